@@ -0,0 +1,262 @@
+import fnmatch
+import re
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort
+
+
+class NameRule:
+    """
+    端口名映射规则，把源端口名映射为期望的目标端口名
+
+    支持的规则类型:
+        exact: 同名连接
+        prefix: 替换前缀，例如 m_axi_ -> s_axi_
+        suffix: 替换后缀，例如 _o -> _i
+        regex: 正则替换，replacement中可以使用 \\1 等分组引用
+    """
+
+    KINDS = ('exact', 'prefix', 'suffix', 'regex')
+
+    def __init__(self, kind, pattern='', replacement=''):
+        """
+        初始化名称映射规则
+
+        参数:
+            kind (str): 规则类型，可选值: 'exact', 'prefix', 'suffix', 'regex'
+            pattern (str): 源端口名中需要匹配的前缀/后缀/正则表达式
+            replacement (str): 替换后的前缀/后缀/正则替换串
+
+        异常:
+            ValueError: 规则类型未知或正则表达式无效时抛出
+        """
+        kind = kind.lower()
+        if kind not in self.KINDS:
+            raise ValueError(f"未知的规则类型 '{kind}'，可选值: {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.pattern = pattern
+        self.replacement = replacement
+        self._regex = None
+        if kind == 'regex':
+            try:
+                self._regex = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"无效的正则表达式 '{pattern}': {e}")
+
+    @classmethod
+    def parse(cls, text):
+        """
+        从文本解析规则，格式为 "类型 [匹配串] [替换串]"，例如 "prefix m_axi_ s_axi_"
+
+        参数:
+            text (str): 规则文本
+
+        返回:
+            NameRule: 解析得到的规则
+        """
+        fields = text.split()
+        if not fields:
+            raise ValueError("规则不能为空")
+        if fields[0].lower() == 'exact':
+            return cls('exact')
+        if len(fields) != 3:
+            raise ValueError(f"规则 '{text}' 格式错误，应为 \"类型 匹配串 替换串\"")
+        return cls(fields[0], fields[1], fields[2])
+
+    @classmethod
+    def parse_rules(cls, text):
+        """解析以分号或换行分隔的多条规则"""
+        return [cls.parse(item) for item in re.split(r'[;\n]', text) if item.strip()]
+
+    def map_name(self, name):
+        """
+        把源端口名映射为目标端口名
+
+        返回:
+            str or None: 目标端口名，规则不适用于该端口名时返回None
+        """
+        if self.kind == 'exact':
+            return name
+        if self.kind == 'prefix':
+            return self.replacement + name[len(self.pattern):] if name.startswith(self.pattern) else None
+        if self.kind == 'suffix':
+            if not self.pattern:
+                return name + self.replacement
+            return name[:-len(self.pattern)] + self.replacement if name.endswith(self.pattern) else None
+        match = self._regex.fullmatch(name)
+        return match.expand(self.replacement) if match else None
+
+    def __str__(self):
+        if self.kind == 'exact':
+            return 'exact'
+        return f"{self.kind} {self.pattern} {self.replacement}"
+
+
+class AutoConnectPlan:
+    """自动连接预览结果，apply之前不会修改数据库"""
+
+    def __init__(self):
+        self.matches: list[tuple] = []  # (源端口, 目标端口, 命中的规则)
+        self.width_mismatches: list[str] = []  # 名称匹配但位宽不一致的端口对
+        self.already_driven: list[str] = []  # 名称匹配但目标端口已有其他驱动
+        self.unmatched: list[str] = []  # 没有找到目标端口的源端口
+
+    def get_summary(self):
+        """获取自动连接预览的文本摘要"""
+        result = "自动连接预览\n"
+        result += "===============\n"
+        result += f"\n将要创建的连接 ({len(self.matches)}):\n"
+        for source_port, dest_port, rule in self.matches:
+            result += f"  {source_port.father_module.name}.{source_port.name} -> " \
+                      f"{dest_port.father_module.name}.{dest_port.name}  ({rule})\n"
+        result += f"\n位宽不一致 ({len(self.width_mismatches)}):\n"
+        for item in self.width_mismatches:
+            result += f"  {item}\n"
+        result += f"\n目标端口已有驱动 ({len(self.already_driven)}):\n"
+        for item in self.already_driven:
+            result += f"  {item}\n"
+        result += f"\n未匹配的源端口 ({len(self.unmatched)}):\n"
+        for item in self.unmatched:
+            result += f"  {item}\n"
+        return result
+
+
+class AutoConnectEngine:
+    """
+    按端口名映射规则自动连接Master模块和Slave模块
+
+    先把所有Slave模块的输入/双向端口按名称建立哈希表，再对每个Master输出/双向端口
+    按规则顺序计算目标端口名并查表，匹配代价与端口数量成线性关系。
+    plan只生成预览，apply在一个事务中创建全部连接。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection):
+        """
+        初始化自动连接引擎
+
+        参数:
+            collection (VerilogModuleCollection): 模块集合数据库
+        """
+        self.collection = collection
+
+    def plan(self, master_modules: list[VerilogModule], slave_modules: list[VerilogModule], rules: list[NameRule]):
+        """
+        按规则匹配端口并批量校验位宽，生成连接预览
+
+        每个源端口使用第一条能匹配到目标端口的规则；同一个目标端口只会被匹配一次。
+
+        参数:
+            master_modules (list[VerilogModule]): 提供源端口的模块
+            slave_modules (list[VerilogModule]): 提供目标端口的模块
+            rules (list[NameRule]): 按优先级排列的名称映射规则
+
+        返回:
+            AutoConnectPlan: 连接预览
+        """
+        plan = AutoConnectPlan()
+
+        # 目标端口名 -> 所有Slave模块中同名的输入/双向端口
+        dest_index: dict[str, list[VerilogPort]] = {}
+        for module in slave_modules:
+            for port in module.ports:
+                if port.is_input() or port.is_inout():
+                    dest_index.setdefault(port.name, []).append(port)
+
+        claimed = set()
+        for module in master_modules:
+            for source_port in module.ports:
+                if not (source_port.is_output() or source_port.is_inout()):
+                    continue
+                candidates = None
+                for rule in rules:
+                    dest_name = rule.map_name(source_port.name)
+                    if dest_name is None:
+                        continue
+                    candidates = [port for port in dest_index.get(dest_name, ())
+                                  if port.father_module is not module and id(port) not in claimed]
+                    if candidates:
+                        break
+                if not candidates:
+                    plan.unmatched.append(f"{module.name}.{source_port.name}")
+                    continue
+
+                source_width = source_port.get_width_value()
+                for dest_port in candidates:
+                    claimed.add(id(dest_port))
+                    if dest_port.source is None and dest_port.get_width_value() == source_width:
+                        plan.matches.append((source_port, dest_port, rule))
+                        continue
+                    if dest_port.source is source_port:
+                        continue
+                    pair_str = f"{module.name}.{source_port.name} -> {dest_port.father_module.name}.{dest_port.name}"
+                    if dest_port.source is not None:
+                        plan.already_driven.append(
+                            f"{pair_str} (已由 {dest_port.source.father_module.name}.{dest_port.source.name} 驱动)")
+                    else:
+                        plan.width_mismatches.append(
+                            f"{pair_str} ({source_width} != {dest_port.get_width_value()})")
+        return plan
+
+    def plan_broadcast(self, source_port: VerilogPort, pattern, modules: list[VerilogModule] = None):
+        """
+        生成广播连接预览：把一个源端口连接到所有名称匹配且未连接的输入端口
+
+        用于时钟、复位、测试模式等全局信号。端口名匹配结果按名称缓存，
+        每个不同的端口名只做一次通配符匹配。
+
+        参数:
+            source_port (VerilogPort): 源端口，必须是输出或双向端口
+            pattern (str): 目标端口名通配符，例如 "clk" 或 "rst*_n"
+            modules (list[VerilogModule] or None): 目标模块范围，为None时为数据库中的所有模块
+
+        返回:
+            AutoConnectPlan: 连接预览，len(plan.matches)即为试运行的连接数量
+        """
+        if not (source_port.is_output() or source_port.is_inout()):
+            raise ValueError(f"源端口 '{source_port.name}' 必须是输出或双向端口")
+        plan = AutoConnectPlan()
+        regex = re.compile(fnmatch.translate(pattern))
+        name_matches: dict[str, bool] = {}
+        source_width = source_port.get_width_value()
+        source_str = f"{source_port.father_module.name}.{source_port.name}"
+        rule = f"broadcast {pattern}"
+
+        for module in self.collection.modules if modules is None else modules:
+            if module is source_port.father_module:
+                continue
+            for dest_port in module.ports:
+                if not (dest_port.is_input() or dest_port.is_inout()):
+                    continue
+                matched = name_matches.get(dest_port.name)
+                if matched is None:
+                    matched = name_matches[dest_port.name] = regex.match(dest_port.name) is not None
+                if not matched or dest_port.source is source_port:
+                    continue
+                if dest_port.source is not None:
+                    plan.already_driven.append(
+                        f"{source_str} -> {module.name}.{dest_port.name} "
+                        f"(已由 {dest_port.source.father_module.name}.{dest_port.source.name} 驱动)")
+                elif dest_port.get_width_value() != source_width:
+                    plan.width_mismatches.append(
+                        f"{source_str} -> {module.name}.{dest_port.name} ({source_width} != {dest_port.get_width_value()})")
+                else:
+                    plan.matches.append((source_port, dest_port, rule))
+        return plan
+
+    def apply(self, plan: AutoConnectPlan):
+        """
+        在一个事务中创建预览中的所有连接，任一连接失败时全部撤销
+
+        参数:
+            plan (AutoConnectPlan): plan生成的连接预览
+
+        返回:
+            list[VerilogConnection]: 新建的连接
+
+        异常:
+            ValueError: 预览生成后数据库发生变化导致连接失败时抛出，此时数据库保持不变
+        """
+        return self.collection.connect_ports([(source_port, dest_port) for source_port, dest_port, _ in plan.matches])
@@ -0,0 +1,270 @@
+import gc
+import itertools
+import os
+import queue
+import threading
+import time
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection
+    from .sqlite_backend import is_sqlite_path, write_sqlite_file
+    from .binary_session import is_binary_session_path, write_binary_file
+    from .session_schema import normalize_records
+    from .session_store import SessionStore, is_session_manifest_path
+except ImportError:
+    from verilog_models import VerilogModuleCollection
+    from sqlite_backend import is_sqlite_path, write_sqlite_file
+    from binary_session import is_binary_session_path, write_binary_file
+    from session_schema import normalize_records
+    from session_store import SessionStore, is_session_manifest_path
+
+
+class SaveResult:
+    """一次后台保存的结果，由AutosaveWorker.poll在主线程中返回"""
+
+    def __init__(self, collection, file_path, context=None):
+        self.collection = collection  # 被保存的数据库（用于判断数据库是否已被替换）
+        self.file_path = file_path
+        self.context = context  # 开始快照时on_snapshot回调的返回值
+        self.error = ''  # 保存失败时的错误信息
+        self.snapshot_time = 0.0  # 主线程中生成快照累计花费的时间（秒）
+        self.write_time = 0.0  # 后台线程写入文件花费的时间（秒）
+        self.collection_copy: VerilogModuleCollection = None  # keep_copy时在后台线程中重建的数据库副本
+
+    def is_success(self):
+        """判断保存是否成功"""
+        return not self.error
+
+
+class _SaveRequest:
+    """等待保存的请求，同一文件路径的多次请求合并为一个"""
+
+    def __init__(self, collection, file_path, metadata, on_snapshot, keep_copy, due_time, deadline):
+        self.collection = collection
+        self.file_path = file_path
+        self.metadata = metadata
+        self.on_snapshot = on_snapshot
+        self.keep_copy = keep_copy
+        self.due_time = due_time  # 最后一次请求之后再等待delay秒
+        self.deadline = deadline  # 连续请求时最迟的保存时间
+
+
+class AutosaveWorker:
+    """
+    后台保存数据库
+
+    主线程中只生成数据库的快照：快照由iter_records逐条生成的普通字典组成，按slice_time分片
+    在多次poll中完成，单次poll不会长时间阻塞Tk事件循环；JSON序列化、写入临时文件、fsync和替换
+    目标文件都在后台线程中完成。delay秒内的连续保存请求合并为一次写入，持续编辑时最迟max_delay秒
+    保存一次。快照使用开始时的模块列表和连接列表（见VerilogModuleCollection.iter_records），
+    快照过程中只连接或断开端口（写入会话日志的修改）时继续生成，写入的内容与开始快照时的数据库一致，
+    之后的修改由会话日志中开始快照时的序号之后的记录保存。再次请求保存或调用invalidate_snapshot
+    （例如批量修改了端口）时丢弃未完成的快照重新开始。
+
+    快照中的字典在创建时都会被循环垃圾回收跟踪，数据库较大时会触发扫描整个堆的完整回收（每次上百毫秒）。
+    快照没有循环引用，写入后靠引用计数即可释放，因此pause_gc为True时在保存期间暂停自动垃圾回收。
+
+    除后台线程外所有方法都必须在主线程（修改数据库的线程）中调用。
+    """
+
+    def __init__(self, path_factory=None, delay=1.0, max_delay=10.0, slice_time=0.008, pause_gc=True):
+        """
+        初始化后台保存器
+
+        参数:
+            path_factory (callable or None): 请求中没有指定文件路径时，在开始快照时调用生成保存路径
+            delay (float): 合并连续保存请求的等待时间（秒）
+            max_delay (float): 连续请求时距第一次请求的最长等待时间（秒）
+            slice_time (float): 每次poll中生成快照的最长时间（秒）
+            pause_gc (bool): 是否在生成快照和写入期间暂停自动垃圾回收
+        """
+        self.path_factory = path_factory
+        self.delay = delay
+        self.max_delay = max_delay
+        self.slice_time = slice_time
+        self.pause_gc = pause_gc
+        self._gc_paused = False
+        self._pending: dict[str, _SaveRequest] = {}  # 文件路径（None表示自动路径） -> 请求
+        self._snapshot = None  # 正在生成的快照：(请求, 记录生成器, 快照字典, SaveResult)
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._active_jobs = 0  # 已交给后台线程但还没有返回结果的写入
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, collection: VerilogModuleCollection, file_path=None, metadata=None, on_snapshot=None,
+                keep_copy=False, immediate=False):
+        """
+        请求保存数据库
+
+        参数:
+            collection (VerilogModuleCollection): 要保存的数据库
+            file_path (str or None): 保存路径，为None时由path_factory生成
+            metadata (dict or None): 写入文件的元数据
+            on_snapshot (callable or None): 开始生成快照时调用，返回值保存在SaveResult.context中
+            keep_copy (bool): 是否在后台线程中从快照重建数据库副本（SaveResult.collection_copy）
+            immediate (bool): 为True时不等待合并，下一次poll即开始保存（用户主动保存）
+        """
+        now = time.monotonic()
+        previous = self._pending.get(file_path)
+        deadline = previous.deadline if previous is not None else now + self.max_delay
+        due_time = now if immediate else min(now + self.delay, deadline)
+        self._pending[file_path] = _SaveRequest(collection, file_path, metadata, on_snapshot, keep_copy,
+                                                due_time, deadline)
+        self.invalidate_snapshot()
+
+    def invalidate_snapshot(self):
+        """数据库在快照生成过程中发生了变化，丢弃未完成的快照，之后重新开始"""
+        if self._snapshot is None:
+            return
+        request = self._snapshot[0]
+        # 如果没有新的请求覆盖它，放回等待队列并立即重新开始
+        self._pending.setdefault(request.file_path, request)
+        self._snapshot = None
+        # 丢弃的快照中的字典可能已经形成了需要回收的垃圾，重新开始快照时再暂停自动垃圾回收
+        if self._gc_paused:
+            gc.enable()
+            self._gc_paused = False
+
+    def has_pending(self):
+        """判断是否还有未完成的保存（等待中、快照中或正在写入）"""
+        return bool(self._pending) or self._snapshot is not None or self._active_jobs > 0
+
+    def poll(self, now=None):
+        """
+        推进快照生成并收集已完成的保存结果，由主线程定期调用（例如通过root.after）
+
+        参数:
+            now (float or None): 当前时间（time.monotonic），用于测试
+
+        返回:
+            list[SaveResult]: 自上次调用以来完成的保存
+        """
+        now = time.monotonic() if now is None else now
+        if self._snapshot is None:
+            due = [request for request in self._pending.values() if request.due_time <= now]
+            if due:
+                self._start_snapshot(min(due, key=lambda request: request.due_time))
+        if self._snapshot is not None:
+            self._advance_snapshot(self.slice_time)
+
+        results = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._active_jobs -= 1
+            results.append(result)
+        if self._gc_paused and not self.has_pending():
+            gc.enable()
+            self._gc_paused = False
+        return results
+
+    def flush(self, timeout=None):
+        """
+        立即完成所有等待中的保存并等待写入结束（退出程序前调用）
+
+        参数:
+            timeout (float or None): 等待写入的最长时间（秒）
+
+        返回:
+            list[SaveResult]: 完成的保存
+        """
+        for request in self._pending.values():
+            request.due_time = 0.0
+        results = []
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while self.has_pending():
+            if self._snapshot is None and self._pending:
+                self._start_snapshot(next(iter(self._pending.values())))
+            if self._snapshot is not None:
+                self._advance_snapshot(None)
+            results.extend(self.poll())
+            if self.has_pending():
+                if end_time is not None and time.monotonic() >= end_time:
+                    break
+                time.sleep(0.005)
+        return results
+
+    def close(self, timeout=None):
+        """完成所有保存后停止后台线程"""
+        results = self.flush(timeout)
+        self._jobs.put(None)
+        self._thread.join(timeout)
+        return results
+
+    def _start_snapshot(self, request: _SaveRequest):
+        """开始为请求生成快照"""
+        del self._pending[request.file_path]
+        if self.pause_gc and gc.isenabled():
+            gc.disable()
+            self._gc_paused = True
+        file_path = request.file_path
+        if file_path is None:
+            file_path = self.path_factory()
+        context = request.on_snapshot() if request.on_snapshot is not None else None
+        result = SaveResult(request.collection, file_path, context)
+        snapshot = {'modules': [], 'connections': []}
+        self._snapshot = (request, request.collection.iter_records(), snapshot, result)
+
+    def _advance_snapshot(self, time_budget):
+        """生成快照，最多花费time_budget秒（None表示直到完成），完成后交给后台线程写入"""
+        request, records, snapshot, result = self._snapshot
+        start_time = time.perf_counter()
+        count = 0
+        for key, record in records:
+            snapshot[key].append(record)
+            count += 1
+            # 每64条检查一次时间，避免频繁调用perf_counter
+            if time_budget is not None and count % 64 == 0 and time.perf_counter() - start_time >= time_budget:
+                result.snapshot_time += time.perf_counter() - start_time
+                return
+        result.snapshot_time += time.perf_counter() - start_time
+        self._snapshot = None
+        self._active_jobs += 1
+        self._jobs.put((snapshot, dict(request.metadata or {}), request.keep_copy, result))
+
+    def _run(self):
+        """后台线程：依次写入快照"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            snapshot, metadata, keep_copy, result = job
+            start_time = time.perf_counter()
+            try:
+                self._write(snapshot, metadata, result.file_path)
+                if keep_copy:
+                    result.collection_copy = VerilogModuleCollection.from_dict(snapshot)
+            except Exception as e:
+                result.error = str(e)
+            result.write_time = time.perf_counter() - start_time
+            self._results.put(result)
+
+    @staticmethod
+    def _write(snapshot, metadata, file_path):
+        """把快照写入临时文件后替换目标文件，写入过程中退出时不会留下不完整的数据库"""
+        records = itertools.chain((('modules', record) for record in snapshot['modules']),
+                                  (('connections', record) for record in snapshot['connections']))
+        # 扩展名为.db/.sqlite时保存为SQLite数据库
+        if is_sqlite_path(file_path):
+            write_sqlite_file(file_path, records, metadata)
+            return
+        # 自动保存的会话清单：只写入与之前的会话不同的数据块
+        if is_session_manifest_path(file_path):
+            SessionStore(os.path.dirname(os.path.abspath(file_path))).save(records, metadata, file_path)
+            return
+        # 扩展名为.wgs时保存为二进制会话文件
+        if is_binary_session_path(file_path):
+            write_binary_file(file_path, records, metadata)
+            return
+        temp_path = f"{file_path}.tmp"
+        # 逐条序列化，每条记录之间都可以切换线程，不会长时间占用GIL阻塞主线程；
+        # JSON文件使用规范化格式，每个模块定义的端口列表只保存一次
+        with open(temp_path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+            VerilogModuleCollection.write_records(f, normalize_records(records), metadata)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
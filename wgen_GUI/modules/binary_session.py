@@ -0,0 +1,433 @@
+import gc
+import json
+import lzma
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+
+
+# 二进制会话文件头，用于识别文件格式
+BINARY_MAGIC = b'\x89WGSESS\n'
+# 用户保存时按扩展名选择二进制格式
+BINARY_EXTENSIONS = ('.wgs',)
+BINARY_VERSION = 1
+
+# 压缩方式及其在文件头中的编号
+COMPRESSION_CODES = {'none': 0, 'zlib': 1, 'lzma': 2}
+
+# 文件头: 魔数, 格式版本, 压缩方式, 保留, 解压后的数据长度
+_HEADER = struct.Struct('<8sHBBQ')
+# 数据块头: 解压后长度, 存储长度
+_BLOCK = struct.Struct('<II')
+# 数据区开头的计数: 字符串, 模块, 端口, includes, 连接, 显式位范围的整数个数
+_COUNTS = struct.Struct('<IIIIII')
+_BLOCK_SIZE = 1024 * 1024
+
+# 连接标志: 源/目标位范围与端口位宽不同，位范围保存在ranges数组中
+_SOURCE_RANGE = 1
+_DEST_RANGE = 2
+
+
+def is_binary_session_file(file_path):
+    """根据文件头判断文件是否为二进制会话文件"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    except OSError:
+        return False
+
+
+def is_binary_session_path(file_path):
+    """根据扩展名判断保存路径是否使用二进制会话格式"""
+    return file_path.lower().endswith(BINARY_EXTENSIONS)
+
+
+def _int_bytes(typecode, values):
+    """把整数列表打包为小端字节串"""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _int_list(typecode, view, offset, count):
+    """从offset处读取count个小端整数，返回(列表, 新的offset)"""
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(view[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist(), end
+
+
+class _RecordEncoder:
+    """把iter_records格式的记录编码为按列存储的整数数组"""
+
+    def __init__(self):
+        self.strings: dict[str, int] = {}  # 字符串 -> 字符串表中的序号
+        # 模块列（字符串序号，None保存为-1）
+        self.module_names = []
+        self.module_file_paths = []
+        self.module_def_names = []
+        self.module_tops = []
+        self.module_hashes = []
+        self.module_parameters = []
+        self.module_port_counts = []
+        self.module_include_counts = []
+        self.module_need_gen = []
+        # 端口列，端口按模块顺序连续存放，序号即端口ID
+        self.port_names = []
+        self.port_directions = []
+        self.port_highs = []
+        self.port_lows = []
+        self.includes = []
+        # 连接列
+        self.sources = []
+        self.dests = []
+        self.flags = []
+        self.ranges = []
+        self.module_ports: dict[str, dict[str, int]] = {}  # 模块名 -> {端口名: 端口ID}
+        self.deferred = []  # 出现在对应模块之前的连接
+        self.skipped = 0  # 找不到端口的连接数
+
+    def intern(self, text):
+        """获取字符串在字符串表中的序号，None返回-1"""
+        if text is None:
+            return -1
+        sid = self.strings.get(text)
+        if sid is None:
+            if not isinstance(text, str) or '\x00' in text:
+                raise ValueError(f"无法保存到二进制会话文件的字符串: {text!r}")
+            sid = self.strings[text] = len(self.strings)
+        return sid
+
+    def add_module(self, module_info):
+        """编码一条模块记录"""
+        intern = self.intern
+        self.module_names.append(intern(module_info['name']))
+        self.module_file_paths.append(intern(module_info.get('file_path', '')))
+        self.module_def_names.append(intern(module_info.get('module_def_name', '')))
+        self.module_tops.append(intern(module_info.get('top_module_name')))
+        self.module_hashes.append(intern(module_info.get('file_hash')))
+        parameters = module_info.get('parameters')
+        self.module_parameters.append(intern(json.dumps(parameters, ensure_ascii=False)) if parameters else -1)
+        self.module_need_gen.append(1 if module_info.get('need_gen') else 0)
+
+        ports = module_info.get('ports', [])
+        # 同名模块以最后一个为准、同名端口以第一个为准，与VerilogModuleCollection的查找一致
+        port_ids = self.module_ports[module_info['name']] = {}
+        for port_info in ports:
+            port_ids.setdefault(port_info['name'], len(self.port_names))
+            width = port_info.get('width') or {'high': 0, 'low': 0}
+            self.port_names.append(intern(port_info['name']))
+            self.port_directions.append(intern(port_info['direction']))
+            self.port_highs.append(width['high'])
+            self.port_lows.append(width['low'])
+        self.module_port_counts.append(len(ports))
+
+        includes = module_info.get('includes', [])
+        self.includes.extend(intern(name) for name in includes)
+        self.module_include_counts.append(len(includes))
+
+    def add_connection(self, conn_info, final=False):
+        """编码一条连接记录，端口还不存在时暂存（final为True时跳过）"""
+        source = self.module_ports.get(conn_info['source_module_name'], {}).get(conn_info['source_port_name'])
+        dest = self.module_ports.get(conn_info['dest_module_name'], {}).get(conn_info['dest_port_name'])
+        if source is None or dest is None:
+            if final:
+                print(f"警告: 无法保存连接 {conn_info['source_module_name']}.{conn_info['source_port_name']} -> "
+                      f"{conn_info['dest_module_name']}.{conn_info['dest_port_name']}: 端口不存在")
+                self.skipped += 1
+            else:
+                self.deferred.append(conn_info)
+            return
+        flags = 0
+        # 与端口位宽相同的位范围（绝大多数连接）不需要保存
+        for port_id, bit_range, flag in ((source, conn_info.get('source_bit_range'), _SOURCE_RANGE),
+                                         (dest, conn_info.get('dest_bit_range'), _DEST_RANGE)):
+            if bit_range and (bit_range['high'] != self.port_highs[port_id] or bit_range['low'] != self.port_lows[port_id]):
+                flags |= flag
+                self.ranges.append(bit_range['high'])
+                self.ranges.append(bit_range['low'])
+        self.sources.append(source)
+        self.dests.append(dest)
+        self.flags.append(flags)
+
+    def encode(self, metadata):
+        """生成解压后的完整数据区"""
+        for conn_info in self.deferred:
+            self.add_connection(conn_info, final=True)
+        self.deferred = []
+        string_blob = '\x00'.join(self.strings).encode('utf-8')
+        metadata_blob = json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8')
+        parts = [_COUNTS.pack(len(self.strings), len(self.module_names), len(self.port_names), len(self.includes),
+                              len(self.sources), len(self.ranges)),
+                 struct.pack('<I', len(metadata_blob)), metadata_blob,
+                 struct.pack('<I', len(string_blob)), string_blob]
+        for column in (self.module_names, self.module_file_paths, self.module_def_names, self.module_tops,
+                       self.module_hashes, self.module_parameters, self.module_port_counts, self.module_include_counts,
+                       self.port_names, self.port_directions, self.port_highs, self.port_lows, self.includes,
+                       self.sources, self.dests, self.ranges):
+            parts.append(_int_bytes('i', column))
+        parts.append(bytes(self.module_need_gen))
+        parts.append(bytes(self.flags))
+        return b''.join(parts)
+
+
+def write_binary_records(file_obj, records, metadata=None, compression='zlib'):
+    """
+    把iter_records格式的记录写入二进制会话文件
+
+    文件由文件头和若干数据块组成，每个数据块（解压后最大1MB）单独压缩。解压后的数据区包括
+    元数据、字符串表（模块名、端口名等每个字符串只保存一次）和按列存储的整数数组：模块和端口
+    用序号表示，连接只保存两端的端口ID，与端口位宽相同的位范围不重复保存。
+
+    参数:
+        file_obj: 以二进制模式打开的文件对象
+        records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+        metadata (dict or None): 元数据
+        compression (str): 压缩方式，'none'、'zlib'或'lzma'
+
+    返回:
+        int: 因端口不存在而没有保存的连接数
+
+    异常:
+        ValueError: 不支持的压缩方式或无法保存的字符串
+    """
+    if compression not in COMPRESSION_CODES:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    encoder = _RecordEncoder()
+    for key, record in records:
+        if key == 'modules':
+            encoder.add_module(record)
+        elif key == 'connections':
+            encoder.add_connection(record)
+    payload = encoder.encode(metadata)
+
+    file_obj.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, COMPRESSION_CODES[compression], 0, len(payload)))
+    view = memoryview(payload)
+    for offset in range(0, len(payload), _BLOCK_SIZE):
+        block = view[offset:offset + _BLOCK_SIZE]
+        if compression == 'zlib':
+            stored = zlib.compress(block, 6)
+        elif compression == 'lzma':
+            stored = lzma.compress(block, preset=1)
+        else:
+            stored = block
+        file_obj.write(_BLOCK.pack(len(block), len(stored)))
+        file_obj.write(stored)
+    return encoder.skipped
+
+
+def write_binary_file(file_path, records, metadata=None, compression='zlib'):
+    """
+    把记录写入临时文件后替换目标文件，写入过程中退出时不会留下不完整的文件
+
+    参数:
+        file_path (str): 二进制会话文件路径
+        records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+        metadata (dict or None): 元数据
+        compression (str): 压缩方式，'none'、'zlib'或'lzma'
+
+    返回:
+        int: 因端口不存在而没有保存的连接数
+    """
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        skipped = write_binary_records(f, records, metadata, compression)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+    return skipped
+
+
+def _read_payload(file_obj):
+    """读取文件头并解压所有数据块，返回解压后的数据区"""
+    header = file_obj.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("二进制会话文件不完整")
+    magic, version, compression, _, payload_size = _HEADER.unpack(header)
+    if magic != BINARY_MAGIC:
+        raise ValueError("不是二进制会话文件")
+    if version > BINARY_VERSION:
+        raise ValueError(f"不支持的二进制会话文件版本: {version}")
+    payload = bytearray()
+    while len(payload) < payload_size:
+        block_header = file_obj.read(_BLOCK.size)
+        if len(block_header) < _BLOCK.size:
+            raise ValueError("二进制会话文件不完整")
+        raw_size, stored_size = _BLOCK.unpack(block_header)
+        stored = file_obj.read(stored_size)
+        if len(stored) < stored_size:
+            raise ValueError("二进制会话文件不完整")
+        if compression == COMPRESSION_CODES['zlib']:
+            stored = zlib.decompress(stored)
+        elif compression == COMPRESSION_CODES['lzma']:
+            stored = lzma.decompress(stored)
+        elif compression != COMPRESSION_CODES['none']:
+            raise ValueError(f"不支持的压缩方式编号: {compression}")
+        if len(stored) != raw_size:
+            raise ValueError("二进制会话文件数据块长度错误")
+        payload += stored
+    return payload
+
+
+def read_binary_metadata(file_path):
+    """
+    读取二进制会话文件的元数据
+
+    返回:
+        dict: 元数据
+
+    异常:
+        ValueError: 文件格式错误
+    """
+    with open(file_path, 'rb') as f:
+        payload = _read_payload(f)
+    offset = _COUNTS.size
+    (size,) = struct.unpack_from('<I', payload, offset)
+    return json.loads(bytes(payload[offset + 4:offset + 4 + size]).decode('utf-8'))
+
+
+def load_binary_file(file_path, progress_callback=None):
+    """
+    从二进制会话文件加载模块集合
+
+    按端口ID直接建立连接，不需要按名称查找模块和端口，也不需要解析JSON文本。
+    创建对象期间暂停自动垃圾回收，避免对象图增长过程中反复扫描整个堆。
+
+    参数:
+        file_path (str): 二进制会话文件路径
+        progress_callback (callable or None): progress_callback(已创建的模块和连接数, 模块和连接总数)，
+                                              每10000条调用一次，可以在后台线程中加载时更新进度
+
+    返回:
+        VerilogModuleCollection: 重建的模块集合对象
+
+    异常:
+        ValueError: 文件格式错误
+    """
+    with open(file_path, 'rb') as f:
+        payload = _read_payload(f)
+    view = memoryview(payload)
+    try:
+        (string_count, module_count, port_count, include_count,
+         connection_count, range_count) = _COUNTS.unpack_from(payload, 0)
+        offset = _COUNTS.size
+        (size,) = struct.unpack_from('<I', payload, offset)
+        offset += 4 + size
+        (size,) = struct.unpack_from('<I', payload, offset)
+        offset += 4
+        strings = bytes(view[offset:offset + size]).decode('utf-8').split('\x00') if string_count else []
+        offset += size
+        if len(strings) != string_count:
+            raise ValueError("二进制会话文件字符串表错误")
+
+        columns = []
+        for count in (module_count,) * 8 + (port_count,) * 4 + (include_count, connection_count,
+                                                                connection_count, range_count):
+            column, offset = _int_list('i', view, offset, count)
+            columns.append(column)
+        need_gen = bytes(view[offset:offset + module_count])
+        flags = bytes(view[offset + module_count:offset + module_count + connection_count])
+        if offset + module_count + connection_count != len(payload):
+            raise ValueError("二进制会话文件数据长度错误")
+    except struct.error as e:
+        raise ValueError(f"二进制会话文件格式错误: {e}")
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_collection(strings, columns, need_gen, flags, progress_callback)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _build_collection(strings, columns, need_gen, flags, progress_callback):
+    """根据字符串表和各列数据创建模块、端口和连接"""
+    (names, file_paths, def_names, tops, hashes, parameters, port_counts, include_counts,
+     port_names, port_directions, port_highs, port_lows, includes, sources, dests, ranges) = columns
+    module_count = len(names)
+    connection_count = len(sources)
+    total = module_count + connection_count
+    done = 0
+    collection = VerilogModuleCollection()
+    all_ports = []
+    references = []  # (模块, includes名称列表, top_module名称)
+    parsed_parameters = {}  # 参数JSON的字符串序号 -> 参数字典，相同定义的实例只解析一次
+    port_index = 0
+    include_index = 0
+    for i in range(module_count):
+        module = VerilogModule(strings[names[i]], strings[file_paths[i]], strings[def_names[i]])
+        ports = []
+        for j in range(port_index, port_index + port_counts[i]):
+            port = VerilogPort(strings[port_names[j]], strings[port_directions[j]],
+                               {'high': port_highs[j], 'low': port_lows[j]})
+            port.father_module = module
+            ports.append(port)
+        port_index += port_counts[i]
+        module.ports = ports
+        all_ports.extend(ports)
+        module.need_gen = bool(need_gen[i])
+        if parameters[i] >= 0:
+            if parameters[i] not in parsed_parameters:
+                parsed_parameters[parameters[i]] = json.loads(strings[parameters[i]])
+            module.parameters = dict(parsed_parameters[parameters[i]])
+        module.file_hash = strings[hashes[i]] if hashes[i] >= 0 else None
+        collection.add_module(module)
+        include_names = [strings[sid] for sid in includes[include_index:include_index + include_counts[i]]]
+        include_index += include_counts[i]
+        references.append((module, include_names, strings[tops[i]] if tops[i] >= 0 else None))
+        done += 1
+        if progress_callback is not None and done % 10000 == 0:
+            progress_callback(done, total)
+
+    # 恢复includes和top_module引用
+    module_map = collection._get_module_index()
+    for module, include_names, top_module_name in references:
+        module.includes = [module_map[name] for name in include_names if name in module_map]
+        if top_module_name and top_module_name in module_map:
+            module.top_module = module_map[top_module_name]
+
+    connections = collection.connections
+    range_index = 0
+    for k in range(connection_count):
+        source_port = all_ports[sources[k]]
+        dest_port = all_ports[dests[k]]
+        source_range = dest_range = None
+        if flags[k] & _SOURCE_RANGE:
+            source_range = {'high': ranges[range_index], 'low': ranges[range_index + 1]}
+            range_index += 2
+        if flags[k] & _DEST_RANGE:
+            dest_range = {'high': ranges[range_index], 'low': ranges[range_index + 1]}
+            range_index += 2
+        try:
+            # 与add_connection相同的方向和位范围检查
+            connection = VerilogConnection(source_port.father_module, source_port, dest_port.father_module, dest_port,
+                                           source_range, dest_range)
+        except ValueError as e:
+            print(f"警告: 无法创建连接 {source_port.father_module.name}.{source_port.name} -> "
+                  f"{dest_port.father_module.name}.{dest_port.name}: {e}")
+            continue
+        connections.append(connection)
+        # 目标端口还没有驱动时不可能在任何destinations中，驱动已经是源端口时一定已经在其中，
+        # 只有同一个目标端口被不同的源端口先后连接时才需要线性查找
+        previous = dest_port.source
+        if previous is None or (previous is not source_port and dest_port not in source_port.destinations):
+            source_port.destinations.append(dest_port)
+        dest_port.source = source_port
+        done += 1
+        if progress_callback is not None and done % 10000 == 0:
+            progress_callback(done, total)
+
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return collection
@@ -0,0 +1,195 @@
+import sys
+import json
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection
+    from .json_stream import iter_json_file
+    from .session_schema import denormalize_records
+except ImportError:
+    from verilog_models import VerilogModuleCollection
+    from json_stream import iter_json_file
+    from session_schema import denormalize_records
+
+
+# 参与比较的模块属性（端口单独比较）
+MODULE_FIELDS = ('file_path', 'module_def_name', 'need_gen', 'parameters', 'includes', 'top_module_name', 'file_hash')
+
+
+def iter_source_records(source):
+    """
+    逐条生成数据源中的模块和连接记录
+
+    参数:
+        source (VerilogModuleCollection or str): 模块集合对象或数据库json文件路径
+
+    返回:
+        generator: 依次生成 ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+    """
+    if isinstance(source, VerilogModuleCollection):
+        yield from source.iter_records()
+    else:
+        # 规范化格式的文件转换为每个模块都带端口列表的记录
+        yield from denormalize_records((key, value) for key, value, is_item in iter_json_file(source)
+                                       if is_item and key in ('definitions', 'modules', 'connections'))
+
+
+def _field_hashes(module_info):
+    """计算模块各属性的哈希值，只保存哈希以节省内存"""
+    return tuple(hash(json.dumps(module_info.get(field), sort_keys=True)) for field in MODULE_FIELDS)
+
+
+def _port_signature(port_info):
+    """端口特征：方向和位宽"""
+    width = port_info.get('width') or {'high': 0, 'low': 0}
+    return (sys.intern(port_info['direction']), width['high'], width['low'])
+
+
+def _connection_key(conn_info):
+    """连接的键：源模块、源端口、目标模块、目标端口"""
+    return (sys.intern(conn_info['source_module_name']), sys.intern(conn_info['source_port_name']),
+            sys.intern(conn_info['dest_module_name']), sys.intern(conn_info['dest_port_name']))
+
+
+def _connection_value(conn_info):
+    """连接的值：源和目标使用的位范围"""
+    source_range = conn_info.get('source_bit_range') or {}
+    dest_range = conn_info.get('dest_bit_range') or {}
+    return (source_range.get('high'), source_range.get('low'), dest_range.get('high'), dest_range.get('low'))
+
+
+def _format_range(high, low):
+    return f"[{high}:{low}]" if high is not None else ""
+
+
+def _connection_record(record_type, key, value, old_value=None):
+    """生成连接差异记录"""
+    record = {
+        'type': record_type,
+        'source': f"{key[0]}.{key[1]}{_format_range(value[0], value[1])}",
+        'dest': f"{key[2]}.{key[3]}{_format_range(value[2], value[3])}",
+    }
+    if old_value is not None:
+        record['old_source'] = f"{key[0]}.{key[1]}{_format_range(old_value[0], old_value[1])}"
+        record['old_dest'] = f"{key[2]}.{key[3]}{_format_range(old_value[2], old_value[3])}"
+    return record
+
+
+def _port_record(record_type, module_name, port_name, signature, old_signature=None):
+    """生成端口差异记录"""
+    record = {
+        'type': record_type,
+        'module': module_name,
+        'port': port_name,
+        'direction': signature[0],
+        'width': {'high': signature[1], 'low': signature[2]},
+    }
+    if old_signature is not None:
+        record['old_direction'] = old_signature[0]
+        record['old_width'] = {'high': old_signature[1], 'low': old_signature[2]}
+    return record
+
+
+def iter_diff(old_source, new_source):
+    """
+    流式比较两个模块集合数据库
+
+    只为旧数据库建立以哈希键索引的紧凑摘要（模块属性哈希、端口特征、连接位范围），
+    新数据库逐条流式读取并与摘要比较，整体时间复杂度为O(n)。
+
+    参数:
+        old_source (VerilogModuleCollection or str): 旧的模块集合或数据库文件路径
+        new_source (VerilogModuleCollection or str): 新的模块集合或数据库文件路径
+
+    返回:
+        generator: 逐条生成差异记录字典，type字段取值为
+                   module_added / module_removed / module_changed /
+                   port_added / port_removed / port_changed /
+                   connection_added / connection_removed / connection_changed
+    """
+    # 第一遍：为旧数据库建立紧凑索引
+    old_modules: dict[str, tuple] = {}
+    old_connections: dict[tuple, tuple] = {}
+    for key, record in iter_source_records(old_source):
+        if key == 'modules':
+            ports = {sys.intern(port_info['name']): _port_signature(port_info) for port_info in record.get('ports', [])}
+            old_modules[sys.intern(record['name'])] = (_field_hashes(record), ports)
+        else:
+            old_connections[_connection_key(record)] = _connection_value(record)
+
+    # 第二遍：流式读取新数据库并与索引比较
+    for key, record in iter_source_records(new_source):
+        if key == 'modules':
+            module_name = record['name']
+            new_ports = [(port_info['name'], _port_signature(port_info)) for port_info in record.get('ports', [])]
+            old_entry = old_modules.pop(module_name, None)
+            if old_entry is None:
+                yield {'type': 'module_added', 'module': module_name, 'port_count': len(new_ports)}
+                continue
+
+            old_hashes, old_ports = old_entry
+            changed_fields = [field for field, old_hash, new_hash in zip(MODULE_FIELDS, old_hashes, _field_hashes(record))
+                              if old_hash != new_hash]
+            if changed_fields:
+                yield {'type': 'module_changed', 'module': module_name, 'fields': changed_fields}
+
+            for port_name, signature in new_ports:
+                old_signature = old_ports.pop(port_name, None)
+                if old_signature is None:
+                    yield _port_record('port_added', module_name, port_name, signature)
+                elif old_signature != signature:
+                    yield _port_record('port_changed', module_name, port_name, signature, old_signature)
+            for port_name, signature in old_ports.items():
+                yield _port_record('port_removed', module_name, port_name, signature)
+        else:
+            conn_key = _connection_key(record)
+            new_value = _connection_value(record)
+            old_value = old_connections.pop(conn_key, None)
+            if old_value is None:
+                yield _connection_record('connection_added', conn_key, new_value)
+            elif old_value != new_value:
+                yield _connection_record('connection_changed', conn_key, new_value, old_value)
+
+    # 索引中剩余的条目在新数据库中不存在
+    for module_name, (_, old_ports) in old_modules.items():
+        yield {'type': 'module_removed', 'module': module_name, 'port_count': len(old_ports)}
+    for conn_key, old_value in old_connections.items():
+        yield _connection_record('connection_removed', conn_key, old_value)
+
+
+def summarize_diff(records):
+    """
+    统计差异记录的数量
+
+    参数:
+        records (iterable): iter_diff生成的差异记录
+
+    返回:
+        dict: 差异类型到数量的映射
+    """
+    summary = {}
+    for record in records:
+        summary[record['type']] = summary.get(record['type'], 0) + 1
+    return summary
+
+
+def main(argv=None):
+    """命令行入口：比较两个数据库文件，并以每行一条JSON记录的形式输出差异"""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="比较两个wgen_GUI数据库文件的结构差异")
+    arg_parser.add_argument('old_file', help="旧的数据库json文件")
+    arg_parser.add_argument('new_file', help="新的数据库json文件")
+    arg_parser.add_argument('--summary', action='store_true', help="只输出各类差异的数量")
+    args = arg_parser.parse_args(argv)
+
+    summary = {}
+    for record in iter_diff(args.old_file, args.new_file):
+        summary[record['type']] = summary.get(record['type'], 0) + 1
+        if not args.summary:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.write(json.dumps({'type': 'summary', 'counts': summary}, ensure_ascii=False) + "\n")
+    return 1 if summary else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
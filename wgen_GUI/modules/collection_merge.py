@@ -0,0 +1,149 @@
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection
+    from .collection_diff import iter_source_records
+except ImportError:
+    from verilog_models import VerilogModuleCollection
+    from collection_diff import iter_source_records
+
+
+class MergeConflict:
+    """三方合并冲突记录，描述同一个目标端口在ours和theirs中被修改为不同的驱动"""
+
+    def __init__(self, dest, base_drivers, our_drivers, their_drivers, reason="目标端口存在两个不同的驱动"):
+        """
+        初始化合并冲突记录
+
+        参数:
+            dest (tuple): 目标端口 (模块名, 端口名)
+            base_drivers (tuple): base中该端口的连接签名
+            our_drivers (tuple): ours中该端口的连接签名
+            their_drivers (tuple): theirs中该端口的连接签名
+            reason (str): 冲突原因
+        """
+        self.dest = dest
+        self.base_drivers = base_drivers
+        self.our_drivers = our_drivers
+        self.their_drivers = their_drivers
+        self.reason = reason
+
+    @staticmethod
+    def _format_drivers(drivers):
+        if not drivers:
+            return "无驱动"
+        return ", ".join(f"{sig[0]}.{sig[1]}[{sig[2]}:{sig[3]}]" for sig in drivers)
+
+    def __str__(self):
+        return (f"{self.dest[0]}.{self.dest[1]}: {self.reason}\n"
+                f"    base:   {self._format_drivers(self.base_drivers)}\n"
+                f"    ours:   {self._format_drivers(self.our_drivers)}\n"
+                f"    theirs: {self._format_drivers(self.their_drivers)}")
+
+
+class MergeResult:
+    """三方合并结果，包含合并后的模块集合与冲突列表"""
+
+    def __init__(self, collection: VerilogModuleCollection, conflicts: list[MergeConflict], taken_from_theirs: int):
+        self.collection = collection
+        self.conflicts = conflicts
+        self.taken_from_theirs = taken_from_theirs  # 采用theirs修改的目标端口数量
+
+    def get_summary(self):
+        """获取合并结果的文本摘要"""
+        result = "三方合并报告\n"
+        result += "===============\n"
+        result += f"合并后连接数: {len(self.collection.connections)}\n"
+        result += f"采用theirs修改的目标端口: {self.taken_from_theirs}\n"
+        result += f"冲突数: {len(self.conflicts)}（冲突端口保留ours的连接）\n"
+        for conflict in self.conflicts:
+            result += f"\n{conflict}\n"
+        return result
+
+
+def _index_source(source, modules_out=None):
+    """
+    按目标端口建立连接索引
+
+    每个输入端口只能有一个驱动，因此以 (目标模块, 目标端口) 为哈希键，
+    值为该端口上所有连接签名排序后的元组。
+
+    参数:
+        source (VerilogModuleCollection or str): 模块集合或数据库文件路径
+        modules_out (dict or None): 不为None时收集模块记录
+
+    返回:
+        dict: 目标端口到连接签名元组的映射
+    """
+    grouped: dict[tuple, list] = {}
+    for key, record in iter_source_records(source):
+        if key == 'modules':
+            if modules_out is not None:
+                modules_out[record['name']] = record
+            continue
+        source_range = record.get('source_bit_range') or {}
+        dest_range = record.get('dest_bit_range') or {}
+        signature = (record['source_module_name'], record['source_port_name'],
+                     source_range.get('high'), source_range.get('low'),
+                     dest_range.get('high'), dest_range.get('low'))
+        grouped.setdefault((record['dest_module_name'], record['dest_port_name']), []).append(signature)
+    return {dest: tuple(sorted(signatures, key=repr)) for dest, signatures in grouped.items()}
+
+
+def merge_collections(base, ours, theirs):
+    """
+    在连接层面对三个模块集合数据库做三方合并
+
+    模块以ours为准，并加入theirs中新增（base中不存在）的模块。
+    每个目标端口的连接按以下规则合并，整体时间复杂度为O(n)：
+        - ours与theirs相同：直接采用
+        - 只有一方相对base有修改：采用修改的一方
+        - 双方修改不同：记录冲突，保留ours
+
+    参数:
+        base (VerilogModuleCollection or str): 共同祖先
+        ours (VerilogModuleCollection or str): 本方数据库
+        theirs (VerilogModuleCollection or str): 对方数据库
+
+    返回:
+        MergeResult: 合并结果
+    """
+    base_modules = {}
+    our_modules = {}
+    their_modules = {}
+    base_index = _index_source(base, base_modules)
+    our_index = _index_source(ours, our_modules)
+    their_index = _index_source(theirs, their_modules)
+
+    # 合并模块：ours的全部模块加上theirs新增的模块
+    module_records = list(our_modules.values())
+    module_records += [record for name, record in their_modules.items()
+                       if name not in our_modules and name not in base_modules]
+    collection = VerilogModuleCollection.from_dict({'modules': module_records, 'connections': []})
+
+    conflicts = []
+    taken_from_theirs = 0
+    merged_connections = []
+    for dest in {**base_index, **our_index, **their_index}:
+        base_sig = base_index.get(dest, ())
+        our_sig = our_index.get(dest, ())
+        their_sig = their_index.get(dest, ())
+        if our_sig == their_sig or their_sig == base_sig:
+            merged_sig = our_sig
+        elif our_sig == base_sig:
+            merged_sig = their_sig
+            taken_from_theirs += 1
+        else:
+            merged_sig = our_sig
+            conflicts.append(MergeConflict(dest, base_sig, our_sig, their_sig))
+        merged_connections.extend((dest, signature) for signature in merged_sig)
+
+    for dest, signature in merged_connections:
+        source_range = None if signature[2] is None else {'high': signature[2], 'low': signature[3]}
+        dest_range = None if signature[4] is None else {'high': signature[4], 'low': signature[5]}
+        try:
+            collection.add_connection(signature[0], signature[1], dest[0], dest[1], source_range, dest_range)
+        except ValueError as e:
+            conflicts.append(MergeConflict(dest, base_index.get(dest, ()), our_index.get(dest, ()),
+                                           their_index.get(dest, ()), reason=f"连接无法建立: {e}"))
+
+    return MergeResult(collection, conflicts, taken_from_theirs)
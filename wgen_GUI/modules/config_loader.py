@@ -0,0 +1,172 @@
+import json
+import os
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .file_cache import compute_content_hash, get_cache_dir, load_json_cache, save_json_cache
+except ImportError:
+    from file_cache import compute_content_hash, get_cache_dir, load_json_cache, save_json_cache
+
+
+def get_yaml_loader():
+    """获取YAML安全加载器，安装了libyaml时使用C实现的CSafeLoader，否则使用纯Python的SafeLoader"""
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+# 缓存目录中最多保留的配置缓存文件数
+CONFIG_CACHE_MAX_ENTRIES = 64
+
+
+def get_config_cache_path(config_file_path):
+    """
+    获取配置文件的编译缓存路径，每个配置文件只保留一个缓存文件
+
+    参数:
+        config_file_path (str): 配置文件路径
+
+    返回:
+        str: 缓存目录中的缓存文件路径
+    """
+    path_hash = compute_content_hash(os.path.abspath(config_file_path).encode('utf-8'))
+    return os.path.join(get_cache_dir(), f"config_{path_hash[:16]}.json")
+
+
+def get_config_source_path(cache_path):
+    """
+    获取配置缓存的来源记录文件路径，来源记录文件中只保存配置文件的绝对路径，清理缓存时不需要解析缓存内容
+
+    参数:
+        cache_path (str): 配置缓存文件路径
+
+    返回:
+        str: 与缓存文件同名、扩展名为.src的文件路径
+    """
+    return os.path.splitext(cache_path)[0] + '.src'
+
+
+def _read_config_source(source_path):
+    """读取来源记录文件中的配置文件路径，文件不存在时返回None"""
+    try:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def prune_config_cache(cache_dir=None, max_entries=CONFIG_CACHE_MAX_ENTRIES):
+    """
+    清理缓存目录中的配置缓存：删除配置文件已不存在的缓存，其余按修改时间只保留最近的max_entries个
+
+    配置文件路径从来源记录文件（见get_config_source_path）读取，不解析缓存内容；
+    没有来源记录的缓存和没有缓存的来源记录都会被删除
+
+    参数:
+        cache_dir (str or None): 缓存目录，为None时使用默认缓存目录
+        max_entries (int): 最多保留的缓存文件数
+
+    返回:
+        int: 删除的缓存文件数
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    entries = []
+    removed = 0
+    names = set(os.listdir(cache_dir))
+    for name in names:
+        if not name.startswith('config_'):
+            continue
+        path = os.path.join(cache_dir, name)
+        source_path = get_config_source_path(path)
+        try:
+            if name.endswith('.src'):
+                # 缓存文件已不存在的来源记录
+                if name[:-4] + '.json' not in names:
+                    os.remove(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            source = _read_config_source(source_path)
+            if source and os.path.isfile(source):
+                entries.append((os.path.getmtime(path), path))
+                continue
+            _remove_config_cache(path)
+            removed += 1
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    for _, path in entries[max_entries:]:
+        try:
+            _remove_config_cache(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _remove_config_cache(cache_path):
+    """删除配置缓存文件及其来源记录文件"""
+    os.remove(cache_path)
+    try:
+        os.remove(get_config_source_path(cache_path))
+    except OSError:
+        pass
+
+
+def load_config_data(config_file_path, cache_path=None):
+    """
+    读取配置文件内容
+
+    扩展名为.json的配置按JSON读取；其他配置内容以 { 开头且是合法JSON时按JSON读取，否则按YAML读取，
+    解析结果以JSON格式缓存并记录配置文件的哈希，配置文件未变化时直接读取缓存，跳过YAML解析。
+    默认缓存目录中写入新的缓存时清理过期的配置缓存（见prune_config_cache）。
+
+    参数:
+        config_file_path (str): 配置文件路径
+        cache_path (str or None): 编译缓存文件路径，为None时使用缓存目录中的默认文件，为空字符串时不缓存
+
+    返回:
+        配置内容（通常为dict）
+
+    异常:
+        ValueError: .json配置格式错误
+    """
+    with open(config_file_path, 'rb') as f:
+        content = f.read()
+    text = content.decode('utf-8')
+
+    if config_file_path.lower().endswith('.json'):
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"JSON配置文件格式错误: {e}")
+    # 其他扩展名的配置以 { 开头时可能是JSON，也可能是YAML的flow风格，JSON解析失败时按YAML读取
+    if text.lstrip().startswith('{'):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+
+    default_cache = cache_path is None
+    if default_cache:
+        cache_path = get_config_cache_path(config_file_path)
+    content_hash = compute_content_hash(content)
+    if cache_path:
+        cached = load_json_cache(cache_path)
+        if cached.get('hash') == content_hash and 'data' in cached:
+            return cached['data']
+
+    import yaml
+    config_data = yaml.load(text, Loader=get_yaml_loader())
+
+    # 只缓存与JSON往返一致的内容（YAML中的日期、非字符串键等无法用JSON表示）
+    if cache_path and isinstance(config_data, dict):
+        try:
+            if json.loads(json.dumps(config_data)) == config_data:
+                save_json_cache(cache_path, {'hash': content_hash, 'data': config_data})
+                if default_cache:
+                    with open(get_config_source_path(cache_path), 'w', encoding='utf-8') as f:
+                        f.write(os.path.abspath(config_file_path))
+                    prune_config_cache()
+        except (TypeError, ValueError, OSError):
+            pass
+    return config_data
@@ -0,0 +1,389 @@
+import os
+import queue
+import re
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+    from .verilog_parser import VerilogPortParser
+    from .file_cache import compute_file_hash
+    from .file_watcher import FileWatcher
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+    from verilog_parser import VerilogPortParser
+    from file_cache import compute_file_hash
+    from file_watcher import FileWatcher
+
+
+class DatabaseUpdateReport:
+    """增量更新报告类，记录一次增量更新中所有的端口变化和失效连接"""
+
+    def __init__(self):
+        """初始化空的更新报告"""
+        self.changed_files: list[str] = []  # 内容发生变化并重新解析的文件
+        self.missing_files: list[str] = []  # 无法找到的文件
+        self.failed_files: list[str] = []  # 解析失败的文件及原因
+        self.added_ports: list[str] = []  # 新增端口 module.port
+        self.removed_ports: list[str] = []  # 删除端口 module.port
+        self.width_changed_ports: list[str] = []  # 位宽变化的端口
+        self.direction_changed_ports: list[str] = []  # 方向变化的端口
+        self.renamed_ports: list[str] = []  # 重命名的端口 module.old -> new
+        self.invalidated_connections: list[str] = []  # 失效并被删除的连接及原因
+
+    def has_changes(self):
+        """
+        判断本次更新是否修改了数据库
+
+        只修改了注释或空白的文件重新解析后端口没有变化，但模块记录的文件哈希已更新，
+        同样算作修改，需要保存数据库，否则下次更新时会再次解析这些文件
+        """
+        return bool(self.changed_files) or self.has_port_changes()
+
+    def has_port_changes(self):
+        """判断本次更新是否修改了端口或删除了连接"""
+        return bool(self.added_ports or self.removed_ports or self.width_changed_ports or
+                    self.direction_changed_ports or self.renamed_ports or self.invalidated_connections)
+
+    def get_summary(self):
+        """获取更新报告的文本摘要"""
+        sections = [
+            ("重新解析的文件", self.changed_files),
+            ("未找到的文件", self.missing_files),
+            ("解析失败的文件", self.failed_files),
+            ("新增端口", self.added_ports),
+            ("删除端口", self.removed_ports),
+            ("位宽变化端口", self.width_changed_ports),
+            ("方向变化端口", self.direction_changed_ports),
+            ("重命名端口", self.renamed_ports),
+            ("失效连接", self.invalidated_connections),
+        ]
+        result = "增量更新报告\n"
+        result += "===============\n"
+        for title, items in sections:
+            result += f"\n{title} ({len(items)}):\n"
+            for item in items:
+                result += f"  {item}\n"
+        return result
+
+    def __str__(self):
+        return self.get_summary()
+
+
+class DatabaseUpdater:
+    """
+    数据库增量更新器
+
+    只重新解析哈希值发生变化的RTL文件，逐模块比较新旧端口（新增、删除、位宽变化、重命名），
+    原地更新VerilogModuleCollection并保留所有仍然有效的连接，失效的连接写入更新报告。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection, preprocessor=None):
+        """
+        初始化增量更新器
+
+        参数:
+            collection (VerilogModuleCollection): 需要更新的模块集合
+            preprocessor (VerilogPreprocessor, optional): 加载配置时使用的预处理器，重新解析时同样先展开宏
+        """
+        self.collection = collection
+        self.preprocessor = preprocessor
+
+    def _group_modules_by_file(self):
+        """按文件路径对需要从RTL解析的模块分组，同一文件只需解析一次"""
+        modules_by_file: dict[str, list[VerilogModule]] = {}
+        for module in self.collection.modules:
+            # 需要生成的模块没有对应的RTL文件
+            if module.need_gen or not module.file_path:
+                continue
+            modules_by_file.setdefault(module.file_path, []).append(module)
+        return modules_by_file
+
+    @staticmethod
+    def _select_module_name(file_path, module_def_name):
+        """
+        获取重新解析时要选择的模块名
+
+        库文件中可能定义了多个模块，文件中有module_def_name的定义时按该名称选择；
+        否则与加载配置时相同，解析文件中的第一个模块（配置中的模块名与文件中的不一致）
+        """
+        if not module_def_name:
+            return None
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+        except OSError:
+            return None
+        if re.search(rf'\bmodule\s+{re.escape(module_def_name)}\b', content):
+            return module_def_name
+        return None
+
+    def get_watch_map(self):
+        """
+        获取需要监视的文件及其影响的RTL文件
+
+        模块的RTL文件影响自身；配置了预处理器时，RTL文件 `include 的头文件影响包含它的所有RTL文件。
+
+        返回:
+            dict: 监视的文件绝对路径 -> 需要重新解析的RTL文件路径集合（与模块的file_path一致）
+        """
+        watch_map: dict[str, set] = {}
+        for file_path in self._group_modules_by_file():
+            watch_map.setdefault(os.path.abspath(file_path), set()).add(file_path)
+            if self.preprocessor is not None:
+                for dependency in self.preprocessor.get_dependencies(file_path):
+                    watch_map.setdefault(dependency, set()).add(file_path)
+        return watch_map
+
+    def find_changed_files(self, report: DatabaseUpdateReport):
+        """
+        找出内容哈希值与数据库记录不一致的文件
+
+        参数:
+            report (DatabaseUpdateReport): 用于记录缺失文件的报告
+
+        返回:
+            list: 需要重新解析的文件路径列表
+        """
+        changed_files = []
+        for file_path, modules in self._group_modules_by_file().items():
+            if not os.path.isfile(file_path):
+                report.missing_files.append(file_path)
+                continue
+            try:
+                new_hash = compute_file_hash(file_path)
+            except IOError as e:
+                report.failed_files.append(f"{file_path}: {e}")
+                continue
+            if any(module.file_hash != new_hash for module in modules):
+                changed_files.append(file_path)
+        return changed_files
+
+    def parse_files(self, file_paths, report: DatabaseUpdateReport):
+        """
+        解析指定的RTL文件，不修改数据库，可以在后台线程中调用
+
+        参数:
+            file_paths (list): 需要解析的文件路径列表
+            report (DatabaseUpdateReport): 用于记录解析失败的报告
+
+        返回:
+            dict: (文件路径, 模块定义名) 到VerilogPortParser的映射，同一文件中的每个模块定义分别解析
+        """
+        modules_by_file = self._group_modules_by_file()
+        parsed = {}
+        for file_path in file_paths:
+            for module_def_name in dict.fromkeys(module.module_def_name for module in modules_by_file.get(file_path, [])):
+                try:
+                    parsed[(file_path, module_def_name)] = VerilogPortParser(
+                        file_path, module_name=self._select_module_name(file_path, module_def_name),
+                        preprocessor=self.preprocessor)
+                except Exception as e:
+                    report.failed_files.append(f"{file_path} ({module_def_name}): {e}")
+        return parsed
+
+    def apply(self, parsed: dict, report: DatabaseUpdateReport):
+        """
+        将解析结果应用到数据库中，必须在持有数据库的线程中调用
+
+        参数:
+            parsed (dict): parse_files返回的 (文件路径, 模块定义名) 到VerilogPortParser的映射
+            report (DatabaseUpdateReport): 用于记录端口变化和失效连接的报告
+        """
+        # 建立端口到连接的索引，只遍历一次连接列表
+        connections_by_port: dict[int, list[VerilogConnection]] = {}
+        for conn in self.collection.connections:
+            connections_by_port.setdefault(id(conn.source_port), []).append(conn)
+            connections_by_port.setdefault(id(conn.dest_port), []).append(conn)
+
+        invalid_connections: dict[int, VerilogConnection] = {}
+
+        def invalidate_port_connections(port, reason):
+            for conn in connections_by_port.get(id(port), []):
+                if id(conn) not in invalid_connections:
+                    invalid_connections[id(conn)] = conn
+                    report.invalidated_connections.append(f"{conn} ({reason})")
+
+        modules_by_file = self._group_modules_by_file()
+        for (file_path, module_def_name), port_parser in parsed.items():
+            if file_path not in report.changed_files:
+                report.changed_files.append(file_path)
+            for module in modules_by_file.get(file_path, []):
+                if module.module_def_name != module_def_name:
+                    continue
+                self._update_module_ports(module, port_parser.get_all_ports(), report,
+                                          connections_by_port, invalidate_port_connections)
+                module.file_hash = port_parser.file_hash
+
+        if invalid_connections:
+            self._remove_connections(invalid_connections)
+
+    def update(self):
+        """
+        执行一次完整的增量更新
+
+        返回:
+            DatabaseUpdateReport: 更新报告
+        """
+        report = DatabaseUpdateReport()
+        changed_files = self.find_changed_files(report)
+        parsed = self.parse_files(changed_files, report)
+        self.apply(parsed, report)
+        return report
+
+    def _update_module_ports(self, module: VerilogModule, new_ports: list[VerilogPort], report,
+                             connections_by_port, invalidate_port_connections):
+        """比较模块的新旧端口并原地更新，保留端口对象以维持连接引用"""
+        old_ports = {port.name: port for port in module.ports}
+        new_port_names = {port.name for port in new_ports}
+
+        removed = [port for port in module.ports if port.name not in new_port_names]
+        added = [port for port in new_ports if port.name not in old_ports]
+
+        # 方向和位宽都相同的一对删除/新增端口视为重命名
+        removed_by_key: dict[tuple, list[VerilogPort]] = {}
+        for port in removed:
+            removed_by_key.setdefault(self._port_key(port), []).append(port)
+        added_by_key: dict[tuple, list[VerilogPort]] = {}
+        for port in added:
+            added_by_key.setdefault(self._port_key(port), []).append(port)
+
+        renamed: dict[str, VerilogPort] = {}  # 新端口名 -> 旧端口对象
+        for key, removed_ports in removed_by_key.items():
+            added_ports = added_by_key.get(key, [])
+            if len(removed_ports) == 1 and len(added_ports) == 1:
+                renamed[added_ports[0].name] = removed_ports[0]
+
+        renamed_old_names = {port.name for port in renamed.values()}
+        for port in removed:
+            if port.name not in renamed_old_names:
+                invalidate_port_connections(port, f"端口 {module.name}.{port.name} 已删除")
+                report.removed_ports.append(f"{module.name}.{port.name}")
+
+        # 按新文件中的端口顺序重建端口列表，尽量复用旧端口对象
+        updated_ports = []
+        for new_port in new_ports:
+            if new_port.name in old_ports:
+                port = old_ports[new_port.name]
+            elif new_port.name in renamed:
+                port = renamed[new_port.name]
+                report.renamed_ports.append(f"{module.name}.{port.name} -> {new_port.name}")
+                port.name = new_port.name
+            else:
+                port = VerilogPort(name=new_port.name, direction=new_port.direction, width=dict(new_port.width))
+                port.father_module = module
+                report.added_ports.append(f"{module.name}.{new_port.name}")
+                updated_ports.append(port)
+                continue
+
+            if port.direction != new_port.direction:
+                report.direction_changed_ports.append(
+                    f"{module.name}.{port.name}: {port.direction} -> {new_port.direction}")
+                port.direction = new_port.direction
+                for conn in connections_by_port.get(id(port), []):
+                    if not self._is_direction_valid(conn):
+                        invalidate_port_connections(port, f"端口 {module.name}.{port.name} 方向已变化")
+
+            if port.width != new_port.width:
+                report.width_changed_ports.append(
+                    f"{module.name}.{port.name}: [{port.width['high']}:{port.width['low']}] -> "
+                    f"[{new_port.width['high']}:{new_port.width['low']}]")
+                port.width = dict(new_port.width)
+                for conn in connections_by_port.get(id(port), []):
+                    if not self._is_range_valid(conn):
+                        invalidate_port_connections(port, f"端口 {module.name}.{port.name} 位宽已变化")
+
+            updated_ports.append(port)
+
+        module.ports = updated_ports
+
+    def _remove_connections(self, invalid_connections: dict):
+        """一次性删除所有失效连接，并清理端口上的源和目的地引用"""
+        for conn in invalid_connections.values():
+            if conn.dest_port in conn.source_port.destinations:
+                conn.source_port.destinations.remove(conn.dest_port)
+            if conn.dest_port.source is conn.source_port:
+                conn.dest_port.source = None
+        self.collection.connections = [conn for conn in self.collection.connections
+                                       if id(conn) not in invalid_connections]
+
+    @staticmethod
+    def _port_key(port: VerilogPort):
+        """用于重命名检测的端口特征：方向和位宽"""
+        return (port.direction, port.width['high'], port.width['low'])
+
+    @staticmethod
+    def _is_direction_valid(conn: VerilogConnection):
+        """检查连接两端的端口方向是否仍然合法"""
+        return ((conn.source_port.is_output() or conn.source_port.is_inout()) and
+                (conn.dest_port.is_input() or conn.dest_port.is_inout()))
+
+    @staticmethod
+    def _is_range_valid(conn: VerilogConnection):
+        """检查连接使用的位范围是否仍在端口位宽范围内"""
+        try:
+            conn._validate_bit_range(conn.source_bit_range, conn.source_port.width)
+            conn._validate_bit_range(conn.dest_bit_range, conn.dest_port.width)
+        except ValueError:
+            return False
+        return True
+
+
+class DatabaseWatchService:
+    """
+    监视模式：RTL文件或其 `include 的头文件变化时自动增量更新数据库
+
+    文件监视和重新解析都在后台线程中进行，只重新解析受变化影响的RTL文件；
+    解析结果放入队列，由持有数据库的线程（GUI主线程）调用apply_pending应用到数据库。
+    监视的文件集合在启动时确定，RTL中新增的 `include 在重新启动监视后生效。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection, preprocessor=None, **watcher_options):
+        """
+        初始化监视服务
+
+        参数:
+            collection (VerilogModuleCollection): 需要更新的模块集合
+            preprocessor (VerilogPreprocessor, optional): 加载配置时使用的预处理器
+            watcher_options: 传给FileWatcher的参数（interval、batch_size、settle、use_inotify）
+        """
+        self.updater = DatabaseUpdater(collection, preprocessor)
+        self.watch_map = self.updater.get_watch_map()
+        self.watcher = FileWatcher(self.watch_map, **watcher_options)
+        self._results = queue.Queue()
+
+    @property
+    def collection(self):
+        return self.updater.collection
+
+    def start(self):
+        """启动后台监视"""
+        self.watcher.start(self._on_change)
+
+    def stop(self):
+        """停止后台监视，未应用的解析结果被丢弃"""
+        self.watcher.stop()
+
+    def _on_change(self, changed_paths):
+        """在监视线程中重新解析受影响的RTL文件"""
+        file_paths = sorted({file_path for path in changed_paths for file_path in self.watch_map.get(path, ())})
+        if not file_paths:
+            return
+        report = DatabaseUpdateReport()
+        parsed = self.updater.parse_files(file_paths, report)
+        self._results.put((parsed, report))
+
+    def apply_pending(self):
+        """
+        应用后台解析完成的结果，必须在持有数据库的线程中调用
+
+        返回:
+            list[DatabaseUpdateReport]: 每批文件变化对应一个更新报告，没有待应用的结果时为空列表
+        """
+        reports = []
+        while True:
+            try:
+                parsed, report = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self.updater.apply(parsed, report)
+            reports.append(report)
+        return reports
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+
+
+def compute_content_hash(content: bytes) -> str:
+    """
+    计算一段字节内容的哈希值
+
+    参数:
+        content (bytes): 文件内容
+
+    返回:
+        str: 十六进制格式的sha1哈希值
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """
+    分块读取文件并计算哈希值，用于判断RTL文件内容是否发生变化
+
+    参数:
+        file_path (str): 文件路径
+        chunk_size (int): 每次读取的字节数
+
+    返回:
+        str: 十六进制格式的sha1哈希值
+
+    异常:
+        IOError: 文件无法读取时抛出
+    """
+    hasher = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_cache_dir():
+    """
+    获取缓存目录（wgen_GUI/cache），不存在时创建
+
+    返回:
+        str: 缓存目录路径
+    """
+    cache_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache"))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def load_json_cache(cache_path):
+    """
+    读取JSON格式的缓存文件
+
+    参数:
+        cache_path (str): 缓存文件路径
+
+    返回:
+        dict: 缓存内容，文件不存在或已损坏时返回空字典
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json_cache(cache_path, data):
+    """
+    写入JSON格式的缓存文件，先写临时文件再替换，避免中途退出留下损坏的缓存
+
+    参数:
+        cache_path (str): 缓存文件路径
+        data (dict): 缓存内容
+    """
+    temp_path = f"{cache_path}.tmp"
+    # json.dumps一次性编码可以使用C加速的编码器，json.dump逐段写入时只能使用纯Python实现
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, cache_path)
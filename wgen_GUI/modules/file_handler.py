@@ -1,18 +1,54 @@
 import os
-import copy
 import datetime
 import json
 import os
+import sqlite3
+import threading
 import yaml
 from tkinter import filedialog, messagebox
 from modules.verilog_models import VerilogModuleCollection
+from modules.autosave_worker import AutosaveWorker
+from modules.sqlite_backend import SqliteCollectionStore, is_sqlite_file, is_sqlite_path
+from modules.binary_session import is_binary_session_file, load_binary_file
+from modules.session_store import SessionStore, is_session_manifest, load_session_manifest, MANIFEST_EXTENSION
 
 class FileHandler:
     """文件处理类，负责处理txt配置文件和json数据库文件的读写操作"""
     
     def __init__(self):
         """初始化文件处理器"""
-        pass
+        # 最近一次成功保存的数据库文件路径，作为会话日志的快照
+        self.last_saved_path = None
+        # 后台保存器：主线程只生成快照，写入文件在后台线程中完成
+        self.save_worker = AutosaveWorker(path_factory=self._new_session_path)
+        # 最近一次保存请求传入的连接历史栈
+        self._history_stack = None
+        # 最近一次打开的SQLite数据库，其中的数据库是当前数据库时编辑操作直接写入SQLite
+        self.sqlite_store: SqliteCollectionStore = None
+        # SQLite数据库的模块数超过该值时，打开前选择要加载的模块（只加载这些模块及与它们有连接的模块）
+        self.sqlite_partial_threshold = 5000
+        # sessions目录的保留策略：保留最近的会话和最近几天中每天的最后一个会话，
+        # 每自动保存session_cleanup_interval次在后台清理一次旧会话和未引用的数据块
+        self.session_keep_last = 50
+        self.session_keep_days = 14
+        self.session_cleanup_interval = 20
+        self._autosave_count = 0
+        self._cleanup_thread: threading.Thread = None
+
+    def get_sessions_dir(self):
+        """获取sessions目录（不存在时创建），自动保存的数据库和会话日志都存放在这里
+        
+        返回:
+            str: sessions目录路径
+        """
+        # 获取当前文件的父目录
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        # 向上一级目录，然后进入sessions目录，并规范化路径
+        sessions_dir = os.path.normpath(os.path.join(current_dir, "..", "sessions"))
+        # 创建sessions目录（如果不存在）
+        if not os.path.exists(sessions_dir):
+            os.makedirs(sessions_dir)
+        return sessions_dir
         
     def open_config_file_dialog(self):
         """打开配置文件对话框，让用户选择txt文件
@@ -22,7 +58,7 @@ class FileHandler:
         """
         file_path = filedialog.askopenfilename(
             title="打开配置文件",
-            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+            filetypes=[("文本文件", "*.txt"), ("YAML文件", "*.yaml *.yml"), ("JSON文件", "*.json"), ("所有文件", "*.*")]
         )
         return file_path
         
@@ -54,87 +90,201 @@ class FileHandler:
         """
         file_path = filedialog.askopenfilename(
             title="打开数据库",
-            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+            filetypes=[("JSON文件", "*.json"), ("二进制会话文件", "*.wgs"), ("SQLite数据库", "*.db *.sqlite *.sqlite3"),
+                       ("会话清单", f"*{MANIFEST_EXTENSION}"), ("所有文件", "*.*")]
         )
         return file_path
         
-    def load_database(self, file_path):
-        """加载数据库文件并恢复模块集合
+    def load_database(self, file_path, progress_callback=None, module_names=None):
+        """加载数据库文件并恢复模块集合，根据文件头识别JSON、二进制会话、会话清单和SQLite格式
+        
+        可以在后台线程中调用：打开的SQLite数据库只返回给调用者，不替换sqlite_store，
+        由调用者在主线程中通过set_sqlite_store使用。
         
         参数:
             file_path (str): 数据库文件的路径
+            progress_callback (callable or None): progress_callback(已读取字节数, 文件总字节数)，用于显示加载进度
+            module_names (list[str] or None): 只对SQLite数据库有效，只加载这些模块及与它们有连接的模块，None表示全部
             
         返回:
-            VerilogModuleCollection: 从文件加载的模块集合
+            tuple: (VerilogModuleCollection, SqliteCollectionStore or None)，文件不是SQLite数据库时第二项为None
             
         异常:
             Exception: 加载失败时抛出异常
         """
         try:
+            if is_sqlite_file(file_path):
+                store = SqliteCollectionStore(file_path)
+                try:
+                    if module_names is None:
+                        loaded_collection = store.load_collection(progress_callback=progress_callback)
+                    else:
+                        loaded_collection = store.open_modules(module_names, progress_callback)
+                except Exception:
+                    store.close()
+                    raise
+                return loaded_collection, store
+            if is_binary_session_file(file_path):
+                return load_binary_file(file_path, progress_callback), None
+            if is_session_manifest(file_path):
+                return load_session_manifest(file_path, progress_callback), None
+            
             # 从文件加载模块集合
-            loaded_collection = VerilogModuleCollection.load_from_file(file_path)
+            loaded_collection = VerilogModuleCollection.load_from_file(file_path, progress_callback)
             
             if loaded_collection:
-                return loaded_collection
+                return loaded_collection, None
             else:
                 raise Exception("数据库文件加载失败，文件格式可能不正确")
         except Exception as e:
             raise Exception(f"加载数据库失败: {str(e)}")
+
+    def get_sqlite_module_names(self, file_path):
+        """获取大型SQLite数据库的模块名，用于打开前选择要加载的模块
+        
+        返回:
+            list[str] or None: 文件是SQLite数据库且模块数超过sqlite_partial_threshold时返回所有模块名，否则返回None
+        """
+        if not is_sqlite_file(file_path):
+            return None
+        store = SqliteCollectionStore(file_path)
+        try:
+            if store.count_records()[0] <= self.sqlite_partial_threshold:
+                return None
+            return store.get_module_names()
+        finally:
+            store.close()
+
+    def set_sqlite_store(self, store):
+        """使用新打开的SQLite数据库（在主线程中调用），之前打开的SQLite数据库被关闭"""
+        if self.sqlite_store is not None and self.sqlite_store is not store:
+            self.sqlite_store.close()
+        self.sqlite_store = store
             
-    def save_database(self, collection_DB, file_path=None, connections_DB_stack=None, version=None):
-        """深拷贝collection_DB并保存为时间戳命名的json文件到sessions目录
+    def _new_session_path(self):
+        """生成sessions目录中以时间戳（具体到秒）命名的会话清单路径，数据块保存在sessions/objects中"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.get_sessions_dir(), f"collection_{timestamp}{MANIFEST_EXTENSION}")
+
+    def clean_sessions(self, grace_seconds=3600):
+        """按保留策略删除旧会话，再删除不被任何会话引用的数据块
+        
+        参数:
+            grace_seconds (float): 最近grace_seconds秒内写入或引用过的数据块不删除
+            
+        返回:
+            SessionRetentionReport: 清理报告
+        """
+        store = SessionStore(self.get_sessions_dir())
+        # 会话日志以最近一次保存的文件为快照，不能删除
+        report = store.apply_retention(self.session_keep_last, self.session_keep_days,
+                                       protected=[self.last_saved_path])
+        return store.collect_garbage(grace_seconds, report)
+
+    def _schedule_session_cleanup(self):
+        """在后台线程中清理sessions目录，上一次清理还没有结束时跳过"""
+        if self._cleanup_thread is not None and self._cleanup_thread.is_alive():
+            return
+        self._cleanup_thread = threading.Thread(target=self.clean_sessions, daemon=True)
+        self._cleanup_thread.start()
+
+    def save_database(self, collection_DB, file_path=None, connections_DB_stack=None, version=None, on_snapshot=None):
+        """请求在后台保存collection_DB，file_path为None时保存为sessions目录中时间戳命名的会话清单
+        
+        短时间内的多次自动保存合并为一次写入；指定了file_path的保存（用户主动保存）不等待合并。
+        保存结果通过poll_saves获取。
         
         参数:
             collection_DB: 要保存的模块集合数据库
             file_path (str or None): 数据库文件路径，为None时使用默认路径
-            connections_DB_stack (deque or None): 连接历史栈，用于保存历史记录
+            connections_DB_stack (deque or None): 连接历史栈，保存完成后把数据库副本加入栈中
             version (str): 可选的软件版本信息
+            on_snapshot (callable or None): 开始生成快照时在主线程中调用，返回值保存在SaveResult.context中
             
         返回:
-            str: 保存结果信息
+            str: 保存请求信息
             
         异常:
-            Exception: 保存失败时抛出异常
+            Exception: 没有可保存的数据库时抛出异常
         """
         if not collection_DB:
             raise Exception("没有可保存的数据库")
-            
+
+        # 准备元数据
+        metadata = {'version': version} if version else {}
+        self._history_stack = connections_DB_stack
+        self.save_worker.request(collection_DB, file_path, metadata, on_snapshot,
+                                 keep_copy=connections_DB_stack is not None, immediate=file_path is not None)
+        if file_path is None:
+            return "数据库将在后台自动保存"
+        return f"数据库将在后台保存到:\n{file_path}"
+
+    def poll_saves(self):
+        """推进后台保存并获取已完成的保存结果，需要在主线程中定期调用
+        
+        返回:
+            list[SaveResult]: 已完成的保存，成功的保存会更新last_saved_path
+        """
+        results = self.save_worker.poll()
+        self._apply_save_results(results)
+        return results
+
+    def flush_saves(self, timeout=None):
+        """立即完成所有等待中的保存（退出程序前调用）
+        
+        返回:
+            list[SaveResult]: 完成的保存
+        """
+        results = self.save_worker.flush(timeout)
+        self._apply_save_results(results)
+        return results
+
+    def get_sqlite_store(self, collection_DB):
+        """获取collection_DB对应的SQLite数据库
+        
+        返回:
+            SqliteCollectionStore or None: collection_DB不是从SQLite数据库加载或保存的（或已被替换）时返回None
+        """
+        store = self.sqlite_store
+        if store is not None and collection_DB is not None and store.collection is collection_DB:
+            return store
+        return None
+
+    def close(self, timeout=None):
+        """完成等待中的保存并关闭SQLite数据库（退出程序前调用）
+        
+        返回:
+            list[SaveResult]: 完成的保存
+        """
+        results = self.flush_saves(timeout)
+        if self.sqlite_store is not None:
+            self.sqlite_store.close()
+            self.sqlite_store = None
+        return results
+
+    def _open_saved_sqlite(self, result):
+        """保存为SQLite数据库后打开该文件作为sqlite_store，之后的编辑操作直接写入该文件"""
         try:
-            # 深拷贝collection_DB
-            db_copy = copy.deepcopy(collection_DB)
-            
-            # 获取当前文件的父目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            # 向上一级目录，然后进入sessions目录
-            sessions_dir = os.path.join(current_dir, "..", "sessions")
-            # 规范化路径
-            sessions_dir = os.path.normpath(sessions_dir)
-                
-            # 创建sessions目录（如果不存在）
-            if not os.path.exists(sessions_dir):
-                os.makedirs(sessions_dir)
-                
-            # 生成包含时间戳的文件名（具体到秒）
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            if file_path is None:
-                file_path = os.path.join(sessions_dir, f"collection_{timestamp}.json")
-            
-            # 准备元数据
-            metadata = {'version': version} if version else {}
-            
-            # 调用副本的save_to_file方法保存，并传递元数据
-            save_success = db_copy.save_to_file(file_path, metadata)
-            
-            if save_success:
-                success_message = f"数据库已成功保存到:\n{file_path}"
-                # 如果提供了连接栈，则添加到栈中
-                if connections_DB_stack is not None:
-                    connections_DB_stack.append(db_copy)
-                return success_message
-            else:
-                raise Exception("保存数据库失败")
-        except Exception as e:
-            raise Exception(f"保存数据库时发生错误: {str(e)}")
+            store = SqliteCollectionStore(result.file_path)
+        except sqlite3.Error:
+            return
+        store.collection = result.collection
+        self.set_sqlite_store(store)
+
+    def _apply_save_results(self, results):
+        """记录成功保存的路径，打开保存的SQLite数据库，并把后台线程重建的副本加入连接历史栈"""
+        for result in results:
+            if not result.is_success():
+                continue
+            self.last_saved_path = result.file_path
+            if is_sqlite_path(result.file_path):
+                self._open_saved_sqlite(result)
+            if os.path.dirname(result.file_path) == self.get_sessions_dir():
+                self._autosave_count += 1
+                if self._autosave_count % self.session_cleanup_interval == 0:
+                    self._schedule_session_cleanup()
+            if result.collection_copy is not None and self._history_stack is not None:
+                self._history_stack.append(result.collection_copy)
             
     def load_from_file_with_dialog(self, file_type="json"):
         """打开文件对话框并加载文件
@@ -151,7 +301,10 @@ class FileHandler:
         if file_type == "json":
             file_path = self.open_database_dialog()
             if file_path:
-                return self.load_database(file_path)
+                collection, store = self.load_database(file_path)
+                if store is not None:
+                    self.set_sqlite_store(store)
+                return collection
         elif file_type == "txt":
             file_path = self.open_config_file_dialog()
             if file_path:
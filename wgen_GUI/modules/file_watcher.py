@@ -0,0 +1,225 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+
+# inotify事件掩码，参见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _stat_signature(path):
+    """文件的 (mtime, 大小)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _Inotify:
+    """通过ctypes调用Linux inotify，监视文件所在的目录（可以捕获编辑器先写临时文件再重命名的保存方式）"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.directories: dict[int, str] = {}  # watch描述符 -> 目录
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"无法监视目录: {directory}")
+                self.directories[wd] = directory
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def read_events(self):
+        """
+        读取所有待处理的事件
+
+        返回:
+            tuple: (发生变化的文件路径集合, 是否发生了事件队列溢出)
+        """
+        paths = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].split(b'\0', 1)[0]
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name and wd in self.directories:
+                    paths.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """
+    文件变化监视器
+
+    在Linux上优先使用inotify监视文件所在的目录，空闲时后台线程阻塞在select上，不占用CPU；
+    其他平台或inotify不可用时退回stat轮询：每次只检查batch_size个文件，分批在interval秒内
+    完成一轮检查，避免监视上万个文件时出现周期性的CPU峰值。
+
+    两种方式都用 (mtime, 大小) 确认文件确实发生了变化；连续的变化在settle秒内合并为一次通知，
+    避免编辑器保存文件时的多次写入触发多次重新解析。回调在后台线程中执行。
+    """
+
+    def __init__(self, paths, interval=2.0, batch_size=500, settle=0.3, use_inotify=None):
+        """
+        初始化文件监视器
+
+        参数:
+            paths (iterable[str]): 需要监视的文件路径
+            interval (float): stat轮询时完成一轮检查的时间（秒）
+            batch_size (int): stat轮询时每批检查的文件数
+            settle (float): 合并连续变化的等待时间（秒）
+            use_inotify (bool or None): 是否使用inotify，为None时在Linux上自动使用
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self.settle = settle
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith('linux')
+        self.use_inotify = use_inotify
+        self._paths = [os.path.abspath(path) for path in paths]
+        self._signatures = {path: _stat_signature(path) for path in self._paths}
+        self._inotify: _Inotify = None
+        self._thread: threading.Thread = None
+        self._stop_event = threading.Event()
+        self._wake_read, self._wake_write = None, None
+
+    @property
+    def backend(self):
+        """当前使用的监视方式：'inotify' 或 'stat'"""
+        return 'inotify' if self._inotify is not None else 'stat'
+
+    def poll(self):
+        """
+        检查一轮所有文件（同步调用，不需要启动后台线程）
+
+        返回:
+            list[str]: 自上次检查以来发生变化的文件，按路径排序
+        """
+        return sorted(self._check(self._paths))
+
+    def _check(self, paths):
+        """检查指定文件的 (mtime, 大小)，返回发生变化的文件集合"""
+        changed = set()
+        for path in paths:
+            if path not in self._signatures:
+                continue
+            signature = _stat_signature(path)
+            if signature != self._signatures[path]:
+                self._signatures[path] = signature
+                changed.add(path)
+        return changed
+
+    def start(self, callback):
+        """
+        启动后台监视线程
+
+        参数:
+            callback (callable): callback(changed_paths)，changed_paths为按路径排序的列表，在后台线程中调用
+        """
+        if self._thread is not None:
+            return
+        if self.use_inotify:
+            try:
+                directories = sorted({os.path.dirname(path) for path in self._paths})
+                self._inotify = _Inotify([d for d in directories if os.path.isdir(d)])
+                self._wake_read, self._wake_write = os.pipe()
+            except (OSError, AttributeError):
+                # inotify不可用（非Linux、inotify数量上限等）时退回stat轮询
+                self._inotify = None
+        self._stop_event.clear()
+        target = self._run_inotify if self._inotify is not None else self._run_polling
+        self._thread = threading.Thread(target=target, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台监视线程"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b'x')
+        self._thread.join()
+        self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._wake_read, self._wake_write = None, None
+
+    def is_running(self):
+        """判断后台监视线程是否在运行"""
+        return self._thread is not None
+
+    def _run_polling(self, callback):
+        """stat轮询：每批检查batch_size个文件，一轮检查分摊在interval秒内"""
+        pending = set()
+        last_change = 0.0
+        index = 0
+        batches = max(1, (len(self._paths) + self.batch_size - 1) // self.batch_size)
+        delay = self.interval / batches
+        while not self._stop_event.is_set():
+            batch = self._paths[index:index + self.batch_size]
+            index = index + self.batch_size if index + self.batch_size < len(self._paths) else 0
+            changed = self._check(batch)
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            if pending and time.monotonic() - last_change >= self.settle:
+                callback(sorted(pending))
+                pending = set()
+            self._stop_event.wait(min(delay, self.settle) if pending else delay)
+
+    def _run_inotify(self, callback):
+        """inotify：阻塞等待目录事件，再用stat确认文件是否真的变化"""
+        pending = set()
+        last_change = 0.0
+        while not self._stop_event.is_set():
+            timeout = max(0.0, self.settle - (time.monotonic() - last_change)) if pending else None
+            readable, _, _ = select.select([self._inotify.fd, self._wake_read], [], [], timeout)
+            if self._stop_event.is_set():
+                break
+            if self._inotify.fd in readable:
+                paths, overflow = self._inotify.read_events()
+                # 事件队列溢出时无法知道哪些文件变化，检查全部文件
+                changed = self._check(self._paths if overflow else paths)
+                if changed:
+                    pending |= changed
+                    last_change = time.monotonic()
+            if pending and time.monotonic() - last_change >= self.settle:
+                callback(sorted(pending))
+                pending = set()
@@ -0,0 +1,252 @@
+class HierarchyIndex:
+    """
+    模块层次结构索引
+
+    根据VerilogModule.includes/top_module一次性计算每个模块的父模块、深度和祖先跳转表，
+    全部使用迭代遍历，不受递归深度限制。层次化路径（例如 soc_chip.sublock.u_complex）
+    按路径段逐级校验父子关系解析，代价与路径长度成正比；
+    每个模块保存倍增跳转表，最近公共祖先查询为O(log n)。
+    includes变化时只重新计算受影响的子树。
+    """
+
+    def __init__(self, modules):
+        """
+        根据模块列表建立层次结构索引
+
+        参数:
+            modules (list[VerilogModule]): 模块列表，模块名必须唯一
+        """
+        self._modules = {}  # 模块名 -> 模块对象
+        self._includers = {}  # 模块名 -> 包含它的父模块名列表
+        self._included = {}  # 模块名 -> 它包含的子模块名集合
+        self._parent = {}  # 模块名 -> 树中的父模块名（根模块为None）
+        self._children = {}  # 模块名 -> 树中的子模块名列表
+        self._depth = {}  # 模块名 -> 深度（根模块为0）
+        self._up = {}  # 模块名 -> 倍增跳转表，第k项为向上2^k层的祖先
+        self._roots = []  # 根模块名列表
+
+        for module in modules:
+            self._modules[module.name] = module
+            self._includers.setdefault(module.name, [])
+            self._children[module.name] = []
+        for module in modules:
+            self._included[module.name] = set()
+            for included_module in self._unique_includes(module):
+                if included_module.name in self._modules:
+                    self._includers[included_module.name].append(module.name)
+                    self._included[module.name].add(included_module.name)
+
+        for name in self._modules:
+            self._parent[name] = self._choose_parent(name)
+            if self._parent[name] is not None:
+                self._children[self._parent[name]].append(name)
+
+        # 从根模块开始迭代遍历，剩余未访问的模块位于环中，断开父引用后作为根模块
+        for name in self._modules:
+            if self._parent[name] is None:
+                self._roots.append(name)
+                self._compute_subtree(name)
+        for name in self._modules:
+            if name not in self._depth:
+                self._children[self._parent[name]].remove(name)
+                self._parent[name] = None
+                self._roots.append(name)
+                self._compute_subtree(name)
+
+    @staticmethod
+    def _unique_includes(module):
+        """去除重复后的包含模块列表，保持原有顺序"""
+        seen = set()
+        result = []
+        for included_module in module.includes:
+            if id(included_module) not in seen:
+                seen.add(id(included_module))
+                result.append(included_module)
+        return result
+
+    def _choose_parent(self, name):
+        """选择树中的父模块：优先使用top_module，否则使用第一个包含它的模块"""
+        includers = self._includers.get(name, [])
+        if not includers:
+            return None
+        top_module = self._modules[name].top_module
+        if top_module is not None and top_module.name in includers:
+            return top_module.name
+        return includers[0]
+
+    def _compute_subtree(self, root_name):
+        """迭代计算子树中每个模块的深度和倍增跳转表"""
+        queue = [root_name]
+        index = 0
+        while index < len(queue):
+            name = queue[index]
+            index += 1
+
+            parent = self._parent[name]
+            if parent is None:
+                self._depth[name] = 0
+                self._up[name] = []
+            else:
+                self._depth[name] = self._depth[parent] + 1
+                up = [parent]
+                while len(self._up[up[-1]]) >= len(up):
+                    up.append(self._up[up[-1]][len(up) - 1])
+                self._up[name] = up
+            queue.extend(self._children[name])
+
+    def _name(self, module_or_name):
+        return module_or_name if isinstance(module_or_name, str) else module_or_name.name
+
+    def get_roots(self):
+        """获取所有根模块"""
+        return [self._modules[name] for name in self._roots]
+
+    def get_parent(self, module):
+        """获取模块在层次树中的父模块，根模块返回None"""
+        parent = self._parent.get(self._name(module))
+        return self._modules[parent] if parent is not None else None
+
+    def get_children(self, module):
+        """获取模块在层次树中的子模块列表"""
+        return [self._modules[name] for name in self._children.get(self._name(module), [])]
+
+    def get_depth(self, module):
+        """获取模块深度，根模块深度为0"""
+        return self._depth[self._name(module)]
+
+    def get_path(self, module):
+        """获取模块的层次化路径，例如 soc_chip.sublock.u_complex"""
+        names = []
+        name = self._name(module)
+        while name is not None:
+            names.append(name)
+            name = self._parent[name]
+        return ".".join(reversed(names))
+
+    def get_port_path(self, module, port_name):
+        """获取端口的层次化路径，例如 soc_chip.sublock.u_complex.data_out"""
+        return f"{self.get_path(module)}.{port_name}"
+
+    def get_ancestors(self, module):
+        """获取模块的所有祖先，从父模块到根模块"""
+        ancestors = []
+        parent = self._parent.get(self._name(module))
+        while parent is not None:
+            ancestors.append(self._modules[parent])
+            parent = self._parent[parent]
+        return ancestors
+
+    def find_module(self, path):
+        """
+        根据层次化路径查找模块
+
+        参数:
+            path (str): 层次化路径
+
+        返回:
+            VerilogModule or None: 找到的模块
+        """
+        parent = None
+        for name in path.split('.'):
+            if name not in self._modules or self._parent[name] != parent:
+                return None
+            parent = name
+        return self._modules[parent] if parent is not None else None
+
+    def resolve_path(self, path):
+        """
+        解析模块或端口的层次化路径
+
+        参数:
+            path (str): 例如 soc_chip.sublock.u_complex 或 soc_chip.sublock.u_complex.data_out
+
+        返回:
+            tuple: (模块, 端口)，路径指向模块时端口为None，无法解析时返回 (None, None)
+        """
+        module = self.find_module(path)
+        if module is not None:
+            return module, None
+        module_path, _, port_name = path.rpartition('.')
+        module = self.find_module(module_path)
+        if module is not None:
+            port = module.get_port(port_name)
+            if port is not None:
+                return module, port
+        return None, None
+
+    def _lift(self, name, levels):
+        """将模块向上提升指定层数"""
+        bit = 0
+        while levels:
+            if levels & 1:
+                name = self._up[name][bit]
+            levels >>= 1
+            bit += 1
+        return name
+
+    def lowest_common_ancestor(self, module_a, module_b):
+        """
+        查询两个模块的最近公共祖先（可以是其中一个模块本身）
+
+        返回:
+            VerilogModule or None: 最近公共祖先，两个模块不在同一棵树中时返回None
+        """
+        a = self._name(module_a)
+        b = self._name(module_b)
+        if self._depth[a] < self._depth[b]:
+            a, b = b, a
+        a = self._lift(a, self._depth[a] - self._depth[b])
+        if a == b:
+            return self._modules[a]
+        for k in range(len(self._up[a]) - 1, -1, -1):
+            if k < len(self._up[a]) and self._up[a][k] != self._up[b][k]:
+                a = self._up[a][k]
+                b = self._up[b][k]
+        a = self._parent[a]
+        b = self._parent[b]
+        if a is None or a != b:
+            return None
+        return self._modules[a]
+
+    def is_ancestor(self, ancestor, module):
+        """判断ancestor是否为module的祖先（或module本身）"""
+        a = self._name(ancestor)
+        m = self._name(module)
+        depth_diff = self._depth[m] - self._depth[a]
+        return depth_diff >= 0 and self._lift(m, depth_diff) == a
+
+    def update_includes(self, parent_module):
+        """
+        在parent_module.includes变化后增量更新索引，只重新计算父模块发生变化的子树
+
+        参数:
+            parent_module (VerilogModule): includes发生变化的模块
+        """
+        parent_name = parent_module.name
+        new_children = {module.name for module in self._unique_includes(parent_module) if module.name in self._modules}
+        old_children = self._included[parent_name]
+        self._included[parent_name] = new_children
+
+        for name in old_children - new_children:
+            self._includers[name].remove(parent_name)
+        for name in new_children - old_children:
+            self._includers[name].append(parent_name)
+
+        for name in old_children ^ new_children:
+            new_parent = self._choose_parent(name)
+            # 新的父模块位于当前子树中会形成环，此时保持为根模块
+            if new_parent is not None and self.is_ancestor(name, new_parent):
+                new_parent = None
+            if new_parent == self._parent[name]:
+                continue
+            old_parent = self._parent[name]
+            if old_parent is None:
+                self._roots.remove(name)
+            else:
+                self._children[old_parent].remove(name)
+            self._parent[name] = new_parent
+            if new_parent is None:
+                self._roots.append(name)
+            else:
+                self._children[new_parent].append(name)
+            self._compute_subtree(name)
@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogModule
+    from .verilog_parser import iter_verilog_statements, parse_instance_statement
+    from .file_cache import compute_file_hash, get_cache_dir, load_json_cache, save_json_cache
+    from .hierarchy_validator import validate_hierarchy
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogModule
+    from verilog_parser import iter_verilog_statements, parse_instance_statement
+    from file_cache import compute_file_hash, get_cache_dir, load_json_cache, save_json_cache
+    from hierarchy_validator import validate_hierarchy
+
+
+_MODULE_NAME = re.compile(r'module\s+([a-zA-Z_]\w*)')
+
+# 需要扫描的文件数超过该值时使用多进程并行扫描
+PARALLEL_SCAN_THRESHOLD = 32
+
+# 扫描缓存文件的格式版本，格式变化时旧缓存作废
+SCAN_CACHE_VERSION = 2
+
+
+def scan_file_instances(file_path):
+    """
+    扫描RTL文件中的所有实例化语句
+
+    只记录 (所在模块名, 模块定义名, 实例名)，与已知模块的匹配在扫描之后进行，
+    因此扫描结果只取决于文件内容，可以按文件哈希缓存。该函数可以在子进程中执行。
+
+    参数:
+        file_path (str): RTL文件路径
+
+    返回:
+        list[list]: [所在模块名, 模块定义名, 实例名] 列表
+    """
+    instances = []
+    enclosing = ''
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        for statement in iter_verilog_statements(f):
+            if statement.startswith('module'):
+                match = _MODULE_NAME.match(statement)
+                enclosing = match.group(1) if match else ''
+            elif statement == 'endmodule':
+                enclosing = ''
+            elif enclosing:
+                instance = parse_instance_statement(statement)
+                if instance is not None:
+                    instances.append([enclosing, instance[0], instance[1]])
+    return instances
+
+
+class HierarchyInferenceResult:
+    """层次结构推断结果"""
+
+    def __init__(self):
+        self.edges: list[tuple] = []  # (父模块, 子模块)
+        self.existing = 0  # 已经存在的包含关系数量
+        self.scanned_files: list[str] = []  # 重新扫描的文件
+        self.cached_files = 0  # 使用缓存结果的文件数
+        self.missing_files: list[str] = []  # 不存在或无法读取的文件
+        self.unresolved: list[str] = []  # 无法对应到数据库模块的实例化
+        self.validation = None  # 应用推断结果后的层次结构校验报告
+
+    def apply(self, modules: list[VerilogModule], collection: VerilogModuleCollection = None):
+        """
+        把推断出的包含关系加入模块，并校验层次结构
+
+        参数:
+            modules (list[VerilogModule]): 模块列表
+            collection (VerilogModuleCollection or None): 提供时通过add_include加入，同时增量更新层次结构索引
+
+        返回:
+            HierarchyValidationReport: 层次结构校验报告
+        """
+        for parent, child in self.edges:
+            if collection is not None:
+                collection.add_include(parent, child)
+            else:
+                parent.includes.append(child)
+                child.top_module = parent
+        self.validation = validate_hierarchy(modules)
+        return self.validation
+
+    def get_summary(self):
+        """获取层次结构推断结果的文本摘要"""
+        result = "层次结构推断报告\n"
+        result += "===============\n"
+        result += f"\n重新扫描的文件: {len(self.scanned_files)}\n"
+        result += f"使用缓存的文件: {self.cached_files}\n"
+        result += f"已存在的包含关系: {self.existing}\n"
+        result += f"\n新增包含关系 ({len(self.edges)}):\n"
+        for parent, child in self.edges:
+            result += f"  {parent.name} -> {child.name}\n"
+        result += f"\n未找到的文件 ({len(self.missing_files)}):\n"
+        for item in self.missing_files:
+            result += f"  {item}\n"
+        result += f"\n无法对应的实例化 ({len(self.unresolved)}):\n"
+        for item in self.unresolved:
+            result += f"  {item}\n"
+        if self.validation is not None and (self.validation.has_errors() or self.validation.has_warnings()):
+            result += f"\n层次结构校验:\n{self.validation.get_summary()}"
+        return result
+
+
+class HierarchyInference:
+    """
+    根据RTL中的实例化语句推断模块包含关系（代替手写的hierarchy_def）
+
+    扫描每个模块的RTL文件（包括已有RTL的生成模块），找出实例化了其他已知模块的语句。
+    已知模块按实例名和模块定义名建立哈希索引，每个实例化候选O(1)匹配：
+    优先匹配实例名相同且定义名一致的模块，否则匹配定义名唯一的模块（例如生成模块）。
+
+    扫描结果按文件路径缓存（同时记录文件哈希）并持久化到缓存目录，文件未变化时不再重新扫描，
+    缓存大小只取决于扫描过的文件数，文件修改后覆盖原来的记录，文件不存在时删除记录；
+    需要扫描的文件较多时使用spawn方式创建的多进程并行扫描（不从GUI进程fork）。
+    """
+
+    CACHE_FILE_NAME = "hierarchy_scan_cache.json"
+
+    def __init__(self, cache_path=None, max_workers=None):
+        """
+        初始化层次结构推断
+
+        参数:
+            cache_path (str or None): 扫描缓存文件路径，为None时使用缓存目录中的默认文件，为空字符串时不持久化
+            max_workers (int or None): 并行扫描的进程数，为None时使用CPU核数
+        """
+        if cache_path is None:
+            cache_path = os.path.join(get_cache_dir(), self.CACHE_FILE_NAME)
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        data = load_json_cache(cache_path) if cache_path else {}
+        if data.get('version') != SCAN_CACHE_VERSION:
+            data = {}
+        # 文件路径 -> {'hash': 文件哈希, 'instances': 扫描结果}
+        self._cache: dict[str, dict] = data.get('files', {})
+
+    def _scan_files(self, file_paths, result):
+        """扫描文件，返回 文件路径 -> 扫描结果，文件未变化时使用缓存"""
+        scans = {}
+        pending = {}  # 文件哈希 -> 内容相同的文件路径列表
+        changed = False
+        for file_path in file_paths:
+            try:
+                file_hash = compute_file_hash(file_path)
+            except OSError:
+                result.missing_files.append(file_path)
+                changed |= self._cache.pop(file_path, None) is not None
+                continue
+            record = self._cache.get(file_path)
+            if record is not None and record.get('hash') == file_hash:
+                scans[file_path] = record['instances']
+                result.cached_files += 1
+            else:
+                pending.setdefault(file_hash, []).append(file_path)
+
+        if pending:
+            hashes = list(pending)
+            paths = [pending[file_hash][0] for file_hash in hashes]
+            scanned = None
+            if len(paths) >= PARALLEL_SCAN_THRESHOLD and self.max_workers != 1:
+                try:
+                    # 使用spawn方式创建子进程，fork会复制Tk主进程的状态（窗口、线程、锁）
+                    context = multiprocessing.get_context('spawn')
+                    with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as executor:
+                        scanned = list(executor.map(scan_file_instances, paths, chunksize=16))
+                except (OSError, RuntimeError, ImportError):
+                    # 无法创建子进程时退回串行扫描
+                    scanned = None
+            if scanned is None:
+                scanned = [scan_file_instances(path) for path in paths]
+
+            for file_hash, path, instances in zip(hashes, paths, scanned):
+                result.scanned_files.append(path)
+                for file_path in pending[file_hash]:
+                    self._cache[file_path] = {'hash': file_hash, 'instances': instances}
+                    scans[file_path] = instances
+            changed = True
+        if changed and self.cache_path:
+            save_json_cache(self.cache_path, {'version': SCAN_CACHE_VERSION, 'files': self._cache})
+        return scans
+
+    def infer(self, modules: list[VerilogModule], base_dir=''):
+        """
+        推断模块之间的包含关系，不修改模块
+
+        参数:
+            modules (list[VerilogModule]): 模块列表
+            base_dir (str): 相对路径的基准目录
+
+        返回:
+            HierarchyInferenceResult: 推断结果，调用apply加入包含关系
+        """
+        result = HierarchyInferenceResult()
+
+        by_name: dict[str, VerilogModule] = {}  # 实例名 -> 模块
+        by_def: dict[str, list[VerilogModule]] = {}  # 模块定义名 -> 模块列表
+        by_file: dict[str, list[VerilogModule]] = {}  # 文件路径 -> 模块列表
+        for module in modules:
+            by_name.setdefault(module.name, module)
+            by_def.setdefault(module.module_def_name or module.name, []).append(module)
+            if module.file_path:
+                path = os.path.normpath(os.path.join(base_dir, module.file_path))
+                if os.path.isfile(path) or not module.need_gen:
+                    by_file.setdefault(path, []).append(module)
+
+        scans = self._scan_files(list(by_file), result)
+        seen = {(id(parent), id(child)) for parent in modules for child in parent.includes}
+
+        for file_path, instances in scans.items():
+            file_modules = by_file[file_path]
+            for enclosing, module_type, instance_name in instances:
+                # 所在模块：该文件对应的模块中定义名一致的模块
+                parents = [m for m in file_modules if (m.module_def_name or m.name) == enclosing]
+                if not parents:
+                    continue
+                # 子模块：实例名一致优先，否则使用定义名唯一的模块
+                child = by_name.get(instance_name)
+                if child is None or (child.module_def_name or child.name) != module_type:
+                    candidates = by_def.get(module_type)
+                    if candidates is None:
+                        continue
+                    if len(candidates) != 1:
+                        result.unresolved.append(f"{enclosing}: {module_type} {instance_name} (存在多个候选实例)")
+                        continue
+                    child = candidates[0]
+                if len(parents) != 1:
+                    result.unresolved.append(f"{enclosing}: {module_type} {instance_name} (所在模块有多个实例)")
+                    continue
+                parent = parents[0]
+                if child is parent:
+                    continue
+                key = (id(parent), id(child))
+                if key in seen:
+                    result.existing += 1
+                    continue
+                seen.add(key)
+                result.edges.append((parent, child))
+        return result
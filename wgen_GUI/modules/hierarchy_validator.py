@@ -0,0 +1,99 @@
+class HierarchyValidationReport:
+    """层次结构校验报告"""
+
+    def __init__(self):
+        self.cycles: list[list[str]] = []  # 环，每个环为模块名列表
+        self.duplicate_includes: list[tuple] = []  # (父模块名, 子模块名, 出现次数)
+        self.multi_parent: dict[str, list[str]] = {}  # 子模块名 -> 包含它的所有父模块名
+        self.order: list[str] = []  # 子模块在父模块之前的拓扑顺序（存在环时不包含环上的模块）
+
+    def has_errors(self):
+        """存在环时层次结构不可用"""
+        return bool(self.cycles)
+
+    def has_warnings(self):
+        """存在重复包含或多父模块实例"""
+        return bool(self.duplicate_includes or self.multi_parent)
+
+    def get_summary(self):
+        """获取校验报告的文本摘要"""
+        result = ""
+        if self.cycles:
+            result += f"循环包含 ({len(self.cycles)}):\n"
+            for cycle in self.cycles:
+                result += f"  {' -> '.join(cycle + cycle[:1])}\n"
+        if self.duplicate_includes:
+            result += f"重复包含 ({len(self.duplicate_includes)}):\n"
+            for parent_name, child_name, count in self.duplicate_includes:
+                result += f"  {parent_name} 包含 {child_name} {count} 次\n"
+        if self.multi_parent:
+            result += f"多父模块实例 ({len(self.multi_parent)}):\n"
+            for child_name, parent_names in self.multi_parent.items():
+                result += f"  {child_name} 被 {', '.join(parent_names)} 同时包含\n"
+        return result
+
+
+def validate_hierarchy(modules):
+    """
+    线性时间校验模块层次结构
+
+    使用拓扑排序（Kahn算法）检测循环包含，同时统计重复包含和被多个父模块包含的实例，
+    并给出子模块在父模块之前的生成顺序。
+
+    参数:
+        modules (list[VerilogModule]): 模块列表
+
+    返回:
+        HierarchyValidationReport: 校验报告
+    """
+    report = HierarchyValidationReport()
+    names = [module.name for module in modules]
+    children: dict[str, list[str]] = {name: [] for name in names}
+    parents: dict[str, list[str]] = {name: [] for name in names}
+
+    for module in modules:
+        counts: dict[str, int] = {}
+        for included_module in module.includes:
+            counts[included_module.name] = counts.get(included_module.name, 0) + 1
+        for child_name, count in counts.items():
+            if count > 1:
+                report.duplicate_includes.append((module.name, child_name, count))
+            if child_name in children:
+                children[module.name].append(child_name)
+                parents[child_name].append(module.name)
+
+    for name in names:
+        if len(parents[name]) > 1:
+            report.multi_parent[name] = parents[name]
+
+    # Kahn算法：从没有父模块的模块开始，按父模块在前的顺序出队
+    in_degree = {name: len(parents[name]) for name in names}
+    queue = [name for name in names if in_degree[name] == 0]
+    index = 0
+    while index < len(queue):
+        name = queue[index]
+        index += 1
+        for child_name in children[name]:
+            in_degree[child_name] -= 1
+            if in_degree[child_name] == 0:
+                queue.append(child_name)
+    report.order = queue[::-1]
+
+    # 剩余入度不为0的模块都位于环上或环的下游，沿剩余的边找出每个环
+    remaining = {name for name in names if in_degree[name] > 0}
+    visited = set()
+    for start in names:
+        if start not in remaining or start in visited:
+            continue
+        path = []
+        position = {}
+        name = start
+        while name not in visited:
+            visited.add(name)
+            position[name] = len(path)
+            path.append(name)
+            name = next(parent for parent in parents[name] if parent in remaining)
+        if name in position:
+            report.cycles.append(path[position[name]:][::-1])
+
+    return report
@@ -0,0 +1,205 @@
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModule, VerilogPort
+    from .auto_connect import AutoConnectPlan
+except ImportError:
+    from verilog_models import VerilogModule, VerilogPort
+    from auto_connect import AutoConnectPlan
+
+
+class PortInterface:
+    """由同一前缀的一组端口组成的总线接口，例如 axi_awvalid/axi_awready/axi_wdata 组成接口 axi"""
+
+    def __init__(self, prefix, ports: list[VerilogPort]):
+        """
+        初始化总线接口
+
+        参数:
+            prefix (str): 接口前缀，不含末尾的下划线
+            ports (list[VerilogPort]): 属于该接口的端口
+        """
+        self.prefix = prefix
+        self.ports = ports
+
+    def get_signal_name(self, port: VerilogPort):
+        """获取端口在接口中的信号名，即去掉接口前缀后的部分"""
+        return port.name[len(self.prefix) + 1:]
+
+    def get_signals(self):
+        """获取信号名到端口的映射"""
+        return {self.get_signal_name(port): port for port in self.ports}
+
+    def __str__(self):
+        return f"{self.prefix} ({len(self.ports)} ports)"
+
+
+class _TrieNode:
+    """端口名前缀树节点，按下划线分隔的名称段建树"""
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.port_indexes: list[int] = []  # 子树中所有端口在模块端口列表中的下标
+        self.directions = set()  # 子树中出现的端口方向
+
+
+class InterfaceInference:
+    """
+    总线接口推断
+
+    对模块的端口名按下划线分段建立前缀树，若某个前缀下至少有min_ports个端口，
+    并且同时包含输出和输入（例如valid/ready握手），则认为该前缀是一个接口。
+    当一个接口前缀下有两个及以上的子前缀各自也构成接口时（例如 m_axi_* 与 m_apb_*），
+    拆分为各个子接口。
+
+    推断结果按module_def_name缓存，同一个模块定义的多个实例只推断一次。
+    """
+
+    def __init__(self, min_ports=2):
+        """
+        初始化接口推断
+
+        参数:
+            min_ports (int): 构成接口所需的最少端口数
+        """
+        self.min_ports = min_ports
+        # module_def_name -> (端口数, [(接口前缀, [端口名])])
+        self._cache: dict[str, tuple] = {}
+
+    def _qualifies(self, node: _TrieNode):
+        """判断前缀树节点是否构成接口：端口足够多且方向互补"""
+        if len(node.port_indexes) < self.min_ports:
+            return False
+        return 'inout' in node.directions or ('input' in node.directions and 'output' in node.directions)
+
+    def _infer_layout(self, module: VerilogModule):
+        """推断模块的接口布局，返回 [(接口前缀, [端口名])]"""
+        root = _TrieNode()
+        for index, port in enumerate(module.ports):
+            tokens = port.name.split('_')
+            # 最后一段是信号名本身，只用前面的段建树
+            node = root
+            for token in tokens[:-1]:
+                node = node.children.setdefault(token, _TrieNode())
+                node.port_indexes.append(index)
+                node.directions.add(port.direction)
+
+        layout = []
+        # 自上而下查找接口，栈中保存 (节点, 前缀)
+        stack = [(child, token) for token, child in reversed(list(root.children.items()))]
+        while stack:
+            node, prefix = stack.pop()
+            if not self._qualifies(node):
+                continue
+            qualified_children = [(child, token) for token, child in node.children.items() if self._qualifies(child)]
+            # 唯一的子前缀覆盖全部端口（例如 m_ 后只有 axi_）或有多个子接口时继续向下查找
+            single_child = len(qualified_children) == 1 and \
+                len(qualified_children[0][0].port_indexes) == len(node.port_indexes)
+            if single_child or len(qualified_children) > 1:
+                for child, token in reversed(qualified_children):
+                    stack.append((child, f"{prefix}_{token}"))
+                continue
+            layout.append((prefix, [module.ports[index].name for index in node.port_indexes]))
+        return layout
+
+    def infer(self, module: VerilogModule):
+        """
+        推断模块中的总线接口
+
+        参数:
+            module (VerilogModule): 模块
+
+        返回:
+            list[PortInterface]: 推断得到的接口列表
+        """
+        key = module.module_def_name or module.name
+        cached = self._cache.get(key)
+        # 端口数变化（例如端口穿透新增端口）时重新推断
+        if cached is None or cached[0] != len(module.ports):
+            cached = (len(module.ports), self._infer_layout(module))
+            self._cache[key] = cached
+
+        interfaces = []
+        for prefix, port_names in cached[1]:
+            ports = [module.get_port(name) for name in port_names]
+            if all(port is not None for port in ports):
+                interfaces.append(PortInterface(prefix, ports))
+        return interfaces
+
+    def invalidate(self, module_def_name=None):
+        """清除指定模块定义（为None时清除全部）的推断缓存"""
+        if module_def_name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(module_def_name, None)
+
+    @staticmethod
+    def match_score(interface_a: PortInterface, interface_b: PortInterface):
+        """两个接口中信号名相同且方向互补的信号数量"""
+        signals_b = interface_b.get_signals()
+        score = 0
+        for signal, port_a in interface_a.get_signals().items():
+            port_b = signals_b.get(signal)
+            if port_b is not None and _complementary(port_a, port_b):
+                score += 1
+        return score
+
+    def find_matching_interface(self, interface: PortInterface, module: VerilogModule):
+        """
+        在另一个模块中查找与接口最匹配的接口
+
+        返回:
+            PortInterface or None: 匹配信号最多的接口，没有任何匹配信号时返回None
+        """
+        best = None
+        best_score = 0
+        for candidate in self.infer(module):
+            score = self.match_score(interface, candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    @staticmethod
+    def plan_connect(interface_a: PortInterface, interface_b: PortInterface):
+        """
+        生成两个接口之间的连接预览，按信号名配对，输出端口驱动对方的同名输入端口
+
+        例如 m_axi.awvalid -> s_axi.awvalid，s_axi.awready -> m_axi.awready。
+        预览可以交给AutoConnectEngine.apply在一个事务中应用。
+
+        返回:
+            AutoConnectPlan: 连接预览
+        """
+        plan = AutoConnectPlan()
+        rule = f"interface {interface_a.prefix} <-> {interface_b.prefix}"
+        signals_b = interface_b.get_signals()
+        for signal, port_a in interface_a.get_signals().items():
+            port_b = signals_b.pop(signal, None)
+            if port_b is None or not _complementary(port_a, port_b):
+                plan.unmatched.append(f"{port_a.father_module.name}.{port_a.name}")
+                continue
+            if port_a.is_output() or (port_a.is_inout() and not port_b.is_output()):
+                source_port, dest_port = port_a, port_b
+            else:
+                source_port, dest_port = port_b, port_a
+            pair_str = f"{source_port.father_module.name}.{source_port.name} -> " \
+                       f"{dest_port.father_module.name}.{dest_port.name}"
+            if dest_port.source is source_port:
+                continue
+            if dest_port.source is not None:
+                plan.already_driven.append(
+                    f"{pair_str} (已由 {dest_port.source.father_module.name}.{dest_port.source.name} 驱动)")
+            elif source_port.get_width_value() != dest_port.get_width_value():
+                plan.width_mismatches.append(
+                    f"{pair_str} ({source_port.get_width_value()} != {dest_port.get_width_value()})")
+            else:
+                plan.matches.append((source_port, dest_port, rule))
+        for port_b in signals_b.values():
+            plan.unmatched.append(f"{port_b.father_module.name}.{port_b.name}")
+        return plan
+
+
+def _complementary(port_a: VerilogPort, port_b: VerilogPort):
+    """判断两个端口方向是否互补（一个驱动另一个）"""
+    if port_a.is_inout() or port_b.is_inout():
+        return True
+    return port_a.direction != port_b.direction
@@ -0,0 +1,135 @@
+import codecs
+import json
+
+
+class JsonStreamReader:
+    """
+    JSON流式读取器
+
+    用于逐条读取数据库文件顶层对象中的数组元素（例如modules和connections），
+    每次只在内存中保留一个元素及一个读取缓冲区，适合处理超大的数据库文件。
+    """
+
+    WHITESPACE = ' \t\n\r'
+
+    def __init__(self, file_obj, chunk_size=1024 * 1024):
+        """
+        初始化流式读取器
+
+        参数:
+            file_obj: 以二进制模式打开的文件对象
+            chunk_size (int): 每次从文件读取的字节数
+        """
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.bytes_read = 0  # 已读取的字节数，可用于显示进度
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_size=0):
+        """从文件读取更多数据到缓冲区，返回是否读到了新数据"""
+        if self._eof:
+            return False
+        # 丢弃已经处理过的内容，保证缓冲区大小有界
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        data = self.file_obj.read(max(self.chunk_size, min_size))
+        self.bytes_read += len(data)
+        if not data:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b'', final=True)
+            return False
+        self._buffer += self._text_decoder.decode(data)
+        return True
+
+    def _peek(self):
+        """跳过空白字符并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self.WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        """读取并校验下一个非空白字符"""
+        next_char = self._peek()
+        if next_char != char:
+            raise ValueError(f"JSON格式错误: 期望 '{char}'，实际为 '{next_char}'（字节位置约 {self.bytes_read}）")
+        self._pos += 1
+
+    def _decode_value(self):
+        """从缓冲区解码一个完整的JSON值，缓冲区不足时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # 数值等标量恰好结束在缓冲区末尾时可能并不完整，需要读取更多数据确认
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # 按未处理内容的长度成倍扩大读取量，避免超大元素被反复解码
+            self._fill(len(self._buffer) - self._pos)
+
+    def iter_items(self):
+        """
+        遍历顶层对象
+
+        返回:
+            generator: 对数组类型的值逐个生成 (键, 元素, True)，
+                       对其他类型的值生成 (键, 值, False)
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise ValueError("JSON格式错误: 对象的键必须是字符串")
+            self._expect(':')
+            if self._peek() == '[':
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield key, self._decode_value(), True
+                        next_char = self._peek()
+                        self._pos += 1
+                        if next_char == ']':
+                            break
+                        if next_char != ',':
+                            raise ValueError(f"JSON格式错误: 数组 '{key}' 中出现意外字符 '{next_char}'")
+            else:
+                yield key, self._decode_value(), False
+
+            next_char = self._peek()
+            self._pos += 1
+            if next_char == '}':
+                return
+            if next_char != ',':
+                raise ValueError(f"JSON格式错误: 顶层对象中出现意外字符 '{next_char}'")
+
+
+def iter_json_file(file_path, chunk_size=1024 * 1024):
+    """
+    流式遍历JSON数据库文件的顶层对象
+
+    参数:
+        file_path (str): JSON文件路径
+        chunk_size (int): 每次从文件读取的字节数
+
+    返回:
+        generator: 与JsonStreamReader.iter_items相同的 (键, 值, 是否为数组元素) 元组
+    """
+    with open(file_path, 'rb') as f:
+        yield from JsonStreamReader(f, chunk_size).iter_items()
@@ -0,0 +1,333 @@
+import re
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogPort
+    from .verilog_parser import iter_verilog_statements, parse_instance_statement, NON_INSTANCE_KEYWORDS
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogPort
+    from verilog_parser import iter_verilog_statements, parse_instance_statement, NON_INSTANCE_KEYWORDS
+
+
+_FIRST_WORD = re.compile(r'[`\w]+')
+_MODULE_HEADER = re.compile(r'module\s+(\w+)\s*(?:#\s*\(.*?\)\s*)?(?:\((.*)\))?\s*$', re.DOTALL)
+_DECLARATION = re.compile(
+    r'(input|output|inout|wire|reg|logic|tri)\b(?:\s+(?:wire|reg|logic|tri|signed|unsigned)\b)*\s*'
+    r'(?:\[\s*(\d+)\s*:\s*(\d+)\s*\])?\s*(.*)$', re.DOTALL)
+_NAMED_CONNECTION = re.compile(r'\.\s*(\w+)\s*\(')
+_NET_REFERENCE = re.compile(r'([a-zA-Z_]\w*)\s*(?:\[\s*(\d+)\s*(?::\s*(\d+)\s*)?\])?$')
+_ASSIGN = re.compile(r'assign\s+([a-zA-Z_]\w*)\s*=\s*([a-zA-Z_]\w*)$')
+_CONSTANT = re.compile(r"(?:\d+)?'[sS]?[bBoOdDhH][0-9a-fA-FxXzZ_?]+$|\d+$")
+
+
+def _iter_named_connections(connections):
+    """
+    依次取出实例端口列表中的命名连接 .port(expression)，表达式中可以有嵌套的括号
+
+    返回:
+        generator: (端口名, 表达式) 元组，括号不匹配时表达式为None
+    """
+    pos = 0
+    while True:
+        match = _NAMED_CONNECTION.search(connections, pos)
+        if match is None:
+            return
+        depth = 1
+        end = match.end()
+        while end < len(connections) and depth:
+            if connections[end] == '(':
+                depth += 1
+            elif connections[end] == ')':
+                depth -= 1
+            end += 1
+        if depth:
+            yield match.group(1), None
+            return
+        yield match.group(1), connections[match.end():end - 1].strip()
+        pos = end
+
+
+class _PortSnapshot:
+    """扫描网表时使用的端口快照，后台线程只读取快照，不访问数据库中的对象图"""
+
+    __slots__ = ('port', 'module_name', 'name', 'direction', 'high', 'low')
+
+    def __init__(self, port: VerilogPort, module_name):
+        self.port = port  # 数据库中的端口，只在apply时（主线程）使用
+        self.module_name = module_name
+        self.name = port.name
+        self.direction = port.direction
+        self.high = port.width['high']
+        self.low = port.width['low']
+
+    def get_width_value(self):
+        return self.high - self.low + 1
+
+    def __str__(self):
+        return f"{self.module_name}.{self.name}"
+
+
+class NetlistImportReport:
+    """网表导入报告"""
+
+    def __init__(self):
+        self.statements = 0  # 读取的语句数
+        self.instances_matched = 0  # 在数据库中找到的实例数
+        self.connections: list[tuple] = []  # 待创建的连接 (源端口, 目标端口, 源位范围, 目标位范围)
+        self.already_connected = 0  # 数据库中已存在的连接数
+        self.unknown_instances: list[str] = []  # 数据库中不存在的实例
+        self.unknown_ports: list[str] = []  # 实例端口在数据库模块中不存在
+        self.unsupported: list[str] = []  # 无法解析的端口表达式（拼接、表达式等）
+        self.undriven_loads: list[str] = []  # 线网没有驱动的输入端口
+        self.conflicts: list[str] = []  # 多驱动、位宽不一致或与数据库已有连接冲突
+
+    def get_summary(self):
+        """获取网表导入报告的文本摘要"""
+        result = "网表导入报告\n"
+        result += "===============\n"
+        result += f"\n读取语句: {self.statements}\n"
+        result += f"匹配实例: {self.instances_matched}\n"
+        result += f"新建连接: {len(self.connections)}\n"
+        result += f"已存在的连接: {self.already_connected}\n"
+        for title, items in (("数据库中不存在的实例", self.unknown_instances),
+                             ("数据库中不存在的端口", self.unknown_ports),
+                             ("无法解析的端口表达式", self.unsupported),
+                             ("没有驱动的输入端口", self.undriven_loads),
+                             ("冲突", self.conflicts)):
+            result += f"\n{title} ({len(items)}):\n"
+            for item in items:
+                result += f"  {item}\n"
+        return result
+
+
+class NetlistImporter:
+    """
+    从已有的顶层Verilog网表导入连接
+
+    流式逐条读取网表语句（iter_verilog_statements），只保留线网表：
+    每个线网记录驱动它的输出端口和它驱动的输入端口以及使用的位范围，
+    内存占用与线网数量成正比，与网表文件大小无关。读取结束后按线网把
+    每个输入端口匹配到覆盖其位范围的驱动端口，转换为数据库连接。
+
+    实例按实例名与数据库中的VerilogModule.name对应；支持 .port(net)、.port(net[h:l])、
+    .port(net[i]) 形式的命名端口连接，以及简单的 assign a = b 线网别名。
+
+    创建导入器时（主线程）生成模块名和端口的快照，scan只读取快照，可以在后台线程中执行；
+    目标端口在数据库中已有的驱动在apply时检查。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection):
+        """
+        初始化网表导入器
+
+        参数:
+            collection (VerilogModuleCollection): 模块集合数据库
+        """
+        self.collection = collection
+        # 模块名 -> {端口名: _PortSnapshot}；同名模块以最后一个为准、同名端口以第一个为准，与数据库的查找一致
+        self._ports: dict[str, dict[str, _PortSnapshot]] = {}
+        for module in collection.modules:
+            ports = {}
+            for port in module.ports:
+                ports.setdefault(port.name, _PortSnapshot(port, module.name))
+            self._ports[module.name] = ports
+
+    def scan(self, file_path, chunk_size=1 << 16):
+        """
+        扫描网表文件并解析出需要创建的连接，只读取端口快照，不访问数据库，可以在后台线程中执行
+
+        参数:
+            file_path (str): 网表文件路径
+            chunk_size (int): 流式读取的块大小
+
+        返回:
+            NetlistImportReport: 导入报告，report.connections为待创建的连接
+        """
+        report = NetlistImportReport()
+        declared = {}  # (网表模块, 线网名) -> (high, low)
+        endpoints = {}  # (网表模块, 线网名) -> [(端口, high, low)]，high/low为None表示整个线网
+        aliases = {}  # 并查集，assign a = b 把两个线网合并
+
+        current = ''
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            for statement in iter_verilog_statements(f, chunk_size):
+                report.statements += 1
+                word_match = _FIRST_WORD.match(statement)
+                first_word = word_match.group() if word_match else ''
+                if first_word == 'module':
+                    header = _MODULE_HEADER.match(statement)
+                    current = header.group(1) if header else ''
+                    if header and header.group(2):
+                        self._parse_ansi_header(current, header.group(2), declared)
+                elif first_word == 'endmodule':
+                    current = ''
+                elif first_word in ('input', 'output', 'inout', 'wire', 'reg', 'logic', 'tri'):
+                    self._parse_declaration(current, statement, declared)
+                elif first_word == 'assign':
+                    assign = _ASSIGN.match(statement)
+                    if assign:
+                        self._union(aliases, (current, assign.group(1)), (current, assign.group(2)))
+                elif first_word and first_word not in NON_INSTANCE_KEYWORDS and not first_word.startswith('`'):
+                    self._parse_instance(current, statement, endpoints, report)
+
+        self._resolve_nets(declared, endpoints, aliases, report)
+        return report
+
+    def apply(self, report: NetlistImportReport):
+        """
+        检查目标端口在数据库中的现有驱动，在一个事务中创建scan解析出的连接，需要在主线程中调用
+
+        已存在的连接计入report.already_connected，已由其他端口驱动或扫描后被删除的端口计入report.conflicts，
+        report.connections更新为实际创建的连接。
+
+        返回:
+            list[VerilogConnection]: 新建的连接
+        """
+        pairs = []
+        for source_port, dest_port, source_range, dest_range in report.connections:
+            dest_str = f"{dest_port.father_module.name}.{dest_port.name}"
+            stale = [port for port in (source_port, dest_port)
+                     if self.collection.get_module(port.father_module.name) is not port.father_module
+                     or port.father_module.get_port(port.name) is not port]
+            if stale:
+                report.conflicts.append(f"{dest_str}: 端口 "
+                                        f"{', '.join(f'{p.father_module.name}.{p.name}' for p in stale)} 在扫描后已被删除")
+                continue
+            if dest_port.source is source_port:
+                report.already_connected += 1
+                continue
+            if dest_port.source is not None:
+                report.conflicts.append(f"{dest_str}: 数据库中已由 "
+                                        f"{dest_port.source.father_module.name}.{dest_port.source.name} 驱动")
+                continue
+            pairs.append((source_port, dest_port, source_range, dest_range))
+        report.connections = pairs
+        return self.collection.connect_ports(pairs)
+
+    def import_file(self, file_path):
+        """扫描网表并创建连接，返回导入报告"""
+        report = self.scan(file_path)
+        self.apply(report)
+        return report
+
+    @staticmethod
+    def _parse_ansi_header(current, port_section, declared):
+        """解析ANSI风格模块头中的端口声明位宽"""
+        width = None
+        for item in port_section.split(','):
+            declaration = _DECLARATION.match(item.strip())
+            if declaration:
+                width = (int(declaration.group(2)), int(declaration.group(3))) if declaration.group(2) else None
+                item = declaration.group(4)
+            name = item.strip().split('=')[0].strip()
+            if width is not None and re.fullmatch(r'[a-zA-Z_]\w*', name):
+                declared[(current, name)] = width
+
+    @staticmethod
+    def _parse_declaration(current, statement, declared):
+        """解析 wire [7:0] a, b 形式的线网声明位宽"""
+        declaration = _DECLARATION.match(statement)
+        if not declaration or not declaration.group(2):
+            return
+        width = (int(declaration.group(2)), int(declaration.group(3)))
+        for item in declaration.group(4).split(','):
+            name = item.split('=')[0].strip()
+            if re.fullmatch(r'[a-zA-Z_]\w*', name):
+                declared[(current, name)] = width
+
+    def _parse_instance(self, current, statement, endpoints, report):
+        """解析实例化语句，把实例端口挂到对应线网上"""
+        instance = parse_instance_statement(statement)
+        if instance is None:
+            return
+        module_type, instance_name, connections = instance
+        module_ports = self._ports.get(instance_name)
+        if module_ports is None:
+            report.unknown_instances.append(f"{module_type} {instance_name}")
+            return
+        report.instances_matched += 1
+
+        if connections.strip() and '.' not in connections:
+            report.unsupported.append(f"{instance_name}: 不支持按位置连接端口")
+            return
+        for port_name, expression in _iter_named_connections(connections):
+            if expression is None:
+                report.unsupported.append(f"{instance_name}.{port_name}: 括号不匹配")
+                continue
+            if not expression or _CONSTANT.match(expression):
+                continue
+            port = module_ports.get(port_name)
+            if port is None:
+                report.unknown_ports.append(f"{instance_name}.{port_name}")
+                continue
+            reference = _NET_REFERENCE.match(expression)
+            if reference is None:
+                report.unsupported.append(f"{instance_name}.{port_name}({expression})")
+                continue
+            net_name, high, low = reference.groups()
+            if high is not None:
+                high = int(high)
+                low = int(low) if low is not None else high
+            endpoints.setdefault((current, net_name), []).append((port, high, low))
+
+    @staticmethod
+    def _find(aliases, key):
+        """并查集查找，带路径压缩"""
+        root = key
+        while aliases.get(root, root) != root:
+            root = aliases[root]
+        while key != root:
+            aliases[key], key = root, aliases.get(key, key)
+        return root
+
+    def _union(self, aliases, key_a, key_b):
+        root_a = self._find(aliases, key_a)
+        root_b = self._find(aliases, key_b)
+        if root_a != root_b:
+            aliases[root_a] = root_b
+
+    def _resolve_nets(self, declared, endpoints, aliases, report):
+        """按线网把输入端口匹配到驱动端口，生成连接"""
+        nets = {}  # 线网根 -> [(端口, high, low)]，high/low已展开为具体位范围
+        for key, items in endpoints.items():
+            root = self._find(aliases, key) if aliases else key
+            net_width = declared.get(key) or declared.get(root)
+            resolved = nets.setdefault(root, [])
+            for port, high, low in items:
+                if high is None:
+                    # 引用整个线网：使用声明的位宽，未声明时使用端口位宽
+                    high, low = net_width if net_width else (port.get_width_value() - 1, 0)
+                resolved.append((port, high, low))
+
+        claimed = set()  # 已经匹配到驱动的目标端口，同一端口出现多次时只连接一次
+        for (_, net_name), items in nets.items():
+            drivers = [item for item in items if item[0].direction == 'output']
+            if not drivers:
+                # 没有输出端口驱动时，由第一个双向端口驱动
+                drivers = [item for item in items if item[0].direction == 'inout'][:1]
+            driver_ports = {id(item[0]) for item in drivers}
+            for dest_port, high, low in items:
+                if id(dest_port) in driver_ports or dest_port.direction == 'output' or id(dest_port) in claimed:
+                    continue
+                dest_str = str(dest_port)
+                covering = [item for item in drivers if item[2] <= low and high <= item[1]]
+                if not covering:
+                    report.undriven_loads.append(f"{dest_str} ({net_name}[{high}:{low}])")
+                    continue
+                if len(covering) > 1:
+                    names = ', '.join(str(p) for p, _, _ in covering)
+                    report.conflicts.append(f"{dest_str}: 线网 {net_name} 有多个驱动 {names}")
+                    continue
+                source_port, driver_high, driver_low = covering[0]
+                if dest_port.get_width_value() != high - low + 1:
+                    report.conflicts.append(
+                        f"{dest_str}: 位宽 {dest_port.get_width_value()} 与线网 {net_name}[{high}:{low}] 不一致")
+                    continue
+                source_low = source_port.low + (low - driver_low)
+                source_range = {'high': source_low + (high - low), 'low': source_low}
+                if source_range['high'] > source_port.high:
+                    report.conflicts.append(f"{dest_str}: 线网 {net_name} 超出驱动端口 {source_port} 的位宽")
+                    continue
+                claimed.add(id(dest_port))
+                report.connections.append((source_port.port, dest_port.port, source_range,
+                                           {'high': dest_port.high, 'low': dest_port.low}))
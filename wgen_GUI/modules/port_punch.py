@@ -0,0 +1,204 @@
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+
+
+class PunchThroughResult:
+    """端口穿透结果，记录新建/复用的端口、每条连接经过的端口以及无法穿透的连接"""
+
+    def __init__(self):
+        self.created_ports: list[str] = []  # 新建的端口 module.port
+        self.reused_ports = 0  # 复用已有端口的次数
+        self.routes: list[str] = []  # 每条跨层次连接经过的端口
+        self.unroutable: list[str] = []  # 无法穿透的连接及原因
+
+    def get_summary(self):
+        """获取端口穿透结果的文本摘要"""
+        result = "端口穿透报告\n"
+        result += "===============\n"
+        result += f"\n新建端口 ({len(self.created_ports)}):\n"
+        for item in self.created_ports:
+            result += f"  {item}\n"
+        result += f"\n复用端口次数: {self.reused_ports}\n"
+        result += f"\n跨层次连接 ({len(self.routes)}):\n"
+        for item in self.routes:
+            result += f"  {item}\n"
+        result += f"\n无法穿透的连接 ({len(self.unroutable)}):\n"
+        for item in self.unroutable:
+            result += f"  {item}\n"
+        return result
+
+
+class PortPunchEngine:
+    """
+    跨层次连接的端口穿透引擎
+
+    对每条跨越层次边界的连接，在层次索引中找到两端模块的最近公共祖先，
+    在源模块一侧的中间生成模块（need_gen）上创建输出端口，在目标模块一侧创建输入端口，
+    并把原来的跨层次连接替换为逐层经过这些端口的连接（源端口 -> 输出端口 -> ... -> 输入端口 -> 目标端口）。
+    同一个线网（源模块、源端口、位范围）在同一个中间模块上只创建一个端口、只连接一次。
+    所有连接在一次批处理中完成，新端口直接加入模块端口列表，
+    由WgenConfigGenerator.gen_generated_md_port_def输出。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection):
+        """
+        初始化端口穿透引擎
+
+        参数:
+            collection (VerilogModuleCollection): 模块集合数据库
+        """
+        self.collection = collection
+        self.index = collection.get_hierarchy_index()
+        # (模块名, 线网键, 方向) -> 端口，保证同一线网的端口被复用
+        self._net_ports: dict[tuple, VerilogPort] = {}
+
+    @staticmethod
+    def _net_key(conn: VerilogConnection):
+        """线网键：源模块、源端口和使用的位范围"""
+        return (conn.source_module_name, conn.source_port.name,
+                conn.source_bit_range['high'], conn.source_bit_range['low'])
+
+    @staticmethod
+    def _net_port_name(net_key, source_port: VerilogPort):
+        """生成穿透端口名，只使用部分位宽时附加位范围"""
+        name = f"{net_key[0]}_{net_key[1]}"
+        if (net_key[2], net_key[3]) != (source_port.width['high'], source_port.width['low']):
+            name += f"_{net_key[2]}_{net_key[3]}"
+        return name
+
+    def _path_below(self, module: VerilogModule, ancestor: VerilogModule):
+        """获取从module的父模块到ancestor（不含）之间的所有模块，按自下而上的顺序"""
+        path = []
+        current = self.index.get_parent(module)
+        while current is not None and current is not ancestor:
+            path.append(current)
+            current = self.index.get_parent(current)
+        return path
+
+    def _get_or_create_port(self, module: VerilogModule, net_key, direction, width, source_port, result):
+        """在中间模块上获取同一线网已有的端口，或创建新端口"""
+        key = (module.name, net_key, direction)
+        port = self._net_ports.get(key)
+        if port is not None:
+            result.reused_ports += 1
+            return port
+
+        base_name = self._net_port_name(net_key, source_port)
+        name = base_name
+        suffix = 1
+        while True:
+            existing = module.get_port(name)
+            if existing is None:
+                port = VerilogPort(name=name, direction=direction, width=dict(width))
+                module.add_port(port)
+                result.created_ports.append(f"{module.name}.{name}")
+                break
+            # 之前批处理创建的同名同方向同位宽端口直接复用，保证多次执行结果一致
+            if existing.direction == direction and existing.width == width:
+                port = existing
+                result.reused_ports += 1
+                break
+            name = f"{base_name}_{suffix}"
+            suffix += 1
+
+        self._net_ports[key] = port
+        return port
+
+    def _replace_with_hops(self, conn: VerilogConnection, hop_ports):
+        """
+        在一个事务中把跨层次连接替换为经过穿透端口的逐层连接
+
+        参数:
+            conn (VerilogConnection): 原来的跨层次连接
+            hop_ports (list[VerilogPort]): 按信号方向排列的穿透端口
+
+        异常:
+            ValueError: 新连接无法创建（例如穿透端口已被其他线网驱动）时抛出，此时原连接保持不变
+        """
+        ports = [conn.source_port] + hop_ports + [conn.dest_port]
+        pairs = []
+        for index, (from_port, to_port) in enumerate(zip(ports, ports[1:])):
+            # 同一线网之前的连接已经创建了这一段
+            if to_port.source is from_port and to_port is not conn.dest_port:
+                continue
+            source_bit_range = dict(conn.source_bit_range) if index == 0 else None
+            dest_bit_range = dict(conn.dest_bit_range) if to_port is conn.dest_port else None
+            pairs.append((from_port, to_port, source_bit_range, dest_bit_range))
+
+        # 先断开原连接，目标端口才能接收新的驱动
+        conn.dest_port.source = None
+        was_destination = conn.dest_port in conn.source_port.destinations
+        if was_destination:
+            conn.source_port.destinations.remove(conn.dest_port)
+        try:
+            self.collection.connect_ports(pairs)
+        except ValueError:
+            conn.dest_port.source = conn.source_port
+            if was_destination:
+                conn.source_port.destinations.append(conn.dest_port)
+            raise
+
+    def run(self, connections=None):
+        """
+        对连接批量执行端口穿透
+
+        参数:
+            connections (list or None): 需要处理的连接，为None时处理数据库中的所有连接
+
+        返回:
+            PunchThroughResult: 端口穿透结果
+        """
+        result = PunchThroughResult()
+        if connections is None:
+            connections = self.collection.connections
+        replaced = set()  # 已被逐层连接替换的原连接
+
+        for conn in list(connections):
+            source_module = self.collection.get_module(conn.source_module_name)
+            dest_module = self.collection.get_module(conn.dest_module_name)
+            if source_module is None or dest_module is None:
+                result.unroutable.append(f"{conn}: 找不到连接两端的模块")
+                continue
+
+            # 两端模块的父模块相同时不需要穿透（两端都是根模块时父模块都为None，不属于这种情况）
+            source_parent = self.index.get_parent(source_module)
+            if source_parent is not None and source_parent is self.index.get_parent(dest_module):
+                continue
+
+            ancestor = self.index.lowest_common_ancestor(source_module, dest_module)
+            if ancestor is None:
+                result.unroutable.append(f"{conn}: 两端模块不在同一个层次结构中")
+                continue
+
+            # 一端模块本身就是公共祖先时，该端不需要经过中间模块
+            up_path = [] if ancestor is source_module else self._path_below(source_module, ancestor)
+            down_path = [] if ancestor is dest_module else self._path_below(dest_module, ancestor)
+            blocked = [module.name for module in up_path + down_path if not module.need_gen]
+            if blocked:
+                result.unroutable.append(f"{conn}: 中间模块 {', '.join(blocked)} 不是生成模块，无法添加端口")
+                continue
+            if not up_path and not down_path:
+                continue
+
+            net_key = self._net_key(conn)
+            width = {'high': net_key[2] - net_key[3], 'low': 0}
+            hop_ports = []
+            for module in up_path:
+                hop_ports.append(self._get_or_create_port(module, net_key, 'output', width, conn.source_port, result))
+            for module in reversed(down_path):
+                hop_ports.append(self._get_or_create_port(module, net_key, 'input', width, conn.source_port, result))
+            try:
+                self._replace_with_hops(conn, hop_ports)
+            except ValueError as e:
+                result.unroutable.append(f"{conn}: {e}")
+                continue
+            replaced.add(id(conn))
+            hops = [f"{port.father_module.name}.{port.name}" for port in hop_ports]
+            result.routes.append(f"{conn}: 经过 {' -> '.join(hops)}")
+
+        if replaced:
+            self.collection.connections[:] = [conn for conn in self.collection.connections if id(conn) not in replaced]
+        return result
@@ -0,0 +1,205 @@
+import re
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogPort
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogPort
+
+
+# 常见的方向前缀/后缀，例如 clk_i、o_data、data_out
+_DIRECTION_AFFIX = re.compile(r'^(?:i|o|io|in|out)_|_(?:i|o|io|in|out)$')
+
+
+def normalize_port_name(name):
+    """
+    归一化端口名：转小写，去掉方向前缀/后缀和下划线
+
+    例如 RData、r_data、rdata_o 都归一化为 rdata，clk_i 归一化为 clk。
+    """
+    name = name.lower()
+    stripped = _DIRECTION_AFFIX.sub('', name)
+    return (stripped or name).replace('_', '')
+
+
+def _build_pattern(pattern):
+    """为位并行编辑距离预计算每个字符在pattern中出现位置的位掩码"""
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks, len(pattern)
+
+
+def _pattern_distance(compiled, text):
+    """
+    使用Myers位并行算法计算预编译pattern与text的编辑距离
+
+    pattern的每一列用一个整数的一位表示，每处理text的一个字符只需要常数次整数运算，
+    比逐格动态规划快一个数量级。
+    """
+    masks, length = compiled
+    if length == 0:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive = full
+    negative = 0
+    score = length
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | negative
+        xh = (((eq & positive) + positive) ^ positive) | eq
+        horizontal_positive = negative | ~(xh | positive)
+        horizontal_negative = positive & xh
+        if horizontal_positive & last:
+            score += 1
+        elif horizontal_negative & last:
+            score -= 1
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative <<= 1
+        positive = (horizontal_negative | ~(xv | horizontal_positive)) & full
+        negative = horizontal_positive & xv & full
+    return score
+
+
+def edit_distance(a, b):
+    """计算两个字符串的编辑距离（Levenshtein距离）"""
+    return _pattern_distance(_build_pattern(a), b)
+
+
+class _BKNode:
+    """BK树节点，同一个归一化名称的所有端口存放在一个节点中"""
+
+    def __init__(self, key):
+        self.key = key
+        self.ports: list[VerilogPort] = []
+        self.children: dict[int, _BKNode] = {}
+
+
+class BKTree:
+    """
+    基于编辑距离的BK树
+
+    查询距离不超过max_distance的所有键时，利用三角不等式只访问距离在
+    [d - max_distance, d + max_distance] 内的子树。插入和查询都使用迭代实现。
+    """
+
+    def __init__(self):
+        self.root: _BKNode = None
+        self._nodes: dict[str, _BKNode] = {}  # 键 -> 节点，相同的键直接追加端口
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def add(self, key, port: VerilogPort):
+        """添加一个端口，key为端口的归一化名称"""
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = _BKNode(key)
+            if self.root is None:
+                self.root = node
+            else:
+                compiled = _build_pattern(key)
+                current = self.root
+                while True:
+                    distance = _pattern_distance(compiled, current.key)
+                    child = current.children.get(distance)
+                    if child is None:
+                        current.children[distance] = node
+                        break
+                    current = child
+        node.ports.append(port)
+
+    def search(self, key, max_distance):
+        """
+        查询与key的编辑距离不超过max_distance的所有节点
+
+        返回:
+            list[tuple]: (距离, 节点) 列表，按距离排序
+        """
+        if self.root is None:
+            return []
+        compiled = _build_pattern(key)
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = _pattern_distance(compiled, node.key)
+            if distance <= max_distance:
+                results.append((distance, node))
+            for child_distance, child in node.children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda item: (item[0], item[1].key))
+        return results
+
+
+class PortSimilarityIndex:
+    """
+    端口名相似度索引
+
+    把数据库中所有输入/双向端口按归一化名称放入BK树，同名的端口共用一个节点，
+    因此同一模块定义的多个实例不会增加树的大小。查询时从距离0开始逐步放宽阈值，
+    找到足够的候选端口后即停止，再按方向和位宽过滤。
+    """
+
+    def __init__(self, collection: VerilogModuleCollection):
+        """
+        根据数据库建立相似度索引
+
+        参数:
+            collection (VerilogModuleCollection): 模块集合数据库
+        """
+        self.collection = collection
+        self.tree = BKTree()
+        normalized: dict[str, str] = {}  # 原始端口名 -> 归一化名称，同名端口只归一化一次
+        for module in collection.modules:
+            for port in module.ports:
+                if port.is_input() or port.is_inout():
+                    key = normalized.get(port.name)
+                    if key is None:
+                        key = normalized[port.name] = normalize_port_name(port.name)
+                    self.tree.add(key, port)
+        self._build_key = self._get_build_key()
+
+    def _get_build_key(self):
+        """索引建立时数据库的模块数和端口总数，用于判断索引是否过期"""
+        return (id(self.collection.modules), len(self.collection.modules),
+                sum(len(module.ports) for module in self.collection.modules))
+
+    def is_current(self, collection: VerilogModuleCollection):
+        """判断索引是否仍然与数据库一致（模块和端口数量没有变化）"""
+        return collection is self.collection and self._get_build_key() == self._build_key
+
+    def suggest(self, port: VerilogPort, k=10, max_distance=3, unconnected_only=True):
+        """
+        为源端口推荐最相似的k个目标端口
+
+        参数:
+            port (VerilogPort): 源端口（输出或双向端口）
+            k (int): 返回的候选数量
+            max_distance (int): 归一化名称的最大编辑距离
+            unconnected_only (bool): 是否只推荐没有驱动的端口
+
+        返回:
+            list[tuple]: (编辑距离, 目标端口) 列表，按距离和端口名排序
+        """
+        key = normalize_port_name(port.name)
+        width = port.get_width_value()
+        suggestions = []
+        seen = set()
+        for threshold in range(max_distance + 1):
+            for distance, node in self.tree.search(key, threshold):
+                if id(node) in seen:
+                    continue
+                seen.add(id(node))
+                for candidate in node.ports:
+                    if candidate.father_module is port.father_module or candidate.get_width_value() != width:
+                        continue
+                    if unconnected_only and candidate.source is not None:
+                        continue
+                    suggestions.append((distance, candidate))
+            if len(suggestions) >= k:
+                break
+        suggestions.sort(key=lambda item: (item[0], item[1].father_module.name, item[1].name))
+        return suggestions[:k]
@@ -0,0 +1,232 @@
+import os
+import re
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .file_cache import compute_content_hash, get_cache_dir, load_json_cache, save_json_cache
+except ImportError:
+    from file_cache import compute_content_hash, get_cache_dir, load_json_cache, save_json_cache
+
+
+# 行首的module声明，直接在字节内容上匹配，不需要解码整个文件
+_MODULE_DECLARATION = re.compile(rb'^[ \t]*(?:macro)?module\s+([A-Za-z_][A-Za-z0-9_$]*)', re.MULTILINE)
+
+# 索引文件格式版本，格式变化时丢弃旧索引
+INDEX_VERSION = 1
+
+
+class LibraryRefreshReport:
+    """RTL库索引刷新报告"""
+
+    def __init__(self):
+        self.indexed_files: list[str] = []  # 新增或内容变化后重新索引的文件
+        self.removed_files: list[str] = []  # 已经不存在的文件
+        self.unchanged_files = 0  # mtime和大小都没有变化的文件数
+        self.duplicates: dict[str, list[str]] = {}  # 在多个文件中定义的模块名 -> 文件列表
+
+    def has_changes(self):
+        """判断本次刷新是否修改了索引"""
+        return bool(self.indexed_files or self.removed_files)
+
+    def get_summary(self):
+        """获取刷新报告的文本摘要"""
+        result = "RTL库索引刷新报告\n"
+        result += "===============\n"
+        result += f"\n未变化的文件: {self.unchanged_files}\n"
+        result += f"\n重新索引的文件 ({len(self.indexed_files)}):\n"
+        for item in self.indexed_files:
+            result += f"  {item}\n"
+        result += f"\n删除的文件 ({len(self.removed_files)}):\n"
+        for item in self.removed_files:
+            result += f"  {item}\n"
+        result += f"\n重复定义的模块 ({len(self.duplicates)}):\n"
+        for name, files in self.duplicates.items():
+            result += f"  {name}: {', '.join(files)}\n"
+        return result
+
+
+class RtlLibraryIndex:
+    """
+    持久化的RTL库索引：模块名 -> (文件, 偏移, 文件哈希)
+
+    遍历库根目录下的所有Verilog文件，用行首的module声明快速提取模块名和字节偏移，
+    索引保存到缓存目录。刷新时先比较每个文件的mtime和大小，未变化的文件不读取；
+    变化的文件再比较内容哈希，只有内容真正变化时才重新提取模块名。
+    """
+
+    INDEX_FILE_NAME = "rtl_library_index.json"
+    EXTENSIONS = ('.v', '.sv')
+
+    def __init__(self, index_path=None):
+        """
+        初始化RTL库索引，从索引文件加载上次的结果
+
+        参数:
+            index_path (str or None): 索引文件路径，为None时使用缓存目录中的默认文件，为空字符串时不持久化
+        """
+        if index_path is None:
+            index_path = os.path.join(get_cache_dir(), self.INDEX_FILE_NAME)
+        self.index_path = index_path
+        data = load_json_cache(index_path) if index_path else {}
+        if data.get('version') != INDEX_VERSION:
+            data = {}
+        # 文件路径 -> {'mtime': int, 'size': int, 'hash': str, 'modules': [[模块名, 偏移], ...]}
+        self._files: dict[str, dict] = data.get('files', {})
+        self._definitions: dict[str, list[str]] = {}  # 模块名 -> 定义该模块的文件路径列表
+        # 最近一次刷新的库根目录前缀和文件，查找时只考虑这些文件（索引文件中可能还有其他库的记录）
+        self._active_prefixes: tuple = ()
+        self._active_files: set[str] = set()
+        self._scoped = False
+        for path, record in self._files.items():
+            self._add_definitions(path, record)
+
+    def _add_definitions(self, path, record):
+        """把文件中定义的模块加入模块名索引"""
+        for name, _ in record['modules']:
+            self._definitions.setdefault(name, []).append(path)
+
+    def _remove_definitions(self, path, record):
+        """从模块名索引中删除文件中定义的模块"""
+        for name, _ in record['modules']:
+            paths = self._definitions.get(name)
+            if paths is not None and path in paths:
+                paths.remove(path)
+                if not paths:
+                    del self._definitions[name]
+
+    def refresh(self, roots, files=None):
+        """
+        增量刷新库根目录下的索引
+
+        参数:
+            roots (list[str]): 库根目录列表
+            files (list[str] or None): 额外索引的文件（例如.f文件列表中的源文件）
+
+        返回:
+            LibraryRefreshReport: 刷新报告
+        """
+        report = LibraryRefreshReport()
+        roots = [os.path.abspath(root) for root in roots]
+        files = [os.path.abspath(path) for path in files or []]
+        seen = set()
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            record = self._files.get(path)
+            if record is not None and record['mtime'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+                report.unchanged_files += 1
+                continue
+            self._index_file(path, stat, record, report)
+        stack = list(roots)
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.name.endswith(self.EXTENSIONS):
+                        continue
+                    path = entry.path
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    record = self._files.get(path)
+                    if record is not None and record['mtime'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+                        report.unchanged_files += 1
+                        continue
+                    self._index_file(path, stat, record, report)
+
+        # 删除根目录下已经不存在的文件；索引文件由多个库共用，其他库中已删除的文件也一并删除
+        prefixes = tuple(os.path.join(root, '') for root in roots)
+        self._active_prefixes = prefixes
+        self._active_files = set(files)
+        self._scoped = True
+        for path in list(self._files):
+            if path in seen:
+                continue
+            if path.startswith(prefixes) or path in self._active_files or not os.path.isfile(path):
+                self._remove_definitions(path, self._files.pop(path))
+                report.removed_files.append(path)
+
+        if report.has_changes() and self.index_path:
+            save_json_cache(self.index_path, {'version': INDEX_VERSION, 'files': self._files})
+        report.duplicates = self.get_duplicates()
+        return report
+
+    def _index_file(self, path, stat, record, report):
+        """读取文件并更新索引记录，内容哈希未变化时只更新mtime"""
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return
+        file_hash = compute_content_hash(content)
+        if record is not None and record['hash'] == file_hash:
+            record['mtime'] = stat.st_mtime_ns
+            record['size'] = stat.st_size
+            report.unchanged_files += 1
+            return
+        modules = [[match.group(1).decode('ascii'), match.start()] for match in _MODULE_DECLARATION.finditer(content)]
+        if record is not None:
+            self._remove_definitions(path, record)
+        record = self._files[path] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': file_hash,
+                                      'modules': modules}
+        self._add_definitions(path, record)
+        report.indexed_files.append(path)
+
+    def lookup(self, module_name):
+        """
+        查找模块定义
+
+        参数:
+            module_name (str): 模块名
+
+        返回:
+            tuple or None: (文件路径, 字节偏移, 文件哈希)，未找到时返回None；
+                只在最近一次刷新的库根目录和文件中查找，同名模块取路径排序后的第一个文件
+        """
+        paths = self._definitions.get(module_name)
+        if paths and self._scoped:
+            paths = [path for path in paths if self._in_scope(path)]
+        if not paths:
+            return None
+        path = min(paths)
+        record = self._files[path]
+        for name, offset in record['modules']:
+            if name == module_name:
+                return path, offset, record['hash']
+        return None
+
+    def _in_scope(self, path):
+        """判断文件是否属于最近一次刷新的库根目录或文件"""
+        return path in self._active_files or path.startswith(self._active_prefixes)
+
+    def get_duplicates(self):
+        """获取最近一次刷新的范围内，在多个文件中定义的模块名 -> 排序后的文件列表"""
+        duplicates = {}
+        for name, paths in self._definitions.items():
+            if len(paths) > 1:
+                if self._scoped:
+                    paths = [path for path in paths if self._in_scope(path)]
+                if len(paths) > 1:
+                    duplicates[name] = sorted(paths)
+        return duplicates
+
+    def get_module_names(self):
+        """获取索引中的所有模块名"""
+        return list(self._definitions)
+
+    def __len__(self):
+        return len(self._definitions)
@@ -0,0 +1,274 @@
+import datetime
+import json
+import os
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogPort
+    from .binary_session import is_binary_session_file, load_binary_file
+    from .session_store import is_session_manifest, load_session_manifest
+    from .sqlite_backend import SqliteCollectionStore, is_sqlite_file
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogPort
+    from binary_session import is_binary_session_file, load_binary_file
+    from session_store import is_session_manifest, load_session_manifest
+    from sqlite_backend import SqliteCollectionStore, is_sqlite_file
+
+
+class JournalRecoveryReport:
+    """会话日志恢复报告"""
+
+    def __init__(self):
+        self.snapshot_path = ''  # 恢复使用的完整快照
+        self.replayed = 0  # 成功重放的记录数
+        self.failed: list[str] = []  # 无法重放的记录及原因
+        self.truncated = False  # 日志末尾是否有未写完的记录（写入过程中程序退出）
+
+    def get_summary(self):
+        """获取恢复报告的文本摘要"""
+        result = "会话恢复报告\n"
+        result += "===============\n"
+        result += f"\n快照: {self.snapshot_path}\n"
+        result += f"重放的操作: {self.replayed}\n"
+        if self.truncated:
+            result += "日志末尾有未写完的记录，已忽略\n"
+        result += f"\n无法重放的操作 ({len(self.failed)}):\n"
+        for item in self.failed:
+            result += f"  {item}\n"
+        return result
+
+
+class SessionJournal:
+    """
+    追加写入的会话日志
+
+    日志第一行记录一个完整快照（数据库文件）的路径，之后每次连接或断开连接追加一行JSON记录
+    并fsync，单次编辑只写入几十字节，不再深拷贝和重写整个数据库。记录数超过compact_threshold
+    后由调用方保存新的完整快照并调用attach或rebase压缩日志。恢复时加载快照并按顺序重放日志记录。
+    """
+
+    FILE_NAME = "journal.log"
+
+    def __init__(self, journal_path, compact_threshold=500):
+        """
+        初始化会话日志
+
+        参数:
+            journal_path (str): 日志文件路径
+            compact_threshold (int): 记录数超过该值时需要压缩为完整快照
+        """
+        self.journal_path = journal_path
+        self.compact_threshold = compact_threshold
+        self.collection: VerilogModuleCollection = None  # 日志对应的数据库
+        self.record_count = 0  # 快照之后的记录数
+        self.seq = 0  # 最后一条记录的序号，rebase后继续递增
+        self._file = None
+
+    def attach(self, collection: VerilogModuleCollection, snapshot_path):
+        """
+        以新的完整快照开始日志，丢弃之前的记录（压缩）
+
+        参数:
+            collection (VerilogModuleCollection): 与快照内容一致的数据库
+            snapshot_path (str): 快照（数据库文件）路径
+        """
+        self.close()
+        header = {'op': 'snapshot', 'path': os.path.abspath(snapshot_path),
+                  'time': datetime.datetime.now().isoformat(timespec='seconds')}
+        # 先写临时文件再替换，压缩过程中退出时旧日志仍然完整
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self.collection = collection
+        self.record_count = 0
+        self.seq = 0
+
+    def rebase(self, snapshot_path, snapshot_seq):
+        """
+        以后台保存完成的快照压缩日志，只保留生成快照之后追加的记录
+
+        参数:
+            snapshot_path (str): 快照（数据库文件）路径
+            snapshot_seq (int): 开始生成快照时的seq，快照已包含该序号及之前的记录
+        """
+        if self._file is None:
+            raise RuntimeError("会话日志尚未attach到数据库")
+        self._file.close()
+        self._file = None
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')[1:-1]
+        kept = []
+        for line in lines:
+            try:
+                if json.loads(line).get('seq', 0) > snapshot_seq:
+                    kept.append(line)
+            except ValueError:
+                continue
+        header = {'op': 'snapshot', 'path': os.path.abspath(snapshot_path),
+                  'time': datetime.datetime.now().isoformat(timespec='seconds')}
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in [json.dumps(header, ensure_ascii=False)] + kept))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self.record_count = len(kept)
+
+    def is_attached(self, collection: VerilogModuleCollection):
+        """判断日志是否对应指定的数据库（数据库被替换后需要重新attach）"""
+        return self._file is not None and self.collection is collection
+
+    def needs_compaction(self):
+        """判断记录数是否超过压缩阈值"""
+        return self.record_count >= self.compact_threshold
+
+    def close(self):
+        """关闭日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.collection = None
+
+    def _append(self, record):
+        """追加一条记录并fsync，保证返回后记录已经落盘"""
+        if self._file is None:
+            raise RuntimeError("会话日志尚未attach到数据库")
+        self.record_count += 1
+        self.seq += 1
+        record['seq'] = self.seq
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_connect(self, source_port: VerilogPort, dest_port: VerilogPort, source_bit_range=None,
+                       dest_bit_range=None):
+        """记录一次连接"""
+        source_bit_range = source_bit_range or source_port.width
+        dest_bit_range = dest_bit_range or dest_port.width
+        self._append({'op': 'connect',
+                      'src': [source_port.father_module.name, source_port.name],
+                      'dst': [dest_port.father_module.name, dest_port.name],
+                      'src_range': [source_bit_range['high'], source_bit_range['low']],
+                      'dst_range': [dest_bit_range['high'], dest_bit_range['low']]})
+
+    def record_disconnect_source(self, source_port: VerilogPort):
+        """记录删除输出端口的所有连接"""
+        self._append({'op': 'disconnect_source', 'port': [source_port.father_module.name, source_port.name]})
+
+    def record_disconnect_dest(self, dest_port: VerilogPort):
+        """记录删除输入端口的连接"""
+        self._append({'op': 'disconnect_dest', 'port': [dest_port.father_module.name, dest_port.name]})
+
+    @staticmethod
+    def read_snapshot_path(journal_path):
+        """
+        读取日志对应的快照路径
+
+        返回:
+            str or None: 快照路径，日志不存在或格式错误时返回None
+        """
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+        return header.get('path') if isinstance(header, dict) and header.get('op') == 'snapshot' else None
+
+    @staticmethod
+    def count_records(journal_path):
+        """
+        统计日志中快照之后的记录数
+
+        返回:
+            int: 记录数，日志不存在时返回0
+        """
+        try:
+            with open(journal_path, 'rb') as f:
+                return max(0, sum(1 for line in f if line.strip()) - 1)
+        except OSError:
+            return 0
+
+    @classmethod
+    def recover(cls, journal_path):
+        """
+        加载快照并重放日志记录
+
+        参数:
+            journal_path (str): 日志文件路径
+
+        返回:
+            tuple: (VerilogModuleCollection, JournalRecoveryReport)
+
+        异常:
+            ValueError: 日志不存在、格式错误或快照无法加载
+        """
+        report = JournalRecoveryReport()
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except OSError as e:
+            raise ValueError(f"无法读取会话日志: {e}")
+        snapshot_path = cls.read_snapshot_path(journal_path)
+        if snapshot_path is None:
+            raise ValueError("会话日志格式错误，缺少快照记录")
+        # 自动保存的快照是会话清单，用户另存为二进制会话文件或SQLite数据库后快照是该文件
+        if is_session_manifest(snapshot_path):
+            collection = load_session_manifest(snapshot_path)
+        elif is_binary_session_file(snapshot_path):
+            collection = load_binary_file(snapshot_path)
+        elif is_sqlite_file(snapshot_path):
+            store = SqliteCollectionStore(snapshot_path)
+            try:
+                collection = store.load_collection()
+            finally:
+                store.close()
+        else:
+            collection = VerilogModuleCollection.load_from_file(snapshot_path)
+        if collection is None:
+            raise ValueError(f"无法加载会话快照: {snapshot_path}")
+        report.snapshot_path = snapshot_path
+
+        # 最后一行之后没有换行符说明写入被中断
+        if lines[-1]:
+            report.truncated = True
+        for line in lines[1:-1]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                error = cls._replay(collection, record)
+            except (ValueError, KeyError, TypeError) as e:
+                error = f"{line} ({e})"
+            if error:
+                report.failed.append(error)
+            else:
+                report.replayed += 1
+        return collection, report
+
+    @staticmethod
+    def _replay(collection: VerilogModuleCollection, record):
+        """重放一条记录，成功时返回空字符串，否则返回错误信息"""
+        op = record['op']
+        if op == 'connect':
+            (source_module, source_port), (dest_module, dest_port) = record['src'], record['dst']
+            collection.add_connection(source_module, source_port, dest_module, dest_port,
+                                      {'high': record['src_range'][0], 'low': record['src_range'][1]},
+                                      {'high': record['dst_range'][0], 'low': record['dst_range'][1]})
+            return ''
+        if op in ('disconnect_source', 'disconnect_dest'):
+            module_name, port_name = record['port']
+            module = collection.get_module(module_name)
+            port = module.get_port(port_name) if module is not None else None
+            if port is None:
+                return f"#{record.get('seq')} {op}: 端口 {module_name}.{port_name} 不存在"
+            if op == 'disconnect_source':
+                error = collection.remove_master_port_connections(port)
+            else:
+                error = collection.remove_slave_port_connection(port)
+            return f"#{record.get('seq')} {op}: {error}" if error else ''
+        return f"#{record.get('seq')} 未知操作 {op}"
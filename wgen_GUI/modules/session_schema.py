@@ -0,0 +1,222 @@
+"""
+数据库文件的规范化格式（schema_version 2）
+
+旧格式中每个模块（实例）都保存完整的端口列表，连接用模块名和端口名表示。规范化格式把
+module_def_name、file_path、file_hash和端口列表都相同的实例归为一个定义，定义只保存一次：
+
+    {
+      "definitions": [{"id": 0, "module_def_name": ..., "file_path": ..., "file_hash": ...,
+                       "ports": [...], "parameters": {所有实例都相同的参数}}],
+      "modules": [{"name": ..., "definition": 0, "includes": [...], "top_module_name": ...,
+                   "need_gen": ..., "parameter_overrides": {与定义不同的参数}}],
+      "connections": [{"source": [源模块序号, 源端口序号], "dest": [目标模块序号, 目标端口序号],
+                       "source_bit_range": ..., "dest_bit_range": ...}],
+      "metadata": {"schema_version": 2, ...}
+    }
+
+模块序号是实例在modules数组中的位置，端口序号是端口在定义的ports数组中的位置；与端口位宽相同的
+位范围省略。实例的参数顺序不能由定义参数加覆盖参数得到时，直接保存完整的parameters。
+两端无法用序号表示的连接仍按名称保存。
+"""
+
+SCHEMA_VERSION = 2
+
+
+def _definition_key(module_info):
+    """实例可以共享定义的条件：定义名、文件、文件哈希和端口列表都相同"""
+    ports = tuple((port_info['name'], port_info['direction'],
+                   (port_info.get('width') or {}).get('high', 0), (port_info.get('width') or {}).get('low', 0))
+                  for port_info in module_info.get('ports', []))
+    return (module_info.get('module_def_name', ''), module_info.get('file_path', ''),
+            module_info.get('file_hash'), ports)
+
+
+def _common_parameters(instances):
+    """所有实例中取值都相同的参数（按第一个实例的顺序）"""
+    common = dict(instances[0].get('parameters') or {})
+    for module_info in instances[1:]:
+        parameters = module_info.get('parameters') or {}
+        for name in [name for name, value in common.items() if name not in parameters or parameters[name] != value]:
+            del common[name]
+    return common
+
+
+def normalize_records(records):
+    """
+    把iter_records格式的记录转换为规范化格式的记录
+
+    模块记录需要全部读入后才能确定定义，连接记录逐条转换。
+
+    参数:
+        records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组，模块在连接之前
+
+    返回:
+        generator: 依次生成 ('definitions', 定义字典)、('modules', 实例字典) 和 ('connections', 连接字典) 元组
+
+    异常:
+        ValueError: 模块记录出现在连接记录之后
+    """
+    module_infos = []
+    definition_ids = {}  # 定义的键 -> 定义序号
+    definition_instances = []  # 定义序号 -> 使用该定义的模块记录
+    instance_definitions = []  # 模块序号 -> 定义序号
+    first_connection = None
+    records = iter(records)
+    for key, record in records:
+        if key == 'modules':
+            definition_key = _definition_key(record)
+            definition_id = definition_ids.get(definition_key)
+            if definition_id is None:
+                definition_id = definition_ids[definition_key] = len(definition_instances)
+                definition_instances.append([])
+            definition_instances[definition_id].append(record)
+            module_infos.append(record)
+            instance_definitions.append(definition_id)
+        elif key == 'connections':
+            first_connection = record
+            break
+
+    # 定义
+    definitions = []
+    for definition_id, instances in enumerate(definition_instances):
+        first = instances[0]
+        definition = {
+            'id': definition_id,
+            'module_def_name': first.get('module_def_name', ''),
+            'file_path': first.get('file_path', ''),
+            'file_hash': first.get('file_hash'),
+            'ports': first.get('ports', []),
+            'parameters': _common_parameters(instances)
+        }
+        definitions.append(definition)
+        yield 'definitions', definition
+
+    # 实例；同名模块以最后一个为准、同名端口以第一个为准，与VerilogModuleCollection的查找一致
+    port_ids = {}  # 模块名 -> (模块序号, {端口名: 端口序号})
+    for module_index, module_info in enumerate(module_infos):
+        definition = definitions[instance_definitions[module_index]]
+        instance = {
+            'name': module_info['name'],
+            'definition': definition['id'],
+            'includes': module_info.get('includes', []),
+            'top_module_name': module_info.get('top_module_name'),
+            'need_gen': module_info.get('need_gen', False)
+        }
+        parameters = module_info.get('parameters') or {}
+        common = definition['parameters']
+        overrides = {name: value for name, value in parameters.items() if name not in common}
+        if list({**common, **overrides}) == list(parameters):
+            if overrides:
+                instance['parameter_overrides'] = overrides
+        else:
+            instance['parameters'] = parameters
+        indexes = {}
+        for port_index, port_info in enumerate(definition['ports']):
+            indexes.setdefault(port_info['name'], port_index)
+        port_ids[module_info['name']] = (module_index, indexes)
+        yield 'modules', instance
+
+    # 连接
+    def convert(conn_info):
+        source_module = port_ids.get(conn_info['source_module_name'])
+        dest_module = port_ids.get(conn_info['dest_module_name'])
+        source_port = source_module[1].get(conn_info['source_port_name']) if source_module else None
+        dest_port = dest_module[1].get(conn_info['dest_port_name']) if dest_module else None
+        if source_port is None or dest_port is None:
+            return conn_info
+        conn = {'source': [source_module[0], source_port], 'dest': [dest_module[0], dest_port]}
+        for field, (module_index, port_index) in (('source_bit_range', conn['source']),
+                                                  ('dest_bit_range', conn['dest'])):
+            bit_range = conn_info.get(field)
+            width = definitions[instance_definitions[module_index]]['ports'][port_index].get('width') or {}
+            if bit_range and (bit_range['high'] != width.get('high', 0) or bit_range['low'] != width.get('low', 0)):
+                conn[field] = bit_range
+        return conn
+
+    if first_connection is not None:
+        yield 'connections', convert(first_connection)
+    for key, record in records:
+        if key == 'modules':
+            raise ValueError("模块记录必须在连接记录之前")
+        if key == 'connections':
+            yield 'connections', convert(record)
+
+
+def denormalize_records(records):
+    """
+    把规范化格式的记录转换为iter_records格式的记录，旧格式的记录原样生成
+
+    参数:
+        records (iterable): (键, 记录) 元组，键为'definitions'、'modules'或'connections'
+
+    返回:
+        generator: 依次生成 ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+    """
+    definitions = {}  # 定义id -> 定义字典
+    instances = []  # 模块序号 -> (模块名, 定义字典或None)
+    pending = []  # 出现在模块之前的连接记录
+
+    def convert(conn_info):
+        if 'source' not in conn_info:
+            return conn_info
+        try:
+            (source_index, source_port), (dest_index, dest_port) = conn_info['source'], conn_info['dest']
+            source_name, source_definition = instances[source_index]
+            dest_name, dest_definition = instances[dest_index]
+            source_port_info = source_definition['ports'][source_port]
+            dest_port_info = dest_definition['ports'][dest_port]
+        except (IndexError, TypeError, ValueError):
+            print(f"警告: 无法创建连接 {conn_info.get('source')} -> {conn_info.get('dest')}: 端口序号错误")
+            return None
+        source_width = source_port_info.get('width') or {'high': 0, 'low': 0}
+        dest_width = dest_port_info.get('width') or {'high': 0, 'low': 0}
+        return {
+            'source_module_name': source_name,
+            'source_port_name': source_port_info['name'],
+            'dest_module_name': dest_name,
+            'dest_port_name': dest_port_info['name'],
+            'source_bit_range': conn_info.get('source_bit_range') or dict(source_width),
+            'dest_bit_range': conn_info.get('dest_bit_range') or dict(dest_width)
+        }
+
+    for key, record in records:
+        if key == 'definitions':
+            definitions[record['id']] = record
+        elif key == 'modules':
+            if 'definition' in record:
+                definition = definitions.get(record['definition'])
+                if definition is None:
+                    raise ValueError(f"模块 '{record['name']}' 引用了不存在的定义 {record['definition']}")
+                if 'parameters' in record:
+                    parameters = dict(record['parameters'] or {})
+                else:
+                    parameters = dict(definition.get('parameters') or {})
+                    parameters.update(record.get('parameter_overrides') or {})
+                record = {
+                    'name': record['name'],
+                    'file_path': definition.get('file_path', ''),
+                    'module_def_name': definition.get('module_def_name', ''),
+                    'ports': definition.get('ports', []),
+                    'includes': record.get('includes', []),
+                    'top_module_name': record.get('top_module_name'),
+                    'need_gen': record.get('need_gen', False),
+                    'parameters': parameters,
+                    'file_hash': definition.get('file_hash')
+                }
+                instances.append((record['name'], definition))
+            else:
+                # 旧格式的模块不会被端口序号引用，不保留其端口列表
+                instances.append((record['name'], None))
+            yield 'modules', record
+        elif key == 'connections':
+            # 端口序号引用的模块还没有出现时，等所有记录读取完后再转换
+            if 'source' in record and not instances:
+                pending.append(record)
+                continue
+            conn_info = convert(record)
+            if conn_info is not None:
+                yield 'connections', conn_info
+    for record in pending:
+        conn_info = convert(record)
+        if conn_info is not None:
+            yield 'connections', conn_info
@@ -0,0 +1,397 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+import zlib
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection
+    from .session_schema import normalize_records
+except ImportError:
+    from verilog_models import VerilogModuleCollection
+    from session_schema import normalize_records
+
+
+# 会话清单文件开头，用于识别文件格式
+MANIFEST_FORMAT = 'wgen_session_manifest'
+MANIFEST_PREFIX = f'{{"format": "{MANIFEST_FORMAT}"'.encode('utf-8')
+MANIFEST_EXTENSION = '.manifest'
+# 清单中按顺序保存的三类数据块
+SECTIONS = ('definitions', 'modules', 'connections')
+
+
+def is_session_manifest(file_path):
+    """根据文件开头判断文件是否为会话清单"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MANIFEST_PREFIX)) == MANIFEST_PREFIX
+    except OSError:
+        return False
+
+
+def is_session_manifest_path(file_path):
+    """根据扩展名判断保存路径是否为会话清单"""
+    return file_path.lower().endswith(MANIFEST_EXTENSION)
+
+
+def load_session_manifest(manifest_path, progress_callback=None):
+    """
+    加载会话清单对应的数据库，数据块从清单所在目录的对象存储中读取
+
+    参数:
+        manifest_path (str): 会话清单路径
+        progress_callback (callable or None): progress_callback(已读取的数据块数, 数据块总数)
+
+    返回:
+        VerilogModuleCollection: 重建的模块集合对象
+
+    异常:
+        ValueError: 清单格式错误或数据块缺失、损坏
+    """
+    return SessionStore(os.path.dirname(os.path.abspath(manifest_path))).load(manifest_path, progress_callback)
+
+
+class SessionRetentionReport:
+    """会话目录清理报告"""
+
+    def __init__(self):
+        self.removed_sessions: list[str] = []  # 按保留策略删除的会话文件
+        self.kept_sessions = 0  # 保留的会话数
+        self.removed_objects = 0  # 删除的未引用数据块数
+        self.freed_bytes = 0  # 释放的字节数
+
+    def get_summary(self):
+        """获取清理报告的文本摘要"""
+        result = "会话目录清理报告\n"
+        result += "===============\n"
+        result += f"\n保留的会话: {self.kept_sessions}\n"
+        result += f"删除的数据块: {self.removed_objects}\n"
+        result += f"释放空间: {self.freed_bytes / 1024 / 1024:.1f} MB\n"
+        result += f"\n删除的会话 ({len(self.removed_sessions)}):\n"
+        for path in self.removed_sessions:
+            result += f"  {os.path.basename(path)}\n"
+        return result
+
+
+class SessionStore:
+    """
+    按内容寻址的会话目录
+
+    每次保存把数据库拆分为模块定义、模块实例和连接三类数据块，数据块以内容的SHA-256命名保存在
+    objects目录中，相同内容只保存一次；每个会话只是一个很小的清单文件，按顺序列出各数据块的哈希。
+    数据块的边界由记录内容决定（记录的CRC满足条件时结束当前块），插入或删除记录只影响附近的数据块，
+    之后的数据块仍与上一次保存相同。连接按模块名和端口名保存，插入模块不会改变连接数据块。
+
+    apply_retention按保留策略删除旧会话（包括旧版本的完整collection_*.json文件），
+    collect_garbage删除不再被任何清单引用的数据块。
+    """
+
+    OBJECTS_DIR = "objects"
+
+    def __init__(self, sessions_dir, chunk_target=256, max_chunk_records=4096):
+        """
+        初始化会话目录
+
+        参数:
+            sessions_dir (str): 会话目录，清单保存在该目录中，数据块保存在其中的objects目录
+            chunk_target (int): 数据块的平均记录数
+            max_chunk_records (int): 数据块的最大记录数
+        """
+        self.sessions_dir = sessions_dir
+        self.objects_dir = os.path.join(sessions_dir, self.OBJECTS_DIR)
+        self.chunk_target = chunk_target
+        self.max_chunk_records = max_chunk_records
+
+    def _object_path(self, digest):
+        """数据块文件路径，按哈希前两位分目录"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_object(self, content):
+        """
+        保存一个数据块，已存在时只更新修改时间（避免被同时进行的垃圾回收删除）
+
+        返回:
+            tuple: (哈希, 是否新写入)
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        try:
+            os.utime(path)
+            return digest, False
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(zlib.compress(content, 6))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return digest, True
+
+    def _get_object(self, digest):
+        """读取数据块并校验哈希，损坏的数据块被删除，之后保存相同内容时重新写入"""
+        path = self._object_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise ValueError(f"无法读取会话数据块 {digest}: {e}")
+        try:
+            content = zlib.decompress(data)
+        except zlib.error:
+            content = None
+        if content is None or hashlib.sha256(content).hexdigest() != digest:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise ValueError(f"会话数据块 {digest} 已损坏")
+        return content
+
+    def _chunk_lines(self, records):
+        """把记录序列化为JSON行，按内容决定的边界分组，生成每个数据块的(内容, 记录数)"""
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        lines = []
+        for record in records:
+            line = (encoder.encode(record) + '\n').encode('utf-8')
+            lines.append(line)
+            if zlib.crc32(line) % self.chunk_target == 0 or len(lines) >= self.max_chunk_records:
+                yield b''.join(lines), len(lines)
+                lines = []
+        if lines:
+            yield b''.join(lines), len(lines)
+
+    def save(self, records, metadata=None, manifest_path=None):
+        """
+        保存一个会话：写入新的数据块，然后写入清单
+
+        参数:
+            records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组，模块在连接之前
+            metadata (dict or None): 元数据
+            manifest_path (str or None): 清单路径，为None时在会话目录中以时间戳命名
+
+        返回:
+            str: 清单路径
+        """
+        if manifest_path is None:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            manifest_path = os.path.join(self.sessions_dir, f"collection_{timestamp}{MANIFEST_EXTENSION}")
+        sections = {section: [] for section in SECTIONS}
+        module_infos = []
+        new_objects = 0
+
+        def add_chunks(section, section_records):
+            nonlocal new_objects
+            for content, count in self._chunk_lines(section_records):
+                digest, is_new = self._put_object(content)
+                sections[section].append([digest, count])
+                new_objects += is_new
+
+        def connection_records():
+            for key, record in records:
+                if key == 'modules':
+                    module_infos.append(record)
+                elif key == 'connections':
+                    yield record
+
+        # 连接按名称保存（不依赖模块的位置），模块记录收集后转换为定义和引用定义的实例
+        add_chunks('connections', connection_records())
+        normalized = {'definitions': [], 'modules': []}
+        for key, record in normalize_records(('modules', module_info) for module_info in module_infos):
+            normalized[key].append(record)
+        add_chunks('definitions', normalized['definitions'])
+        add_chunks('modules', normalized['modules'])
+
+        manifest = {
+            'format': MANIFEST_FORMAT,
+            'version': 1,
+            'save_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'metadata': metadata or {},
+            'new_objects': new_objects,
+            'sections': sections
+        }
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, manifest_path)
+        return manifest_path
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        """
+        读取会话清单
+
+        返回:
+            dict: 清单内容
+
+        异常:
+            ValueError: 不是会话清单或格式错误
+        """
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"无法读取会话清单 {manifest_path}: {e}")
+        if not isinstance(manifest, dict) or manifest.get('format') != MANIFEST_FORMAT:
+            raise ValueError(f"不是会话清单: {manifest_path}")
+        return manifest
+
+    def iter_records(self, manifest_path, progress_callback=None):
+        """
+        按清单逐个读取数据块，生成 ('definitions'/'modules'/'connections', 记录) 元组
+
+        参数:
+            manifest_path (str): 会话清单路径
+            progress_callback (callable or None): progress_callback(已读取的数据块数, 数据块总数)
+        """
+        manifest = self.read_manifest(manifest_path)
+        chunks = [(section, digest) for section in SECTIONS for digest, _ in manifest['sections'].get(section, [])]
+        for done, (section, digest) in enumerate(chunks, 1):
+            for line in self._get_object(digest).decode('utf-8').splitlines():
+                yield section, json.loads(line)
+            if progress_callback is not None:
+                progress_callback(done, len(chunks))
+
+    def load(self, manifest_path, progress_callback=None):
+        """
+        加载会话清单对应的数据库
+
+        参数:
+            manifest_path (str): 会话清单路径
+            progress_callback (callable or None): progress_callback(已读取的数据块数, 数据块总数)
+
+        返回:
+            VerilogModuleCollection: 重建的模块集合对象
+
+        异常:
+            ValueError: 清单格式错误或数据块缺失、损坏
+        """
+        return VerilogModuleCollection.from_records(self.iter_records(manifest_path, progress_callback))
+
+    def list_sessions(self):
+        """
+        按保存时间从旧到新列出会话目录中的会话（会话清单和旧版本的完整collection_*.json文件）
+
+        返回:
+            list[str]: 会话文件路径
+        """
+        sessions = []
+        try:
+            names = os.listdir(self.sessions_dir)
+        except OSError:
+            return []
+        for name in names:
+            path = os.path.join(self.sessions_dir, name)
+            if name.startswith("collection_") and (name.endswith(MANIFEST_EXTENSION) or name.endswith(".json")):
+                try:
+                    sessions.append((os.path.getmtime(path), name, path))
+                except OSError:
+                    continue
+        return [path for _, _, path in sorted(sessions)]
+
+    def apply_retention(self, keep_last=50, keep_days=14, protected=(), now=None):
+        """
+        按保留策略删除旧会话：保留最近keep_last个会话，以及最近keep_days天中每天的最后一个会话
+
+        参数:
+            keep_last (int): 保留的最近会话数
+            keep_days (int): 每天保留一个会话的天数
+            protected (iterable): 不删除的会话路径（例如会话日志的快照）
+            now (float or None): 当前时间（time.time），用于测试
+
+        返回:
+            SessionRetentionReport: 清理报告（只包含删除的会话）
+        """
+        report = SessionRetentionReport()
+        now = time.time() if now is None else now
+        protected = {os.path.abspath(path) for path in protected if path}
+        sessions = self.list_sessions()
+        keep = set(sessions[-keep_last:]) if keep_last > 0 else set()
+        daily = {}  # 日期 -> 当天最后一个会话
+        for path in sessions:
+            mtime = os.path.getmtime(path)
+            if now - mtime <= keep_days * 86400:
+                daily[datetime.date.fromtimestamp(mtime)] = path
+        keep.update(daily.values())
+        for path in sessions:
+            if path in keep or os.path.abspath(path) in protected:
+                report.kept_sessions += 1
+                continue
+            try:
+                report.freed_bytes += os.path.getsize(path)
+                os.remove(path)
+                report.removed_sessions.append(path)
+            except OSError:
+                report.kept_sessions += 1
+        return report
+
+    def collect_garbage(self, grace_seconds=3600, report=None, now=None):
+        """
+        删除不被任何会话清单引用的数据块
+
+        最近grace_seconds秒内写入或被引用过的数据块不删除，正在后台保存的会话在写入清单之前
+        不会丢失数据块。无法读取的清单中引用的数据块无法确定，此时不删除任何数据块。
+
+        参数:
+            grace_seconds (float): 保护期（秒）
+            report (SessionRetentionReport or None): 累加到已有的清理报告中
+            now (float or None): 当前时间（time.time），用于测试
+
+        返回:
+            SessionRetentionReport: 清理报告
+        """
+        report = report if report is not None else SessionRetentionReport()
+        now = time.time() if now is None else now
+        referenced = set()
+        for path in self.list_sessions():
+            if not path.endswith(MANIFEST_EXTENSION):
+                continue
+            try:
+                manifest = self.read_manifest(path)
+            except ValueError:
+                if os.path.exists(path):
+                    return report
+                continue  # 列出之后被删除
+            for section in SECTIONS:
+                referenced.update(digest for digest, _ in manifest['sections'].get(section, []))
+
+        if not os.path.isdir(self.objects_dir):
+            return report
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name in referenced:
+                    continue
+                path = os.path.join(prefix_dir, name)
+                try:
+                    if now - os.path.getmtime(path) < grace_seconds:
+                        continue
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+                report.removed_objects += 1
+                report.freed_bytes += size
+        return report
+
+    def get_disk_usage(self):
+        """
+        统计会话目录占用的空间
+
+        返回:
+            tuple: (会话文件字节数, 数据块字节数, 数据块个数)
+        """
+        session_bytes = sum(os.path.getsize(path) for path in self.list_sessions() if os.path.exists(path))
+        object_bytes = object_count = 0
+        for root, _, names in os.walk(self.objects_dir):
+            for name in names:
+                object_bytes += os.path.getsize(os.path.join(root, name))
+                object_count += 1
+        return session_bytes, object_bytes, object_count
@@ -0,0 +1,501 @@
+import json
+import os
+import sqlite3
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModuleCollection, VerilogPort
+    from .json_stream import iter_json_file
+    from .session_schema import denormalize_records
+except ImportError:
+    from verilog_models import VerilogModuleCollection, VerilogPort
+    from json_stream import iter_json_file
+    from session_schema import denormalize_records
+
+
+# SQLite数据库文件头，用于识别文件格式
+SQLITE_MAGIC = b'SQLite format 3\x00'
+# 用户保存时按扩展名选择SQLite格式
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    file_path TEXT NOT NULL DEFAULT '',
+    module_def_name TEXT NOT NULL DEFAULT '',
+    includes TEXT NOT NULL DEFAULT '[]',
+    top_module_name TEXT,
+    need_gen INTEGER NOT NULL DEFAULT 0,
+    parameters TEXT NOT NULL DEFAULT '{}',
+    file_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_modules_name ON modules(name);
+CREATE TABLE IF NOT EXISTS ports (
+    id INTEGER PRIMARY KEY,
+    module_id INTEGER NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    high INTEGER NOT NULL,
+    low INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ports_module_name ON ports(module_id, name);
+CREATE INDEX IF NOT EXISTS idx_ports_name ON ports(name);
+CREATE TABLE IF NOT EXISTS connections (
+    id INTEGER PRIMARY KEY,
+    source_port_id INTEGER NOT NULL REFERENCES ports(id) ON DELETE CASCADE,
+    dest_port_id INTEGER NOT NULL REFERENCES ports(id) ON DELETE CASCADE,
+    source_high INTEGER NOT NULL,
+    source_low INTEGER NOT NULL,
+    dest_high INTEGER NOT NULL,
+    dest_low INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_connections_source ON connections(source_port_id);
+CREATE INDEX IF NOT EXISTS idx_connections_dest ON connections(dest_port_id);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 按模块名和端口名查找端口ID，同名模块取最后一个（与VerilogModuleCollection.get_module一致），同名端口取第一个
+_PORT_ID = ("(SELECT p.id FROM ports p WHERE p.module_id = "
+            "(SELECT MAX(m.id) FROM modules m WHERE m.name = ?) AND p.name = ? ORDER BY p.id LIMIT 1)")
+
+_INSERT_CONNECTION = (f"INSERT INTO connections (source_port_id, dest_port_id, source_high, source_low, dest_high, dest_low) "
+                      f"SELECT s, d, ?, ?, ?, ? FROM (SELECT {_PORT_ID} AS s, {_PORT_ID} AS d) "
+                      f"WHERE s IS NOT NULL AND d IS NOT NULL")
+
+_SELECT_CONNECTIONS = """
+SELECT sm.name, sp.name, dm.name, dp.name, c.source_high, c.source_low, c.dest_high, c.dest_low
+FROM connections c
+JOIN ports sp ON sp.id = c.source_port_id JOIN modules sm ON sm.id = sp.module_id
+JOIN ports dp ON dp.id = c.dest_port_id JOIN modules dm ON dm.id = dp.module_id
+"""
+
+
+def is_sqlite_file(file_path):
+    """根据文件头判断文件是否为SQLite数据库"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def is_sqlite_path(file_path):
+    """根据扩展名判断保存路径是否使用SQLite格式"""
+    return file_path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+class SqliteCollectionStore:
+    """
+    SQLite数据库后端
+
+    把模块、端口和连接分别保存在三张表中，模块名、端口名和连接两端的端口都有索引。
+    连接和断开操作（record_connect等，与SessionJournal的接口相同）各自在一个单行事务中完成，
+    不需要重写整个文件。可以只加载部分模块（load_collection的module_names参数），
+    用open_modules打开的部分数据库保存时只同步加载的模块，
+    也可以不经过对象图直接与JSON文件互相导入导出。
+    """
+
+    def __init__(self, db_path):
+        """
+        打开（不存在时创建）SQLite数据库
+
+        参数:
+            db_path (str): 数据库文件路径
+        """
+        self.db_path = db_path
+        # 允许在后台线程中打开、在主线程中使用（同一时间只有一个线程使用）
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+        self.collection: VerilogModuleCollection = None  # 最近一次加载或保存的数据库，编辑操作写入本后端
+        # collection是open_modules部分加载的数据库时为请求加载的模块名，否则为None
+        self.loaded_modules: set[str] = None
+
+    def close(self):
+        """关闭数据库连接"""
+        self.connection.close()
+        self.collection = None
+        self.loaded_modules = None
+
+    def get_module_names(self):
+        """按保存顺序获取所有模块名称"""
+        return [row[0] for row in self.connection.execute("SELECT name FROM modules ORDER BY id")]
+
+    def count_records(self):
+        """
+        统计模块和连接记录数
+
+        返回:
+            tuple: (模块数, 连接数)
+        """
+        return (self.connection.execute("SELECT COUNT(*) FROM modules").fetchone()[0],
+                self.connection.execute("SELECT COUNT(*) FROM connections").fetchone()[0])
+
+    def get_metadata(self):
+        """获取保存时写入的元数据"""
+        return {key: json.loads(value) for key, value in self.connection.execute("SELECT key, value FROM metadata")}
+
+    def iter_records(self, module_names=None):
+        """
+        按iter_records格式逐条生成模块和连接记录，不构建对象图
+
+        参数:
+            module_names (iterable[str] or None): 只生成这些模块、与它们有连接的模块以及与它们相关的连接，None表示全部
+
+        返回:
+            generator: ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+        """
+        cursor = self.connection.cursor()
+        if module_names is None:
+            module_filter, connection_filter = "", ""
+        else:
+            # 临时表保存需要加载的模块ID，包括连接另一端的模块，使端口的连接关系完整
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS selected_modules (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.selected_modules")
+            cursor.executemany("INSERT OR IGNORE INTO temp.selected_modules SELECT id FROM modules WHERE name = ?",
+                               [(name,) for name in module_names])
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS selected_connections (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.selected_connections")
+            for column in ('source_port_id', 'dest_port_id'):
+                cursor.execute(f"INSERT OR IGNORE INTO temp.selected_connections SELECT c.id FROM connections c "
+                               f"JOIN ports p ON p.id = c.{column} "
+                               f"WHERE p.module_id IN (SELECT id FROM temp.selected_modules)")
+            for column in ('source_port_id', 'dest_port_id'):
+                cursor.execute(f"INSERT OR IGNORE INTO temp.selected_modules SELECT p.module_id FROM connections c "
+                               f"JOIN ports p ON p.id = c.{column} "
+                               f"WHERE c.id IN (SELECT id FROM temp.selected_connections)")
+            module_filter = "WHERE m.id IN (SELECT id FROM temp.selected_modules)"
+            connection_filter = "WHERE c.id IN (SELECT id FROM temp.selected_connections)"
+
+        # 模块和端口都按ID排序，合并两个查询结果，避免每个模块单独查询一次端口
+        ports = self.connection.execute(
+            f"SELECT p.module_id, p.name, p.direction, p.high, p.low FROM ports p "
+            f"JOIN modules m ON m.id = p.module_id {module_filter} ORDER BY p.module_id, p.id")
+        next_port = ports.fetchone()
+        for row in self.connection.execute(
+                f"SELECT m.id, m.name, m.file_path, m.module_def_name, m.includes, m.top_module_name, m.need_gen, "
+                f"m.parameters, m.file_hash FROM modules m {module_filter} ORDER BY m.id"):
+            module_id = row[0]
+            port_list = []
+            while next_port is not None and next_port[0] == module_id:
+                port_list.append({'name': next_port[1], 'direction': next_port[2],
+                                  'width': {'high': next_port[3], 'low': next_port[4]}})
+                next_port = ports.fetchone()
+            yield 'modules', {
+                'name': row[1],
+                'file_path': row[2],
+                'module_def_name': row[3],
+                'ports': port_list,
+                'includes': json.loads(row[4]),
+                'top_module_name': row[5],
+                'need_gen': bool(row[6]),
+                'parameters': json.loads(row[7]),
+                'file_hash': row[8]
+            }
+        for row in self.connection.execute(f"{_SELECT_CONNECTIONS} {connection_filter} ORDER BY c.id"):
+            yield 'connections', {
+                'source_module_name': row[0],
+                'source_port_name': row[1],
+                'dest_module_name': row[2],
+                'dest_port_name': row[3],
+                'source_bit_range': {'high': row[4], 'low': row[5]},
+                'dest_bit_range': {'high': row[6], 'low': row[7]}
+            }
+
+    def load_collection(self, module_names=None, progress_callback=None):
+        """
+        从数据库创建VerilogModuleCollection
+
+        参数:
+            module_names (iterable[str] or None): 只加载这些模块及与它们有连接的模块，None表示全部
+            progress_callback (callable or None): progress_callback(已处理记录数, 总记录数)，每1000条调用一次
+
+        返回:
+            VerilogModuleCollection: 加载的数据库；加载全部模块时，之后的编辑操作写入本后端
+        """
+        total = sum(self.count_records())
+
+        def records():
+            for count, record in enumerate(self.iter_records(module_names), 1):
+                yield record
+                if progress_callback is not None and count % 1000 == 0:
+                    progress_callback(count, total)
+
+        collection = VerilogModuleCollection.from_records(records())
+        if progress_callback is not None:
+            progress_callback(total, total)
+        if module_names is None:
+            self.collection = collection
+            self.loaded_modules = None
+        return collection
+
+    def open_modules(self, module_names, progress_callback=None):
+        """
+        只加载指定模块及与它们有连接的模块，之后的编辑操作和保存写入本后端
+
+        保存（save_collection）时只同步加载的模块及与请求的模块相关的连接，其他模块和连接保持不变，
+        适合只处理大型数据库中一部分模块的场景。
+
+        参数:
+            module_names (iterable[str]): 请求加载的模块名
+            progress_callback (callable or None): 同load_collection
+
+        返回:
+            VerilogModuleCollection: 部分加载的数据库
+        """
+        module_names = list(module_names)
+        collection = self.load_collection(module_names, progress_callback)
+        self.collection = collection
+        self.loaded_modules = set(module_names)
+        return collection
+
+    def save_collection(self, collection: VerilogModuleCollection, metadata=None):
+        """
+        在一个事务中用collection替换数据库的全部内容（批量操作后同步）
+
+        collection是open_modules部分加载的数据库时只同步加载的部分（见_save_partial）。
+
+        参数:
+            collection (VerilogModuleCollection): 要保存的数据库，之后的编辑操作写入本后端
+            metadata (dict or None): 元数据
+        """
+        if self.loaded_modules is not None and collection is self.collection:
+            self._save_partial(collection, metadata)
+            return
+        self.write_records(collection.iter_records(), metadata)
+        self.collection = collection
+        self.loaded_modules = None
+
+    def _save_partial(self, collection: VerilogModuleCollection, metadata=None):
+        """
+        在一个事务中把部分加载的数据库同步到SQLite
+
+        - 模块：更新字段，includes和top_module中未加载的模块名保留数据库中的值；新模块直接插入
+        - 端口：同名端口保留ID并更新方向和位宽（未加载模块与它的连接不受影响），删除已不存在的端口，追加新端口
+        - 连接：与请求的模块（和新模块）相关的连接在对象图中是完整的，整体替换；
+          其他连接（相邻模块之间新建的连接）替换同一对端口的旧记录
+        """
+        loaded_names = {module.name for module in collection.modules}
+        scoped = set(self.loaded_modules)
+        failed = 0
+        with self.connection:
+            cursor = self.connection.cursor()
+            for module in collection.modules:
+                include_names = [included.name for included in module.includes]
+                top_name = module.top_module.name if module.top_module is not None else None
+                row = cursor.execute("SELECT id, includes, top_module_name FROM modules WHERE name = ? "
+                                     "ORDER BY id DESC LIMIT 1", (module.name,)).fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO modules (name, file_path, module_def_name, includes, top_module_name, "
+                                   "need_gen, parameters, file_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (module.name, module.file_path, module.module_def_name, json.dumps(include_names),
+                                    top_name, int(bool(module.need_gen)), json.dumps(module.parameters or {}),
+                                    module.file_hash))
+                    module_id = cursor.lastrowid
+                    # 新模块的所有连接都在对象图中
+                    scoped.add(module.name)
+                    db_ports = []
+                else:
+                    module_id, db_includes, db_top = row
+                    db_includes = json.loads(db_includes)
+                    includes = ([name for name in db_includes if name not in loaded_names or name in include_names]
+                                + [name for name in include_names if name not in db_includes])
+                    if top_name is None and db_top not in loaded_names:
+                        top_name = db_top
+                    cursor.execute("UPDATE modules SET file_path = ?, module_def_name = ?, includes = ?, "
+                                   "top_module_name = ?, need_gen = ?, parameters = ?, file_hash = ? WHERE id = ?",
+                                   (module.file_path, module.module_def_name, json.dumps(includes), top_name,
+                                    int(bool(module.need_gen)), json.dumps(module.parameters or {}),
+                                    module.file_hash, module_id))
+                    db_ports = cursor.execute("SELECT id, name FROM ports WHERE module_id = ? ORDER BY id",
+                                              (module_id,)).fetchall()
+
+                # 按 (端口名, 同名端口中的序号) 对应数据库中的端口
+                db_port_ids = {}
+                counts = {}
+                for port_id, name in db_ports:
+                    counts[name] = counts.get(name, 0) + 1
+                    db_port_ids[(name, counts[name])] = port_id
+                counts = {}
+                for port in module.ports:
+                    counts[port.name] = counts.get(port.name, 0) + 1
+                    port_id = db_port_ids.pop((port.name, counts[port.name]), None)
+                    if port_id is None:
+                        cursor.execute("INSERT INTO ports (module_id, name, direction, high, low) VALUES (?, ?, ?, ?, ?)",
+                                       (module_id, port.name, port.direction.lower(), port.width['high'],
+                                        port.width['low']))
+                    else:
+                        cursor.execute("UPDATE ports SET direction = ?, high = ?, low = ? WHERE id = ?",
+                                       (port.direction.lower(), port.width['high'], port.width['low'], port_id))
+                cursor.executemany("DELETE FROM ports WHERE id = ?", [(port_id,) for port_id in db_port_ids.values()])
+
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS scoped_modules (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.scoped_modules")
+            cursor.executemany("INSERT OR IGNORE INTO temp.scoped_modules SELECT id FROM modules WHERE name = ?",
+                               [(name,) for name in scoped])
+            for column in ('source_port_id', 'dest_port_id'):
+                cursor.execute(f"DELETE FROM connections WHERE {column} IN (SELECT p.id FROM ports p "
+                               f"WHERE p.module_id IN (SELECT id FROM temp.scoped_modules))")
+            connection_rows, other_rows = [], []
+            for conn in collection.connections:
+                row = self._connection_row({
+                    'source_module_name': conn.source_module_name, 'source_port_name': conn.source_port.name,
+                    'dest_module_name': conn.dest_module_name, 'dest_port_name': conn.dest_port.name,
+                    'source_bit_range': conn.source_bit_range, 'dest_bit_range': conn.dest_bit_range})
+                if conn.source_module_name in scoped or conn.dest_module_name in scoped:
+                    connection_rows.append(row)
+                else:
+                    other_rows.append(row)
+            cursor.executemany(f"DELETE FROM connections WHERE source_port_id = {_PORT_ID} AND dest_port_id = {_PORT_ID}",
+                               [row[4:] for row in other_rows])
+            before = self.connection.total_changes
+            cursor.executemany(_INSERT_CONNECTION, connection_rows + other_rows)
+            failed = len(connection_rows) + len(other_rows) - (self.connection.total_changes - before)
+            cursor.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                               [(key, json.dumps(value)) for key, value in (metadata or {}).items()])
+        if failed:
+            print(f"警告: {failed} 个连接的端口不存在，未保存到SQLite数据库")
+
+    def write_records(self, records, metadata=None):
+        """
+        在一个事务中用记录流替换数据库的全部内容
+
+        参数:
+            records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组，模块在连接之前
+            metadata (dict or None): 元数据
+
+        返回:
+            int: 两端端口不存在而无法保存的连接数
+        """
+        failed = 0
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute("DELETE FROM connections")
+            cursor.execute("DELETE FROM ports")
+            cursor.execute("DELETE FROM modules")
+            cursor.execute("DELETE FROM metadata")
+            module_rows, port_rows, connection_rows = [], [], []
+            module_id, port_id = 0, 0
+
+            def flush():
+                nonlocal failed
+                cursor.executemany("INSERT INTO modules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", module_rows)
+                cursor.executemany("INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?)", port_rows)
+                before = self.connection.total_changes
+                cursor.executemany(_INSERT_CONNECTION, connection_rows)
+                failed += len(connection_rows) - (self.connection.total_changes - before)
+                module_rows.clear()
+                port_rows.clear()
+                connection_rows.clear()
+
+            for key, record in records:
+                if key == 'modules':
+                    module_id += 1
+                    module_rows.append((module_id, record['name'], record.get('file_path', ''),
+                                        record.get('module_def_name', ''), json.dumps(record.get('includes', [])),
+                                        record.get('top_module_name'), int(bool(record.get('need_gen', False))),
+                                        json.dumps(record.get('parameters') or {}), record.get('file_hash')))
+                    for port_info in record.get('ports', []):
+                        port_id += 1
+                        width = port_info.get('width') or {'high': 0, 'low': 0}
+                        port_rows.append((port_id, module_id, port_info['name'], port_info['direction'].lower(),
+                                          width['high'], width['low']))
+                elif key == 'connections':
+                    connection_rows.append(self._connection_row(record))
+                if len(module_rows) + len(port_rows) + len(connection_rows) >= 10000:
+                    flush()
+            flush()
+            cursor.executemany("INSERT INTO metadata VALUES (?, ?)",
+                               [(key, json.dumps(value)) for key, value in (metadata or {}).items()])
+        if failed:
+            print(f"警告: {failed} 个连接的端口不存在，未保存到SQLite数据库")
+        return failed
+
+    @staticmethod
+    def _connection_row(conn_info):
+        """连接字典转换为_INSERT_CONNECTION的参数"""
+        source_bit_range = conn_info.get('source_bit_range')
+        dest_bit_range = conn_info.get('dest_bit_range')
+        if not source_bit_range or not dest_bit_range:
+            raise ValueError(f"连接缺少位范围: {conn_info['source_module_name']}.{conn_info['source_port_name']}")
+        return (source_bit_range['high'], source_bit_range['low'], dest_bit_range['high'], dest_bit_range['low'],
+                conn_info['source_module_name'], conn_info['source_port_name'],
+                conn_info['dest_module_name'], conn_info['dest_port_name'])
+
+    def import_json(self, json_path):
+        """
+        把JSON数据库文件流式导入本数据库（替换全部内容），不构建对象图
+
+        返回:
+            int: 两端端口不存在而无法导入的连接数
+        """
+        metadata = {}
+
+        def records():
+            for key, value, is_item in iter_json_file(json_path):
+                if is_item:
+                    yield key, value
+                elif key == 'metadata' and isinstance(value, dict):
+                    metadata.update(value)
+
+        # 元数据在文件末尾，读取完所有记录后再写入
+        failed = self.write_records(denormalize_records(records()))
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                                        [(key, json.dumps(value)) for key, value in metadata.items()])
+        return failed
+
+    def export_json(self, json_path, compact=False):
+        """把本数据库流式导出为JSON数据库文件，不构建对象图"""
+        with open(json_path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+            VerilogModuleCollection.write_records(f, self.iter_records(), self.get_metadata(), compact)
+
+    def record_connect(self, source_port: VerilogPort, dest_port: VerilogPort, source_bit_range=None,
+                       dest_bit_range=None):
+        """在单行事务中保存一个连接"""
+        source_bit_range = source_bit_range or source_port.width
+        dest_bit_range = dest_bit_range or dest_port.width
+        with self.connection:
+            cursor = self.connection.execute(_INSERT_CONNECTION, self._connection_row({
+                'source_module_name': source_port.father_module.name, 'source_port_name': source_port.name,
+                'dest_module_name': dest_port.father_module.name, 'dest_port_name': dest_port.name,
+                'source_bit_range': source_bit_range, 'dest_bit_range': dest_bit_range}))
+        if cursor.rowcount != 1:
+            raise ValueError(f"SQLite数据库中不存在端口 {source_port.father_module.name}.{source_port.name} "
+                             f"或 {dest_port.father_module.name}.{dest_port.name}")
+
+    def record_disconnect_source(self, source_port: VerilogPort):
+        """在单个事务中删除输出端口的所有连接"""
+        with self.connection:
+            self.connection.execute(f"DELETE FROM connections WHERE source_port_id = {_PORT_ID}",
+                                    (source_port.father_module.name, source_port.name))
+
+    def record_disconnect_dest(self, dest_port: VerilogPort):
+        """在单个事务中删除输入端口的连接"""
+        with self.connection:
+            self.connection.execute(f"DELETE FROM connections WHERE dest_port_id = {_PORT_ID}",
+                                    (dest_port.father_module.name, dest_port.name))
+
+
+def write_sqlite_file(file_path, records, metadata=None):
+    """
+    把记录流写入新的SQLite数据库文件：先写临时文件再替换，写入过程中退出时不会留下不完整的数据库
+
+    参数:
+        file_path (str): 数据库文件路径
+        records (iterable): ('modules', 模块字典) 和 ('connections', 连接字典) 元组
+        metadata (dict or None): 元数据
+    """
+    temp_path = f"{file_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    store = SqliteCollectionStore(temp_path)
+    try:
+        store.write_records(records, metadata)
+    finally:
+        store.close()
+    os.replace(temp_path, file_path)
@@ -0,0 +1,109 @@
+import sys
+import os
+import tempfile
+from verilog_models import VerilogModule, VerilogPort, VerilogModuleCollection
+from json_stream import iter_json_file
+from collection_diff import iter_diff, summarize_diff
+from collection_merge import merge_collections
+
+
+def _build_collection():
+    collection = VerilogModuleCollection()
+    src = VerilogModule(name="u_src", file_path="src.v", module_def_name="src")
+    src.add_port(VerilogPort(name="data_out", direction="output", width={'high': 7, 'low': 0}))
+    src.add_port(VerilogPort(name="valid", direction="output"))
+    dst = VerilogModule(name="u_dst", file_path="dst.v", module_def_name="dst")
+    dst.add_port(VerilogPort(name="data_in", direction="input", width={'high': 7, 'low': 0}))
+    dst.add_port(VerilogPort(name="valid_in", direction="input"))
+    collection.add_module(src)
+    collection.add_module(dst)
+    collection.add_connection("u_src", "data_out", "u_dst", "data_in")
+    return collection
+
+
+# 测试流式读取器在极小缓冲区下也能完整读出数组元素
+def test_json_stream_small_chunks():
+    print("开始测试JSON流式读取...")
+    collection = _build_collection()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "collection.json")
+        assert collection.save_to_file(file_path, {'version': 'test'})
+
+        items = list(iter_json_file(file_path, chunk_size=7))
+        modules = [value for key, value, is_item in items if key == 'modules']
+        connections = [value for key, value, is_item in items if key == 'connections']
+        metadata = [value for key, value, is_item in items if key == 'metadata']
+
+        assert [m['name'] for m in modules] == ["u_src", "u_dst"], "流式读取的模块错误"
+        assert connections == collection.to_dict()['connections'], "流式读取的连接错误"
+        assert metadata[0]['version'] == 'test', "流式读取的元数据错误"
+
+    print("✓ JSON流式读取测试通过!")
+
+
+# 测试集合与文件之间的结构差异比较
+def test_diff_collection_against_file():
+    print("\n开始测试数据库差异比较...")
+    old_collection = _build_collection()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        old_path = os.path.join(tmp_dir, "old.json")
+        old_collection.save_to_file(old_path)
+
+        new_collection = _build_collection()
+        new_collection.remove_connection("u_src", "data_out", "u_dst", "data_in")
+        new_collection.add_connection("u_src", "valid", "u_dst", "valid_in")
+        new_collection.get_module("u_dst").get_port("data_in").width = {'high': 15, 'low': 0}
+        new_module = VerilogModule(name="u_new", module_def_name="new")
+        new_collection.add_module(new_module)
+
+        assert summarize_diff(iter_diff(old_collection, old_path)) == {}, "相同数据库不应有差异"
+
+        records = list(iter_diff(old_path, new_collection))
+        summary = summarize_diff(records)
+        print(f"差异统计: {summary}")
+        assert summary == {'module_added': 1, 'port_changed': 1, 'connection_added': 1, 'connection_removed': 1}, \
+            f"差异统计错误: {summary}"
+        removed = [r for r in records if r['type'] == 'connection_removed'][0]
+        assert removed['source'] == "u_src.data_out[7:0]" and removed['dest'] == "u_dst.data_in[7:0]"
+
+    print("✓ 数据库差异比较测试通过!")
+
+
+# 测试三方合并：不同端口的修改自动合并，同一端口的不同驱动产生冲突
+def test_three_way_merge():
+    print("\n开始测试三方合并...")
+    base = _build_collection()
+    base.get_module("u_src").add_port(VerilogPort(name="aux_out", direction="output"))
+    base.get_module("u_dst").add_port(VerilogPort(name="aux_in", direction="input"))
+
+    ours = VerilogModuleCollection.from_dict(base.to_dict())
+    theirs = VerilogModuleCollection.from_dict(base.to_dict())
+
+    # ours 连接 valid_in，theirs 删除 data_in 的连接；双方对 aux_in 使用不同的驱动
+    ours.add_connection("u_src", "valid", "u_dst", "valid_in")
+    theirs.remove_connection("u_src", "data_out", "u_dst", "data_in")
+    ours.add_connection("u_src", "valid", "u_dst", "aux_in")
+    theirs.add_connection("u_src", "aux_out", "u_dst", "aux_in")
+
+    result = merge_collections(base, ours, theirs)
+    print(result.get_summary())
+
+    connection_strs = sorted(str(conn) for conn in result.collection.connections)
+    assert connection_strs == ["u_src.valid -> u_dst.aux_in", "u_src.valid -> u_dst.valid_in"], \
+        f"合并后的连接错误: {connection_strs}"
+    assert len(result.conflicts) == 1 and result.conflicts[0].dest == ("u_dst", "aux_in"), "冲突记录错误"
+    assert result.taken_from_theirs == 1, "采用theirs修改的数量错误"
+
+    print("✓ 三方合并测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_json_stream_small_chunks()
+        test_diff_collection_against_file()
+        test_three_way_merge()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,296 @@
+import os
+import sys
+import tempfile
+import time
+from verilog_models import VerilogModule, VerilogPort, VerilogModuleCollection
+from auto_connect import AutoConnectEngine, NameRule
+from interface_inference import InterfaceInference
+from port_similarity import PortSimilarityIndex, normalize_port_name, edit_distance
+from netlist_importer import NetlistImporter
+
+
+def _build_chain():
+    """构建 u_a -> u_b -> u_c 的链式连接，u_b 另有一个分支 u_d"""
+    collection = VerilogModuleCollection()
+    for name in ("u_a", "u_b", "u_c", "u_d"):
+        module = VerilogModule(name=name, module_def_name=name)
+        module.add_port(VerilogPort(name="din", direction="input", width={'high': 7, 'low': 0}))
+        module.add_port(VerilogPort(name="dout", direction="output", width={'high': 7, 'low': 0}))
+        collection.add_module(module)
+    collection.add_connection("u_a", "dout", "u_b", "din")
+    collection.add_connection("u_b", "dout", "u_c", "din")
+    collection.add_connection("u_b", "dout", "u_d", "din")
+    return collection
+
+
+# 测试扇出锥与扇入锥遍历，包括深度限制和模块过滤
+def test_cone_traversal():
+    print("开始测试扇出/扇入锥遍历...")
+    collection = _build_chain()
+    start = collection.get_module("u_a").get_port("dout")
+
+    def names(cone):
+        return [(depth, f"{port.father_module.name}.{port.name}") for depth, port in cone]
+
+    fanout = names(collection.get_fanout_cone(start))
+    assert fanout == [(1, "u_b.din"), (1, "u_b.dout"), (2, "u_c.din"), (2, "u_c.dout"), (2, "u_d.din"), (2, "u_d.dout")], \
+        f"扇出锥错误: {fanout}"
+    assert names(collection.get_fanout_cone(start, max_depth=1)) == [(1, "u_b.din"), (1, "u_b.dout")], "深度限制错误"
+    filtered = names(collection.get_fanout_cone(start, module_filter={"u_b", "u_c"}))
+    assert (2, "u_d.din") not in filtered and (2, "u_c.dout") in filtered, f"模块过滤错误: {filtered}"
+
+    fanin = names(collection.get_fanin_cone(collection.get_module("u_c").get_port("din")))
+    assert fanin == [(1, "u_b.dout"), (1, "u_b.din"), (2, "u_a.dout"), (2, "u_a.din")], f"扇入锥错误: {fanin}"
+
+    print("✓ 扇出/扇入锥遍历测试通过!")
+
+
+# 测试按名称规则自动连接、位宽校验和事务回滚
+def test_auto_connect():
+    print("\n开始测试按名称自动连接...")
+    collection = VerilogModuleCollection()
+    master = VerilogModule(name="u_master", module_def_name="axi_master")
+    slave = VerilogModule(name="u_slave", module_def_name="axi_slave")
+    for name, width in (("m_axi_awvalid", 0), ("m_axi_wdata", 31), ("m_axi_wstrb", 3), ("irq_o", 0), ("dbg", 0)):
+        master.add_port(VerilogPort(name=name, direction="output", width={'high': width, 'low': 0}))
+    for name, width in (("s_axi_awvalid", 0), ("s_axi_wdata", 31), ("s_axi_wstrb", 7), ("irq_i", 0)):
+        slave.add_port(VerilogPort(name=name, direction="input", width={'high': width, 'low': 0}))
+    collection.add_module(master)
+    collection.add_module(slave)
+
+    rules = NameRule.parse_rules("exact; prefix m_axi_ s_axi_; regex (.*)_o \\1_i")
+    engine = AutoConnectEngine(collection)
+    plan = engine.plan([master], [slave], rules)
+    print(plan.get_summary())
+    pairs = [(s.name, d.name) for s, d, _ in plan.matches]
+    assert pairs == [("m_axi_awvalid", "s_axi_awvalid"), ("m_axi_wdata", "s_axi_wdata"), ("irq_o", "irq_i")], f"匹配错误: {pairs}"
+    assert len(plan.width_mismatches) == 1 and plan.unmatched == ["u_master.dbg"], "位宽校验或未匹配端口错误"
+    assert collection.connections == [], "预览不应修改数据库"
+
+    # 预览生成后目标端口被其他连接驱动，apply失败时整批撤销
+    collection.connect_port(master.get_port("dbg"), slave.get_port("irq_i"))
+    try:
+        engine.apply(plan)
+        assert False, "目标端口已有驱动时应抛出异常"
+    except ValueError:
+        pass
+    assert len(collection.connections) == 1 and slave.get_port("s_axi_awvalid").source is None, "回滚失败"
+    assert master.get_port("m_axi_awvalid").destinations == [], "回滚后destinations应恢复"
+
+    collection.remove_slave_port_connection(slave.get_port("irq_i"))
+    created = engine.apply(engine.plan([master], [slave], rules))
+    assert len(created) == 3 and slave.get_port("irq_i").source is master.get_port("irq_o"), "应用连接错误"
+
+    # 10万端口的匹配（耗时只打印，不作为断言，避免在负载较高的机器上误报）
+    big = VerilogModuleCollection()
+    big_master = VerilogModule(name="big_master")
+    big_slave = VerilogModule(name="big_slave")
+    for i in range(100000):
+        big_master.add_port(VerilogPort(name=f"m_sig{i}", direction="output"))
+        big_slave.add_port(VerilogPort(name=f"s_sig{i}", direction="input"))
+    big.add_module(big_master)
+    big.add_module(big_slave)
+    start = time.perf_counter()
+    big_plan = AutoConnectEngine(big).plan([big_master], [big_slave], [NameRule("prefix", "m_", "s_")])
+    elapsed = time.perf_counter() - start
+    print(f"  10万端口匹配耗时 {elapsed:.3f}s")
+    assert len(big_plan.matches) == 100000, "大规模匹配结果错误"
+
+    print("✓ 按名称自动连接测试通过!")
+
+
+# 测试总线接口推断、按模块定义缓存以及接口级连接
+def test_interface_connect():
+    print("\n开始测试总线接口推断与接口连接...")
+    collection = VerilogModuleCollection()
+    master_ports = (("clk", "input"), ("m_axi_awvalid", "output"), ("m_axi_awready", "input"),
+                    ("m_axi_wdata", "output"), ("m_apb_psel", "output"), ("m_apb_pready", "input"))
+    slave_ports = (("clk", "input"), ("s_axi_awvalid", "input"), ("s_axi_awready", "output"), ("s_axi_wdata", "input"))
+    for name, def_name, ports in (("u_dma0", "dma", master_ports), ("u_dma1", "dma", master_ports),
+                                  ("u_mem", "mem", slave_ports)):
+        module = VerilogModule(name=name, module_def_name=def_name)
+        for port_name, direction in ports:
+            module.add_port(VerilogPort(name=port_name, direction=direction))
+        collection.add_module(module)
+
+    inference = InterfaceInference()
+    interfaces = inference.infer(collection.get_module("u_dma0"))
+    assert [i.prefix for i in interfaces] == ["m_axi", "m_apb"], f"接口推断错误: {[i.prefix for i in interfaces]}"
+    assert sorted(interfaces[0].get_signals()) == ["awready", "awvalid", "wdata"], "接口信号错误"
+
+    # 同一模块定义的第二个实例直接使用缓存
+    layout = inference._cache["dma"]
+    interfaces_1 = inference.infer(collection.get_module("u_dma1"))
+    assert inference._cache["dma"] is layout and interfaces_1[0].ports[0].father_module.name == "u_dma1", "缓存错误"
+
+    mem = collection.get_module("u_mem")
+    target = inference.find_matching_interface(interfaces[0], mem)
+    assert target is not None and target.prefix == "s_axi", "匹配接口错误"
+    plan = inference.plan_connect(interfaces[0], target)
+    created = AutoConnectEngine(collection).apply(plan)
+    assert len(created) == 3, f"接口连接数量错误: {len(created)}"
+    assert mem.get_port("s_axi_awvalid").source.name == "m_axi_awvalid", "正向信号连接错误"
+    assert collection.get_module("u_dma0").get_port("m_axi_awready").source is mem.get_port("s_axi_awready"), \
+        "反向握手信号连接错误"
+
+    print("✓ 总线接口推断与接口连接测试通过!")
+
+
+# 测试广播连接：试运行计数、跳过已驱动和位宽不一致的端口、大规模扇出
+def test_broadcast_connect():
+    print("\n开始测试广播连接...")
+    collection = VerilogModuleCollection()
+    crg = VerilogModule(name="u_crg")
+    crg.add_port(VerilogPort(name="clk_out", direction="output"))
+    crg.add_port(VerilogPort(name="other_clk", direction="output"))
+    collection.add_module(crg)
+    for i in range(3):
+        module = VerilogModule(name=f"u_ip{i}")
+        module.add_port(VerilogPort(name="clk", direction="input"))
+        module.add_port(VerilogPort(name="clk_div", direction="input", width={'high': i, 'low': 0}))
+        module.add_port(VerilogPort(name="data", direction="input"))
+        collection.add_module(module)
+    collection.connect_port(crg.get_port("other_clk"), collection.get_module("u_ip2").get_port("clk"))
+
+    engine = AutoConnectEngine(collection)
+    plan = engine.plan_broadcast(crg.get_port("clk_out"), "clk*")
+    assert len(plan.matches) == 3, f"试运行连接数量错误: {len(plan.matches)}"
+    assert len(plan.already_driven) == 1 and len(plan.width_mismatches) == 2, "已驱动或位宽不一致端口统计错误"
+    assert len(collection.connections) == 1, "试运行不应修改数据库"
+
+    scoped = engine.plan_broadcast(crg.get_port("clk_out"), "clk", [collection.get_module("u_ip0")])
+    assert len(scoped.matches) == 1, "指定模块范围的广播错误"
+
+    engine.apply(plan)
+    assert len(crg.get_port("clk_out").destinations) == 3, "广播连接错误"
+
+    # 10万个目标端口的广播连接（耗时只打印，不作为断言）
+    big = VerilogModuleCollection()
+    source_module = VerilogModule(name="u_src")
+    source_module.add_port(VerilogPort(name="rst_n", direction="output"))
+    big.add_module(source_module)
+    for i in range(20000):
+        module = VerilogModule(name=f"u_sink{i}", module_def_name="sink")
+        for j in range(5):
+            module.add_port(VerilogPort(name=f"rst_n{j}", direction="input"))
+        module.add_port(VerilogPort(name="data", direction="input"))
+        big.add_module(module)
+    start = time.perf_counter()
+    big_engine = AutoConnectEngine(big)
+    created = big_engine.apply(big_engine.plan_broadcast(source_module.get_port("rst_n"), "rst_n*"))
+    elapsed = time.perf_counter() - start
+    print(f"  10万个目标端口广播连接耗时 {elapsed:.3f}s")
+    assert len(created) == 100000 and len(source_module.get_port("rst_n").destinations) == 100000, "大规模广播连接错误"
+
+    print("✓ 广播连接测试通过!")
+
+
+# 测试相似端口推荐：名称归一化、编辑距离、方向与位宽过滤
+def test_port_similarity():
+    print("\n开始测试相似端口推荐...")
+    assert normalize_port_name("R_Data") == normalize_port_name("rdata_o") == "rdata", "端口名归一化错误"
+    assert normalize_port_name("clk_i") == "clk", "端口名归一化错误"
+    assert edit_distance("kitten", "sitting") == 3 and edit_distance("", "abc") == 3, "编辑距离错误"
+
+    collection = VerilogModuleCollection()
+    master = VerilogModule(name="u_master")
+    master.add_port(VerilogPort(name="rdata", direction="output", width={'high': 31, 'low': 0}))
+    master.add_port(VerilogPort(name="clk_o", direction="output"))
+    slave = VerilogModule(name="u_slave")
+    for name, direction, width in (("rd_data", "input", 31), ("rd_date", "input", 31), ("rd_data16", "input", 15),
+                                   ("wr_data", "output", 31), ("clk", "input", 0), ("bclk_i", "input", 0)):
+        slave.add_port(VerilogPort(name=name, direction=direction, width={'high': width, 'low': 0}))
+    collection.add_module(master)
+    collection.add_module(slave)
+
+    index = PortSimilarityIndex(collection)
+    names = [(distance, port.name) for distance, port in index.suggest(master.get_port("rdata"), k=5)]
+    assert names == [(1, "rd_data"), (2, "rd_date")], f"推荐结果错误: {names}"
+    names = [(distance, port.name) for distance, port in index.suggest(master.get_port("clk_o"), k=1)]
+    assert names == [(0, "clk")], f"推荐结果错误: {names}"
+
+    collection.connect_port(master.get_port("clk_o"), slave.get_port("clk"))
+    names = [port.name for _, port in index.suggest(master.get_port("clk_o"), k=1)]
+    assert names == ["bclk_i"], f"已连接端口不应被推荐: {names}"
+    assert index.is_current(collection), "端口数未变化时索引不应过期"
+    slave.add_port(VerilogPort(name="clk2", direction="input"))
+    assert not index.is_current(collection), "新增端口后索引应过期"
+
+    print("✓ 相似端口推荐测试通过!")
+
+
+# 测试从顶层网表导入连接：位选择、线网别名、常量和无法解析的表达式
+def test_netlist_import():
+    print("\n开始测试网表导入...")
+    collection = VerilogModuleCollection()
+    for name, ports in (("u_a", (("dout", "output", 7), ("flag", "output", 0))),
+                        ("u_b", (("din", "input", 3), ("en", "input", 0), ("mode", "input", 0))),
+                        ("u_c", (("din", "input", 7), ("sel", "input", 1))),
+                        ("u_e", (("a", "input", 7), ("b", "input", 0), ("c", "input", 0)))):
+        module = VerilogModule(name=name)
+        for port_name, direction, width in ports:
+            module.add_port(VerilogPort(name=port_name, direction=direction, width={'high': width, 'low': 0}))
+        collection.add_module(module)
+
+    netlist = """
+    // 顶层网表
+    module top (input clk, output [7:0] out);
+      wire [15:8] w_data;  /* 声明位宽与驱动端口不同 */
+      wire w_flag, w_flag_alias;
+      assign w_flag_alias = w_flag;
+      block_a u_a (.dout(w_data), .flag(w_flag));
+      block_b #(.W(4)) u_b (
+        .din (w_data[15:12]),   // 高4位
+        .en  (w_flag_alias),
+        .mode(1'b0)
+      );
+      block_c u_c (.din(w_data), .sel({w_flag, w_flag}));
+      block_d u_d (.x(w_data));
+      block_e u_e (.a(f(w_data)), .b((w_flag)), .c(w_flag));
+    endmodule
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        netlist_path = os.path.join(temp_dir, "top.v")
+        with open(netlist_path, "w", encoding="utf-8") as f:
+            f.write(netlist)
+        importer = NetlistImporter(collection)
+        report = importer.scan(netlist_path, chunk_size=16)
+        print(report.get_summary())
+        assert collection.connections == [], "scan不应修改数据库"
+        importer.apply(report)
+
+        # 已有驱动在apply时按数据库的当前状态检查：扫描之后删除的连接会重新创建
+        importer = NetlistImporter(collection)
+        rescan = importer.scan(netlist_path)
+        collection.remove_slave_port_connection(collection.get_module("u_b").get_port("din"))
+        importer.apply(rescan)
+        assert len(rescan.connections) == 1 and rescan.already_connected == 3, rescan.get_summary()
+
+    u_a, u_b, u_c = (collection.get_module(name) for name in ("u_a", "u_b", "u_c"))
+    assert len(collection.connections) == 4, f"连接数量错误: {len(collection.connections)}"
+    conn = next(c for c in collection.connections if c.dest_port is u_b.get_port("din"))
+    assert conn.source_bit_range == {'high': 7, 'low': 4}, f"位选择映射错误: {conn.source_bit_range}"
+    assert u_b.get_port("en").source is u_a.get_port("flag"), "assign别名未生效"
+    assert u_c.get_port("din").source is u_a.get_port("dout"), "整线网连接错误"
+    assert report.unknown_instances == ["block_d u_d"], "未知实例统计错误"
+    # 含括号的端口表达式也要列为无法解析，不能被跳过
+    assert report.unsupported == ["u_c.sel({w_flag, w_flag})", "u_e.a(f(w_data))", "u_e.b((w_flag))"], \
+        f"无法解析的表达式统计错误: {report.unsupported}"
+    assert collection.get_module("u_e").get_port("c").source is u_a.get_port("flag"), "括号表达式之后的连接丢失"
+
+    print("✓ 网表导入测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_cone_traversal()
+        test_auto_connect()
+        test_interface_connect()
+        test_broadcast_connect()
+        test_port_similarity()
+        test_netlist_import()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,194 @@
+import sys
+import os
+import tempfile
+import time
+from verilog_models import VerilogModule, VerilogModuleCollection
+from verilog_parser import VerilogPortParser
+from database_updater import DatabaseUpdater, DatabaseWatchService
+from verilog_preprocessor import VerilogPreprocessor
+from file_watcher import FileWatcher
+
+
+def _write_file(file_path, content):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _build_module(name, file_path):
+    parser = VerilogPortParser(file_path)
+    module = VerilogModule(name=name, file_path=file_path, module_def_name=parser.module_name)
+    module.add_ports(parser.get_all_ports())
+    module.file_hash = parser.file_hash
+    return module
+
+
+# 测试未变化的文件不会被重新解析
+def test_unchanged_files_are_skipped():
+    print("开始测试未变化文件的增量更新...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = os.path.join(tmp_dir, "src.v")
+        _write_file(src_path, "module src (input clk, output [7:0] data_out);\nendmodule\n")
+
+        collection = VerilogModuleCollection()
+        collection.add_module(_build_module("u_src", src_path))
+
+        report = DatabaseUpdater(collection).update()
+        assert report.changed_files == [], f"未变化的文件被重新解析: {report.changed_files}"
+        assert not report.has_changes(), "未变化的文件不应产生端口变化"
+
+        # 只修改注释时端口没有变化，但文件哈希已更新，需要保存数据库
+        _write_file(src_path, "// comment\nmodule src (input clk, output [7:0] data_out);\nendmodule\n")
+        report = DatabaseUpdater(collection).update()
+        assert report.changed_files == [src_path] and not report.has_port_changes(), "只修改注释时不应产生端口变化"
+        assert report.has_changes(), "文件哈希更新后应保存数据库"
+        assert DatabaseUpdater(collection).update().changed_files == [], "文件哈希未更新"
+
+    print("✓ 未变化文件测试通过!")
+
+
+# 测试端口新增、删除、位宽变化和重命名，以及连接的保留与失效
+def test_port_changes_keep_valid_connections():
+    print("\n开始测试端口变化与连接保留...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = os.path.join(tmp_dir, "src.v")
+        dst_path = os.path.join(tmp_dir, "dst.v")
+        _write_file(src_path, "module src (input clk, output [7:0] data_out, output [3:0] flag, output old_name);\nendmodule\n")
+        _write_file(dst_path, "module dst (input [7:0] data_in, input [3:0] flag_in, input single);\nendmodule\n")
+
+        collection = VerilogModuleCollection()
+        collection.add_module(_build_module("u_src", src_path))
+        collection.add_module(_build_module("u_dst", dst_path))
+        collection.add_connection("u_src", "data_out", "u_dst", "data_in")
+        collection.add_connection("u_src", "flag", "u_dst", "flag_in")
+        collection.add_connection("u_src", "old_name", "u_dst", "single")
+
+        # flag 缩小位宽导致连接失效，old_name 重命名为 new_name，新增 extra
+        _write_file(src_path, "module src (input clk, output [7:0] data_out, output [1:0] flag, output new_name, output [2:0] extra);\nendmodule\n")
+
+        report = DatabaseUpdater(collection).update()
+        print(report.get_summary())
+
+        assert report.changed_files == [src_path], f"重新解析的文件错误: {report.changed_files}"
+        assert "u_src.extra" in report.added_ports, "未检测到新增端口"
+        assert "u_src.old_name -> new_name" in report.renamed_ports, "未检测到端口重命名"
+        assert len(report.width_changed_ports) == 1, "未检测到位宽变化"
+        assert len(report.invalidated_connections) == 1, "位宽变化后的失效连接数量错误"
+
+        connection_strs = [str(conn) for conn in collection.connections]
+        assert connection_strs == ["u_src.data_out -> u_dst.data_in", "u_src.new_name -> u_dst.single"], \
+            f"保留的连接错误: {connection_strs}"
+        assert collection.get_module("u_dst").get_port("flag_in").source is None, "失效连接的源引用未清除"
+
+        # 再次更新时文件哈希已记录，不应重复解析
+        report = DatabaseUpdater(collection).update()
+        assert report.changed_files == [], "文件哈希未更新"
+
+    print("✓ 端口变化与连接保留测试通过!")
+
+
+# 测试一个库文件中定义了多个模块时，每个模块按自己的定义更新端口
+def test_multi_module_file():
+    print("\n开始测试多模块库文件的增量更新...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lib_path = os.path.join(tmp_dir, "lib.v")
+        _write_file(lib_path, "module a (input clk, output [7:0] x);\nendmodule\n"
+                              "module b (input [7:0] y, output z);\nendmodule\n")
+
+        def build():
+            collection = VerilogModuleCollection()
+            for name, def_name in (("u_a", "a"), ("u_b", "b")):
+                parser = VerilogPortParser(lib_path, module_name=def_name)
+                module = VerilogModule(name=name, file_path=lib_path, module_def_name=def_name)
+                module.add_ports(parser.get_all_ports())
+                module.file_hash = parser.file_hash
+                collection.add_module(module)
+            collection.add_connection("u_a", "x", "u_b", "y")
+            return collection
+
+        collection = build()
+        # 只修改文件内容（增加注释），两个模块的端口都不变
+        _write_file(lib_path, "// touched\nmodule a (input clk, output [7:0] x);\nendmodule\n"
+                              "module b (input [7:0] y, output z);\nendmodule\n")
+        report = DatabaseUpdater(collection).update()
+        assert report.changed_files == [lib_path], f"重新解析的文件错误: {report.changed_files}"
+        assert [p.name for p in collection.get_module("u_b").ports] == ["y", "z"], \
+            f"u_b的端口被替换: {[p.name for p in collection.get_module('u_b').ports]}"
+        assert [str(conn) for conn in collection.connections] == ["u_a.x -> u_b.y"], "连接被错误删除"
+        assert not report.invalidated_connections, report.get_summary()
+
+        # 监视模式使用同样的解析路径，b新增端口只影响u_b
+        collection = build()
+        service = DatabaseWatchService(collection, use_inotify=False)
+        _write_file(lib_path, "module a (input clk, output [7:0] x);\nendmodule\n"
+                              "module b (input [7:0] y, output z, output w);\nendmodule\n")
+        service._on_change([os.path.abspath(lib_path)])
+        reports = service.apply_pending()
+        assert len(reports) == 1 and reports[0].added_ports == ["u_b.w"], reports and reports[0].get_summary()
+        assert [p.name for p in collection.get_module("u_a").ports] == ["clk", "x"], "u_a的端口被替换"
+        assert [str(conn) for conn in collection.connections] == ["u_a.x -> u_b.y"], "连接被错误删除"
+
+    print("✓ 多模块库文件增量更新测试通过!")
+
+
+# 测试监视模式：头文件变化时只重新解析包含它的RTL文件
+def test_watch_mode():
+    print("开始测试RTL文件监视模式...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        header_path = os.path.join(tmp_dir, "width.vh")
+        core_path = os.path.join(tmp_dir, "core.v")
+        other_path = os.path.join(tmp_dir, "other.v")
+        _write_file(header_path, "`define W 8\n")
+        _write_file(core_path, "`include \"width.vh\"\nmodule core (input clk, output [`W-1:0] q);\nendmodule\n")
+        _write_file(other_path, "module other (input [7:0] d);\nendmodule\n")
+
+        preprocessor = VerilogPreprocessor()
+        collection = VerilogModuleCollection()
+        for name, path in (("u_core", core_path), ("u_other", other_path)):
+            parser = VerilogPortParser(path, preprocessor=preprocessor)
+            module = VerilogModule(name=name, file_path=path, module_def_name=parser.module_name)
+            module.add_ports(parser.get_all_ports())
+            module.file_hash = parser.file_hash
+            collection.add_module(module)
+        assert collection.get_module("u_core").get_port("q").get_width_value() == 8, "预处理位宽错误"
+
+        for use_inotify in (True, False):
+            service = DatabaseWatchService(collection, preprocessor, interval=0.1, settle=0.05,
+                                           use_inotify=use_inotify)
+            assert set(service.watch_map) == {header_path, core_path, other_path}, "监视文件错误"
+            service.start()
+            backend = service.watcher.backend
+            try:
+                width = 16 if use_inotify else 32
+                _write_file(header_path, f"`define W {width}\n")
+                reports = []
+                deadline = time.time() + 10
+                while not reports and time.time() < deadline:
+                    time.sleep(0.05)
+                    reports = service.apply_pending()
+                assert reports, f"未检测到头文件变化 ({backend})"
+                assert reports[0].changed_files == [core_path], f"重新解析的文件错误: {reports[0].changed_files}"
+                assert collection.get_module("u_core").get_port("q").get_width_value() == width, "位宽未更新"
+            finally:
+                service.stop()
+            print(f"  {backend} 监视通过")
+
+        # stat轮询只报告 (mtime, 大小) 变化的文件
+        watcher = FileWatcher([core_path, other_path], use_inotify=False)
+        assert watcher.poll() == [], "没有变化时不应报告"
+        _write_file(other_path, "module other (input [15:0] d);\nendmodule\n")
+        assert watcher.poll() == [other_path], "未检测到文件变化"
+
+    print("✓ RTL文件监视模式测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_unchanged_files_are_skipped()
+        test_port_changes_keep_valid_connections()
+        test_multi_module_file()
+        test_watch_mode()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,227 @@
+import os
+import sys
+import tempfile
+from verilog_models import VerilogModule, VerilogPort, VerilogModuleCollection
+from port_punch import PortPunchEngine
+from hierarchy_validator import validate_hierarchy
+from wgen_config_generator import WgenConfigGenerator
+from hierarchy_inference import HierarchyInference
+from file_cache import load_json_cache
+
+
+def _build_collection():
+    """构建与example_config.txt相同的层次结构"""
+    collection = VerilogModuleCollection()
+    for name in ("soc_chip", "sublock", "u_simple", "u_param_module", "u_complex", "u_axi4_fifo"):
+        module = VerilogModule(name=name, module_def_name=name)
+        module.need_gen = name in ("soc_chip", "sublock")
+        collection.add_module(module)
+    collection.get_module("u_complex").add_port(VerilogPort(name="data_out", direction="output"))
+
+    for parent_name, child_names in (("soc_chip", ["u_simple", "u_simple", "u_param_module", "u_complex", "sublock"]),
+                                     ("sublock", ["u_complex", "u_axi4_fifo"])):
+        parent = collection.get_module(parent_name)
+        for child_name in child_names:
+            child = collection.get_module(child_name)
+            parent.includes.append(child)
+            child.top_module = parent
+    return collection
+
+
+# 测试层次化路径、深度和最近公共祖先
+def test_paths_and_lca():
+    print("开始测试层次结构索引...")
+    collection = _build_collection()
+    index = collection.get_hierarchy_index()
+
+    assert index.get_path("u_complex") == "soc_chip.sublock.u_complex", f"路径错误: {index.get_path('u_complex')}"
+    assert index.get_depth("u_axi4_fifo") == 2, "深度错误"
+    assert [m.name for m in index.get_ancestors("u_complex")] == ["sublock", "soc_chip"], "祖先错误"
+
+    module, port = index.resolve_path("soc_chip.sublock.u_complex.data_out")
+    assert module.name == "u_complex" and port.name == "data_out", "端口路径解析错误"
+    assert index.resolve_path("soc_chip.u_complex") == (None, None), "不存在的路径应解析失败"
+
+    assert index.lowest_common_ancestor("u_complex", "u_axi4_fifo").name == "sublock", "LCA错误"
+    assert index.lowest_common_ancestor("u_complex", "u_simple").name == "soc_chip", "LCA错误"
+    assert index.lowest_common_ancestor("sublock", "u_axi4_fifo").name == "sublock", "祖先自身应为LCA"
+
+    print("✓ 层次结构索引测试通过!")
+
+
+# 测试深层次结构不受递归深度限制，且includes变化时增量更新
+def test_deep_chain_and_incremental_update():
+    print("\n开始测试深层次结构与增量更新...")
+    collection = VerilogModuleCollection()
+    depth = 5000
+    modules = [VerilogModule(name=f"m{i}") for i in range(depth)]
+    for module in modules:
+        collection.add_module(module)
+    for parent, child in zip(modules, modules[1:]):
+        collection.add_include(parent, child)
+
+    index = collection.get_hierarchy_index()
+    assert index.get_depth("m4999") == depth - 1, "深层次结构深度错误"
+    assert index.lowest_common_ancestor("m4999", "m1234").name == "m1234", "深层次结构LCA错误"
+
+    # 把 m2500 移到 m0 下，只重新计算该子树
+    collection.remove_include(modules[2499], modules[2500])
+    collection.add_include(modules[0], modules[2500])
+    assert index.get_depth("m4999") == 2500, f"增量更新后深度错误: {index.get_depth('m4999')}"
+    assert index.get_path("m2501") == "m0.m2500.m2501", f"增量更新后路径错误: {index.get_path('m2501')}"
+    assert index.lowest_common_ancestor("m4999", "m2499").name == "m0", "增量更新后LCA错误"
+    assert index.find_module("m0.m2500") is modules[2500], "增量更新后路径查找错误"
+
+    print("✓ 深层次结构与增量更新测试通过!")
+
+
+# 测试跨层次连接的端口穿透与同一线网的端口复用
+def test_port_punch_through():
+    print("\n开始测试端口穿透...")
+    collection = _build_collection()
+    collection.get_module("u_complex").ports[0].width = {'high': 7, 'low': 0}
+    collection.get_module("u_simple").add_port(VerilogPort(name="data_in", direction="input", width={'high': 7, 'low': 0}))
+    collection.get_module("u_param_module").add_port(VerilogPort(name="data_in", direction="input", width={'high': 7, 'low': 0}))
+    collection.add_connection("u_complex", "data_out", "u_simple", "data_in")
+    collection.add_connection("u_complex", "data_out", "u_param_module", "data_in")
+
+    result = PortPunchEngine(collection).run()
+    print(result.get_summary())
+    assert result.created_ports == ["sublock.u_complex_data_out"], f"新建端口错误: {result.created_ports}"
+    assert result.reused_ports == 1, "同一线网应复用端口"
+    port = collection.get_module("sublock").get_port("u_complex_data_out")
+    assert port.is_output() and port.get_width_value() == 8, "穿透端口方向或位宽错误"
+
+    port_def = WgenConfigGenerator().gen_generated_md_port_def(collection)
+    assert "bus  output sublock.u_complex_data_out (7:0)" in port_def, "穿透端口未输出到端口定义"
+
+    # 跨层次连接被替换为经过穿透端口的逐层连接，同一线网的公共段只连接一次
+    connections = sorted(str(conn) for conn in collection.connections)
+    assert connections == sorted(["u_complex.data_out -> sublock.u_complex_data_out",
+                                  "sublock.u_complex_data_out -> u_simple.data_in",
+                                  "sublock.u_complex_data_out -> u_param_module.data_in"]), f"逐层连接错误: {connections}"
+    assert port.source is collection.get_module("u_complex").get_port("data_out"), "穿透端口没有驱动"
+    assert collection.get_module("u_simple").get_port("data_in").source is port, "目标端口应由穿透端口驱动"
+
+    # 经过父模块端口的连接可以保存和重新加载
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "punched.json")
+        assert collection.save_to_file(db_path), "保存失败"
+        loaded = VerilogModuleCollection.load_from_file(db_path)
+        assert sorted(str(conn) for conn in loaded.connections) == connections, "重新加载后逐层连接丢失"
+
+    # 再次执行时复用已有端口，不会重复创建
+    result = PortPunchEngine(collection).run()
+    assert result.created_ports == [] and result.routes == [], "重复执行不应新建端口或连接"
+    assert len(collection.connections) == 3, "重复执行不应改变连接"
+
+    # 两端分别是不同层次树的根模块时无法穿透，不能被当作同级模块跳过
+    collection.add_module(VerilogModule(name="u_root_a"))
+    collection.add_module(VerilogModule(name="u_root_b"))
+    collection.get_module("u_root_a").add_port(VerilogPort(name="o", direction="output"))
+    collection.get_module("u_root_b").add_port(VerilogPort(name="i", direction="input"))
+    collection.add_connection("u_root_a", "o", "u_root_b", "i")
+    result = PortPunchEngine(collection).run()
+    assert len(result.unroutable) == 1 and "不在同一个层次结构中" in result.unroutable[0], result.get_summary()
+
+    print("✓ 端口穿透测试通过!")
+
+
+# 测试层次结构校验：重复包含、多父模块实例、循环包含和生成顺序
+def test_hierarchy_validation():
+    print("\n开始测试层次结构校验...")
+    collection = _build_collection()
+    report = validate_hierarchy(collection.modules)
+    print(report.get_summary())
+
+    assert not report.has_errors(), "示例层次结构不应存在环"
+    assert report.duplicate_includes == [("soc_chip", "u_simple", 2)], f"重复包含错误: {report.duplicate_includes}"
+    assert report.multi_parent == {"u_complex": ["soc_chip", "sublock"]}, f"多父模块实例错误: {report.multi_parent}"
+    order = report.order
+    assert order.index("sublock") < order.index("soc_chip"), "子模块应排在父模块之前"
+    assert order.index("u_axi4_fifo") < order.index("sublock"), "子模块应排在父模块之前"
+
+    # sublock 包含 soc_chip 形成环
+    collection.get_module("sublock").includes.append(collection.get_module("soc_chip"))
+    report = validate_hierarchy(collection.modules)
+    assert report.has_errors(), "未检测到循环包含"
+    assert sorted(report.cycles[0]) == ["soc_chip", "sublock"], f"环检测错误: {report.cycles}"
+
+    print("✓ 层次结构校验测试通过!")
+
+
+# 测试根据RTL实例化语句推断层次结构，以及按文件哈希缓存扫描结果
+def test_hierarchy_inference():
+    print("\n开始测试层次结构推断...")
+    sources = {
+        "soc_chip.v": "module soc_chip(input clk);\n  simple_module u_simple (.clk(clk));\n"
+                      "  // complex_module u_fake (.clk(clk));\n  sublock u_sublock (.clk(clk));\nendmodule\n",
+        "sublock.v": "module sublock(input clk);\n  complex_module #(.W(8)) u_complex (.clk(clk));\n"
+                     "  axi4_fifo u_axi4_fifo (.clk(clk));\n  unknown_ip u_ip (.clk(clk));\nendmodule\n",
+    }
+    for name in ("simple_module", "complex_module", "axi4_fifo"):
+        sources[f"{name}.v"] = f"module {name}(input clk);\nendmodule\n"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for file_name, content in sources.items():
+            with open(os.path.join(temp_dir, file_name), "w", encoding="utf-8") as f:
+                f.write(content)
+        modules = []
+        for name, def_name, need_gen in (("soc_chip", "soc_chip", True), ("sublock", "sublock", True),
+                                         ("u_simple", "simple_module", False), ("u_complex", "complex_module", False),
+                                         ("u_axi4_fifo", "axi4_fifo", False)):
+            module = VerilogModule(name=name, file_path=os.path.join(temp_dir, f"{def_name}.v"), module_def_name=def_name)
+            module.need_gen = need_gen
+            modules.append(module)
+
+        cache_path = os.path.join(temp_dir, "scan_cache.json")
+        result = HierarchyInference(cache_path=cache_path).infer(modules)
+        validation = result.apply(modules)
+        print(result.get_summary())
+        edges = sorted((parent.name, child.name) for parent, child in result.edges)
+        assert edges == [("soc_chip", "sublock"), ("soc_chip", "u_simple"),
+                         ("sublock", "u_axi4_fifo"), ("sublock", "u_complex")], f"推断的包含关系错误: {edges}"
+        assert not validation.has_errors() and modules[2].top_module is modules[0], "top_module设置错误"
+        assert len(result.scanned_files) == 5, "首次推断应扫描所有文件"
+
+        # 文件未变化时使用缓存，已存在的包含关系不重复添加
+        result = HierarchyInference(cache_path=cache_path).infer(modules)
+        assert result.scanned_files == [] and result.cached_files == 5, "未使用扫描缓存"
+        assert result.edges == [] and result.existing == 4, "已存在的包含关系不应重复添加"
+
+        # 缓存按文件路径记录，文件修改后覆盖原记录，文件删除后删除记录
+        with open(os.path.join(temp_dir, "simple_module.v"), "a", encoding="utf-8") as f:
+            f.write("// changed\n")
+        result = HierarchyInference(cache_path=cache_path).infer(modules)
+        assert len(result.scanned_files) == 1 and result.cached_files == 4, "文件修改后没有重新扫描"
+        os.rename(os.path.join(temp_dir, "simple_module.v"), os.path.join(temp_dir, "simple_module.bak"))
+        HierarchyInference(cache_path=cache_path).infer(modules)
+        cached_paths = set(load_json_cache(cache_path)["files"])
+        assert len(cached_paths) == 4 and os.path.join(temp_dir, "simple_module.v") not in cached_paths, \
+            f"扫描缓存记录错误: {sorted(cached_paths)}"
+        os.rename(os.path.join(temp_dir, "simple_module.bak"), os.path.join(temp_dir, "simple_module.v"))
+
+        # 文件数超过阈值时并行扫描，结果与串行一致
+        for i in range(40):
+            with open(os.path.join(temp_dir, f"leaf{i}.v"), "w", encoding="utf-8") as f:
+                f.write(f"module leaf{i}(input clk);\n  simple_module u_s{i} (.clk(clk));\nendmodule\n")
+        leaves = [VerilogModule(name=f"u_leaf{i}", file_path=os.path.join(temp_dir, f"leaf{i}.v"),
+                                module_def_name=f"leaf{i}") for i in range(40)]
+        result = HierarchyInference(cache_path="").infer([modules[2]] + leaves)
+        assert len(result.scanned_files) == 41 and len(result.edges) == 40, "并行扫描结果错误"
+
+    print("✓ 层次结构推断测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_paths_and_lca()
+        test_deep_chain_and_incremental_update()
+        test_port_punch_through()
+        test_hierarchy_validation()
+        test_hierarchy_inference()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
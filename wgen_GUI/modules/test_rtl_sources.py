@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from rtl_library import RtlLibraryIndex
+from verilog_parser import VerilogParser, VerilogPortParser
+from verilog_preprocessor import VerilogFilelist, VerilogPreprocessor
+from config_loader import get_config_source_path, load_config_data, prune_config_cache
+from file_cache import load_json_cache, save_json_cache
+
+
+# 测试RTL库索引的增量刷新和按模块名加载配置
+def test_rtl_library_index():
+    print("开始测试RTL库索引...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lib_dir = os.path.join(temp_dir, "lib")
+        os.makedirs(os.path.join(lib_dir, "sub"))
+        with open(os.path.join(lib_dir, "cells.v"), "w", encoding="utf-8") as f:
+            f.write("module buf_cell(input a, output y);\nendmodule\n\n"
+                    "module inv_cell(input a, output y, output yn);\nendmodule\n")
+        for i in range(200):
+            with open(os.path.join(lib_dir, "sub", f"leaf{i}.v"), "w", encoding="utf-8") as f:
+                f.write(f"// leaf {i}\nmodule leaf{i}(input clk, output [7:0] q);\nendmodule\n")
+        with open(os.path.join(lib_dir, "readme.txt"), "w", encoding="utf-8") as f:
+            f.write("module not_verilog;\n")
+
+        index_path = os.path.join(temp_dir, "index.json")
+        index = RtlLibraryIndex(index_path)
+        report = index.refresh([lib_dir])
+        assert len(report.indexed_files) == 201 and len(index) == 202, "首次索引结果错误"
+        path, offset, _ = index.lookup("inv_cell")
+        with open(path, "rb") as f:
+            assert f.read()[offset:].startswith(b"module inv_cell"), "模块偏移错误"
+        assert index.lookup("not_verilog") is None, "不应索引非Verilog文件"
+
+        # 重新加载索引后没有变化的文件不再读取
+        index = RtlLibraryIndex(index_path)
+        start_time = time.time()
+        report = index.refresh([lib_dir])
+        elapsed = time.time() - start_time
+        assert not report.has_changes() and report.unchanged_files == 201, "未变化时不应重新索引"
+        print(f"  无变化刷新 201 个文件耗时 {elapsed:.3f}s")
+
+        # 修改一个文件、删除一个文件，只处理变化的部分
+        leaf_path = os.path.join(lib_dir, "sub", "leaf0.v")
+        with open(leaf_path, "w", encoding="utf-8") as f:
+            f.write("module leaf0_v2(input clk, output [7:0] q);\nendmodule\n")
+        os.remove(os.path.join(lib_dir, "sub", "leaf1.v"))
+        report = index.refresh([lib_dir])
+        assert report.indexed_files == [leaf_path], f"增量刷新文件错误: {report.indexed_files}"
+        assert len(report.removed_files) == 1 and index.lookup("leaf1") is None, "删除的文件仍在索引中"
+        assert index.lookup("leaf0") is None and index.lookup("leaf0_v2")[0] == leaf_path, "模块名未更新"
+
+        # 刷新其他库根目录时保留仍存在的文件，删除已不存在的文件
+        other_dir = os.path.join(temp_dir, "other")
+        os.makedirs(other_dir)
+        with open(os.path.join(other_dir, "top.v"), "w", encoding="utf-8") as f:
+            f.write("module other_top(input clk);\nendmodule\n")
+        os.remove(os.path.join(lib_dir, "sub", "leaf2.v"))
+        report = index.refresh([other_dir])
+        assert report.removed_files == [os.path.join(lib_dir, "sub", "leaf2.v")], \
+            f"其他库中已删除的文件未清理: {report.removed_files}"
+        assert RtlLibraryIndex(index_path).lookup("leaf3") is not None, "其他库中仍存在的文件不应删除"
+        assert index.lookup("leaf3") is None and index.lookup("other_top") is not None, "查找范围错误"
+
+        # 配置中省略path时按模块名在库中查找，并解析文件中的第二个模块
+        config_path = os.path.join(temp_dir, "config.yaml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(f"library_roots:\n  - {lib_dir}\n"
+                    "modules:\n  - module_name: inv_cell\n    ins_name: u_inv\n")
+        parser = VerilogParser()
+        # 不在缓存目录中留下临时配置的缓存和临时库的索引
+        parser.config_cache_path = ""
+        parser.library_index_path = ""
+        modules = parser.parse_config_file(config_path)
+        assert len(modules) == 1 and modules[0].file_path == os.path.join(lib_dir, "cells.v"), "库模块路径错误"
+        assert [p.name for p in modules[0].ports] == ["a", "y", "yn"], \
+            f"库模块端口错误: {[p.name for p in modules[0].ports]}"
+
+    print("✓ RTL库索引测试通过!")
+
+
+# 测试.f文件列表、预处理器展开和共享头文件的缓存
+def test_verilog_preprocessor():
+    print("开始测试Verilog预处理器...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        include_dir = os.path.join(temp_dir, "include")
+        rtl_dir = os.path.join(temp_dir, "rtl")
+        os.makedirs(include_dir)
+        os.makedirs(rtl_dir)
+        with open(os.path.join(include_dir, "defs.vh"), "w", encoding="utf-8") as f:
+            f.write("`ifndef DEFS_VH\n`define DEFS_VH\n"
+                    "`define DATA_W 16\n"
+                    "`define BUS(name, w=`DATA_W) input [w-1:0] name``_i\n"
+                    "`endif\n")
+        for i in range(20):
+            with open(os.path.join(rtl_dir, f"core{i}.v"), "w", encoding="utf-8") as f:
+                f.write("`timescale 1ns/1ps\n`include \"defs.vh\"\n"
+                        f"module core{i} (\n"
+                        "  input clk,\n"
+                        "  `BUS(cfg, 8),\n"
+                        "  `BUS(data),\n"
+                        "`ifdef USE_DBG\n"
+                        "  output [`DATA_W*2-1:0] dbg,  // `define NOT_A_MACRO\n"
+                        "`elsif USE_TRACE\n"
+                        "  output trace,\n"
+                        "`else\n"
+                        "  output idle,\n"
+                        "`endif\n"
+                        "  output [`DATA_W-1:0] q\n"
+                        ");\nendmodule\n")
+        filelist_path = os.path.join(temp_dir, "top.f")
+        with open(filelist_path, "w", encoding="utf-8") as f:
+            f.write("// 顶层文件列表\n+incdir+include\n+define+USE_DBG\n+libext+.v\n"
+                    + "".join(f"rtl/core{i}.v\n" for i in range(20)))
+
+        filelist = VerilogFilelist()
+        filelist.load(filelist_path)
+        assert len(filelist.files) == 20 and filelist.defines == {"USE_DBG": ""}, "文件列表解析错误"
+        assert filelist.include_dirs == [include_dir] and filelist.ignored_options == ["+libext+.v"], "文件列表选项错误"
+
+        preprocessor = VerilogPreprocessor.from_filelist(filelist)
+        parsers = [VerilogPortParser(path, preprocessor=preprocessor) for path in filelist.files]
+        ports = {port.name: (port.direction, port.width['high']) for port in parsers[3].ports}
+        assert ports == {"clk": ("input", 0), "cfg_i": ("input", 7), "data_i": ("input", 15),
+                         "dbg": ("output", 31), "q": ("output", 15)}, f"预处理后的端口错误: {ports}"
+        # 头文件只读取一次，进入头文件时宏定义相同的展开结果全部命中缓存
+        assert len(preprocessor._sources) == 21, "头文件被重复读取"
+        assert preprocessor.cache_hits == 19, f"头文件展开缓存命中次数错误: {preprocessor.cache_hits}"
+
+        # 不同的宏定义集合走不同的分支
+        trace_ports = [port.name for port in VerilogPortParser(
+            filelist.files[0], preprocessor=VerilogPreprocessor([include_dir], {"USE_TRACE": "1"})).ports]
+        assert "trace" in trace_ports and "dbg" not in trace_ports, f"`elsif 分支错误: {trace_ports}"
+
+        # 调用者已读取的内容直接用于展开，不会在哈希和展开之间重新读取到另一个版本的文件
+        version_a = b"`include \"defs.vh\"\nmodule race (input clk, output [`DATA_W-1:0] q);\nendmodule\n"
+        race_path = os.path.join(rtl_dir, "race.v")
+        with open(race_path, "w", encoding="utf-8") as f:
+            f.write("module race (input clk, output [3:0] q, output extra);\nendmodule\n")
+        text = preprocessor.preprocess(race_path, version_a)
+        assert "[15:0] q" in text and "extra" not in text, f"展开结果不是调用者读取的版本: {text}"
+        assert "extra" in preprocessor.preprocess(race_path), "按路径预处理时应重新读取文件"
+
+        # 配置文件通过filelists加载，模块按名称在文件列表中查找
+        config_path = os.path.join(temp_dir, "config.yaml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(f"filelists:\n  - {filelist_path}\n"
+                    "modules:\n  - module_name: core5\n    ins_name: u_core5\n")
+        parser = VerilogParser()
+        # 不在缓存目录中留下临时配置的缓存和临时库的索引
+        parser.config_cache_path = ""
+        parser.library_index_path = ""
+        modules = parser.parse_config_file(config_path)
+        assert len(modules) == 1 and modules[0].file_path == filelist.files[5], "文件列表中的模块路径错误"
+        assert modules[0].get_port("dbg").get_width_value() == 32, "配置加载的端口位宽错误"
+
+    print("✓ Verilog预处理器测试通过!")
+
+
+# 测试YAML/JSON配置加载和YAML解析结果的缓存
+def test_config_loading():
+    print("开始测试配置文件加载...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rtl_path = os.path.join(temp_dir, "leaf.v")
+        with open(rtl_path, "w", encoding="utf-8") as f:
+            f.write("module leaf(input clk, output [3:0] q);\nendmodule\n")
+        config = {"modules": [{"module_name": "leaf", "ins_name": f"u_leaf{i}", "path": rtl_path} for i in range(3)]}
+
+        yaml_path = os.path.join(temp_dir, "config.yaml")
+        with open(yaml_path, "w", encoding="utf-8") as f:
+            f.write("modules:\n" + "".join(f"  - module_name: leaf\n    ins_name: u_leaf{i}\n    path: {rtl_path}\n"
+                                           for i in range(3)))
+        json_path = os.path.join(temp_dir, "config.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+        cache_path = os.path.join(temp_dir, "config_cache.json")
+        assert load_config_data(yaml_path, cache_path) == config, "YAML配置内容错误"
+        assert load_config_data(json_path, cache_path="") == config, "JSON配置内容错误"
+        assert load_json_cache(cache_path)["data"] == config, "YAML解析结果未缓存"
+
+        # 配置文件未变化时直接使用缓存，不再解析YAML
+        cached = load_json_cache(cache_path)
+        cached["data"]["from_cache"] = True
+        save_json_cache(cache_path, cached)
+        assert load_config_data(yaml_path, cache_path).get("from_cache"), "未使用配置缓存"
+        with open(yaml_path, "a", encoding="utf-8") as f:
+            f.write("infer_hierarchy: false\n")
+        assert "from_cache" not in load_config_data(yaml_path, cache_path), "配置变化后仍使用旧缓存"
+
+        # 非.json扩展名的配置以 { 开头但不是合法JSON时按YAML的flow风格读取
+        flow_path = os.path.join(temp_dir, "flow.txt")
+        with open(flow_path, "w", encoding="utf-8") as f:
+            f.write("{modules: [" + ", ".join(f"{{module_name: leaf, ins_name: u_leaf{i}, path: '{rtl_path}'}}"
+                                             for i in range(3)) + "]}\n")
+        assert load_config_data(flow_path, cache_path="") == config, "YAML flow风格配置内容错误"
+        with open(json_path.replace(".json", "_bad.json"), "w", encoding="utf-8") as f:
+            f.write("{modules: []}\n")
+        try:
+            load_config_data(json_path.replace(".json", "_bad.json"), cache_path="")
+            assert False, ".json配置格式错误时应抛出异常"
+        except ValueError:
+            pass
+
+        # 清理配置缓存：删除配置文件已不存在的缓存，其余只保留最近的几个
+        cache_dir = os.path.join(temp_dir, "cache")
+        os.makedirs(cache_dir)
+        for i, source in enumerate([yaml_path, json_path, flow_path, os.path.join(temp_dir, "deleted.yaml")]):
+            entry_path = os.path.join(cache_dir, f"config_{i}.json")
+            # 缓存内容不是合法JSON：清理时只读取来源记录，不解析缓存
+            with open(entry_path, "w", encoding="utf-8") as f:
+                f.write("{")
+            with open(get_config_source_path(entry_path), "w", encoding="utf-8") as f:
+                f.write(source)
+            os.utime(entry_path, (1000 + i, 1000 + i))
+        save_json_cache(os.path.join(cache_dir, "config_old.json"), {"hash": "", "data": {}})
+        with open(os.path.join(cache_dir, "config_orphan.src"), "w", encoding="utf-8") as f:
+            f.write(yaml_path)
+        save_json_cache(os.path.join(cache_dir, "rtl_index.json"), {})
+        assert prune_config_cache(cache_dir, max_entries=2) == 3, "清理的缓存数错误"
+        assert sorted(os.listdir(cache_dir)) == ["config_1.json", "config_1.src", "config_2.json", "config_2.src",
+                                                 "rtl_index.json"], f"清理后剩余的缓存错误: {sorted(os.listdir(cache_dir))}"
+
+        modules = VerilogParser().parse_config_file(json_path)
+        assert [m.name for m in modules] == ["u_leaf0", "u_leaf1", "u_leaf2"], "JSON配置加载的模块错误"
+        assert modules[0].get_port("q").get_width_value() == 4, "JSON配置加载的端口错误"
+
+    print("✓ 配置文件加载测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_rtl_library_index()
+        test_verilog_preprocessor()
+        test_config_loading()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,671 @@
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from verilog_models import VerilogModule, VerilogPort, VerilogModuleCollection
+from session_journal import SessionJournal
+from autosave_worker import AutosaveWorker
+from sqlite_backend import SqliteCollectionStore, is_sqlite_file, write_sqlite_file
+from collection_diff import iter_diff
+from session_store import SessionStore, is_session_manifest, load_session_manifest
+from binary_session import is_binary_session_file, load_binary_file, read_binary_metadata, write_binary_file
+
+
+def _build_collection(module_count=4):
+    """构建 module_count 个各有一个输入和一个输出端口的模块，u0 -> u1 已连接"""
+    collection = VerilogModuleCollection()
+    for i in range(module_count):
+        module = VerilogModule(name=f"u{i}", module_def_name="leaf")
+        module.add_port(VerilogPort(name="din", direction="input", width={'high': 7, 'low': 0}))
+        module.add_port(VerilogPort(name="dout", direction="output", width={'high': 7, 'low': 0}))
+        collection.add_module(module)
+    collection.add_connection("u0", "dout", "u1", "din")
+    return collection
+
+
+def _connection_set(collection):
+    return {(c.source_port.father_module.name, c.source_port.name, c.dest_port.father_module.name, c.dest_port.name)
+            for c in collection.connections}
+
+
+# 测试会话日志的追加写入、恢复和截断记录的处理
+def test_session_journal():
+    print("开始测试会话日志...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection()
+        snapshot_path = os.path.join(temp_dir, "snapshot.json")
+        assert collection.save_to_file(snapshot_path), "快照保存失败"
+        journal_path = os.path.join(temp_dir, SessionJournal.FILE_NAME)
+        journal = SessionJournal(journal_path, compact_threshold=3)
+        journal.attach(collection, snapshot_path)
+        assert journal.is_attached(collection) and not journal.is_attached(_build_collection()), "attach状态错误"
+
+        port = lambda module, name: collection.get_module(module).get_port(name)
+        collection.connect_port(port("u1", "dout"), port("u2", "din"))
+        journal.record_connect(port("u1", "dout"), port("u2", "din"))
+        collection.connect_port(port("u2", "dout"), port("u3", "din"), {'high': 3, 'low': 0}, {'high': 3, 'low': 0})
+        journal.record_connect(port("u2", "dout"), port("u3", "din"), {'high': 3, 'low': 0}, {'high': 3, 'low': 0})
+        collection.remove_slave_port_connection(port("u1", "din"))
+        journal.record_disconnect_dest(port("u1", "din"))
+        assert journal.needs_compaction() and SessionJournal.count_records(journal_path) == 3, "记录数错误"
+
+        # 模拟写入过程中退出：最后一条记录不完整
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "connect", "src": ["u3"')
+        recovered, report = SessionJournal.recover(journal_path)
+        assert report.replayed == 3 and report.truncated and not report.failed, report.get_summary()
+        assert _connection_set(recovered) == _connection_set(collection), "恢复后的连接与原数据库不一致"
+        ranges = [(c.source_bit_range, c.dest_bit_range) for c in recovered.connections
+                  if c.dest_port.father_module.name == "u3"]
+        assert ranges == [({'high': 3, 'low': 0}, {'high': 3, 'low': 0})], f"位范围恢复错误: {ranges}"
+
+        # 压缩：新快照之后日志清空
+        compacted_path = os.path.join(temp_dir, "compacted.json")
+        collection.save_to_file(compacted_path)
+        journal.attach(collection, compacted_path)
+        assert SessionJournal.count_records(journal_path) == 0, "压缩后日志未清空"
+        assert SessionJournal.read_snapshot_path(journal_path) == compacted_path, "快照路径错误"
+        journal.close()
+
+        # 单次记录的开销与数据库大小无关，远小于保存整个数据库
+        large = _build_collection(2000)
+        large_snapshot = os.path.join(temp_dir, "large.json")
+        start_time = time.time()
+        large.save_to_file(large_snapshot)
+        save_time = time.time() - start_time
+        journal.attach(large, large_snapshot)
+        start_time = time.time()
+        for i in range(2, 22):
+            journal.record_connect(large.get_module(f"u{i}").get_port("dout"), large.get_module(f"u{i + 1}").get_port("din"))
+        record_time = (time.time() - start_time) / 20
+        journal.close()
+        print(f"  保存完整数据库 {save_time:.3f}s，单条日志记录 {record_time * 1000:.2f}ms")
+
+    print("✓ 会话日志测试通过!")
+
+
+# 测试后台保存的请求合并、分片快照、快照失效重做和日志rebase
+def test_autosave_worker():
+    print("开始测试后台保存...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = iter(os.path.join(temp_dir, f"auto_{i}.json") for i in range(100))
+        worker = AutosaveWorker(path_factory=lambda: next(paths), delay=0.05, max_delay=1.0, slice_time=0.001)
+
+        def wait_results():
+            results = []
+            while worker.has_pending():
+                results.extend(worker.poll())
+                time.sleep(0.002)
+            return results
+
+        # 连续5次请求合并为一次写入
+        collection = _build_collection()
+        for _ in range(5):
+            worker.request(collection, keep_copy=True)
+        assert worker.poll() == [], "请求合并期间不应开始保存"
+        results = wait_results()
+        assert len(results) == 1 and results[0].is_success(), f"请求没有合并: {[r.error for r in results]}"
+        assert results[0].collection_copy is not None, "没有生成数据库副本"
+        loaded = VerilogModuleCollection.load_from_file(results[0].file_path)
+        assert _connection_set(loaded) == _connection_set(collection), "后台保存的内容错误"
+        assert not os.path.exists(results[0].file_path + ".tmp"), "临时文件没有被替换"
+
+        # 大数据库的快照分多次poll完成，快照过程中的修改使快照重新生成
+        large = _build_collection(2000)
+        start_time = time.time()
+        large.to_dict()
+        full_time = time.time() - start_time
+        snapshots = []
+        worker.request(large, os.path.join(temp_dir, "large.json"), on_snapshot=lambda: snapshots.append(1),
+                       immediate=True)
+        worker.poll()
+        worker.poll()
+        large.add_connection("u1999", "dout", "u0", "din")
+        worker.invalidate_snapshot()
+        polls = 0
+        max_poll = 0.0
+        results = []
+        while worker.has_pending():
+            snapshotting = worker._snapshot is not None or bool(worker._pending)
+            start_time = time.time()
+            results.extend(worker.poll())
+            if snapshotting:
+                max_poll = max(max_poll, time.time() - start_time)
+                polls += 1
+            time.sleep(0.001)
+        assert len(results) == 1 and len(snapshots) == 2, "快照失效后没有重新生成"
+        loaded = VerilogModuleCollection.load_from_file(results[0].file_path)
+        assert ("u1999", "dout", "u0", "din") in _connection_set(loaded), "快照没有包含失效后的修改"
+        assert polls > 2, f"快照没有分片: {polls}"
+        print(f"  完整快照 {full_time * 1000:.1f}ms，分片后单次poll最长 {max_poll * 1000:.1f}ms（快照分 {polls} 次poll完成）")
+        assert gc.isenabled(), "快照完成后没有恢复自动垃圾回收"
+
+        # 快照过程中连接或断开端口不使快照重新生成，写入开始快照时的数据库
+        snapshots.clear()
+        expected = _connection_set(large)
+        worker.request(large, os.path.join(temp_dir, "large_edit.json"), on_snapshot=lambda: snapshots.append(1),
+                       immediate=True)
+        worker.poll()
+        worker.poll()
+        for i in range(20):
+            large.add_connection(f"u{1979 + i}", "dout", f"u{1000 + i}", "din")
+        results = wait_results()
+        assert len(results) == 1 and len(snapshots) == 1, "快照过程中的连接修改使快照重新生成"
+        loaded = VerilogModuleCollection.load_from_file(results[0].file_path)
+        assert _connection_set(loaded) == expected, "快照不是开始时的数据库"
+
+        # 丢弃快照时恢复自动垃圾回收
+        worker.request(large, os.path.join(temp_dir, "large_gc.json"), immediate=True)
+        worker.poll()
+        assert not gc.isenabled(), "快照过程中没有暂停自动垃圾回收"
+        worker.invalidate_snapshot()
+        assert gc.isenabled(), "丢弃快照后没有恢复自动垃圾回收"
+        wait_results()
+
+        # 写入失败通过结果返回
+        worker.request(collection, os.path.join(temp_dir, "missing", "db.json"), immediate=True)
+        results = wait_results()
+        assert len(results) == 1 and not results[0].is_success(), "写入失败没有报告错误"
+        worker.close()
+
+        # 后台保存完成后rebase，只保留生成快照之后追加的日志记录
+        snapshot_path = os.path.join(temp_dir, "snapshot.json")
+        collection.save_to_file(snapshot_path)
+        journal_path = os.path.join(temp_dir, SessionJournal.FILE_NAME)
+        journal = SessionJournal(journal_path)
+        journal.attach(collection, snapshot_path)
+        port = lambda module, name: collection.get_module(module).get_port(name)
+        collection.connect_port(port("u1", "dout"), port("u2", "din"))
+        journal.record_connect(port("u1", "dout"), port("u2", "din"))
+        rebased_path = os.path.join(temp_dir, "rebased.json")
+        collection.save_to_file(rebased_path)
+        snapshot_seq = journal.seq
+        collection.connect_port(port("u2", "dout"), port("u3", "din"))
+        journal.record_connect(port("u2", "dout"), port("u3", "din"))
+        journal.rebase(rebased_path, snapshot_seq)
+        assert journal.record_count == 1 and SessionJournal.count_records(journal_path) == 1, "rebase保留的记录错误"
+        journal.record_disconnect_dest(port("u1", "din"))
+        collection.remove_slave_port_connection(port("u1", "din"))
+        journal.close()
+        recovered, report = SessionJournal.recover(journal_path)
+        assert report.replayed == 2 and not report.failed, report.get_summary()
+        assert _connection_set(recovered) == _connection_set(collection), "rebase后恢复的连接错误"
+
+    print("✓ 后台保存测试通过!")
+
+
+# 测试流式JSON写入：输出与json.dump一致、紧凑格式、吞吐量和内存占用
+def test_streaming_writer():
+    print("开始测试流式JSON写入...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection(3000)
+        collection.get_module("u0").parameters = {"WIDTH": 8, "NAME": "中文"}
+        metadata = {'version': '1.0', 'save_time': '2024-01-01 00:00:00', 'user': 'tester'}
+        expected = collection.to_dict()
+        expected['metadata'] = dict(metadata)
+
+        stream_path = os.path.join(temp_dir, "stream.json")
+        start_time = time.time()
+        assert collection.save_to_file(stream_path, dict(metadata)), "流式保存失败"
+        stream_time = time.time() - start_time
+        with open(stream_path, encoding="utf-8") as f:
+            assert f.read() == json.dumps(expected, indent=2, ensure_ascii=False), "缩进格式输出与json.dump不一致"
+
+        compact_path = os.path.join(temp_dir, "compact.json")
+        start_time = time.time()
+        assert collection.save_to_file(compact_path, dict(metadata), compact=True), "紧凑格式保存失败"
+        compact_time = time.time() - start_time
+        with open(compact_path, encoding="utf-8") as f:
+            assert json.load(f) == expected, "紧凑格式内容错误"
+        loaded = VerilogModuleCollection.load_from_file(compact_path)
+        assert _connection_set(loaded) == _connection_set(collection), "紧凑格式加载后的连接错误"
+
+        # 流式写入的峰值内存（主要是文件缓冲区）不随数据库大小增长，一次性构建完整字典的方式线性增长
+        def old_save(source, path):
+            collection_dict = source.to_dict()
+            collection_dict['metadata'] = dict(metadata)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(collection_dict, f, indent=2, ensure_ascii=False)
+
+        def peak_memory(save, source):
+            gc.collect()
+            tracemalloc.start()
+            save(source, os.path.join(temp_dir, "peak.json"))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        new_save = lambda source, path: source.save_to_file(path, dict(metadata))
+        small = _build_collection(300)
+        small.get_module("u0").parameters = collection.get_module("u0").parameters
+        old_peaks = [peak_memory(old_save, small), peak_memory(old_save, collection)]
+        new_peaks = [peak_memory(new_save, small), peak_memory(new_save, collection)]
+        assert new_peaks[1] - new_peaks[0] < (old_peaks[1] - old_peaks[0]) / 10, \
+            f"流式写入的峰值内存随数据库增长: {new_peaks} {old_peaks}"
+
+        size_mb = os.path.getsize(stream_path) / 1e6
+        compact_mb = os.path.getsize(compact_path) / 1e6
+        print(f"  缩进格式 {size_mb:.1f}MB {size_mb / stream_time:.1f}MB/s，"
+              f"紧凑格式 {compact_mb:.1f}MB {compact_mb / compact_time:.1f}MB/s")
+        print(f"  峰值内存（300/3000个模块）: 构建完整字典 {old_peaks[0] / 1e6:.2f}/{old_peaks[1] / 1e6:.2f}MB，"
+              f"流式写入 {new_peaks[0] / 1e6:.2f}/{new_peaks[1] / 1e6:.2f}MB")
+
+    print("✓ 流式JSON写入测试通过!")
+
+
+# 测试流式加载：记录到达时建立对象、进度回调、连接在模块之前的文件和峰值内存
+def test_streaming_loader():
+    print("开始测试流式加载...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection(3000)
+        for i in range(1, 2999):
+            collection.add_connection(f"u{i}", "dout", f"u{i + 1}", "din")
+        collection.get_module("u0").includes.append(collection.get_module("u1"))
+        collection.get_module("u1").top_module = collection.get_module("u0")
+        file_path = os.path.join(temp_dir, "db.json")
+        collection.save_to_file(file_path)
+
+        progress = []
+        loaded = VerilogModuleCollection.load_from_file(file_path, lambda done, total: progress.append((done, total)))
+        assert _connection_set(loaded) == _connection_set(collection), "流式加载的连接错误"
+        assert loaded.get_module("u0").includes == [loaded.get_module("u1")], "includes引用未恢复"
+        assert loaded.get_module("u1").top_module is loaded.get_module("u0"), "top_module引用未恢复"
+        total = os.path.getsize(file_path)
+        assert len(progress) > 2 and progress[-1] == (total, total), f"进度回调错误: {progress[-3:]}"
+        assert [done for done, _ in progress] == sorted(done for done, _ in progress), "进度没有单调增加"
+
+        # 连接出现在模块之前的文件也能加载
+        reordered = collection.to_dict()
+        reordered = {'connections': reordered['connections'], 'modules': reordered['modules']}
+        reordered_path = os.path.join(temp_dir, "reordered.json")
+        with open(reordered_path, "w", encoding="utf-8") as f:
+            json.dump(reordered, f)
+        assert _connection_set(VerilogModuleCollection.load_from_file(reordered_path)) == _connection_set(collection), \
+            "连接在模块之前的文件加载错误"
+
+        # 峰值内存接近最终对象图，json.load + from_dict需要额外保存整个文件的字典
+        def old_load(path):
+            with open(path, encoding="utf-8") as f:
+                return VerilogModuleCollection.from_dict(json.load(f))
+
+        memory = []
+        for load in (old_load, VerilogModuleCollection.load_from_file):
+            gc.collect()
+            tracemalloc.start()
+            start_time = time.time()
+            result = load(file_path)
+            elapsed = time.time() - start_time
+            memory.append(tracemalloc.get_traced_memory() + (elapsed,))
+            tracemalloc.stop()
+            del result
+        (old_final, old_peak, old_time), (new_final, new_peak, new_time) = memory
+        assert new_peak - new_final < new_final / 4, f"流式加载的峰值内存过高: {memory}"
+        print(f"  json.load: 对象图 {old_final / 1e6:.1f}MB 峰值 {old_peak / 1e6:.1f}MB {old_time:.2f}s，"
+              f"流式加载: 对象图 {new_final / 1e6:.1f}MB 峰值 {new_peak / 1e6:.1f}MB {new_time:.2f}s")
+
+    print("✓ 流式加载测试通过!")
+
+
+# 测试SQLite后端：完整保存加载、单行编辑、部分加载和JSON导入导出
+def test_sqlite_backend():
+    print("开始测试SQLite后端...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection(500)
+        collection.get_module("u0").includes.append(collection.get_module("u1"))
+        collection.get_module("u0").parameters = {"WIDTH": 8}
+        collection.add_connection("u1", "dout", "u2", "din", {'high': 3, 'low': 0}, {'high': 3, 'low': 0})
+        db_path = os.path.join(temp_dir, "design.db")
+        store = SqliteCollectionStore(db_path)
+        store.save_collection(collection, {'version': '1.0'})
+        assert is_sqlite_file(db_path) and store.count_records() == (500, 2), "SQLite保存结果错误"
+
+        loaded = store.load_collection()
+        assert loaded.to_dict() == collection.to_dict(), "SQLite加载的内容与原数据库不一致"
+        assert store.collection is loaded, "加载后编辑操作应写入该数据库"
+
+        # 编辑操作是单行事务，与内存中的数据库保持一致
+        port = lambda module, name: loaded.get_module(module).get_port(name)
+        loaded.connect_port(port("u5", "dout"), port("u6", "din"))
+        store.record_connect(port("u5", "dout"), port("u6", "din"))
+        loaded.remove_master_port_connections(port("u0", "dout"))
+        store.record_disconnect_source(port("u0", "dout"))
+        loaded.remove_slave_port_connection(port("u2", "din"))
+        store.record_disconnect_dest(port("u2", "din"))
+        store.close()
+        store = SqliteCollectionStore(db_path)
+        assert _connection_set(store.load_collection()) == _connection_set(loaded), "单行编辑没有写入SQLite"
+
+        # 只加载指定模块及与它们有连接的模块
+        partial = store.load_collection(["u6"])
+        assert [m.name for m in partial.modules] == ["u5", "u6"], [m.name for m in partial.modules]
+        assert _connection_set(partial) == {("u5", "dout", "u6", "din")}, "部分加载的连接错误"
+        assert store.collection is not partial, "部分加载的数据库不应接收编辑"
+
+        # open_modules部分加载的数据库保存时只同步加载的部分，其他模块和连接保持不变
+        full = _build_collection(10)
+        for source, dest in (("u2", "u3"), ("u3", "u4"), ("u4", "u5"), ("u7", "u8")):
+            full.add_connection(source, "dout", dest, "din")
+        full.add_include(full.get_module("u5"), full.get_module("u4"))
+        full.add_include(full.get_module("u5"), full.get_module("u6"))
+        partial_store = SqliteCollectionStore(os.path.join(temp_dir, "partial.db"))
+        partial_store.save_collection(full)
+        view = partial_store.open_modules(["u3"])
+        assert [m.name for m in view.modules] == ["u2", "u3", "u4"], [m.name for m in view.modules]
+        u3 = view.get_module("u3")
+        view.remove_slave_port_connection(u3.get_port("din"))
+        partial_store.record_disconnect_dest(u3.get_port("din"))
+        u3.add_port(VerilogPort(name="extra", direction="output", width={'high': 7, 'low': 0}))
+        view.connect_port(u3.get_port("extra"), view.get_module("u2").get_port("din"))
+        partial_store.save_collection(view)
+        assert partial_store.collection is view, "部分加载的数据库保存后应继续接收编辑"
+        reloaded = partial_store.load_collection()
+        assert len(reloaded.modules) == 10, "部分保存不应删除未加载的模块"
+        assert _connection_set(reloaded) == {("u0", "dout", "u1", "din"), ("u3", "dout", "u4", "din"),
+                                             ("u3", "extra", "u2", "din"), ("u4", "dout", "u5", "din"),
+                                             ("u7", "dout", "u8", "din")}, f"部分保存的连接错误: {_connection_set(reloaded)}"
+        assert [p.name for p in reloaded.get_module("u3").ports] == ["din", "dout", "extra"], "部分保存的端口错误"
+        assert [m.name for m in reloaded.get_module("u5").includes] == ["u4", "u6"], "未加载模块的includes被修改"
+        partial_store.close()
+
+        # 不经过对象图与JSON互相导入导出
+        json_path = os.path.join(temp_dir, "design.json")
+        store.export_json(json_path)
+        assert VerilogModuleCollection.load_from_file(json_path).to_dict() == loaded.to_dict(), "导出的JSON错误"
+        imported = SqliteCollectionStore(os.path.join(temp_dir, "imported.db"))
+        assert imported.import_json(json_path) == 0, "导入JSON时有连接失败"
+        assert imported.load_collection().to_dict() == loaded.to_dict(), "从JSON导入的内容错误"
+        assert imported.get_metadata()['version'] == '1.0', "导入的元数据错误"
+        imported.close()
+
+        # 另存为SQLite数据库后会话日志以该文件为快照，恢复时按SQLite格式加载
+        saved_path = os.path.join(temp_dir, "saved.db")
+        write_sqlite_file(saved_path, loaded.iter_records(), {'version': '1.0'})
+        journal = SessionJournal(os.path.join(temp_dir, SessionJournal.FILE_NAME))
+        journal.attach(loaded, saved_path)
+        loaded.connect_port(port("u7", "dout"), port("u8", "din"))
+        journal.record_connect(port("u7", "dout"), port("u8", "din"))
+        journal.close()
+        recovered, report = SessionJournal.recover(journal.journal_path)
+        assert report.replayed == 1 and not report.failed, report.get_summary()
+        assert _connection_set(recovered) == _connection_set(loaded), "从SQLite快照恢复的连接错误"
+
+        # 单行编辑与重写整个文件的耗时比较
+        large = _build_collection(2000)
+        start_time = time.time()
+        store.save_collection(large)
+        save_time = time.time() - start_time
+        port = lambda module, name: large.get_module(module).get_port(name)
+        start_time = time.time()
+        for i in range(2, 22):
+            store.record_connect(port(f"u{i}", "dout"), port(f"u{i + 1}", "din"))
+        edit_time = (time.time() - start_time) / 20
+        store.close()
+        print(f"  重写整个SQLite数据库 {save_time:.3f}s，单行编辑事务 {edit_time * 1000:.2f}ms")
+
+    print("✓ SQLite后端测试通过!")
+
+
+# 测试二进制会话文件：各压缩方式的往返、格式识别、后台保存和会话恢复
+def test_binary_session():
+    print("开始测试二进制会话文件...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection(2000)
+        for i in range(1, 1999):
+            collection.add_connection(f"u{i}", "dout", f"u{i + 1}", "din")
+        collection.add_connection("u0", "dout", "u5", "din")  # 扇出
+        collection.add_connection("u0", "dout", "u1999", "din", {'high': 3, 'low': 0}, {'high': 7, 'low': 4})
+        top = collection.get_module("u0")
+        top.includes.append(collection.get_module("u1"))
+        top.parameters = {"WIDTH": 8, "名称": 1}
+        top.need_gen = True
+        top.file_hash = "abc123"
+        collection.get_module("u1").top_module = top
+        collection.get_module("u1").file_path = "/rtl/模块.v"
+        expected = collection.to_dict()
+
+        sizes = {}
+        for compression in ('none', 'zlib', 'lzma'):
+            path = os.path.join(temp_dir, f"design_{compression}.wgs")
+            assert write_binary_file(path, collection.iter_records(), {'version': '1.0'}, compression) == 0, "有连接没有保存"
+            assert is_binary_session_file(path), "二进制会话文件头错误"
+            loaded = load_binary_file(path)
+            assert loaded.to_dict() == expected, f"{compression}: 加载的内容与原数据库不一致"
+            assert read_binary_metadata(path) == {'version': '1.0'}, "元数据错误"
+            sizes[compression] = os.path.getsize(path)
+        assert loaded.get_module("u1").top_module is loaded.get_module("u0"), "top_module没有指向加载的模块"
+        assert loaded.get_module("u0").get_port("dout").destinations == \
+            [loaded.get_module(name).get_port("din") for name in ("u1", "u5", "u1999")], "destinations错误"
+        assert sizes['zlib'] < sizes['none'] and sizes['lzma'] < sizes['none'], sizes
+
+        # 与JSON格式比较文件大小和加载时间
+        json_path = os.path.join(temp_dir, "design.json")
+        collection.save_to_file(json_path)
+        assert not is_binary_session_file(json_path), "JSON文件被识别为二进制会话文件"
+        start_time = time.time()
+        VerilogModuleCollection.load_from_file(json_path)
+        json_time = time.time() - start_time
+        start_time = time.time()
+        load_binary_file(os.path.join(temp_dir, "design_zlib.wgs"))
+        binary_time = time.time() - start_time
+        print(f"  JSON {os.path.getsize(json_path) // 1024}KB 加载 {json_time:.3f}s，"
+              f"二进制(zlib) {sizes['zlib'] // 1024}KB 加载 {binary_time:.3f}s")
+
+        # 文件不完整时抛出ValueError
+        truncated_path = os.path.join(temp_dir, "truncated.wgs")
+        with open(os.path.join(temp_dir, "design_none.wgs"), 'rb') as f, open(truncated_path, 'wb') as out:
+            out.write(f.read()[:-100])
+        try:
+            load_binary_file(truncated_path)
+            assert False, "不完整的文件应该抛出ValueError"
+        except ValueError:
+            pass
+
+        # 扩展名为.wgs时后台保存为二进制格式，会话日志可以以它为快照恢复
+        worker = AutosaveWorker()
+        path = os.path.join(temp_dir, "autosave.wgs")
+        worker.request(collection, path, immediate=True)
+        results = worker.close(timeout=30)
+        assert results and results[0].is_success(), results and results[0].error
+        assert is_binary_session_file(path), "后台保存没有使用二进制格式"
+        journal = SessionJournal(os.path.join(temp_dir, SessionJournal.FILE_NAME))
+        journal.attach(collection, path)
+        journal.record_disconnect_source(collection.get_module("u10").get_port("dout"))
+        journal.close()
+        recovered, report = SessionJournal.recover(journal.journal_path)
+        assert report.replayed == 1 and not report.failed, report.get_summary()
+        assert len(recovered.connections) == len(collection.connections) - 1, "从二进制快照恢复的结果错误"
+
+    print("✓ 二进制会话文件测试通过!")
+
+
+# 测试规范化格式：定义只保存一次、参数覆盖、端口序号连接，旧格式和各读取方都兼容
+def test_normalized_schema():
+    print("开始测试规范化格式...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = VerilogModuleCollection()
+        for i in range(400):
+            module = VerilogModule(name=f"core{i}", file_path="/rtl/core.v", module_def_name="core")
+            for p in range(20):
+                module.add_port(VerilogPort(name=f"in{p}", direction="input", width={'high': 31, 'low': 0}))
+                module.add_port(VerilogPort(name=f"out{p}", direction="output", width={'high': 31, 'low': 0}))
+            module.parameters = {"WIDTH": 32, "ID": i}
+            module.file_hash = "c0ffee"
+            collection.add_module(module)
+        collection.get_module("core1").parameters = {"ID": 1, "WIDTH": 32}  # 顺序与定义不同
+        collection.get_module("core2").parameters = {}
+        top = VerilogModule(name="top", file_path="/rtl/顶层.v", module_def_name="top")
+        top.add_port(VerilogPort(name="clk", direction="output"))
+        collection.add_module(top)
+        top.includes = [collection.get_module("core0")]
+        collection.get_module("core0").top_module = top
+        for i in range(399):
+            collection.add_connection(f"core{i}", "out0", f"core{i + 1}", "in0")
+        collection.add_connection("core0", "out1", "core5", "in1", {'high': 7, 'low': 0}, {'high': 15, 'low': 8})
+        collection.add_connection("top", "clk", "core0", "in2", None, {'high': 0, 'low': 0})
+        expected = collection.to_dict()
+
+        normalized = collection.to_dict(normalized=True)
+        assert [d['module_def_name'] for d in normalized['definitions']] == ["core", "top"], \
+            "端口相同、参数不同的实例应共享定义"
+        core = normalized['definitions'][0]
+        assert core['parameters'] == {} and core['file_hash'] == "c0ffee", core['parameters']
+        modules = {m['name']: m for m in normalized['modules']}
+        assert 'ports' not in modules['core3'] and modules['core3']['parameter_overrides'] == {"WIDTH": 32, "ID": 3}
+        assert normalized['connections'][0] == {'source': [0, 1], 'dest': [1, 0]}, normalized['connections'][0]
+        assert normalized['connections'][-2]['dest_bit_range'] == {'high': 15, 'low': 8}, "部分位范围丢失"
+        assert VerilogModuleCollection.from_dict(normalized).to_dict() == expected, "从规范化字典重建的内容错误"
+
+        # 参数顺序不能由定义参数加覆盖参数得到时保存完整的参数
+        small = _build_collection(3)
+        for name, parameters in (("u0", {"W": 8, "ID": 0}), ("u1", {"W": 8, "ID": 1}), ("u2", {"ID": 2, "W": 8})):
+            small.get_module(name).parameters = parameters
+        small_dict = small.to_dict(normalized=True)
+        assert small_dict['definitions'][0]['parameters'] == {"W": 8}, small_dict['definitions']
+        assert [m.get('parameter_overrides') for m in small_dict['modules']] == [{"ID": 0}, {"ID": 1}, None]
+        assert small_dict['modules'][2]['parameters'] == {"ID": 2, "W": 8}, small_dict['modules'][2]
+        restored = VerilogModuleCollection.from_dict(small_dict)
+        assert [list(m.parameters.items()) for m in restored.modules] == \
+            [list(m.parameters.items()) for m in small.modules], "参数或参数顺序错误"
+
+        # 流式保存和加载，元数据中记录schema_version
+        legacy_path = os.path.join(temp_dir, "legacy.json")
+        normalized_path = os.path.join(temp_dir, "normalized.json")
+        collection.save_to_file(legacy_path)
+        collection.save_to_file(normalized_path, normalized=True)
+        with open(normalized_path, encoding="utf-8") as f:
+            data = json.load(f)
+        assert data['metadata']['schema_version'] == 2 and data['definitions'] == normalized['definitions']
+        assert VerilogModuleCollection.load_from_file(normalized_path).to_dict() == expected, "规范化文件加载错误"
+        assert VerilogModuleCollection.load_from_file(legacy_path).to_dict() == expected, "旧格式文件加载错误"
+        legacy_size, normalized_size = os.path.getsize(legacy_path), os.path.getsize(normalized_path)
+        assert normalized_size * 10 < legacy_size, (legacy_size, normalized_size)
+        print(f"  旧格式 {legacy_size // 1024}KB，规范化格式 {normalized_size // 1024}KB")
+
+        # 自动保存写入规范化格式，比较工具和SQLite导入都能读取
+        worker = AutosaveWorker()
+        autosave_path = os.path.join(temp_dir, "autosave.json")
+        worker.request(collection, autosave_path, immediate=True)
+        results = worker.close(timeout=30)
+        assert results and results[0].is_success(), results and results[0].error
+        with open(autosave_path, encoding="utf-8") as f:
+            assert 'definitions' in json.load(f), "自动保存没有使用规范化格式"
+        assert not list(iter_diff(legacy_path, autosave_path)), "比较工具读取规范化文件的结果错误"
+        store = SqliteCollectionStore(os.path.join(temp_dir, "imported.db"))
+        assert store.import_json(autosave_path) == 0, "SQLite导入规范化文件时有连接失败"
+        assert store.load_collection().to_dict() == expected, "SQLite导入规范化文件的内容错误"
+        store.close()
+
+    print("✓ 规范化格式测试通过!")
+
+
+# 测试按内容寻址的会话目录：数据块去重、单次调用恢复、保留策略和垃圾回收
+def test_session_store():
+    print("开始测试会话目录...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collection = _build_collection(3000)
+        for i in range(1, 2999):
+            collection.add_connection(f"u{i}", "dout", f"u{i + 1}", "din")
+        collection.get_module("u0").includes.append(collection.get_module("u1"))
+        collection.get_module("u5").parameters = {"WIDTH": 8}
+        store = SessionStore(temp_dir)
+
+        first = store.save(collection.iter_records(), {'version': '1.0'}, os.path.join(temp_dir, "collection_1.manifest"))
+        assert is_session_manifest(first), "会话清单格式错误"
+        assert load_session_manifest(first).to_dict() == collection.to_dict(), "从会话清单恢复的内容错误"
+        first_objects = store.get_disk_usage()[2]
+
+        # 小的编辑只写入附近的数据块
+        collection.remove_slave_port_connection(collection.get_module("u1500").get_port("din"))
+        collection.get_module("u2000").parameters = {"WIDTH": 16}
+        collection.add_connection("u2999", "dout", "u0", "din")
+        second = store.save(collection.iter_records(), None, os.path.join(temp_dir, "collection_2.manifest"))
+        new_objects = SessionStore.read_manifest(second)['new_objects']
+        assert new_objects <= 6, f"小的编辑写入了 {new_objects} 个数据块（共 {first_objects} 个）"
+        expected = collection.to_dict()
+        assert load_session_manifest(second).to_dict() == expected, "第二个会话恢复的内容错误"
+        assert load_session_manifest(first).to_dict() != expected, "历史会话被修改"
+
+        json_path = os.path.join(temp_dir, "full.json")
+        collection.save_to_file(json_path)
+        session_bytes, object_bytes, object_count = store.get_disk_usage()
+        print(f"  完整JSON {os.path.getsize(json_path) // 1024}KB，两个会话的清单 {session_bytes // 1024}KB + "
+              f"数据块 {object_bytes // 1024}KB（{object_count} 个，第二次保存新增 {new_objects} 个）")
+        os.remove(json_path)
+
+        # 保留策略：保留最近的会话和每天的最后一个会话，受保护的会话和旧格式的完整文件按同样的规则处理
+        now = time.time()
+        old_paths = []
+        for day, name in ((30, "collection_old.json"), (20, "collection_3.manifest"), (3, "collection_4.manifest"),
+                          (2.5, "collection_5.manifest"), (2, "collection_6.manifest")):
+            path = os.path.join(temp_dir, name)
+            if name.endswith(".json"):
+                _build_collection().save_to_file(path)
+            else:
+                modified = _build_collection(10)
+                modified.get_module("u9").parameters = {"DAY": day}
+                store.save(modified.iter_records(), None, path)
+            os.utime(path, (now - day * 86400, now - day * 86400))
+            old_paths.append(path)
+        os.utime(first, (now - 40 * 86400, now - 40 * 86400))
+        report = store.apply_retention(keep_last=1, keep_days=3, protected=[first], now=now)
+        remaining = {os.path.basename(path) for path in store.list_sessions()}
+        # collection_5和collection_4是同一天（2.5天和3天前）的话只保留较新的一个，日期边界取决于当前时间
+        assert {"collection_1.manifest", "collection_2.manifest", "collection_6.manifest"} <= remaining, remaining
+        assert not {"collection_old.json", "collection_3.manifest"} & remaining, remaining
+        assert len(report.removed_sessions) + report.kept_sessions == 7, report.get_summary()
+
+        # 垃圾回收只删除不被剩余会话引用的数据块，保护期内的数据块不删除
+        assert store.collect_garbage(grace_seconds=3600).removed_objects == 0, "保护期内的数据块被删除"
+        report = store.collect_garbage(grace_seconds=0)
+        assert report.removed_objects > 0, report.get_summary()
+        assert store.collect_garbage(grace_seconds=0).removed_objects == 0, "第二次回收不应再删除数据块"
+        for path in store.list_sessions():
+            store.load(path)
+        assert load_session_manifest(second).to_dict() == expected, "回收后会话无法恢复"
+
+        # 损坏的数据块被发现并删除，之后的保存重新写入该数据块
+        digest = SessionStore.read_manifest(second)['sections']['connections'][0][0]
+        with open(store._object_path(digest), 'wb') as f:
+            f.write(zlib.compress(b'{}\n'))
+        try:
+            load_session_manifest(second)
+            assert False, "损坏的数据块应该抛出ValueError"
+        except ValueError:
+            pass
+
+        # 自动保存写入会话清单，会话日志可以以它为快照恢复
+        autosave_path = os.path.join(temp_dir, "collection_7.manifest")
+        worker = AutosaveWorker(path_factory=lambda: autosave_path)
+        worker.request(collection, immediate=True)
+        results = worker.close(timeout=30)
+        assert results and results[0].is_success(), results and results[0].error
+        journal = SessionJournal(os.path.join(temp_dir, SessionJournal.FILE_NAME))
+        journal.attach(collection, autosave_path)
+        journal.record_disconnect_source(collection.get_module("u10").get_port("dout"))
+        journal.close()
+        recovered, report = SessionJournal.recover(journal.journal_path)
+        assert report.replayed == 1 and not report.failed, report.get_summary()
+        assert len(recovered.connections) == len(collection.connections) - 1, "从会话清单恢复的结果错误"
+
+    print("✓ 会话目录测试通过!")
+
+
+if __name__ == "__main__":
+    try:
+        test_session_journal()
+        test_autosave_worker()
+        test_streaming_writer()
+        test_streaming_loader()
+        test_sqlite_backend()
+        test_binary_session()
+        test_normalized_schema()
+        test_session_store()
+        print("\n🎉 所有测试都通过了!")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
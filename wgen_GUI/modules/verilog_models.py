@@ -100,6 +100,11 @@ class VerilogModule:
         self.includes:list[VerilogModule] = []  # 存储包含的模块对象
         self.top_module:VerilogModule = None  # 指向顶级模块的引用
         self.need_gen:bool = False  # 是否需要生成该模块的Verilog代码
+        self.file_hash:str = None  # 解析时RTL文件内容的哈希值，用于增量更新
+        
+        # 端口名索引，端口列表被替换或长度变化时自动重建
+        self._port_index:dict[str, VerilogPort] = {}
+        self._port_index_key = None
     
     def add_port(self, port):
         """
@@ -109,8 +114,13 @@ class VerilogModule:
             port (VerilogPort): 要添加的端口对象
         """
         if isinstance(port, VerilogPort):
+            # 索引与端口列表一致时增量更新，否则在下次查找时重建
+            index_is_current = self._port_index_key == (id(self.ports), len(self.ports))
             self.ports.append(port)
             port.father_module = self  # 记录端口所属模块
+            if index_is_current:
+                self._port_index.setdefault(port.name, port)
+                self._port_index_key = (id(self.ports), len(self.ports))
         else:
             raise TypeError("添加的端口必须是VerilogPort类型")
 
@@ -149,6 +159,17 @@ class VerilogModule:
         """获取所有双向端口"""
         return self.get_ports_by_direction('inout')
     
+    def _get_port_index(self):
+        """获取端口名索引，端口列表被替换或长度变化时重建"""
+        index_key = (id(self.ports), len(self.ports))
+        if self._port_index_key != index_key:
+            self._port_index = {}
+            for port in self.ports:
+                # 与按顺序查找保持一致，同名端口取第一个
+                self._port_index.setdefault(port.name, port)
+            self._port_index_key = index_key
+        return self._port_index
+    
     def get_port(self, port_name):
         """
         根据端口名称获取端口对象
@@ -159,10 +180,12 @@ class VerilogModule:
         返回:
             VerilogPort or None: 找到的端口对象，如果未找到则返回None
         """
-        for port in self.ports:
-            if port.name == port_name:
-                return port
-        return None
+        port = self._get_port_index().get(port_name)
+        if port is not None and port.name != port_name:
+            # 端口已被重命名，重建索引后再查找
+            self._port_index_key = None
+            port = self._get_port_index().get(port_name)
+        return port
     
     def __str__(self):
         """返回模块的字符串表示"""
@@ -224,6 +247,11 @@ class VerilogModule:
 class VerilogConnection:
     """Verilog连接类，用于描述两个模块之间的连接"""
     
+    @staticmethod
+    def _is_parent(parent_module, child_module):
+        """判断parent_module是否直接包含child_module"""
+        return any(module is child_module for module in getattr(parent_module, 'includes', ()))
+
     def __init__(self, source_module:VerilogModule, source_port:VerilogPort, dest_module:VerilogModule, dest_port:VerilogPort, source_bit_range=None, dest_bit_range=None):
         """
         初始化Verilog连接
@@ -240,10 +268,13 @@ class VerilogConnection:
         # self.source_module = source_module
         # self.dest_module = dest_module
             
-        # 验证端口方向是否兼容
-        if not (source_port.is_output() or source_port.is_inout()):
+        # 验证端口方向是否兼容；经过父模块端口的跨层次连接（端口穿透）中，
+        # 子模块的输出可以连接到父模块的输出端口，父模块的输入端口可以连接到子模块的输入端口
+        if not (source_port.is_output() or source_port.is_inout()
+                or (source_port.is_input() and self._is_parent(source_module, dest_module))):
             raise ValueError(f"源端口 '{source_port.name}' 必须是输出或双向端口")
-        if not (dest_port.is_input() or dest_port.is_inout()):
+        if not (dest_port.is_input() or dest_port.is_inout()
+                or (dest_port.is_output() and self._is_parent(dest_module, source_module))):
             raise ValueError(f"目标端口 '{dest_port.name}' 必须是输入或双向端口")
         
         self.source_port = source_port
@@ -344,6 +375,14 @@ class VerilogModuleCollection:
         """初始化模块集合"""
         self.modules: list[VerilogModule] = []  # 存储模块列表
         self.connections: list[VerilogConnection] = []  # 存储模块之间的连接
+        
+        # 模块名索引，模块列表被替换或长度变化时自动重建
+        self._module_index: dict[str, VerilogModule] = {}
+        self._module_index_key = None
+        
+        # 层次结构索引，首次使用时建立
+        self._hierarchy_index = None
+        self._hierarchy_index_key = None
     
     def add_module(self, module):
         """
@@ -354,7 +393,7 @@ class VerilogModuleCollection:
         """
         if isinstance(module, VerilogModule):
             # 确保模块名称唯一
-            if any(m.name == module.name for m in self.modules):
+            if self.get_module(module.name) is not None:
                 raise ValueError(f"模块名称 '{module.name}' 已存在")
             
             # 为端口添加模块名称属性，方便在连接时识别
@@ -362,9 +401,20 @@ class VerilogModuleCollection:
                 port.__module_name = module.name
                 
             self.modules.append(module)
+            # 增量更新模块名索引
+            self._module_index[module.name] = module
+            self._module_index_key = (id(self.modules), len(self.modules))
         else:
             raise TypeError("添加的模块必须是VerilogModule类型")
     
+    def _get_module_index(self):
+        """获取模块名索引，模块列表被替换或长度变化时重建"""
+        index_key = (id(self.modules), len(self.modules))
+        if self._module_index_key != index_key:
+            self._module_index = {module.name: module for module in self.modules}
+            self._module_index_key = index_key
+        return self._module_index
+    
     def get_module(self, module_name):
         """
         根据模块名称获取模块对象
@@ -375,10 +425,65 @@ class VerilogModuleCollection:
         返回:
             VerilogModule or None: 找到的模块对象，如果未找到则返回None
         """
-        for module in self.modules:
-            if module.name == module_name:
-                return module
-        return None
+        module = self._get_module_index().get(module_name)
+        if module is not None and module.name != module_name:
+            # 模块已被重命名，重建索引后再查找
+            self._module_index_key = None
+            module = self._get_module_index().get(module_name)
+        return module
+    
+    def get_hierarchy_index(self):
+        """
+        获取模块层次结构索引，模块列表变化时重建
+        
+        通过add_include/remove_include修改包含关系时索引会增量更新，
+        直接修改includes后需要调用invalidate_hierarchy_index。
+        
+        返回:
+            HierarchyIndex: 层次结构索引
+        """
+        # 尝试相对导入，如果失败则使用绝对导入
+        try:
+            from .hierarchy_index import HierarchyIndex
+        except ImportError:
+            from hierarchy_index import HierarchyIndex
+        
+        index_key = (id(self.modules), len(self.modules))
+        if self._hierarchy_index is None or self._hierarchy_index_key != index_key:
+            self._hierarchy_index = HierarchyIndex(self.modules)
+            self._hierarchy_index_key = index_key
+        return self._hierarchy_index
+    
+    def invalidate_hierarchy_index(self):
+        """使层次结构索引失效，下次使用时重建"""
+        self._hierarchy_index = None
+    
+    def add_include(self, parent_module: VerilogModule, child_module: VerilogModule):
+        """
+        将子模块加入父模块的包含关系，并增量更新层次结构索引
+        
+        参数:
+            parent_module (VerilogModule): 父模块
+            child_module (VerilogModule): 子模块
+        """
+        parent_module.includes.append(child_module)
+        child_module.top_module = parent_module
+        if self._hierarchy_index is not None:
+            self._hierarchy_index.update_includes(parent_module)
+    
+    def remove_include(self, parent_module: VerilogModule, child_module: VerilogModule):
+        """
+        从父模块的包含关系中移除子模块，并增量更新层次结构索引
+        
+        参数:
+            parent_module (VerilogModule): 父模块
+            child_module (VerilogModule): 子模块
+        """
+        parent_module.includes = [module for module in parent_module.includes if module is not child_module]
+        if child_module.top_module is parent_module:
+            child_module.top_module = None
+        if self._hierarchy_index is not None:
+            self._hierarchy_index.update_includes(parent_module)
     
     def connect_port(self, from_port:VerilogPort, to_port: VerilogPort, 
                      source_bit_range=None, dest_bit_range=None):
@@ -457,17 +562,67 @@ class VerilogModuleCollection:
         )
         self.connections.append(connection)
         
-        # 更新端口的源和目的地信息
-        # 源端口是输出端口或双向端口
-        if source_port.is_output() or source_port.is_inout():
-            # 将目标端口添加到源端口的destinations列表中
-            if dest_port not in source_port.destinations:
-                source_port.destinations.append(dest_port)
-        
-        # 目标端口是输入端口或双向端口
-        if dest_port.is_input() or dest_port.is_inout():
-            dest_port.source = source_port
-    
+        # 更新端口的源和目的地信息（端口方向已在创建VerilogConnection时检查，
+        # 端口穿透的连接中源端口也可能是父模块的输入端口、目标端口也可能是父模块的输出端口）
+        # 将目标端口添加到源端口的destinations列表中
+        if dest_port not in source_port.destinations:
+            source_port.destinations.append(dest_port)
+        dest_port.source = source_port
+
+    def connect_ports(self, pairs):
+        """
+        在一个事务中批量连接端口，任意一个连接失败时撤销本批次的所有连接
+
+        与逐个调用connect_port相比，不需要按名称查找模块和端口，
+        destinations去重使用集合，适合一次创建大量连接（例如广播连接）。
+
+        参数:
+            pairs (iterable): 元素为 (源端口, 目标端口) 或 (源端口, 目标端口, 源位范围, 目标位范围)
+
+        返回:
+            list[VerilogConnection]: 新建的连接列表
+
+        异常:
+            ValueError: 端口方向或位宽不匹配、目标端口已有驱动时抛出，此时数据库保持不变
+        """
+        created = []
+        appended = []  # 每个新连接是否向源端口destinations追加了目标端口，用于回滚
+        start = len(self.connections)
+        # 每个源端口当前destinations的id集合，避免在大扇出时线性查找
+        dest_ids: dict[int, set] = {}
+        try:
+            for pair in pairs:
+                from_port, to_port = pair[0], pair[1]
+                source_bit_range = pair[2] if len(pair) > 2 and pair[2] is not None else from_port.width.copy()
+                dest_bit_range = pair[3] if len(pair) > 3 and pair[3] is not None else to_port.width.copy()
+                if source_bit_range['high'] - source_bit_range['low'] != dest_bit_range['high'] - dest_bit_range['low']:
+                    raise ValueError(f"源端口 {from_port.name} 位宽与目标端口 {to_port.name} 位宽不匹配")
+                if to_port.source is not None:
+                    raise ValueError(f"目标端口 {to_port.father_module.name}.{to_port.name} 已有驱动")
+
+                connection = VerilogConnection(from_port.father_module, from_port, to_port.father_module, to_port,
+                                               source_bit_range, dest_bit_range)
+                ids = dest_ids.get(id(from_port))
+                if ids is None:
+                    ids = dest_ids[id(from_port)] = {id(port) for port in from_port.destinations}
+                is_new_dest = id(to_port) not in ids
+                if is_new_dest:
+                    ids.add(id(to_port))
+                    from_port.destinations.append(to_port)
+                to_port.source = from_port
+                self.connections.append(connection)
+                created.append(connection)
+                appended.append(is_new_dest)
+        except Exception:
+            # 回滚：按相反顺序撤销本批次的连接
+            for conn, is_new_dest in zip(reversed(created), reversed(appended)):
+                conn.dest_port.source = None
+                if is_new_dest:
+                    conn.source_port.destinations.pop()
+            del self.connections[start:]
+            raise
+        return created
+
 
     def remove_master_port_connections(self, master_port: VerilogPort):
         """
@@ -605,6 +760,97 @@ class VerilogModuleCollection:
         return [conn for conn in self.connections \
                 if (conn.source_module_name == module_name or conn.dest_module_name == module_name)]
     
+    def iter_cone(self, start_port: VerilogPort, direction='fanout', max_depth=None, module_filter=None, strategy='bfs'):
+        """
+        遍历端口的传递扇出锥（负载）或扇入锥（驱动）
+        
+        端口之间的连接沿 source/destinations 邻接关系遍历，模块内部视为黑盒：
+        扇出时到达模块的输入端口后继续经过该模块的所有输出端口，扇入时反之。
+        每个端口只访问一次，代价与锥的大小成正比。
+        
+        参数:
+            start_port (VerilogPort): 起始端口
+            direction (str): 'fanout' 查询负载锥，'fanin' 查询驱动锥
+            max_depth (int or None): 最多经过的连接数，None表示不限制
+            module_filter (callable or iterable or None): 只进入满足条件的模块，
+                可以是接收VerilogModule返回bool的函数，也可以是模块名集合
+            strategy (str): 'bfs' 广度优先，'dfs' 深度优先
+        
+        返回:
+            generator: 依次生成 (深度, 端口)，深度为从起始端口经过的连接数，不包含起始端口本身
+        """
+        from collections import deque
+        
+        if direction not in ('fanout', 'fanin'):
+            raise ValueError(f"不支持的遍历方向 '{direction}'，可选值: 'fanout', 'fanin'")
+        if strategy not in ('bfs', 'dfs'):
+            raise ValueError(f"不支持的遍历策略 '{strategy}'，可选值: 'bfs', 'dfs'")
+        
+        if module_filter is None:
+            allowed = lambda module: True
+        elif callable(module_filter):
+            allowed = module_filter
+        else:
+            module_names = set(module_filter)
+            allowed = lambda module: module is not None and module.name in module_names
+        
+        fanout = direction == 'fanout'
+        # 连接的出口方向（扇出为输出端口，扇入为输入端口）
+        exit_directions = ('output', 'inout') if fanout else ('input', 'inout')
+        
+        def connected_ports(port):
+            if fanout:
+                return port.destinations
+            return [port.source] if port.source is not None else []
+        
+        # 每个模块只展开一次，之后再次进入时其出口端口已全部访问过
+        expanded_modules = set()
+        
+        def through_module_ports(port):
+            module = port.father_module
+            if module is None or id(module) in expanded_modules:
+                return []
+            expanded_modules.add(id(module))
+            return [other for other in module.ports if other is not port and other.direction in exit_directions]
+        
+        visited = {id(start_port)}
+        pending = deque()
+        # 起始端口不在出口方向时，先穿过所属模块
+        if start_port.direction in exit_directions:
+            pending.append((0, start_port))
+        else:
+            for port in through_module_ports(start_port):
+                if id(port) not in visited:
+                    visited.add(id(port))
+                    pending.append((0, port))
+                    yield 0, port
+        
+        while pending:
+            depth, port = pending.popleft() if strategy == 'bfs' else pending.pop()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for next_port in connected_ports(port):
+                if id(next_port) in visited or not allowed(next_port.father_module):
+                    continue
+                visited.add(id(next_port))
+                yield depth + 1, next_port
+                # 到达端口后穿过所属模块继续遍历（双向端口本身也可以继续）
+                if next_port.direction in exit_directions:
+                    pending.append((depth + 1, next_port))
+                for through_port in through_module_ports(next_port):
+                    if id(through_port) not in visited:
+                        visited.add(id(through_port))
+                        yield depth + 1, through_port
+                        pending.append((depth + 1, through_port))
+    
+    def get_fanout_cone(self, port: VerilogPort, max_depth=None, module_filter=None):
+        """获取端口的传递扇出锥，返回 (深度, 端口) 列表"""
+        return list(self.iter_cone(port, 'fanout', max_depth, module_filter))
+    
+    def get_fanin_cone(self, port: VerilogPort, max_depth=None, module_filter=None):
+        """获取端口的传递扇入锥，返回 (深度, 端口) 列表"""
+        return list(self.iter_cone(port, 'fanin', max_depth, module_filter))
+    
     def get_hierarchy_summary(self):
         """获取模块层次结构摘要"""
         result = "Module Hierarchy:\n"
@@ -643,49 +889,107 @@ class VerilogModuleCollection:
         
         return result
         
-    def to_dict(self):
-        """将模块集合转换为可序列化的字典
+    @staticmethod
+    def module_to_dict(module: VerilogModule):
+        """将单个模块转换为可序列化的字典
         
+        参数:
+            module (VerilogModule): 要序列化的模块
+            
         返回:
-            dict: 包含所有模块和连接信息的字典
+            dict: 包含模块属性和端口信息的字典
         """
-        # 首先序列化所有模块
-        modules_dict = []
-        for module in self.modules:
-            module_info = {
-                'name': module.name,
-                'file_path': module.file_path,
-                'module_def_name': module.module_def_name,
-                'ports': [],
-                'includes': [included_module.name for included_module in module.includes],
-                'top_module_name': module.top_module.name if module.top_module else None,
-                'need_gen': module.need_gen,
-                'parameters': module.parameters
+        module_info = {
+            'name': module.name,
+            'file_path': module.file_path,
+            'module_def_name': module.module_def_name,
+            'ports': [],
+            'includes': [included_module.name for included_module in module.includes],
+            'top_module_name': module.top_module.name if module.top_module else None,
+            'need_gen': module.need_gen,
+            'parameters': module.parameters,
+            'file_hash': module.file_hash
+        }
+        
+        # 序列化模块的所有端口
+        for port in module.ports:
+            port_info = {
+                'name': port.name,
+                'direction': port.direction,
+                'width': port.width
             }
+            module_info['ports'].append(port_info)
+        
+        return module_info
+    
+    @staticmethod
+    def connection_to_dict(conn: VerilogConnection):
+        """将单个连接转换为可序列化的字典
+        
+        参数:
+            conn (VerilogConnection): 要序列化的连接
             
-            # 序列化模块的所有端口
-            for port in module.ports:
-                port_info = {
-                    'name': port.name,
-                    'direction': port.direction,
-                    'width': port.width
-                }
-                module_info['ports'].append(port_info)
-            
-            modules_dict.append(module_info)
+        返回:
+            dict: 包含连接两端模块、端口和位范围的字典
+        """
+        return {
+            'source_module_name': conn.source_module_name,
+            'source_port_name': conn.source_port.name,
+            'dest_module_name': conn.dest_module_name,
+            'dest_port_name': conn.dest_port.name,
+            'source_bit_range': conn.source_bit_range,
+            'dest_bit_range': conn.dest_bit_range
+        }
+    
+    def iter_records(self, normalized=False):
+        """按序列化顺序逐条生成模块和连接记录，避免一次性构建完整字典
         
-        # 然后序列化所有连接
-        connections_dict = []
-        for conn in self.connections:
-            conn_info = {
-                'source_module_name': conn.source_module_name,
-                'source_port_name': conn.source_port.name,
-                'dest_module_name': conn.dest_module_name,
-                'dest_port_name': conn.dest_port.name,
-                'source_bit_range': conn.source_bit_range,
-                'dest_bit_range': conn.dest_bit_range
-            }
-            connections_dict.append(conn_info)
+        参数:
+            normalized (bool): 为True时生成规范化格式的记录（见session_schema），
+                               共享定义的实例只保存一次端口列表，连接使用端口序号
+        
+        模块列表和连接列表在调用时复制，之后连接或断开端口不影响生成的记录，
+        生成的记录与调用时的数据库一致（后台保存的快照依赖这一点）。
+        
+        返回:
+            generator: 依次生成 ('modules', 模块字典) 和 ('connections', 连接字典) 元组，
+                       normalized时在最前面生成 ('definitions', 定义字典) 元组
+        """
+        records = self._iter_records(list(self.modules), list(self.connections))
+        if normalized:
+            # 尝试相对导入，如果失败则使用绝对导入
+            try:
+                from .session_schema import normalize_records
+            except ImportError:
+                from session_schema import normalize_records
+            return normalize_records(records)
+        return records
+    
+    def _iter_records(self, modules, connections):
+        """逐条生成模块和连接记录"""
+        for module in modules:
+            yield 'modules', self.module_to_dict(module)
+        for conn in connections:
+            yield 'connections', self.connection_to_dict(conn)
+    
+    def to_dict(self, normalized=False):
+        """将模块集合转换为可序列化的字典
+        
+        参数:
+            normalized (bool): 为True时返回规范化格式（包含definitions）
+        
+        返回:
+            dict: 包含所有模块和连接信息的字典
+        """
+        if normalized:
+            data_dict = {'definitions': [], 'modules': [], 'connections': []}
+            for key, record in self.iter_records(normalized=True):
+                data_dict[key].append(record)
+            return data_dict
+        
+        # 首先序列化所有模块，然后序列化所有连接
+        modules_dict = [self.module_to_dict(module) for module in self.modules]
+        connections_dict = [self.connection_to_dict(conn) for conn in self.connections]
         
         # 返回完整的字典表示
         return {
@@ -707,74 +1011,129 @@ class VerilogModuleCollection:
         """从字典中创建VerilogModuleCollection对象
         
         参数:
-            data_dict (dict): 包含模块和连接信息的字典
+            data_dict (dict): 包含模块和连接信息的字典，旧格式或规范化格式（包含definitions）
+            
+        返回:
+            VerilogModuleCollection: 重建的模块集合对象
+        """
+        records = [('definitions', definition) for definition in data_dict.get('definitions', [])]
+        records += [('modules', module_info) for module_info in data_dict.get('modules', [])]
+        records += [('connections', conn_info) for conn_info in data_dict.get('connections', [])]
+        return cls.from_records(records)
+    
+    @classmethod
+    def from_records(cls, records):
+        """从iter_records格式的记录流中创建VerilogModuleCollection对象
+        
+        每条模块记录到达时立即创建模块和端口，每条连接记录到达时立即建立连接，
+        只有模块之间的引用（includes和top_module）以名称形式暂存，在所有模块创建后恢复。
+        规范化格式的记录（definitions、引用定义的实例和使用端口序号的连接）先转换为旧格式。
+        
+        参数:
+            records (iterable): ('definitions', 定义字典)、('modules', 模块字典) 和 ('connections', 连接字典) 元组，
+                                其他键被忽略
             
         返回:
             VerilogModuleCollection: 重建的模块集合对象
         """
+        # 尝试相对导入，如果失败则使用绝对导入
+        try:
+            from .session_schema import denormalize_records
+        except ImportError:
+            from session_schema import denormalize_records
+        records = denormalize_records(records)
+        
         # 创建空的模块集合
         collection = cls()
+        references = []  # (模块, includes名称列表, top_module名称)
+        restored = 0  # 已恢复引用关系的模块数
+        deferred_connections = []  # 出现在所有模块之前的连接
+
+        def restore_references():
+            # 建立模块之间的引用关系（includes和top_module）。端口穿透的连接需要检查父子关系，
+            # 所以在创建第一个连接之前恢复
+            nonlocal restored
+            module_map = collection._get_module_index()
+            for module, include_names, top_module_name in references[restored:]:
+                # 恢复includes引用
+                for included_module_name in include_names:
+                    if included_module_name in module_map:
+                        module.includes.append(module_map[included_module_name])
+                
+                # 恢复top_module引用
+                if top_module_name and top_module_name in module_map:
+                    module.top_module = module_map[top_module_name]
+            restored = len(references)
+        
+        for key, record in records:
+            if key == 'modules':
+                module = cls._module_from_record(record)
+                collection.add_module(module)
+                references.append((module, record.get('includes', []), record.get('top_module_name')))
+            elif key == 'connections':
+                # 正常的文件中modules在connections之前，否则等模块全部创建后再连接
+                if references:
+                    if restored < len(references):
+                        restore_references()
+                    collection._connect_record(record)
+                else:
+                    deferred_connections.append(record)
+        restore_references()
+        
+        for record in deferred_connections:
+            collection._connect_record(record)
+        return collection
+    
+    @staticmethod
+    def _module_from_record(module_info):
+        """从模块字典创建模块和端口（不包括模块之间的引用）"""
+        module = VerilogModule(
+            name=module_info['name'],
+            file_path=module_info.get('file_path', ''),
+            module_def_name=module_info.get('module_def_name', '')
+        )
         
-        # 首先重建所有模块
-        module_map = {}
-        for module_info in data_dict.get('modules', []):
-            module = VerilogModule(
-                name=module_info['name'],
-                file_path=module_info.get('file_path', ''),
-                module_def_name=module_info.get('module_def_name', '')
+        # 重建模块的所有端口
+        for port_info in module_info.get('ports', []):
+            port = VerilogPort(
+                name=port_info['name'],
+                direction=port_info['direction'],
+                width=VerilogModuleCollection._copy_range(port_info.get('width')) or {'high': 0, 'low': 0}
             )
-            
-            # 重建模块的所有端口
-            for port_info in module_info.get('ports', []):
-                port = VerilogPort(
-                    name=port_info['name'],
-                    direction=port_info['direction'],
-                    width=port_info.get('width', {'high': 0, 'low': 0})
-                )
-                module.add_port(port)
-            
-            # 保存模块信息以便后续建立引用关系
-            module_info['__module_object'] = module
-            collection.add_module(module)
-            module_map[module.name] = module
-        
-        # 建立模块之间的引用关系（includes和top_module）
-        for module_info in data_dict.get('modules', []):
-            module = module_info['__module_object']
-            
-            # 恢复includes引用
-            for included_module_name in module_info.get('includes', []):
-                if included_module_name in module_map:
-                    module.includes.append(module_map[included_module_name])
-            
-            # 恢复top_module引用
-            top_module_name = module_info.get('top_module_name')
-            if top_module_name and top_module_name in module_map:
-                module.top_module = module_map[top_module_name]
-            
-            # 恢复need_gen属性
-            module.need_gen = module_info.get('need_gen', False)
-            
-            # 恢复parameters属性
-            module.parameters = module_info.get('parameters', {})
+            module.add_port(port)
         
-        # 然后重建所有连接
-        for conn_info in data_dict.get('connections', []):
-            try:
-                # 使用现有的add_connection方法来确保所有验证和引用都正确设置
-                collection.add_connection(
-                    source_module_name=conn_info['source_module_name'],
-                    source_port_name=conn_info['source_port_name'],
-                    dest_module_name=conn_info['dest_module_name'],
-                    dest_port_name=conn_info['dest_port_name'],
-                    source_bit_range=conn_info.get('source_bit_range'),
-                    dest_bit_range=conn_info.get('dest_bit_range')
-                )
-            except Exception as e:
-                # 如果连接创建失败，打印错误信息但继续处理其他连接
-                print(f"警告: 无法创建连接 {conn_info['source_module_name']}.{conn_info['source_port_name']} -> {conn_info['dest_module_name']}.{conn_info['dest_port_name']}: {e}")
+        # 恢复need_gen属性
+        module.need_gen = module_info.get('need_gen', False)
         
-        return collection
+        # 恢复parameters属性
+        module.parameters = dict(module_info.get('parameters') or {})
+        
+        # 恢复文件哈希（旧版本数据库中不存在该字段）
+        module.file_hash = module_info.get('file_hash')
+        return module
+    
+    @staticmethod
+    def _copy_range(bit_range):
+        """复制位范围字典，使用常量键名，避免每条记录解码出的键字符串都被保留在对象图中"""
+        if not bit_range:
+            return None
+        return {'high': bit_range['high'], 'low': bit_range['low']}
+    
+    def _connect_record(self, conn_info):
+        """根据连接字典建立连接，失败时打印警告"""
+        try:
+            # 使用现有的add_connection方法来确保所有验证和引用都正确设置
+            self.add_connection(
+                source_module_name=conn_info['source_module_name'],
+                source_port_name=conn_info['source_port_name'],
+                dest_module_name=conn_info['dest_module_name'],
+                dest_port_name=conn_info['dest_port_name'],
+                source_bit_range=self._copy_range(conn_info.get('source_bit_range')),
+                dest_bit_range=self._copy_range(conn_info.get('dest_bit_range'))
+            )
+        except Exception as e:
+            # 如果连接创建失败，打印错误信息但继续处理其他连接
+            print(f"警告: 无法创建连接 {conn_info['source_module_name']}.{conn_info['source_port_name']} -> {conn_info['dest_module_name']}.{conn_info['dest_port_name']}: {e}")
     
     @classmethod
     def from_json(cls, json_str):
@@ -790,64 +1149,143 @@ class VerilogModuleCollection:
         data_dict = json.loads(json_str)
         return cls.from_dict(data_dict)
     
-    def save_to_file(self, file_path, metadata=None):
+    def save_to_file(self, file_path, metadata=None, compact=False, normalized=False):
         """将模块集合保存到文件
         
+        逐条序列化模块和连接并写入带缓冲的文件，不构建完整的字典，内存占用与数据库大小无关。
+        
         参数:
             file_path (str): 保存文件的路径
             metadata (dict): 可选的元数据信息
+            compact (bool): 为True时输出不带缩进和空格的紧凑JSON
+            normalized (bool): 为True时保存为规范化格式，每个模块定义的端口列表只保存一次
             
         返回:
             bool: 保存是否成功
         """
         try:
-            import json
-            import os
-            import datetime
-            
-            # 获取模块集合的字典表示
-            collection_dict = self.to_dict()
-            
-            # 添加元数据到集合字典中
-            if metadata is None:
-                metadata = {}
-            
-            # 确保元数据包含必要信息
-            metadata.setdefault('version', 'unknown')
-            metadata.setdefault('save_time', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            metadata.setdefault('user', os.getlogin() if hasattr(os, 'getlogin') else 'unknown')
-            
-            # 将元数据添加到集合字典中
-            collection_dict['metadata'] = metadata
-            
-            # 将字典保存到文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(collection_dict, f, indent=2, ensure_ascii=False)
-            
+            with open(file_path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+                self.write_records(f, self.iter_records(normalized), metadata, compact)
             return True
         except Exception as e:
             print(f"错误: 无法保存模块集合到文件 {file_path}: {e}")
             return False
     
+    @staticmethod
+    def write_records(file_obj, records, metadata=None, compact=False):
+        """把iter_records格式的记录流式写入JSON文件
+        
+        输出与 json.dump(to_dict() + metadata, indent=2, ensure_ascii=False) 完全相同
+        （compact时与 separators=(',', ':') 相同），每次只序列化一条记录，每256条写入一次文件。
+        第一条记录是definitions时按规范化格式写入，元数据中记录schema_version。
+        
+        参数:
+            file_obj: 以文本模式打开的文件对象
+            records (iterable): ('definitions', 定义字典)（可选）、('modules', 模块字典) 和
+                                ('connections', 连接字典) 元组，按该顺序排列
+            metadata (dict or None): 元数据，缺少的version、save_time、user字段会被补全
+            compact (bool): 为True时输出紧凑JSON
+        """
+        import json
+        import getpass
+        import datetime
+        import itertools
+        
+        # 确保元数据包含必要信息
+        if metadata is None:
+            metadata = {}
+        metadata.setdefault('version', 'unknown')
+        metadata.setdefault('save_time', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        metadata.setdefault('user', getpass.getuser())
+        
+        if compact:
+            newline, pad, colon = '', '', ':'
+            compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+            encode = lambda value, depth: compact_encoder.encode(value)
+        else:
+            newline, pad, colon = '\n', '  ', ': '
+            encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+            # 字符串中的换行会被转义，输出中的换行都是缩进产生的，可以直接加上外层缩进
+            encode = lambda value, depth: encoder.encode(value).replace('\n', '\n' + pad * depth)
+        
+        records = iter(records)
+        first = next(records, None)
+        sections = ('modules', 'connections')
+        if first is not None:
+            if first[0] == 'definitions':
+                # 尝试相对导入，如果失败则使用绝对导入
+                try:
+                    from .session_schema import SCHEMA_VERSION
+                except ImportError:
+                    from session_schema import SCHEMA_VERSION
+                sections = ('definitions',) + sections
+                metadata['schema_version'] = SCHEMA_VERSION
+            records = itertools.chain([first], records)
+        
+        buffer = ['{']
+        current = None  # 正在写入的数组
+        count = 0  # 当前数组中已写入的记录数
+        
+        def open_sections(last):
+            """关闭当前数组，依次打开到sections[last]为止的数组（没有记录的数组写为空数组）"""
+            nonlocal current, count
+            for section in sections[sections.index(current) + 1 if current else 0:last + 1]:
+                if current is not None:
+                    buffer.append(newline + pad + ']' if count else ']')
+                buffer.append(('' if current is None else ',') + newline + pad + f'"{section}"' + colon + '[')
+                current, count = section, 0
+        
+        for key, record in records:
+            if key != current:
+                open_sections(sections.index(key))
+            buffer.append(('' if count == 0 else ',') + newline + pad * 2 + encode(record, 2))
+            count += 1
+            if len(buffer) >= 256:
+                file_obj.write(''.join(buffer))
+                buffer.clear()
+        open_sections(len(sections) - 1)
+        buffer.append(newline + pad + ']' if count else ']')
+        buffer.append(',' + newline + pad + '"metadata"' + colon + encode(metadata, 1) + newline + '}')
+        file_obj.write(''.join(buffer))
+    
     @classmethod
-    def load_from_file(cls, file_path):
+    def load_from_file(cls, file_path, progress_callback=None):
         """从文件加载模块集合
         
+        流式解析文件，每解析出一条模块或连接记录就立即创建对应的对象，
+        不需要先把整个文件读成Python字典，峰值内存接近最终的对象图。
+        
         参数:
             file_path (str): 加载文件的路径
+            progress_callback (callable or None): progress_callback(已读取字节数, 文件总字节数)，
+                                                  每处理1000条记录调用一次，可以在后台线程中加载时更新进度
             
         返回:
             VerilogModuleCollection or None: 重建的模块集合对象，如果加载失败则返回None
         """
+        import os
+        # 尝试相对导入，如果失败则使用绝对导入
         try:
-            import json
-            
-            # 从文件读取字典
-            with open(file_path, 'r', encoding='utf-8') as f:
-                collection_dict = json.load(f)
-            
-            # 从字典创建模块集合
-            return cls.from_dict(collection_dict)
+            from .json_stream import JsonStreamReader
+        except ImportError:
+            from json_stream import JsonStreamReader
+        
+        try:
+            total_bytes = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                reader = JsonStreamReader(f)
+                
+                def records():
+                    for count, (key, value, is_item) in enumerate(reader.iter_items(), 1):
+                        if is_item:
+                            yield key, value
+                        if progress_callback is not None and count % 1000 == 0:
+                            progress_callback(reader.bytes_read, total_bytes)
+                
+                collection = cls.from_records(records())
+            if progress_callback is not None:
+                progress_callback(total_bytes, total_bytes)
+            return collection
         except Exception as e:
             print(f"错误: 无法从文件 {file_path} 加载模块集合: {e}")
-            return None
\ No newline at end of file
+            return None
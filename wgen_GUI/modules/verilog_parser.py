@@ -1,6 +1,20 @@
 
 import re
-from .verilog_models import VerilogModule, VerilogPort
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .verilog_models import VerilogModule, VerilogPort
+    from .file_cache import compute_content_hash
+    from .hierarchy_validator import validate_hierarchy
+    from .rtl_library import RtlLibraryIndex
+    from .verilog_preprocessor import VerilogFilelist, VerilogPreprocessor
+    from .config_loader import load_config_data
+except ImportError:
+    from verilog_models import VerilogModule, VerilogPort
+    from file_cache import compute_content_hash
+    from hierarchy_validator import validate_hierarchy
+    from rtl_library import RtlLibraryIndex
+    from verilog_preprocessor import VerilogFilelist, VerilogPreprocessor
+    from config_loader import load_config_data
 from tkinter import messagebox
 
 class VerilogParser:
@@ -8,6 +22,12 @@ class VerilogParser:
     
     def __init__(self):
         """初始化解析器"""
+        # 配置文件的编译缓存路径，为None时使用缓存目录中的默认文件，为空字符串时不缓存（见config_loader）
+        self.config_cache_path = None
+        # RTL库索引文件路径，为None时使用缓存目录中的默认文件，为空字符串时不持久化（见RtlLibraryIndex）
+        self.library_index_path = None
+        # 最近一次加载的配置文件使用的预处理器（配置了filelists时），增量更新和文件监视时复用
+        self.preprocessor = None
         # 测试阶段，用于存储固定的端口信息
         self.test_input_ports = ['aa_in', 'bb_in', 'cc_in', 'dd_in', 'rr_in', 'ee_in']
         self.test_output_ports = ['cc_out', 'dd_out']
@@ -16,6 +36,8 @@ class VerilogParser:
         """
         解析配置文件，获取模块名与文件路径的映射关系
         
+        配置文件可以是YAML或等价的JSON，YAML配置的解析结果按文件哈希缓存（见config_loader）
+        
         参数:
             config_file_path: 配置文件路径
         
@@ -24,92 +46,152 @@ class VerilogParser:
         """
 
         modules_ans: list[VerilogModule] = []
+        self.preprocessor = None
         try:
-            import yaml
-            with open(config_file_path, 'r', encoding='utf-8') as f:
-                config_data = yaml.safe_load(f)
-                
-                # 假设配置文件格式为：
-                # modules:
-                #   - module_name: simple_module
-                #     ins_name: u_simple
-                #     path: ./examples/simple_module.v
-                
-                # 解析原始的modules部分
-                if 'modules' in config_data:
-                    for module_info in config_data['modules']:
-                        # 对于每个模块，解析其端口信息
-                        portParser =VerilogPortParser(module_info['path'])
-                        ins_name = module_info.get('ins_name')
-                        module_def_name = module_info.get('module_name')
-
-                        # 直接创建VerilogModule对象
-                        module_obj = VerilogModule(name=ins_name, file_path=portParser.file_path, module_def_name=module_def_name)
-                        
-                        # 添加输入端口
-                        module_obj.add_ports(portParser.get_input_ports())
-                        # 添加输出端口
-                        module_obj.add_ports(portParser.get_output_ports())
-                        
-                        # 添加到模块列表
-                        modules_ans.append(module_obj)
-                
-                # generate_modules:
-                #   - module_name: soc_chip
-                #     path: ./examples/soc_chip.v
-                #   - module_name: sublock
-                #     path: ./examples/sublock.v                    
-                # 解析generate_modules部分
-                if 'generate_modules' in config_data:
-
-                    # 标记需要生成的模块
-                    for gen_module_info in config_data['generate_modules']:
-                        module_name = gen_module_info['module_name']
-                        module_path = gen_module_info['path']
-                        
-                        #创建新的模块对象
-                        module_obj = VerilogModule(
-                            name=module_name,
-                            file_path=module_path,
-                            module_def_name=module_name
-                        )
-
-                        module_obj.need_gen = True 
-                        modules_ans.append(module_obj)
-
-                # hierarchy_def:
-                #   - hierarchy: soc_chip
-                #     includes:
-                #       - u_simple
-                #       - u_simple
-                #       - u_param_module
-                #       - u_complex
-                #       - sublock                
-                # 解析hierarchy_def部分
-                if 'hierarchy_def' in config_data:
-
-                    for hierarchy_info in config_data['hierarchy_def']:
-                        parent_module_name = hierarchy_info['hierarchy']
-                        included_modules = hierarchy_info['includes']
-                        
-                        # edit module include relation
-                        parent_module = self.get_module_by_name(modules_ans, parent_module_name)
-                        if parent_module:
-                            for included_module_name in included_modules:
-                                included_module = self.get_module_by_name(modules_ans, included_module_name)
-                                if included_module:
-                                    parent_module.includes.append(included_module)
-                                    included_module.top_module = parent_module
-                                else:
-                                    messagebox.showwarning("警告", f"未找到包含模块(RTL verilog) {included_module_name}")
-                                    return None
-                        else:
-                            messagebox.showwarning("警告", f"未找到父模块(generate verilog) {parent_module_name}")
+            config_data = load_config_data(config_file_path, self.config_cache_path)
+            
+            # 假设配置文件格式为：
+            # modules:
+            #   - module_name: simple_module
+            #     ins_name: u_simple
+            #     path: ./examples/simple_module.v
+            
+            # library_roots:
+            #   - ./rtl_lib
+            # modules中省略path的模块按module_name在库根目录的索引中查找
+            library_roots = list(config_data.get('library_roots') or [])
+
+            # filelists:
+            #   - ./rtl/top.f
+            # .f文件中的 +incdir+/+define+ 用于预处理所有模块，源文件和 -y 库目录用于按模块名查找
+            preprocessor = None
+            filelist_files = []
+            filelists = config_data.get('filelists') or []
+            if isinstance(filelists, str):
+                filelists = [filelists]
+            if filelists:
+                filelist = VerilogFilelist()
+                for filelist_path in filelists:
+                    filelist.load(filelist_path)
+                preprocessor = VerilogPreprocessor.from_filelist(filelist)
+                self.preprocessor = preprocessor
+                filelist_files = filelist.files
+                library_roots.extend(filelist.library_dirs)
+
+            library = None
+            if library_roots or filelist_files:
+                library = RtlLibraryIndex(self.library_index_path)
+                library.refresh(library_roots, files=filelist_files)
+
+            # 解析原始的modules部分
+            if 'modules' in config_data:
+                for module_info in config_data['modules']:
+                    ins_name = module_info.get('ins_name')
+                    module_def_name = module_info.get('module_name')
+                    module_path = module_info.get('path')
+                    select_module = None
+                    if not module_path:
+                        location = library.lookup(module_def_name) if library else None
+                        if location is None:
+                            messagebox.showerror("错误", f"模块 {module_def_name} 未指定path，且在library_roots和filelists中未找到")
                             return None
+                        # 库文件中可能定义了多个模块，按模块名选择
+                        module_path, select_module = location[0], module_def_name
+
+                    # 对于每个模块，解析其端口信息
+                    portParser =VerilogPortParser(module_path, module_name=select_module, preprocessor=preprocessor)
+
+                    # 直接创建VerilogModule对象
+                    module_obj = VerilogModule(name=ins_name, file_path=portParser.file_path, module_def_name=module_def_name)
+                    # 记录文件哈希，用于增量更新时判断文件是否变化
+                    module_obj.file_hash = portParser.file_hash
+                    
+                    # 添加输入端口
+                    module_obj.add_ports(portParser.get_input_ports())
+                    # 添加输出端口
+                    module_obj.add_ports(portParser.get_output_ports())
+                    
+                    # 添加到模块列表
+                    modules_ans.append(module_obj)
+            
+            # generate_modules:
+            #   - module_name: soc_chip
+            #     path: ./examples/soc_chip.v
+            #   - module_name: sublock
+            #     path: ./examples/sublock.v                    
+            # 解析generate_modules部分
+            if 'generate_modules' in config_data:
+
+                # 标记需要生成的模块
+                for gen_module_info in config_data['generate_modules']:
+                    module_name = gen_module_info['module_name']
+                    module_path = gen_module_info['path']
+                    
+                    #创建新的模块对象
+                    module_obj = VerilogModule(
+                        name=module_name,
+                        file_path=module_path,
+                        module_def_name=module_name
+                    )
+
+                    module_obj.need_gen = True 
+                    modules_ans.append(module_obj)
+
+            # hierarchy_def:
+            #   - hierarchy: soc_chip
+            #     includes:
+            #       - u_simple
+            #       - u_simple
+            #       - u_param_module
+            #       - u_complex
+            #       - sublock                
+            # 解析hierarchy_def部分
+            if 'hierarchy_def' in config_data:
+
+                for hierarchy_info in config_data['hierarchy_def']:
+                    parent_module_name = hierarchy_info['hierarchy']
+                    included_modules = hierarchy_info['includes']
+                    
+                    # edit module include relation
+                    parent_module = self.get_module_by_name(modules_ans, parent_module_name)
+                    if parent_module:
+                        for included_module_name in included_modules:
+                            included_module = self.get_module_by_name(modules_ans, included_module_name)
+                            if included_module:
+                                parent_module.includes.append(included_module)
+                                included_module.top_module = parent_module
+                            else:
+                                messagebox.showwarning("警告", f"未找到包含模块(RTL verilog) {included_module_name}")
+                                return None
+                    else:
+                        messagebox.showwarning("警告", f"未找到父模块(generate verilog) {parent_module_name}")
+                        return None
+
+            # infer_hierarchy: true
+            # 根据RTL中的实例化语句自动推断包含关系，与hierarchy_def中的定义合并
+            if config_data.get('infer_hierarchy'):
+                # 尝试相对导入，如果失败则使用绝对导入（hierarchy_inference依赖本模块，需延迟导入）
+                try:
+                    from .hierarchy_inference import HierarchyInference
+                except ImportError:
+                    from hierarchy_inference import HierarchyInference
+                inference = HierarchyInference().infer(modules_ans)
+                inference.apply(modules_ans)
+                if inference.unresolved or inference.missing_files:
+                    messagebox.showwarning("警告", f"层次结构推断存在以下问题:\n{inference.get_summary()}")
+
+            if 'hierarchy_def' in config_data or config_data.get('infer_hierarchy'):
+                # 校验层次结构：循环包含无法使用，重复包含和多父模块实例给出警告
+                validation = validate_hierarchy(modules_ans)
+                if validation.has_errors():
+                    messagebox.showerror("错误", f"hierarchy_def 存在循环包含:\n{validation.get_summary()}")
+                    return None
+                if validation.has_warnings():
+                    messagebox.showwarning("警告", f"hierarchy_def 存在以下问题:\n{validation.get_summary()}")
 
         except Exception as e:
             # 如果解析失败，返回空列表
-            messagebox.showerror("错误", f"解析yaml配置文件失败: {e}")
+            messagebox.showerror("错误", f"解析配置文件失败: {e}")
         
         return modules_ans
         
@@ -133,17 +215,22 @@ class VerilogParser:
 class VerilogPortParser:
     """Verilog端口解析器，用于解析Verilog文件中的module输入输出端口信息"""
     
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, module_name=None, preprocessor=None):
         """
         初始化Verilog端口解析器
         
         参数:
             file_path (str, optional): Verilog文件路径
+            module_name (str, optional): 要解析的模块名，文件中定义了多个模块时使用，默认解析第一个模块
+            preprocessor (VerilogPreprocessor, optional): 预处理器，提供时先展开 `include/`define/`ifdef 再解析
         """
         self.file_path = file_path
+        self.select_module = module_name
+        self.preprocessor = preprocessor
         self.module_name = None
         self.ports: list[VerilogPort] = []  # 存储解析出的端口信息，使用VerilogPort对象
         self.parameters = {}  # 存储模块参数
+        self.file_hash = None  # 解析时文件内容的哈希值
         
         # 如果提供了文件路径，则立即解析
         if file_path:
@@ -167,11 +254,21 @@ class VerilogPortParser:
             raise ValueError("未提供Verilog文件路径")
         
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            with open(self.file_path, 'rb') as f:
+                raw_content = f.read()
+            # 与文本模式读取保持一致，统一换行符
+            content = raw_content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
         except Exception as e:
             raise IOError(f"无法读取文件: {e}")
         
+        # 记录文件哈希，避免增量更新时重复读取文件
+        self.file_hash = compute_content_hash(raw_content)
+        
+        # 展开 `include/`define/`ifdef，预处理器按文件哈希和宏定义集合缓存展开结果；
+        # 使用已读取的内容，不再读取文件，端口与file_hash对应同一版本的文件
+        if self.preprocessor is not None:
+            content = self.preprocessor.preprocess(self.file_path, raw_content, self.file_hash)
+        
         # 重置解析结果
         self.ports = []
         self.parameters = {}  # 重置参数
@@ -185,6 +282,13 @@ class VerilogPortParser:
         # 删除空白行
         content = re.sub(r'\n\s*\n', '\n', content, flags=re.MULTILINE)
         
+        # 指定了模块名时，从该模块的声明开始解析
+        if self.select_module:
+            match = re.search(rf'\bmodule\s+{re.escape(self.select_module)}\b', content)
+            if not match:
+                raise ValueError(f"文件中未找到模块 {self.select_module}: {self.file_path}")
+            content = content[match.start():]
+        
         # 提取模块名和参数
         self._extract_module_name_and_parameters(content)
         
@@ -416,6 +520,117 @@ class VerilogPortParser:
         
         return summary
 
+# 不是实例化语句的关键字
+NON_INSTANCE_KEYWORDS = {
+    'module', 'endmodule', 'input', 'output', 'inout', 'wire', 'reg', 'logic', 'tri', 'supply0', 'supply1',
+    'assign', 'parameter', 'localparam', 'defparam', 'always', 'always_ff', 'always_comb', 'initial',
+    'genvar', 'generate', 'endgenerate', 'integer', 'function', 'endfunction', 'task', 'endtask',
+    'begin', 'end', 'if', 'else', 'for', 'case', 'endcase', 'timescale',
+}
+_INSTANCE_STATEMENT = re.compile(r'([a-zA-Z_]\w*)\s*(?:#\s*\(.*?\)\s*)?([a-zA-Z_]\w*)\s*(?:\[[^\]]*\]\s*)?\((.*)\)\s*$',
+                                 re.DOTALL)
+
+
+def parse_instance_statement(statement):
+    """
+    解析一条实例化语句，例如 simple_module #(.W(8)) u_simple (.a(x), .b(y))
+
+    参数:
+        statement (str): iter_verilog_statements返回的语句
+
+    返回:
+        tuple or None: (模块定义名, 实例名, 端口连接文本)，不是实例化语句时返回None
+    """
+    match = _INSTANCE_STATEMENT.match(statement)
+    if match is None or match.group(1) in NON_INSTANCE_KEYWORDS:
+        return None
+    return match.group(1), match.group(2), match.group(3)
+
+
+# 语句边界和注释/字符串的起始标记
+_STATEMENT_TOKEN = re.compile(r'//|/\*|"|;|\bendmodule\b')
+
+
+def iter_verilog_statements(file_obj, chunk_size=1 << 16):
+    """
+    流式读取Verilog源文件，逐条返回去掉注释后的语句
+
+    语句以分号结尾（不含分号），endmodule单独作为一条语句返回。
+    按行边界分块读取，注释、字符串和关键字都不会跨块被截断；
+    内存占用只与块大小和最长的单条语句有关，与文件大小无关。
+
+    参数:
+        file_obj: 以文本模式打开的文件对象
+        chunk_size (int): 每次读取的字符数
+
+    返回:
+        generator: 逐条产生语句字符串
+    """
+    pieces = []  # 当前语句已读取的部分
+    in_block_comment = False
+    in_string = False
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        if not chunk.endswith('\n'):
+            chunk += file_obj.readline()
+
+        pos = 0
+        length = len(chunk)
+        while pos < length:
+            if in_block_comment:
+                end = chunk.find('*/', pos)
+                if end < 0:
+                    break
+                pos = end + 2
+                in_block_comment = False
+                pieces.append(' ')
+                continue
+            if in_string:
+                end = chunk.find('"', pos)
+                while end > 0 and chunk[end - 1] == '\\':
+                    end = chunk.find('"', end + 1)
+                if end < 0:
+                    pieces.append(chunk[pos:])
+                    break
+                pieces.append(chunk[pos:end + 1])
+                pos = end + 1
+                in_string = False
+                continue
+
+            match = _STATEMENT_TOKEN.search(chunk, pos)
+            if match is None:
+                pieces.append(chunk[pos:])
+                break
+            pieces.append(chunk[pos:match.start()])
+            token = match.group()
+            pos = match.end()
+            if token == '//':
+                end = chunk.find('\n', pos)
+                pos = length if end < 0 else end
+            elif token == '/*':
+                in_block_comment = True
+            elif token == '"':
+                pieces.append(token)
+                in_string = True
+            elif token == ';':
+                statement = ''.join(pieces).strip()
+                pieces = []
+                if statement:
+                    yield statement
+            else:
+                statement = ''.join(pieces).strip()
+                pieces = []
+                if statement:
+                    yield statement
+                yield 'endmodule'
+
+    statement = ''.join(pieces).strip()
+    if statement:
+        yield statement
+
+
 if __name__ == "__main__":
     parser = VerilogPortParser("C:\\Users\\yqduan\\Documents\\trae_projects\\wgenGUI\\examples\\simple_module.v")
     all_ports = parser.get_summary()
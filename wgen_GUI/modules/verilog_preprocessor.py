@@ -0,0 +1,439 @@
+import ast
+import os
+import re
+
+# 尝试相对导入，如果失败则使用绝对导入
+try:
+    from .file_cache import compute_content_hash
+except ImportError:
+    from file_cache import compute_content_hash
+
+
+_COMMENT_OR_STRING = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"', re.DOTALL)
+_DIRECTIVE = re.compile(r'`([A-Za-z_]\w*)')
+_IDENTIFIER = re.compile(r'[ \t]*([A-Za-z_]\w*)')
+_INCLUDE_TARGET = re.compile(r'[ \t]*(?:"([^"]+)"|<([^>]+)>)')
+
+# 只包含整数和 + - * / % ( ) 的位范围，例如宏展开后的 [8-1:0]
+_CONSTANT_RANGE = re.compile(r'\[([\d\s+\-*/%()]+):([\d\s+\-*/%()]+)\]')
+_CONSTANT_OPERATORS = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b, ast.Mult: lambda a, b: a * b,
+                       ast.Div: lambda a, b: a // b, ast.FloorDiv: lambda a, b: a // b, ast.Mod: lambda a, b: a % b}
+
+# 与端口解析无关的编译指令，直接忽略到行尾
+IGNORED_DIRECTIVES = {
+    'timescale', 'default_nettype', 'resetall', 'celldefine', 'endcelldefine', 'pragma', 'line',
+    'begin_keywords', 'end_keywords', 'unconnected_drive', 'nounconnected_drive',
+    'delay_mode_distributed', 'delay_mode_path', 'delay_mode_unit', 'delay_mode_zero',
+}
+
+
+def strip_comments(text):
+    """删除Verilog注释，保留字符串和换行"""
+    def replace(match):
+        token = match.group()
+        if token.startswith('"'):
+            return token
+        if token.startswith('//'):
+            return ''
+        return '\n' * token.count('\n') or ' '
+    return _COMMENT_OR_STRING.sub(replace, text)
+
+
+def _evaluate_constant(node):
+    """计算只包含整数四则运算的表达式树"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate_constant(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in _CONSTANT_OPERATORS:
+        return _CONSTANT_OPERATORS[type(node.op)](_evaluate_constant(node.left), _evaluate_constant(node.right))
+    raise ValueError("不是常量表达式")
+
+
+def fold_constant_ranges(text):
+    """把位范围中的常量表达式计算为整数，例如宏展开后的 [8-1:0] 变为 [7:0]"""
+    def replace(match):
+        try:
+            high = _evaluate_constant(ast.parse(match.group(1).strip(), mode='eval').body)
+            low = _evaluate_constant(ast.parse(match.group(2).strip(), mode='eval').body)
+        except (SyntaxError, ValueError, ZeroDivisionError):
+            return match.group()
+        return f"[{high}:{low}]"
+    return _CONSTANT_RANGE.sub(replace, text)
+
+
+class VerilogFilelist:
+    """
+    Verilog文件列表（.f文件）
+
+    支持的选项：源文件路径、+incdir+dir1+dir2、+define+NAME=VALUE+NAME、-f/-F 嵌套文件列表、
+    -v 库文件、-y 库目录。其他 + 或 - 开头的选项忽略。路径中的环境变量会被展开，
+    相对路径以所在.f文件的目录为基准。
+    """
+
+    MAX_NESTING = 32
+
+    def __init__(self):
+        self.files: list[str] = []  # 源文件
+        self.include_dirs: list[str] = []  # `include 搜索目录
+        self.defines: dict[str, str] = {}  # 宏定义
+        self.library_dirs: list[str] = []  # -y 库目录
+        self.ignored_options: list[str] = []  # 不支持的选项
+
+    def load(self, file_path, _depth=0):
+        """
+        读取文件列表，结果追加到当前对象中
+
+        参数:
+            file_path (str): .f文件路径
+
+        异常:
+            ValueError: 嵌套层数过多或 -f/-v/-y 缺少参数
+        """
+        if _depth > self.MAX_NESTING:
+            raise ValueError(f"文件列表嵌套层数过多: {file_path}")
+        file_path = os.path.abspath(file_path)
+        base_dir = os.path.dirname(file_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        # 支持 // 和 # 注释
+        text = re.sub(r'//.*$|#.*$', '', strip_comments(text), flags=re.MULTILINE)
+
+        tokens = text.split()
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            index += 1
+            if token.startswith('+incdir+'):
+                self.include_dirs.extend(self._resolve(item, base_dir) for item in token[8:].split('+') if item)
+            elif token.startswith('+define+'):
+                for item in token[8:].split('+'):
+                    if item:
+                        name, _, value = item.partition('=')
+                        self.defines[name] = value
+            elif token in ('-f', '-F', '-v', '-y'):
+                if index >= len(tokens):
+                    raise ValueError(f"{file_path}: 选项 {token} 缺少参数")
+                path = self._resolve(tokens[index], base_dir)
+                index += 1
+                if token in ('-f', '-F'):
+                    self.load(path, _depth + 1)
+                elif token == '-v':
+                    self.files.append(path)
+                else:
+                    self.library_dirs.append(path)
+            elif token.startswith(('+', '-')):
+                self.ignored_options.append(token)
+            else:
+                self.files.append(self._resolve(token, base_dir))
+
+    @staticmethod
+    def _resolve(path, base_dir):
+        """展开环境变量，相对路径以文件列表所在目录为基准"""
+        path = os.path.expandvars(path)
+        return os.path.normpath(os.path.join(base_dir, path))
+
+
+class VerilogPreprocessor:
+    """
+    Verilog预处理器，在端口解析之前展开 `include、`define 和 `ifdef/`ifndef/`elsif/`else/`endif
+
+    展开结果按 (文件路径, 文件哈希, 当前宏定义集合) 缓存：大量文件包含同一个头文件时，
+    只要进入头文件时的宏定义相同，头文件只读取和展开一次，直接复用展开后的文本和
+    执行后的宏定义表。缓存命中时还会校验被包含文件的哈希，头文件变化后重新展开。
+    文件内容按mtime和大小缓存，未变化时不重新读取。
+    """
+
+    MAX_INCLUDE_DEPTH = 32
+    MAX_EXPANSION_DEPTH = 64
+
+    def __init__(self, include_dirs=None, defines=None):
+        """
+        初始化预处理器
+
+        参数:
+            include_dirs (list[str] or None): `include 搜索目录
+            defines (dict or None): 初始宏定义，宏名 -> 值
+        """
+        self.include_dirs = list(include_dirs or [])
+        # 宏名 -> (参数元组或None, 宏体)，参数元组中每一项为 (参数名, 默认值或None)
+        self.defines: dict[str, tuple] = {}
+        for name, value in (defines or {}).items():
+            self.defines[name] = (None, '' if value is None else str(value))
+        self._sources: dict[str, tuple] = {}  # 文件路径 -> (mtime, 大小, 文件哈希, 去掉注释的文本)
+        # (文件路径, 文件哈希, 宏定义集合) -> (展开文本, 宏定义表, 包含的文件集合, 被包含文件的哈希)
+        self._expansions: dict[tuple, tuple] = {}
+        self._dependencies: dict[str, frozenset] = {}  # 文件路径 -> 最近一次预处理时直接或间接包含的文件
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_filelist(cls, filelist: VerilogFilelist):
+        """根据文件列表中的 +incdir+ 和 +define+ 创建预处理器"""
+        return cls(filelist.include_dirs, filelist.defines)
+
+    def preprocess(self, file_path, raw_content=None, file_hash=None):
+        """
+        预处理文件
+
+        参数:
+            file_path (str): Verilog文件路径
+            raw_content (bytes or None): 调用者已经读取的文件内容，提供时不再读取文件，
+                保证展开结果与调用者记录的文件哈希对应同一版本的文件
+            file_hash (str or None): raw_content的哈希值，为None时重新计算
+
+        返回:
+            str: 展开后的文本，不含注释和编译指令，位范围中的常量表达式已计算为整数
+
+        异常:
+            ValueError: 条件编译不匹配、找不到 `include 文件或宏展开错误
+        """
+        file_path = os.path.abspath(file_path)
+        if raw_content is not None:
+            self._read_source(file_path, raw_content, file_hash)
+        text, _, dependencies = self._expand_file(file_path, self.defines, 0, raw_content is not None)
+        self._dependencies[file_path] = dependencies
+        return fold_constant_ranges(text)
+
+    def get_dependencies(self, file_path):
+        """
+        获取文件最近一次预处理时直接或间接 `include 的文件
+
+        返回:
+            frozenset: 被包含文件的绝对路径，文件尚未预处理时为空集合
+        """
+        return self._dependencies.get(os.path.abspath(file_path), frozenset())
+
+    def _read_source(self, path, raw_content=None, file_hash=None):
+        """读取文件并删除注释，文件未变化时使用缓存；提供raw_content时使用调用者已读取的内容"""
+        cached = self._sources.get(path)
+        if raw_content is None:
+            stat = os.stat(path)
+            if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                return cached[2], cached[3]
+            with open(path, 'rb') as f:
+                raw_content = f.read()
+            mtime, size = stat.st_mtime_ns, stat.st_size
+            file_hash = compute_content_hash(raw_content)
+        else:
+            file_hash = file_hash or compute_content_hash(raw_content)
+            if cached is not None and cached[2] == file_hash:
+                return cached[2], cached[3]
+            # 调用者读取的内容不一定对应文件当前的mtime，下次按路径读取时重新读取文件
+            mtime, size = None, None
+        text = raw_content.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        text = strip_comments(text)
+        self._sources[path] = (mtime, size, file_hash, text)
+        return file_hash, text
+
+    def _expand_file(self, path, defines, include_depth, use_cached_source=False):
+        """
+        展开一个文件，返回 (展开文本, 展开后的宏定义表, 包含的文件集合)，调用方不能修改返回的宏定义表
+
+        use_cached_source为True时使用_read_source中已缓存的内容，不检查文件是否变化
+        """
+        if use_cached_source:
+            file_hash, text = self._sources[path][2], self._sources[path][3]
+        else:
+            file_hash, text = self._read_source(path)
+        key = (path, file_hash, frozenset(defines.items()))
+        cached = self._expansions.get(key)
+        # 被包含的头文件变化后，包含它的文件的展开结果也失效
+        if cached is not None and all(self._read_source(dependency)[0] == dependency_hash
+                                      for dependency, dependency_hash in cached[3]):
+            self.cache_hits += 1
+            return cached[:3]
+        self.cache_misses += 1
+        defines = dict(defines)
+        output = []
+        dependencies = set()
+        self._process(text, os.path.dirname(path), defines, output, dependencies, include_depth, 0)
+        dependency_hashes = tuple((dependency, self._sources[dependency][2]) for dependency in dependencies)
+        result = (''.join(output), defines, frozenset(dependencies))
+        self._expansions[key] = result + (dependency_hashes,)
+        return result
+
+    def _resolve_include(self, name, base_dir):
+        """在当前文件目录和include目录中查找 `include 文件"""
+        for directory in [base_dir] + self.include_dirs:
+            path = os.path.normpath(os.path.join(directory, name))
+            if os.path.isfile(path):
+                return path
+        raise ValueError(f"找不到 `include 文件: {name}")
+
+    def _process(self, text, base_dir, defines, output, dependencies, include_depth, expansion_depth):
+        """处理编译指令和宏引用，展开结果追加到output，被包含的文件加入dependencies"""
+        if expansion_depth > self.MAX_EXPANSION_DEPTH:
+            raise ValueError("宏展开层数过多，可能存在递归定义的宏")
+        # 条件编译栈，每一项为 [外层是否有效, 是否已有分支被选中, 当前分支是否有效]
+        stack = []
+        active = True
+        pos = 0
+        while True:
+            match = _DIRECTIVE.search(text, pos)
+            if match is None:
+                if active:
+                    output.append(text[pos:])
+                break
+            if active:
+                output.append(text[pos:match.start()])
+            name = match.group(1)
+            pos = match.end()
+
+            if name in ('ifdef', 'ifndef', 'elsif'):
+                identifier = _IDENTIFIER.match(text, pos)
+                if identifier is None:
+                    raise ValueError(f"`{name} 缺少宏名")
+                pos = identifier.end()
+                defined = identifier.group(1) in defines
+                if name == 'elsif':
+                    if not stack:
+                        raise ValueError("`elsif 没有对应的 `ifdef")
+                    frame = stack[-1]
+                    frame[2] = frame[0] and not frame[1] and defined
+                    frame[1] = frame[1] or frame[2]
+                else:
+                    taken = active and (defined if name == 'ifdef' else not defined)
+                    stack.append([active, taken, taken])
+                active = stack[-1][2]
+            elif name == 'else':
+                if not stack:
+                    raise ValueError("`else 没有对应的 `ifdef")
+                frame = stack[-1]
+                frame[2] = frame[0] and not frame[1]
+                frame[1] = True
+                active = frame[2]
+            elif name == 'endif':
+                if not stack:
+                    raise ValueError("`endif 没有对应的 `ifdef")
+                active = stack.pop()[0]
+            elif not active:
+                continue
+            elif name == 'define':
+                pos = self._parse_define(text, pos, defines)
+            elif name == 'undef':
+                identifier = _IDENTIFIER.match(text, pos)
+                if identifier is None:
+                    raise ValueError("`undef 缺少宏名")
+                pos = identifier.end()
+                defines.pop(identifier.group(1), None)
+            elif name == 'include':
+                target = _INCLUDE_TARGET.match(text, pos)
+                if target is None:
+                    raise ValueError("`include 缺少文件名")
+                pos = target.end()
+                if include_depth >= self.MAX_INCLUDE_DEPTH:
+                    raise ValueError("`include 嵌套层数过多，可能存在循环包含")
+                path = self._resolve_include(target.group(1) or target.group(2), base_dir)
+                included, included_defines, included_dependencies = self._expand_file(path, defines,
+                                                                                      include_depth + 1)
+                output.append(included)
+                dependencies.add(path)
+                dependencies.update(included_dependencies)
+                defines.clear()
+                defines.update(included_defines)
+            elif name in IGNORED_DIRECTIVES:
+                line_end = text.find('\n', pos)
+                pos = len(text) if line_end == -1 else line_end
+            else:
+                macro = defines.get(name)
+                if macro is None:
+                    # 未定义的宏保持原样
+                    output.append(match.group())
+                    continue
+                params, body = macro
+                if params is not None:
+                    args, pos = self._parse_macro_args(text, pos, name)
+                    body = self._substitute(name, params, body, args)
+                self._process(body, base_dir, defines, output, dependencies, include_depth, expansion_depth + 1)
+        if stack:
+            raise ValueError("`ifdef 缺少对应的 `endif")
+
+    @staticmethod
+    def _parse_define(text, pos, defines):
+        """解析 `define，支持函数式宏、参数默认值和反斜杠续行，返回宏定义结束的位置"""
+        identifier = _IDENTIFIER.match(text, pos)
+        if identifier is None:
+            raise ValueError("`define 缺少宏名")
+        name = identifier.group(1)
+        pos = identifier.end()
+        params = None
+        # 宏名后紧跟括号时为函数式宏
+        if text.startswith('(', pos):
+            close = text.find(')', pos)
+            if close == -1:
+                raise ValueError(f"宏 {name} 的参数列表缺少右括号")
+            params = []
+            for item in text[pos + 1:close].split(','):
+                if item.strip():
+                    param, has_default, default = item.partition('=')
+                    params.append((param.strip(), default.strip() if has_default else None))
+            params = tuple(params)
+            pos = close + 1
+
+        lines = []
+        while True:
+            line_end = text.find('\n', pos)
+            line = text[pos:] if line_end == -1 else text[pos:line_end]
+            if line.rstrip().endswith('\\') and line_end != -1:
+                lines.append(line.rstrip()[:-1].strip())
+                pos = line_end + 1
+                continue
+            lines.append(line.strip())
+            pos = len(text) if line_end == -1 else line_end
+            break
+        defines[name] = (params, ' '.join(item for item in lines if item))
+        return pos
+
+    @staticmethod
+    def _parse_macro_args(text, pos, name):
+        """解析函数式宏的实参，返回 (实参列表, 右括号之后的位置)"""
+        start = pos
+        while start < len(text) and text[start] in ' \t\n':
+            start += 1
+        if start >= len(text) or text[start] != '(':
+            raise ValueError(f"宏 {name} 需要参数")
+        args = []
+        depth = 0
+        current = start + 1
+        index = start + 1
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                string_end = _COMMENT_OR_STRING.match(text, index)
+                index = string_end.end() if string_end else index + 1
+                continue
+            if char in '([{':
+                depth += 1
+            elif char in ')]}':
+                if depth == 0:
+                    if char != ')':
+                        break
+                    args.append(text[current:index].strip())
+                    return args, index + 1
+                depth -= 1
+            elif char == ',' and depth == 0:
+                args.append(text[current:index].strip())
+                current = index + 1
+            index += 1
+        raise ValueError(f"宏 {name} 的参数缺少右括号")
+
+    @staticmethod
+    def _substitute(name, params, body, args):
+        """把宏体中的形参替换为实参，缺少的实参使用默认值"""
+        if args == [''] and not params:
+            args = []
+        if len(args) > len(params):
+            raise ValueError(f"宏 {name} 的参数过多")
+        values = {}
+        for index, (param, default) in enumerate(params):
+            value = args[index] if index < len(args) and args[index] != '' else default
+            if value is None:
+                raise ValueError(f"宏 {name} 缺少参数 {param}")
+            values[param] = value
+        if values:
+            body = re.sub(r'\b(' + '|'.join(re.escape(param) for param in values) + r')\b',
+                          lambda match: values[match.group(1)], body)
+        # `` 用于拼接标识符
+        return body.replace('``', '')
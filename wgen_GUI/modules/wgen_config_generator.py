@@ -2,9 +2,11 @@
 try:
     from .code_generator_interface import CodeGeneratorInterface
     from .verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+    from .hierarchy_validator import validate_hierarchy
 except ImportError:
     from code_generator_interface import CodeGeneratorInterface
     from verilog_models import VerilogModuleCollection, VerilogModule, VerilogPort, VerilogConnection
+    from hierarchy_validator import validate_hierarchy
 from datetime import datetime
 import getpass
 
@@ -45,6 +47,27 @@ class WgenConfigGenerator(CodeGeneratorInterface):
         return result 
 
 
+    def get_generated_modules_in_order(self, db: VerilogModuleCollection) -> list:
+        """
+        按子模块在父模块之前的顺序获取所有需要生成的模块
+        
+        参数:
+            db (VerilogModuleCollection): 包含模块和连接信息的数据库
+            
+        返回:
+            list: 需要生成的模块列表
+            
+        异常:
+            ValueError: 层次结构存在循环包含时抛出
+        """
+        validation = validate_hierarchy(db.modules)
+        if validation.has_errors():
+            raise ValueError(f"层次结构存在循环包含:\n{validation.get_summary()}")
+        
+        modules = [db.get_module(name) for name in validation.order]
+        return [module for module in modules if module.need_gen]
+
+
     def gen_instace_block(self, db: VerilogModuleCollection) -> str:
         """
         从数据库中获取所有模块实例化代码并拼接成字符串
@@ -106,7 +129,7 @@ class WgenConfigGenerator(CodeGeneratorInterface):
         module_def_lines.append(f"# generated module definition")
         module_def_lines.append(f"##########################################")
 
-        for module in db.modules:
+        for module in self.get_generated_modules_in_order(db):
             if module.need_gen:
                 module_def_lines.append(f"generate verilog {module.module_def_name}  \\")
                 module_def_lines.append(f"  port_order user \\")
@@ -138,7 +161,7 @@ class WgenConfigGenerator(CodeGeneratorInterface):
         hierarchy_lines.append(f"##########################################")
         hierarchy_lines.append(f"# generated module hierarchy")
         hierarchy_lines.append(f"##########################################")
-        for module in db.modules:
+        for module in self.get_generated_modules_in_order(db):
             if module.need_gen:
                 hierarchy_def = f"hierarchy {module.module_def_name} = "
                 for include_md in module.includes:
@@ -1,12 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 import copy
+import fnmatch
+import os
+import threading
 from collections import deque
 from modules.verilog_parser import VerilogParser
 from modules.verilog_models import VerilogModuleCollection, VerilogPort
 from modules.file_handler import FileHandler
 from modules.toast import Toast
 from modules.wgen_config_generator import WgenConfigGenerator
+from modules.database_updater import DatabaseUpdater, DatabaseWatchService
+from modules.collection_merge import merge_collections
+from modules.port_punch import PortPunchEngine
+from modules.auto_connect import AutoConnectEngine, NameRule
+from modules.interface_inference import InterfaceInference
+from modules.port_similarity import PortSimilarityIndex
+from modules.netlist_importer import NetlistImporter
+from modules.hierarchy_inference import HierarchyInference
+from modules.session_journal import SessionJournal
 
 
 class WGenGUI:
@@ -34,6 +46,17 @@ class WGenGUI:
         self.collection_DB:VerilogModuleCollection = None
         # 初始化一个大小为1024的栈，用于存放collection_DB的历史副本
         self.connections_DB_stack: deque[VerilogModuleCollection] = deque(maxlen=1024)
+        # 总线接口推断，结果按模块定义缓存，数据库变化时清除
+        self.interface_inference = InterfaceInference()
+        # 端口名相似度索引，首次使用时建立，数据库端口变化后重建
+        self.similarity_index: PortSimilarityIndex = None
+        # 加载配置文件时使用的预处理器（配置了filelists时），增量更新和文件监视时复用
+        self.rtl_preprocessor = None
+        # RTL文件监视服务，开启监视模式时创建
+        self.watch_service: DatabaseWatchService = None
+        self.watch_var = tk.BooleanVar(value=False)
+        # 会话日志：连接/断开操作追加到日志，不再每次保存整个数据库
+        self.session_journal = SessionJournal(os.path.join(self.file_handler.get_sessions_dir(), SessionJournal.FILE_NAME))
 
         # 存储缩放相关的属性
         self.master_scale = 1.0  # Master电路图的缩放比例
@@ -63,12 +86,24 @@ class WGenGUI:
         
         # 创建主界面布局
         self._create_layout()
+        # 关闭窗口前等待后台保存完成
+        self.root.protocol("WM_DELETE_WINDOW", self._quit)
+        # 定期推进后台保存并处理保存结果
+        self.root.after(100, self._poll_saves)
         
         # 启动时打开选择对话框
         self._show_startup_dialog()
     
     def _show_startup_dialog(self):
         """显示启动选择对话框，使用tkinter内置的是/否按钮对话框"""
+        # 上次会话的连接/断开操作只保存在会话日志中，优先询问是否恢复
+        pending = SessionJournal.count_records(self.session_journal.journal_path)
+        if pending and messagebox.askyesno(
+                title="恢复会话",
+                message=f"上次会话有 {pending} 个操作保存在会话日志中，是否恢复上次会话？"):
+            self._recover_session()
+            return
+
         # 使用messagebox.askyesno显示是/否对话框
         result = messagebox.askyesno(
             title="启动选择",
@@ -262,6 +297,9 @@ class WGenGUI:
         self.port_menu = tk.Menu(self.root, tearoff=0)
         self.port_menu.add_command(label="断开连接", command=lambda: self._port_menu_action("optionA", self.current_tree))
         self.port_menu.add_command(label="optionB", command=lambda: self._port_menu_action("optionB", self.current_tree))
+        self.port_menu.add_command(label="查询扇出/扇入锥", command=lambda: self._show_port_cone(self.current_tree))
+        self.port_menu.add_command(label="广播连接", command=lambda: self._broadcast_connect(self.current_tree))
+        self.port_menu.add_command(label="相似端口推荐", command=lambda: self._suggest_similar_ports(self.current_tree))
         
         # Slave下方 - 电路示意图
         slave_schematic_frame = ttk.LabelFrame(slave_paned, text="Slave电路示意图")
@@ -285,12 +323,16 @@ class WGenGUI:
         file_menu.add_separator()
         file_menu.add_command(label="打开Database", command=self._open_database)
         file_menu.add_command(label="保存Database", command=self._user_save_database)
+        file_menu.add_command(label="恢复上次会话", command=self._recover_session)
+        file_menu.add_command(label="清理会话目录", command=self._clean_sessions)
         file_menu.add_separator()
         file_menu.add_command(label="增量更新Database", command=self._try_update_database)   
+        file_menu.add_command(label="三方合并Database", command=self._merge_database)
+        file_menu.add_command(label="从网表导入连接", command=self._import_netlist)
         file_menu.add_separator()     
         file_menu.add_command(label="导出wgen_config", command=self._export_wgen_config)        
         file_menu.add_separator()     
-        file_menu.add_command(label="退出", command=self.root.quit)
+        file_menu.add_command(label="退出", command=self._quit)
         
         # 添加文件按钮
         menu_bar.add_cascade(label="文件", menu=file_menu)
@@ -298,6 +340,16 @@ class WGenGUI:
         # 添加创建连接按钮
         menu_bar.add_command(label="创建连接", command=self._create_connection)
 
+        # 添加工具菜单
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        menu_bar.add_cascade(label="工具", menu=tools_menu)
+        tools_menu.add_command(label="自动端口穿透", command=self._punch_through_ports)
+        tools_menu.add_command(label="按名称自动连接", command=self._auto_connect_by_name)
+        tools_menu.add_command(label="按接口连接", command=self._connect_interfaces)
+        tools_menu.add_command(label="从RTL推断层次结构", command=self._infer_hierarchy)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="监视RTL文件变化", variable=self.watch_var, command=self._toggle_watch_mode)
+
         # 添加帮助菜单
         help_menu = tk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="帮助", menu=help_menu)
@@ -344,14 +396,518 @@ class WGenGUI:
 
     def _try_update_database(self):
         """增量更新Database按钮的响应函数"""
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可更新的Database")
+            return
+
         # 弹出确认对话框
-        messagebox.showwarning("Warning", "敏感操作，可能毁坏现有数据库，更新前务必保存当前数据库！")
+        confirm = messagebox.askyesno("Warning", "敏感操作，可能毁坏现有数据库，更新前务必保存当前数据库！\n\n是否继续增量更新？")
+        if not confirm:
+            return
+
+        # 增量更新数据库：只重新解析内容发生变化的RTL文件
+        try:
+            report = DatabaseUpdater(self.collection_DB, self.rtl_preprocessor).update()
+        except Exception as e:
+            messagebox.showerror("错误", f"增量更新Database失败: {str(e)}")
+            return
+
+        if report.has_port_changes():
+            self.interface_inference.invalidate()
+            save_result = self._save_database()
+            Toast(self.root, f"增量更新完成\n{save_result}", duration=2000, position='top')
+        elif report.has_changes():
+            # 端口没有变化，只需要保存更新后的文件哈希
+            save_result = self._save_database()
+            Toast(self.root, f"增量更新完成，端口没有变化\n{save_result}", duration=2000, position='top')
+        else:
+            Toast(self.root, "增量更新完成，端口没有变化", duration=2000, position='top')
 
-        # 增量更新数据库
-        messagebox.showinfo("Info", "正在开发，敬请期待！")
+        # 刷新界面显示
+        self._update_modules_list()
+        self._update_hierarchy_view()
+        self._update_master_display()
+        self._update_slave_display()
+
+        # 显示更新报告
+        top = tk.Toplevel()
+        top.title("增量更新报告")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, report.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+        button = ttk.Button(top, text="确定", command=top.destroy)
+        button.pack(pady=5)
         
 
 
+    def _merge_database(self):
+        """三方合并Database按钮的响应函数，以当前数据库作为ours"""
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可合并的Database")
+            return
+
+        base_path = filedialog.askopenfilename(
+            title="选择共同祖先Database（base）",
+            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+        )
+        if not base_path:
+            return
+        their_path = filedialog.askopenfilename(
+            title="选择对方Database（theirs）",
+            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+        )
+        if not their_path:
+            return
+
+        try:
+            result = merge_collections(base_path, self.collection_DB, their_path)
+        except Exception as e:
+            messagebox.showerror("错误", f"合并Database失败: {str(e)}")
+            return
+
+        # 使用合并后的数据库替换当前数据库
+        self.collection_DB = result.collection
+        self.interface_inference.invalidate()
+        self.modules = self.collection_DB.modules
+        self.master_module = None
+        self.slave_module = None
+        for item in self.master_ports_tree.get_children():
+            self.master_ports_tree.delete(item)
+        for item in self.slave_ports_tree.get_children():
+            self.slave_ports_tree.delete(item)
+        self.master_canvas.delete("all")
+        self.slave_canvas.delete("all")
+        self._update_modules_list()
+        self._update_hierarchy_view()
+        save_result = self._save_database()
+        Toast(self.root, f"合并完成，冲突 {len(result.conflicts)} 个\n{save_result}", duration=2000, position='top')
+
+        # 显示合并报告
+        top = tk.Toplevel()
+        top.title("三方合并报告")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, result.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+        button = ttk.Button(top, text="确定", command=top.destroy)
+        button.pack(pady=5)
+
+    def _import_netlist(self):
+        """从网表导入连接按钮的响应函数，在后台线程中扫描网表，扫描完成后在主线程中创建连接"""
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可操作的Database")
+            return
+
+        netlist_path = filedialog.askopenfilename(
+            title="选择顶层Verilog网表",
+            filetypes=[("Verilog文件", "*.v *.sv"), ("所有文件", "*.*")]
+        )
+        if not netlist_path:
+            return
+
+        # 在主线程中生成端口快照，后台线程只读取快照
+        importer = NetlistImporter(self.collection_DB)
+        result = {}
+
+        def scan():
+            try:
+                result['report'] = importer.scan(netlist_path)
+            except Exception as e:
+                result['error'] = e
+
+        worker = threading.Thread(target=scan, daemon=True)
+        worker.start()
+        Toast(self.root, "正在扫描网表...", duration=2000, position='top')
+
+        def check_done():
+            if worker.is_alive():
+                self.root.after(200, check_done)
+                return
+            if 'error' in result:
+                messagebox.showerror("错误", f"扫描网表失败: {str(result['error'])}")
+                return
+            # 扫描期间数据库已被替换（重新加载配置、打开或合并数据库），扫描结果不再适用
+            if importer.collection is not self.collection_DB:
+                Toast(self.root, "Database已替换，已放弃网表导入结果", duration=2000, position='top')
+                return
+            report = result['report']
+            try:
+                importer.apply(report)
+            except Exception as e:
+                messagebox.showerror("错误", f"导入连接失败，已撤销本次所有连接: {str(e)}")
+                return
+            if report.connections:
+                save_result = self._save_database()
+                Toast(self.root, f"已从网表导入 {len(report.connections)} 个连接\n{save_result}", duration=2000, position='top')
+            self._update_master_display()
+            self._update_slave_display()
+
+            # 显示导入报告
+            top = tk.Toplevel()
+            top.title("网表导入报告")
+            text = tk.Text(top, wrap=tk.WORD)
+            text.insert(tk.END, report.get_summary())
+            text.pack(fill=tk.BOTH, expand=True)
+            text.configure(state=tk.DISABLED)
+            button = ttk.Button(top, text="确定", command=top.destroy)
+            button.pack(pady=5)
+
+        self.root.after(200, check_done)
+
+    def _toggle_watch_mode(self):
+        """监视RTL文件变化菜单项的响应函数，开启后RTL或其头文件变化时自动重新解析受影响的模块"""
+        if not self.watch_var.get():
+            self._stop_watch_mode()
+            Toast(self.root, "已停止监视RTL文件", duration=2000, position='top')
+            return
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可监视的Database")
+            self.watch_var.set(False)
+            return
+
+        try:
+            self.watch_service = DatabaseWatchService(self.collection_DB, self.rtl_preprocessor)
+            self.watch_service.start()
+        except Exception as e:
+            self.watch_service = None
+            self.watch_var.set(False)
+            messagebox.showerror("错误", f"启动文件监视失败: {str(e)}")
+            return
+        show_str = f"开始监视 {len(self.watch_service.watch_map)} 个RTL文件（{self.watch_service.watcher.backend}）"
+        Toast(self.root, show_str, duration=2000, position='top')
+        self.root.after(500, self._apply_watch_results)
+
+    def _stop_watch_mode(self):
+        """停止RTL文件监视"""
+        if self.watch_service is not None:
+            self.watch_service.stop()
+            self.watch_service = None
+        self.watch_var.set(False)
+
+    def _apply_watch_results(self):
+        """在主线程中定期应用后台重新解析的结果，并刷新受影响的界面"""
+        service = self.watch_service
+        if service is None:
+            return
+        # 数据库已被替换（重新加载配置、打开或合并数据库），监视结果不再适用
+        if service.collection is not self.collection_DB:
+            self._stop_watch_mode()
+            Toast(self.root, "Database已替换，已停止监视RTL文件", duration=2000, position='top')
+            return
+
+        try:
+            reports = service.apply_pending()
+        except Exception as e:
+            self._stop_watch_mode()
+            messagebox.showerror("错误", f"应用RTL文件变化失败，已停止监视: {str(e)}")
+            return
+
+        changed_files = {file_path for report in reports for file_path in report.changed_files}
+        failed_files = [item for report in reports for item in report.failed_files]
+        if any(report.has_changes() for report in reports):
+            if any(report.has_port_changes() for report in reports):
+                self.interface_inference.invalidate()
+                self.similarity_index = None
+            save_result = self._save_database()
+            Toast(self.root, f"RTL文件已变化，重新解析 {len(changed_files)} 个文件\n{save_result}",
+                  duration=2000, position='top')
+        if failed_files:
+            Toast(self.root, "重新解析失败:\n" + "\n".join(failed_files), duration=3000, position='top')
+        # 只刷新显示了受影响模块的面板
+        if self.master_module is not None and self.master_module.file_path in changed_files:
+            self._update_master_display()
+        if self.slave_module is not None and self.slave_module.file_path in changed_files:
+            self._update_slave_display()
+
+        self.root.after(500, self._apply_watch_results)
+
+    def _infer_hierarchy(self):
+        """从RTL推断层次结构按钮的响应函数，根据RTL中的实例化语句补充模块包含关系"""
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可操作的Database")
+            return
+
+        try:
+            result = HierarchyInference().infer(self.collection_DB.modules)
+        except Exception as e:
+            messagebox.showerror("错误", f"推断层次结构失败: {str(e)}")
+            return
+
+        if result.edges:
+            confirm = messagebox.askyesno("从RTL推断层次结构", f"推断出 {len(result.edges)} 个新的包含关系，是否加入Database？")
+            if confirm:
+                previous_tops = [(child, child.top_module) for _, child in result.edges]
+                validation = result.apply(self.collection_DB.modules, self.collection_DB)
+                if validation.has_errors():
+                    # 推断结果形成循环包含时撤销，并恢复原来的top_module
+                    for parent, child in reversed(result.edges):
+                        self.collection_DB.remove_include(parent, child)
+                    for child, top_module in reversed(previous_tops):
+                        child.top_module = top_module
+                    self.collection_DB.invalidate_hierarchy_index()
+                    messagebox.showerror("错误", f"推断结果存在循环包含，已撤销:\n{validation.get_summary()}")
+                    return
+                save_result = self._save_database()
+                Toast(self.root, f"已加入 {len(result.edges)} 个包含关系\n{save_result}", duration=2000, position='top')
+                self._update_hierarchy_view()
+
+        # 显示推断报告
+        top = tk.Toplevel()
+        top.title("层次结构推断报告")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, result.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+        button = ttk.Button(top, text="确定", command=top.destroy)
+        button.pack(pady=5)
+
+    def _punch_through_ports(self):
+        """自动端口穿透按钮的响应函数，为所有跨层次连接在中间生成模块上创建端口并逐层连接"""
+        if not self.collection_DB:
+            messagebox.showwarning("警告", "没有可操作的Database")
+            return
+
+        try:
+            result = PortPunchEngine(self.collection_DB).run()
+        except Exception as e:
+            messagebox.showerror("错误", f"端口穿透失败: {str(e)}")
+            return
+
+        if result.created_ports or result.routes:
+            save_result = self._save_database()
+            Toast(self.root, f"端口穿透完成，新建 {len(result.created_ports)} 个端口，"
+                             f"替换 {len(result.routes)} 条跨层次连接\n{save_result}", duration=2000, position='top')
+        else:
+            Toast(self.root, "端口穿透完成，没有需要新建的端口", duration=2000, position='top')
+        self._update_master_display()
+        self._update_slave_display()
+
+        # 显示端口穿透报告
+        top = tk.Toplevel()
+        top.title("端口穿透报告")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, result.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+        button = ttk.Button(top, text="确定", command=top.destroy)
+        button.pack(pady=5)
+
+    def _auto_connect_by_name(self):
+        """按名称自动连接按钮的响应函数，按规则批量连接Master模块输出端口到Slave模块输入端口"""
+        if self.master_module is None or self.slave_module is None:
+            messagebox.showerror("错误", "请在模块列表鼠标右键指定Master与Slave！！")
+            return
+
+        rules_text = simpledialog.askstring(
+            "按名称自动连接",
+            "请输入名称映射规则，多条规则用分号分隔，按顺序优先匹配：\n"
+            "  exact                      同名连接\n"
+            "  prefix m_axi_ s_axi_       替换前缀\n"
+            "  suffix _o _i               替换后缀\n"
+            "  regex (.*)_out \\1_in       正则替换",
+            initialvalue="exact"
+        )
+        if not rules_text:
+            return
+        try:
+            rules = NameRule.parse_rules(rules_text)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+
+        engine = AutoConnectEngine(self.collection_DB)
+        plan = engine.plan([self.master_module], [self.slave_module], rules)
+        self._show_connect_plan(engine, plan)
+
+    def _show_connect_plan(self, engine, plan):
+        """显示批量连接预览，确认后在一个事务中创建所有连接并保存一次"""
+        top = tk.Toplevel()
+        top.title("自动连接预览")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, plan.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+
+        def apply_plan():
+            top.destroy()
+            try:
+                created = engine.apply(plan)
+            except Exception as e:
+                messagebox.showerror("错误", f"自动连接失败，已撤销本次所有连接: {str(e)}")
+                return
+            save_result = self._save_database()
+            Toast(self.root, f"已自动创建 {len(created)} 个连接\n{save_result}", duration=2000, position='top')
+            self._update_master_display()
+            self._update_slave_display()
+
+        button_frame = ttk.Frame(top)
+        button_frame.pack(pady=5)
+        apply_button = ttk.Button(button_frame, text="应用", command=apply_plan)
+        apply_button.pack(side=tk.LEFT, padx=5)
+        if not plan.matches:
+            apply_button.configure(state=tk.DISABLED)
+        ttk.Button(button_frame, text="取消", command=top.destroy).pack(side=tk.LEFT, padx=5)
+
+    def _connect_interfaces(self):
+        """按接口连接按钮的响应函数，把Master模块的一个总线接口整体连接到Slave模块的匹配接口"""
+        if self.master_module is None or self.slave_module is None:
+            messagebox.showerror("错误", "请在模块列表鼠标右键指定Master与Slave！！")
+            return
+
+        master_interfaces = self.interface_inference.infer(self.master_module)
+        slave_interfaces = self.interface_inference.infer(self.slave_module)
+        if not master_interfaces or not slave_interfaces:
+            messagebox.showwarning("警告", "Master或Slave模块中没有推断出总线接口")
+            return
+
+        top = tk.Toplevel()
+        top.title("按接口连接")
+        ttk.Label(top, text=f"Master接口 ({self.master_module.name}):").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        master_combo = ttk.Combobox(top, state="readonly", width=40, values=[str(i) for i in master_interfaces])
+        master_combo.grid(row=0, column=1, padx=5, pady=5)
+        ttk.Label(top, text=f"Slave接口 ({self.slave_module.name}):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        slave_combo = ttk.Combobox(top, state="readonly", width=40, values=[str(i) for i in slave_interfaces])
+        slave_combo.grid(row=1, column=1, padx=5, pady=5)
+
+        def on_master_selected(event=None):
+            # 自动选中信号名匹配最多的Slave接口
+            interface = master_interfaces[master_combo.current()]
+            best = self.interface_inference.find_matching_interface(interface, self.slave_module)
+            if best is not None:
+                slave_combo.current([i.prefix for i in slave_interfaces].index(best.prefix))
+
+        def preview():
+            if master_combo.current() < 0 or slave_combo.current() < 0:
+                messagebox.showwarning("警告", "请选择Master接口和Slave接口", parent=top)
+                return
+            plan = self.interface_inference.plan_connect(master_interfaces[master_combo.current()],
+                                                         slave_interfaces[slave_combo.current()])
+            top.destroy()
+            self._show_connect_plan(AutoConnectEngine(self.collection_DB), plan)
+
+        master_combo.bind("<<ComboboxSelected>>", on_master_selected)
+        master_combo.current(0)
+        on_master_selected()
+        button_frame = ttk.Frame(top)
+        button_frame.grid(row=2, column=0, columnspan=2, pady=5)
+        ttk.Button(button_frame, text="预览连接", command=preview).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="取消", command=top.destroy).pack(side=tk.LEFT, padx=5)
+
+    def _broadcast_connect(self, tree):
+        """广播连接的响应函数，把选中的Master端口连接到所有名称匹配且未连接的输入端口"""
+        if tree != self.master_ports_tree or self.master_module is None:
+            messagebox.showwarning("警告", "请在Master端口列表中选择源端口")
+            return
+        selected_items = tree.selection()
+        if not selected_items:
+            messagebox.showwarning("警告", "请先选择端口")
+            return
+        port_name = tree.item(selected_items[0])['values'][0]
+        source_port = self.master_module.get_port(port_name)
+        if source_port is None:
+            messagebox.showerror("错误", f"未找到端口 {port_name}")
+            return
+
+        pattern = simpledialog.askstring("广播连接", "请输入目标端口名通配符（例如 clk、rst*_n）：", initialvalue=port_name)
+        if not pattern:
+            return
+
+        # 模块列表中有选中的模块时可以只连接到这些模块
+        modules = None
+        selected_modules = [self.modules_tree.item(item)['values'][0] for item in self.modules_tree.selection()]
+        if selected_modules and messagebox.askyesno("广播连接", f"是否只连接到模块列表中选中的 {len(selected_modules)} 个模块？\n选择“否”将连接到所有模块。"):
+            modules = [self.collection_DB.get_module(name) for name in selected_modules]
+            modules = [module for module in modules if module is not None]
+
+        engine = AutoConnectEngine(self.collection_DB)
+        try:
+            plan = engine.plan_broadcast(source_port, pattern, modules)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+
+        # 试运行结果只显示数量，确认后一次性创建并保存
+        confirm = messagebox.askyesno(
+            "广播连接试运行",
+            f"源端口: {self.master_module.name}.{port_name}\n"
+            f"目标端口名: {pattern}\n\n"
+            f"将要创建的连接: {len(plan.matches)}\n"
+            f"位宽不一致: {len(plan.width_mismatches)}\n"
+            f"目标端口已有驱动: {len(plan.already_driven)}\n\n"
+            f"是否继续？"
+        )
+        if not confirm or not plan.matches:
+            return
+        try:
+            created = engine.apply(plan)
+        except Exception as e:
+            messagebox.showerror("错误", f"广播连接失败，已撤销本次所有连接: {str(e)}")
+            return
+        save_result = self._save_database()
+        Toast(self.root, f"已广播连接 {len(created)} 个端口\n{save_result}", duration=2000, position='top')
+        self._update_master_display()
+        self._update_slave_display()
+
+    def _suggest_similar_ports(self, tree):
+        """相似端口推荐的响应函数，为选中的Master端口推荐名称相近、方向和位宽匹配的目标端口"""
+        if tree != self.master_ports_tree or self.master_module is None:
+            messagebox.showwarning("警告", "请在Master端口列表中选择源端口")
+            return
+        selected_items = tree.selection()
+        if not selected_items:
+            messagebox.showwarning("警告", "请先选择端口")
+            return
+        port_name = tree.item(selected_items[0])['values'][0]
+        source_port = self.master_module.get_port(port_name)
+        if source_port is None or not (source_port.is_output() or source_port.is_inout()):
+            messagebox.showerror("错误", f"端口 {port_name} 不是输出或双向端口")
+            return
+
+        if self.similarity_index is None or not self.similarity_index.is_current(self.collection_DB):
+            self.similarity_index = PortSimilarityIndex(self.collection_DB)
+        suggestions = self.similarity_index.suggest(source_port, k=20)
+        if not suggestions:
+            messagebox.showinfo("相似端口推荐", f"没有找到与 {port_name} 相似的未连接端口")
+            return
+
+        top = tk.Toplevel()
+        top.title(f"相似端口推荐: {self.master_module.name}.{port_name}")
+        result_tree = ttk.Treeview(top, columns=("distance", "port", "width"), show="headings", selectmode="browse")
+        result_tree.heading("distance", text="编辑距离")
+        result_tree.heading("port", text="端口")
+        result_tree.heading("width", text="位宽")
+        result_tree.column("distance", width=70, anchor="center")
+        result_tree.column("port", width=300)
+        result_tree.column("width", width=60, anchor="center")
+        result_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for index, (distance, port) in enumerate(suggestions):
+            result_tree.insert('', tk.END, iid=str(index),
+                               values=(distance, f"{port.father_module.name}.{port.name}", port.get_width_value()))
+        result_tree.selection_set("0")
+
+        def connect_selected():
+            selected = result_tree.selection()
+            if not selected:
+                return
+            dest_port = suggestions[int(selected[0])][1]
+            top.destroy()
+            try:
+                self.collection_DB.connect_port(source_port, dest_port)
+            except Exception as e:
+                messagebox.showerror("错误", f"连接端口失败: {str(e)}")
+                return
+            save_result = self._save_database()
+            Toast(self.root, f"已成功连接 {self.master_module.name}.{port_name} -> "
+                             f"{dest_port.father_module.name}.{dest_port.name} \n{save_result}", duration=2000, position='top')
+            self._update_master_display()
+            self._update_slave_display()
+
+        button_frame = ttk.Frame(top)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="连接选中端口", command=connect_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="关闭", command=top.destroy).pack(side=tk.LEFT, padx=5)
+
     def _create_connection(self):
         """创建连接按钮的响应函数，显示选中的master和slave端口"""
         # 获取master端口列表中选中的端口
@@ -403,7 +959,8 @@ class WGenGUI:
                         return  # 用户取消输入，退出连接操作
 
                 self.collection_DB.connect_port(from_port_obj, to_port_obj, from_bit_range, to_bit_range)
-                save_result = self._save_database()
+                save_result = self._record_edit(
+                    lambda journal: journal.record_connect(from_port_obj, to_port_obj, from_bit_range, to_bit_range))
                 show_str = f"已成功连接 {self.master_module.name}.{master_port} -> {self.slave_module.name}.{slave_port} \n{save_result}"
                 # messagebox.showinfo("成功", show_str)
                 Toast(self.root, show_str, duration=2000, position='top')
@@ -426,6 +983,7 @@ class WGenGUI:
             modules = self.file_handler.load_config_file(file_path, self.parser)
             if modules:
                 self.modules = modules
+                self.rtl_preprocessor = self.parser.preprocessor
                 self._update_modules_list()
                 self._update_hierarchy_view()
                 show_str = f"配置文件已加载成功！！共包含 {len(modules)} 个模块"
@@ -437,6 +995,7 @@ class WGenGUI:
     def _initialize_collection_DB(self):
         """初始化模块集合数据库"""
         self.collection_DB = VerilogModuleCollection()
+        self.interface_inference.invalidate()
         try:
             # 直接使用self.modules中的VerilogModule对象
             for module in self.modules:
@@ -455,22 +1014,102 @@ class WGenGUI:
         
         file_path = self.file_handler.open_database_dialog()
         if file_path:
+            module_names = self._ask_sqlite_modules(file_path)
+            if module_names is not False:
+                self._load_database_with_progress(file_path, module_names)
+
+    def _ask_sqlite_modules(self, file_path):
+        """
+        大型SQLite数据库打开前让用户选择要加载的模块，只加载这些模块及与它们有连接的模块
+
+        返回:
+            list[str] or None or False: 要加载的模块名，None表示加载全部，False表示取消打开
+        """
+        try:
+            names = self.file_handler.get_sqlite_module_names(file_path)
+        except Exception:
+            # 打开失败的原因由加载过程报告
+            return None
+        if names is None:
+            return None
+        patterns = simpledialog.askstring(
+            "加载SQLite数据库",
+            f"数据库包含 {len(names)} 个模块，请输入要加载的模块名或通配符（空格分隔，例如 u_cpu* u_ddr），"
+            f"只加载这些模块及与它们有连接的模块；留空加载全部：")
+        if patterns is None:
+            return False
+        if not patterns.strip():
+            return None
+        selected = [name for name in names if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns.split())]
+        if not selected:
+            messagebox.showwarning("警告", f"没有匹配 {patterns} 的模块")
+            return False
+        return selected
+
+    def _load_database_with_progress(self, file_path, module_names=None):
+        """在后台线程中流式加载数据库并显示进度条，加载完成后在主线程中替换当前数据库
+
+        参数:
+            file_path (str): 数据库文件路径
+            module_names (list[str] or None): 只对SQLite数据库有效，只加载这些模块及与它们有连接的模块
+        """
+        top = tk.Toplevel(self.root)
+        top.title("加载Database")
+        top.transient(self.root)
+        # 加载期间不允许操作当前数据库
+        top.grab_set()
+        ttk.Label(top, text=f"正在加载 {os.path.basename(file_path)} ...").pack(padx=20, pady=(10, 5))
+        progress_bar = ttk.Progressbar(top, length=320, mode='determinate', maximum=100)
+        progress_bar.pack(padx=20, pady=(0, 10))
+        result = {'progress': 0.0}
+
+        def report_progress(bytes_read, total_bytes):
+            # 在后台线程中调用，只记录进度，由主线程更新进度条
+            result['progress'] = 100.0 * bytes_read / total_bytes if total_bytes else 100.0
+
+        def load():
             try:
                 # 使用FileHandler加载数据库文件
-                self.collection_DB = self.file_handler.load_database(file_path)
-                
-                # 显示加载成功信息
-                show_str = f"Database已从 {file_path} 加载成功！！"
-                Toast(self.root, show_str, duration=2000, position='top')
+                result['collection'], result['store'] = self.file_handler.load_database(
+                    file_path, report_progress, module_names)
+            except Exception as e:
+                result['error'] = e
 
-                # 直接使用VerilogModule对象，不再转换为结构体
-                self.modules = self.collection_DB.modules
+        worker = threading.Thread(target=load, daemon=True)
+        worker.start()
 
-                # 更新模块列表
-                self._update_modules_list()
-                self._update_hierarchy_view()
-            except Exception as e:
-                messagebox.showerror("错误", f"加载Database失败: {str(e)}")
+        def check_done():
+            progress_bar['value'] = result['progress']
+            if worker.is_alive():
+                self.root.after(50, check_done)
+                return
+            top.destroy()
+            if 'error' in result:
+                messagebox.showerror("错误", f"加载Database失败: {str(result['error'])}")
+                return
+            self.collection_DB = result['collection']
+            # SQLite数据库只在主线程中替换，后台加载期间编辑操作仍写入之前的数据库
+            if result['store'] is not None:
+                self.file_handler.set_sqlite_store(result['store'])
+            self.interface_inference.invalidate()
+            self.similarity_index = None
+            # 数据库不是由当前配置文件生成的，不再使用配置文件的预处理器
+            self.rtl_preprocessor = None
+            
+            # 显示加载成功信息
+            show_str = f"Database已从 {file_path} 加载成功！！"
+            if module_names is not None:
+                show_str += f"\n只加载了 {len(self.collection_DB.modules)} 个模块"
+            Toast(self.root, show_str, duration=2000, position='top')
+
+            # 直接使用VerilogModule对象，不再转换为结构体
+            self.modules = self.collection_DB.modules
+
+            # 更新模块列表
+            self._update_modules_list()
+            self._update_hierarchy_view()
+
+        self.root.after(50, check_done)
             
     def _user_save_database(self):
         """弹出文件窗口让用户指定保存位置和文件名，然后调用_save_database保存数据库"""
@@ -480,16 +1119,15 @@ class WGenGUI:
                 file_path = filedialog.asksaveasfilename(
                     title="保存Database",
                     defaultextension=".json",
-                    filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+                    filetypes=[("JSON文件", "*.json"), ("二进制会话文件", "*.wgs"), ("SQLite数据库", "*.db *.sqlite *.sqlite3"),
+                               ("所有文件", "*.*")]
                 )
                 
                 # 如果用户选择了文件路径
                 if file_path:
-                    # 调用_save_database函数，传入用户选择的文件路径和软件版本
-                    save_result = self._save_database(file_path, self.version)  
+                    # 调用_save_database函数，传入用户选择的文件路径和软件版本，保存完成后显示提示
+                    save_result = self._save_database(file_path, self.version, notify=True)
                     if save_result:
-                        show_str = f"Database已成功保存到:\n{file_path}"
-                        Toast(self.root, show_str, duration=2000, position='top')
                         return save_result
                 else:
                     # 用户取消了保存操作
@@ -501,21 +1139,42 @@ class WGenGUI:
             messagebox.showwarning("警告", "没有可保存的Database")
             return "save Failed"
     
-    def _save_database(self, file_path=None, version=None):
-        """保存database到文件"""
+    def _save_database(self, file_path=None, version=None, notify=False):
+        """请求在后台保存database到文件，保存完成后由_poll_saves处理结果
+        
+        参数:
+            file_path (str or None): 保存路径，为None时自动保存到sessions目录
+            version (str or None): 软件版本信息
+            notify (bool): 保存完成后是否显示提示
+        """
         if self.collection_DB:
+            # 从SQLite数据库打开的数据库直接同步到SQLite文件（批量操作后调用，在一个事务中完成）
+            store = self.file_handler.get_sqlite_store(self.collection_DB)
+            if store is not None and (file_path is None or os.path.abspath(file_path) == os.path.abspath(store.db_path)):
+                try:
+                    store.save_collection(self.collection_DB, {'version': version or self.version})
+                except Exception as e:
+                    messagebox.showerror("错误", f"保存Database失败: {str(e)}")
+                    return ""
+                if notify:
+                    Toast(self.root, f"Database已成功保存到:\n{store.db_path}", duration=2000, position='top')
+                return f"已保存到SQLite数据库:\n{store.db_path}"
             try:
+                collection = self.collection_DB
+                # 开始生成快照时记录会话日志的序号，保存完成后只保留之后追加的记录
+                def on_snapshot():
+                    journal = self.session_journal
+                    return {'seq': journal.seq if journal.is_attached(collection) else 0, 'notify': notify}
                 # 使用FileHandler保存数据库，并传递版本信息
                 # 如果没有传入版本，默认使用类的version属性
                 save_result = self.file_handler.save_database(
-                    self.collection_DB, 
+                    collection, 
                     file_path, 
                     self.connections_DB_stack,
-                    version or self.version
+                    version or self.version,
+                    on_snapshot
                 )
-                if save_result:
-                    # messagebox.showinfo("成功", save_result)
-                    return save_result
+                return save_result
             except Exception as e:
                 messagebox.showerror("错误", f"保存Database失败: {str(e)}")
                 return ""
@@ -523,7 +1182,149 @@ class WGenGUI:
             messagebox.showwarning("警告", "没有可保存的Database")
             return ""
 
-    
+    def _poll_saves(self):
+        """在主线程中推进后台保存（分片生成快照）并处理已完成的保存"""
+        for result in self.file_handler.poll_saves():
+            if not result.is_success():
+                messagebox.showerror("错误", f"保存Database失败: {result.error}")
+                continue
+            self._rebase_journal(result)
+            if result.context['notify']:
+                Toast(self.root, f"Database已成功保存到:\n{result.file_path}", duration=2000, position='top')
+        # 有保存在进行时按约60fps的间隔推进快照，空闲时降低轮询频率
+        self.root.after(16 if self.file_handler.save_worker.has_pending() else 100, self._poll_saves)
+
+    def _rebase_journal(self, result):
+        """保存完成后以新文件作为会话日志的快照，生成快照之前的日志记录已包含在快照中"""
+        if result.collection is not self.collection_DB:
+            return
+        journal = self.session_journal
+        snapshot_seq = result.context['seq']
+        # 保存为SQLite数据库后编辑操作直接写入该文件，保存过程中追加到日志的修改也同步到该文件
+        store = self.file_handler.get_sqlite_store(result.collection)
+        if store is not None and journal.is_attached(result.collection) and journal.seq > snapshot_seq:
+            try:
+                store.save_collection(result.collection, {'version': self.version})
+                snapshot_seq = journal.seq
+            except Exception as e:
+                messagebox.showerror("错误", f"同步SQLite数据库失败: {str(e)}")
+        try:
+            if journal.is_attached(result.collection):
+                journal.rebase(result.file_path, snapshot_seq)
+            else:
+                journal.attach(result.collection, result.file_path)
+        except OSError:
+            journal.close()
+
+    def _quit(self):
+        """退出程序，退出前保存日志中的修改并完成等待中的后台保存"""
+        self._stop_watch_mode()
+        # 会话日志中还有修改时保存完整快照，保存完成后压缩日志，下次启动不需要恢复会话
+        if self.session_journal.is_attached(self.collection_DB) and self.session_journal.record_count > 0:
+            self._save_database()
+        for result in self.file_handler.close(timeout=30):
+            if result.is_success():
+                self._rebase_journal(result)
+            else:
+                messagebox.showerror("错误", f"保存Database失败: {result.error}")
+        self.session_journal.close()
+        self.root.quit()
+
+    def _record_edit(self, record):
+        """
+        把一次连接/断开操作追加到会话日志（或写入SQLite数据库），代替保存整个数据库
+
+        参数:
+            record (callable): record(target)，向会话日志或SqliteCollectionStore追加操作记录（两者接口相同）
+
+        返回:
+            str: 保存结果信息
+        """
+        # 从SQLite数据库打开的数据库，每次编辑在SQLite中作为一个单行事务写入
+        store = self.file_handler.get_sqlite_store(self.collection_DB)
+        if store is not None:
+            try:
+                record(store)
+            except Exception:
+                return self._save_database()
+            return "已写入SQLite数据库"
+
+        journal = self.session_journal
+        # 日志还没有当前数据库的快照时保存完整快照
+        if not journal.is_attached(self.collection_DB):
+            return self._save_database()
+        try:
+            record(journal)
+        except OSError:
+            journal.close()
+            return self._save_database()
+        # 正在生成的快照与开始时的数据库一致，不需要重新生成，之后的修改保留在日志中（rebase时保留）
+        # 记录过多时在后台保存新的完整快照，保存完成后压缩日志
+        if journal.needs_compaction():
+            self._save_database()
+        return f"已写入会话日志（第 {journal.record_count} 条）"
+
+    def _clean_sessions(self):
+        """清理会话目录按钮的响应函数，按保留策略删除旧会话和不再被引用的数据块"""
+        try:
+            report = self.file_handler.clean_sessions()
+        except Exception as e:
+            messagebox.showerror("错误", f"清理会话目录失败: {str(e)}")
+            return
+        top = tk.Toplevel()
+        top.title("会话目录清理报告")
+        text = tk.Text(top, wrap=tk.WORD)
+        text.insert(tk.END, report.get_summary())
+        text.pack(fill=tk.BOTH, expand=True)
+        text.configure(state=tk.DISABLED)
+        button = ttk.Button(top, text="确定", command=top.destroy)
+        button.pack(pady=5)
+
+    def _recover_session(self):
+        """恢复上次会话按钮的响应函数，加载会话日志的快照并重放之后的连接/断开操作"""
+        journal_path = self.session_journal.journal_path
+        if SessionJournal.read_snapshot_path(journal_path) is None:
+            messagebox.showinfo("提示", "没有可恢复的会话")
+            return
+        if self.collection_DB and not messagebox.askyesno("确认", "恢复会话将替换当前Database，是否继续？"):
+            return
+
+        try:
+            collection, report = SessionJournal.recover(journal_path)
+        except Exception as e:
+            messagebox.showerror("错误", f"恢复会话失败: {str(e)}")
+            return
+
+        self.session_journal.close()
+        self.collection_DB = collection
+        self.interface_inference.invalidate()
+        self.similarity_index = None
+        self.rtl_preprocessor = None
+        self.modules = self.collection_DB.modules
+        self.master_module = None
+        self.slave_module = None
+        for item in self.master_ports_tree.get_children():
+            self.master_ports_tree.delete(item)
+        for item in self.slave_ports_tree.get_children():
+            self.slave_ports_tree.delete(item)
+        self.master_canvas.delete("all")
+        self.slave_canvas.delete("all")
+        self._update_modules_list()
+        self._update_hierarchy_view()
+        # 保存恢复后的完整快照，压缩会话日志
+        save_result = self._save_database()
+        Toast(self.root, f"已恢复会话，重放 {report.replayed} 个操作\n{save_result}", duration=2000, position='top')
+
+        if report.failed or report.truncated:
+            top = tk.Toplevel()
+            top.title("会话恢复报告")
+            text = tk.Text(top, wrap=tk.WORD)
+            text.insert(tk.END, report.get_summary())
+            text.pack(fill=tk.BOTH, expand=True)
+            text.configure(state=tk.DISABLED)
+            button = ttk.Button(top, text="确定", command=top.destroy)
+            button.pack(pady=5)
+
     def _update_modules_list(self):
         """更新模块列表显示"""
         # 清空现有列表
@@ -707,7 +1508,7 @@ class WGenGUI:
                 if confirm:
                     ans_str = self.collection_DB.remove_master_port_connections(port_obj)
                     if ans_str is None or ans_str == "":
-                        save_result = self._save_database()
+                        save_result = self._record_edit(lambda journal: journal.record_disconnect_source(port_obj))
                         if save_result is not None and save_result != "":
                             Toast(self.root, "删除连接成功\n" + save_result, duration=2000, position='top')
                             print(f"成功删除主端口 {port_name} 的连接")
@@ -726,7 +1527,7 @@ class WGenGUI:
             if port_obj:
                 ans_str = self.collection_DB.remove_slave_port_connection(port_obj)
                 if ans_str is None or ans_str == "":
-                    save_result = self._save_database()
+                    save_result = self._record_edit(lambda journal: journal.record_disconnect_dest(port_obj))
                     if save_result is not None and save_result != "":
                         Toast(self.root, "删除连接成功\n" + save_result, duration=2000, position='top')
                         print(f"成功删除从端口 {port_name} 的连接")
@@ -753,6 +1554,68 @@ class WGenGUI:
         #     # 其他操作保持原有逻辑
         #     messagebox.showinfo("操作提示", f"你在{tree_type}端口列表中点击了{action}操作，端口：{port_name}")
     
+    def _show_port_cone(self, tree):
+        """查询选中端口的传递扇出锥（Master端口）或扇入锥（Slave端口），并分批显示在结果面板中"""
+        selected_items = tree.selection() if tree is not None else ()
+        if not selected_items or not self.collection_DB:
+            messagebox.showwarning("警告", "请先选择端口")
+            return
+        port_name = tree.item(selected_items[0])['values'][0]
+
+        if tree == self.master_ports_tree:
+            module, direction, title = self.master_module, "fanout", "扇出锥"
+        else:
+            module, direction, title = self.slave_module, "fanin", "扇入锥"
+        port_obj = module.get_port(port_name) if module else None
+        if port_obj is None:
+            messagebox.showerror("错误", f"未找到端口 {port_name}")
+            return
+
+        max_depth = simpledialog.askinteger(title, "请输入最大深度（0表示不限制）：", initialvalue=0, minvalue=0)
+        if max_depth is None:
+            return
+
+        # 结果面板
+        top = tk.Toplevel()
+        top.title(f"{title}: {module.name}.{port_name}")
+        status_label = ttk.Label(top, text="查询中...")
+        status_label.pack(fill=tk.X, padx=5, pady=5)
+        result_frame = ttk.Frame(top)
+        result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        result_tree = ttk.Treeview(result_frame, columns=("depth", "port", "direction"), show="headings")
+        result_tree.heading("depth", text="深度")
+        result_tree.heading("port", text="端口")
+        result_tree.heading("direction", text="方向")
+        result_tree.column("depth", width=50, anchor="center")
+        result_tree.column("port", width=300)
+        result_tree.column("direction", width=80, anchor="center")
+        result_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        result_scrollbar = ttk.Scrollbar(result_frame, orient=tk.VERTICAL, command=result_tree.yview)
+        result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        result_tree.configure(yscrollcommand=result_scrollbar.set)
+        ttk.Button(top, text="关闭", command=top.destroy).pack(pady=5)
+
+        cone = self.collection_DB.iter_cone(port_obj, direction, max_depth or None)
+        count = [0]
+
+        def load_batch():
+            # 窗口已关闭时停止查询
+            if not top.winfo_exists():
+                return
+            for _ in range(500):
+                item = next(cone, None)
+                if item is None:
+                    status_label.configure(text=f"查询完成，共 {count[0]} 个端口")
+                    return
+                depth, port = item
+                module_name = port.father_module.name if port.father_module else "unknown_module"
+                result_tree.insert('', tk.END, values=(depth, f"{module_name}.{port.name}", port.direction))
+                count[0] += 1
+            status_label.configure(text=f"查询中... 已找到 {count[0]} 个端口")
+            top.after(1, load_batch)
+
+        load_batch()
+
     def _draw_module_schematic(self, canvas, module):
         """绘制模块电路示意图"""
         # 清空画布
@@ -931,7 +1794,10 @@ class WGenGUI:
         self.hierarchy_text.configure(state=tk.DISABLED)  # 设置为只读
         
     def _generate_module_hierarchy_text(self, module, indent_level, is_last=False, prefix=[]):
-        """递归生成模块及其包含的模块层次结构文本，使用树形结构指示符增强视觉效果
+        """迭代生成模块及其包含的模块层次结构文本，使用树形结构指示符增强视觉效果
+        
+        使用显式栈代替递归，层次再深也不会超出递归深度限制；
+        模块出现在自身的祖先链中时标记为循环包含，不再展开。
         
         参数:
             module: 当前模块对象
@@ -942,42 +1808,52 @@ class WGenGUI:
         返回:
             str: 层次结构文本
         """
-        # 构建树形结构指示符
-        tree_prefix = ""
-        for i, p in enumerate(prefix):
-            if p:
-                tree_prefix += "│   "
-            else:
-                tree_prefix += "    "
-        
-        if indent_level > 0:
-            if is_last:
-                tree_prefix += "└── "
-            else:
-                tree_prefix += "├── "
-        
-        # 生成模块文本
-        module_text = f"{tree_prefix}{module.name}"
-        
-        # 添加模块属性信息
-        if hasattr(module, 'module_def_name') and module.module_def_name:
-            module_text += f" ({module.module_def_name})"
-        
-        # 添加是否为生成模块的标记
-        if hasattr(module, 'need_gen') and module.need_gen:
-            module_text += " [需要生成]"
-        
-        # 检查模块是否有包含的模块
-        includes = getattr(module, 'includes', [])
-        if includes:
-            new_prefix = prefix + [not is_last]
-            # 为每个包含的模块递归生成文本
-            for i, include_module in enumerate(includes):
-                is_last_child = (i == len(includes) - 1)
-                include_text = self._generate_module_hierarchy_text(include_module, indent_level + 1, is_last_child, new_prefix)
-                module_text += f"\n{include_text}"
-        
-        return module_text
+        lines = []
+        # 栈元素: (模块, 缩进级别, 是否最后一个子模块, 前缀列表, 祖先模块id集合)
+        stack = [(module, indent_level, is_last, prefix, frozenset())]
+        while stack:
+            current, level, last, current_prefix, ancestors = stack.pop()
+            
+            # 构建树形结构指示符
+            tree_prefix = ""
+            for p in current_prefix:
+                if p:
+                    tree_prefix += "│   "
+                else:
+                    tree_prefix += "    "
+            
+            if level > 0:
+                if last:
+                    tree_prefix += "└── "
+                else:
+                    tree_prefix += "├── "
+            
+            # 生成模块文本
+            module_text = f"{tree_prefix}{current.name}"
+            
+            # 添加模块属性信息
+            if hasattr(current, 'module_def_name') and current.module_def_name:
+                module_text += f" ({current.module_def_name})"
+            
+            # 添加是否为生成模块的标记
+            if hasattr(current, 'need_gen') and current.need_gen:
+                module_text += " [需要生成]"
+            
+            if id(current) in ancestors:
+                lines.append(module_text + " [循环包含]")
+                continue
+            lines.append(module_text)
+            
+            # 检查模块是否有包含的模块，逆序入栈以保持原有顺序
+            includes = getattr(current, 'includes', [])
+            if includes:
+                new_prefix = current_prefix + [not last]
+                new_ancestors = ancestors | {id(current)}
+                for i in range(len(includes) - 1, -1, -1):
+                    is_last_child = (i == len(includes) - 1)
+                    stack.append((includes[i], level + 1, is_last_child, new_prefix, new_ancestors))
+        
+        return "\n".join(lines)
         
     def _show_about_info(self):
         """显示关于信息对话框